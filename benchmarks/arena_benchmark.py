@@ -0,0 +1,53 @@
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable
+from compiler.tokenizer import TokenStream, tokenize_stream
+from compiler.parser import parse
+from compiler.arena import parse_arena, typecheck_arena
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from benchmarks.programs import generate_source, generate_expressions
+
+# Run with: poetry run python -m benchmarks.arena_benchmark
+
+sizes = [100_000, 300_000, 1_000_000, 3_000_000]
+
+def measure(make: Callable[[TokenStream], Any], stream: TokenStream) -> tuple[Any, int]:
+    """Makes the AST and returns it with the memory it takes."""
+    gc.collect()
+    tracemalloc.start()
+    made = make(stream)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return made, memory
+
+def best_time(run: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    print(f'{"program":>12} {"size":>9} {"nodes":>9} {"AST":>6} {"bytes/node":>10} {"parse ns/node":>13} {"check ns/node":>13}')
+    for (name, generate), size in [(g, s) for g in [("statements", generate_source), ("expressions", generate_expressions)] for s in sizes]:
+        stream = tokenize_stream(generate(size))
+        arena, arena_memory = measure(parse_arena, stream)
+        nodes = len(arena)
+        del arena
+        tree, tree_memory = measure(parse, stream)
+        del tree
+        kinds: list[tuple[str, Callable[[TokenStream], Any], Callable[[Any, SymbolTable], Any], int]] = [
+                ("tree", parse, typecheck, tree_memory),
+                ("arena", parse_arena, typecheck_arena, arena_memory)]
+        for kind, make, check, memory in kinds:
+            parse_time = best_time(lambda: make(stream))
+            made = make(stream)
+            check_time = best_time(lambda: check(made, SymbolTable()))
+            del made
+            print(f'{name:>12} {size:>9} {nodes:>9} {kind:>6} {memory / nodes:>10.1f} {parse_time / nodes * 1e9:>13.0f} {check_time / nodes * 1e9:>13.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import time
+import tracemalloc
+from compiler.tokenizer import tokenize_stream
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from benchmarks.parser_benchmark import count_nodes
+from benchmarks.programs import generate_source, generate_expressions
+
+# Run with: poetry run python -m benchmarks.ast_benchmark
+
+size = 2_000_000
+
+def main() -> None:
+    print(f'{"program":>12} {"nodes":>9} {"AST bytes":>11} {"bytes/node":>10} {"check s":>8} {"check ns/node":>14}')
+    for name, generate in [("statements", generate_source), ("expressions", generate_expressions)]:
+        stream = tokenize_stream(generate(size))
+        tracemalloc.start()
+        tree = parse(stream)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        nodes = count_nodes(tree)
+        check_time = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            typecheck(tree, SymbolTable())
+            check_time = min(check_time, time.perf_counter() - start)
+        print(f'{name:>12} {nodes:>9} {memory:>11} {memory / nodes:>10.1f} {check_time:>8.3f} {check_time / nodes * 1e9:>14.0f}')
+
+if __name__ == '__main__':
+    main()
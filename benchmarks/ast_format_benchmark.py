@@ -0,0 +1,38 @@
+import pickle
+import sys
+import time
+from typing import Any, Callable
+from compiler.tokenizer import tokenize_stream
+from compiler.parser import parse
+from compiler.ast_format import dump_ast, load_ast
+from benchmarks.programs import generate_source, generate_expressions
+
+# Run with: poetry run python -m benchmarks.ast_format_benchmark
+
+sizes = [100_000, 1_000_000]
+
+def best_time(run: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    sys.setrecursionlimit(100_000) # pickle recurses over the tree
+    print(f'{"program":>12} {"size":>9} {"format":>7} {"bytes":>9} {"dump s":>7} {"load s":>7} {"vs parse":>8}')
+    for (name, generate), size in [(g, s) for g in [("statements", generate_source), ("expressions", generate_expressions)] for s in sizes]:
+        source_code = generate(size)
+        parse_time = best_time(lambda: parse(tokenize_stream(source_code)))
+        print(f'{name:>12} {size:>9} {"source":>7} {len(source_code):>9} {"":>7} {parse_time:>7.3f} {1:>7.1f}x')
+        tree = parse(tokenize_stream(source_code))
+        formats: list[tuple[str, Callable[[Any], bytes], Callable[[bytes], Any]]] = [("pickle", pickle.dumps, pickle.loads), ("binary", dump_ast, load_ast)]
+        for format, dump, load in formats:
+            data = dump(tree)
+            dump_time = best_time(lambda: dump(tree))
+            load_time = best_time(lambda: load(data))
+            print(f'{name:>12} {size:>9} {format:>7} {len(data):>9} {dump_time:>7.3f} {load_time:>7.3f} {parse_time / load_time:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import time
+import compiler.ast as ast
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import interpret
+from compiler.ast_optimizer import optimize, count_nodes
+from benchmarks.programs import generate_source, generate_expressions, generate_repetitive
+from benchmarks.interpreter_benchmark import programs
+
+# Run with: poetry run python -m benchmarks.ast_optimizer_benchmark
+
+corpora = {
+    "statements": generate_source(100_000),
+    "expressions": generate_expressions(100_000),
+    "repetitive": generate_repetitive(100_000),
+    **programs,
+}
+
+def typechecked(source_code: str) -> ast.Expression:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    return root
+
+def run_time(root: ast.Expression) -> float:
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        try:
+            interpret(root, lambda: '', lambda text: None)
+        except ZeroDivisionError:
+            pass # generated programs may divide by zero, optimized or not
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    print(f'{"program":>12} {"nodes":>7} {"after":>7} {"removed":>7} {"optimize s":>10} {"run s":>6} {"after":>6} {"saved":>6}')
+    for name, source_code in corpora.items():
+        root = typechecked(source_code)
+        before = count_nodes(root)
+        unoptimized_time = run_time(root)
+        root = typechecked(source_code)
+        start = time.perf_counter()
+        root = optimize(root)
+        optimize_time = time.perf_counter() - start
+        after = count_nodes(root)
+        optimized_time = run_time(root)
+        print(f'{name:>12} {before:>7} {after:>7} {1 - after / before:>7.1%} {optimize_time:>10.4f} '
+              f'{unoptimized_time:>6.3f} {optimized_time:>6.3f} {1 - optimized_time / unoptimized_time:>6.1%}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import time
+import numpy as np
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import compile_program
+from compiler.batch import run_batch
+
+# Run with: poetry run python -m benchmarks.batch_benchmark
+
+programs = {
+    "collatz": """
+        var n = read_int(); var steps = 0;
+        while n != 1 do {
+            if n % 2 == 0 then n = n / 2 else n = 3 * n + 1;
+            steps = steps + 1
+        };
+        steps
+    """,
+    "digits": """
+        var a = read_int(); var b = read_int(); var sum = 0;
+        var x = a * b;
+        while x > 0 do { sum = sum + x % 10; x = x / 10 };
+        if sum % 3 == 0 then print_int(sum);
+        sum > 20
+    """,
+    "polynomial": """
+        var x = read_int(); var y = read_int();
+        var p = 3 * x * x - 2 * x * y + y * y - 7;
+        print_int(p);
+        p % 5 == 0 or p < 0
+    """,
+}
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    print(f'{"program":>10} {"rows":>7} {"per row rows/s":>14} {"batch rows/s":>12} {"speedup":>7}')
+    for name, source_code in programs.items():
+        root = parse(tokenize(source_code))
+        typecheck(root, SymbolTable())
+        for count in [10_000, 100_000]:
+            inputs = rng.integers(1, 10_000, size = (count, 2))
+            # One row at a time, in the closure interpreter, which is compiled once.
+            lines: list[str] = []
+            outputs: list[str] = []
+            code = compile_program(root, lambda: lines.pop(), outputs.append)
+            start = time.perf_counter()
+            for row in inputs.tolist():
+                lines = [f'{number}\n' for number in reversed(row)]
+                code()
+            per_row_time = time.perf_counter() - start
+            start = time.perf_counter()
+            result = run_batch(root, inputs)
+            batch_time = time.perf_counter() - start
+            assert ''.join(result.outputs) == ''.join(outputs)
+            print(f'{name:>10} {count:>7} {count / per_row_time:>14,.0f} {count / batch_time:>12,.0f} {per_row_time / batch_time:>6.1f}x')
+
+if __name__ == '__main__':
+    main()
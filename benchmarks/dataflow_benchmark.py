@@ -0,0 +1,40 @@
+import time
+from typing import Any, Callable
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.ast_cfg import build_ast_cfg
+from compiler.dataflow import liveness, reaching_definitions, definite_assignment
+
+# Run with: poetry run python -m benchmarks.dataflow_benchmark
+
+def generate_program(loops: int, branches: int, variables: int) -> str:
+    """Loops of branches that read and write a few variables, four blocks for
+    each branch."""
+    names = [f'v{n}' for n in range(variables)]
+    lines = [f'var {name} = read_int();' for name in names]
+    for loop in range(loops):
+        body = []
+        for branch in range(branches):
+            a, b, c = names[branch % variables], names[(branch * 7 + loop) % variables], names[(branch * 13 + 1) % variables]
+            body.append(f'if {a} > {b} and {c} < {branch} then {{ var t = {b} + {c}; {a} = t }} else {c} = {a} - 1;')
+        lines.append(f'while {names[loop % variables]} > 0 do {{ {" ".join(body)} {names[loop % variables]} = {names[loop % variables]} - 1 }};')
+    return '\n'.join(lines) + f'\n{names[0]}'
+
+def timed(run: Callable[[], Any]) -> tuple[float, Any]:
+    start = time.perf_counter()
+    result = run()
+    return time.perf_counter() - start, result
+
+def main() -> None:
+    print(f'{"blocks":>7} {"variables":>9} {"definitions":>11} {"build s":>7} {"liveness s":>10} {"reaching s":>10} {"assigned s":>10}')
+    for loops, branches, variables in [(5, 1_000, 16), (20, 1_250, 64), (40, 625, 256)]:
+        root = parse(tokenize(generate_program(loops, branches, variables)))
+        typecheck(root, SymbolTable())
+        build_time, cfg = timed(lambda: build_ast_cfg(root))
+        times = [timed(lambda: analysis(cfg))[0] for analysis in [liveness, reaching_definitions, definite_assignment]]
+        print(f'{len(cfg.blocks):>7} {len(cfg.variables):>9} {len(cfg.definitions):>11} {build_time:>7.2f} {times[0]:>10.2f} {times[1]:>10.2f} {times[2]:>10.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import time
+from typing import Any, Callable
+from compiler.tokenizer import tokenize_stream
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.hash_cons import intern_tree, typecheck_interned
+from benchmarks.programs import generate_source, generate_expressions, generate_repetitive
+
+# Run with: poetry run python -m benchmarks.hash_cons_benchmark
+
+size = 1_000_000
+
+def best_time(run: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    print(f'{"program":>12} {"nodes":>8} {"shared":>8} {"reduction":>9} {"intern s":>8} {"check s":>8} {"shared s":>8} {"speedup":>7}')
+    programs = [
+        ("repetitive", generate_repetitive(size)),
+        ("statements", generate_source(size)),
+        ("expressions", generate_expressions(size)),
+    ]
+    for name, source_code in programs:
+        tree = parse(tokenize_stream(source_code))
+        interned = intern_tree(tree)
+        nodes = len(interned.positions)
+        intern_time = best_time(lambda: intern_tree(tree))
+        check_time = best_time(lambda: typecheck(tree, SymbolTable()))
+        shared_time = best_time(lambda: typecheck_interned(interned, SymbolTable()))
+        print(f'{name:>12} {nodes:>8} {interned.nodes:>8} {nodes / interned.nodes:>8.1f}x {intern_time:>8.3f} {check_time:>8.3f} {shared_time:>8.3f} {check_time / shared_time:>6.1f}x')
+
+if __name__ == '__main__':
+    main()
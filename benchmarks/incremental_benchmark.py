@@ -0,0 +1,54 @@
+import time
+from compiler.tokenizer import tokenize_stream
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.incremental import Document
+
+# Run with: poetry run python -m benchmarks.incremental_benchmark
+
+def generate(lines: int) -> str:
+    """A program of about 'lines' lines, mostly blocks of a few statements."""
+    parts = ['var total = 0;']
+    for index in range(lines // 5):
+        parts.append(f'{{\n    var a{index} = {index % 10};\n    var b{index} = a{index} * 2 + total;\n    total = total + b{index}\n}};')
+    parts.append('print_int(total)')
+    return '\n'.join(parts) + '\n'
+
+def measure(document: Document, offset: int, deleted: int, inserted: str) -> float:
+    """The time of making an edit and of undoing it, per edit, at best of
+    several. The undo fixes the errors of the edit."""
+    removed = document.text[offset:offset + deleted]
+    best = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        document.edit(offset, deleted, inserted)
+        document.edit(offset, len(inserted), removed)
+        best = min(best, (time.perf_counter() - start) / 2)
+        assert document.error is None
+    return best
+
+def main() -> None:
+    text = generate(100_000)
+    middle = text.index('var a10000 =')
+    start = time.perf_counter()
+    root = parse(tokenize_stream(text))
+    typecheck(root, SymbolTable())
+    full_time = time.perf_counter() - start
+    document = Document(text)
+    print(f'{text.count(chr(10)):,} lines, full rebuild {full_time * 1000:,.0f} ms')
+    edits = {
+        'digit in a block': (middle + len('var a10000 = '), 1, '7'),
+        'space in a block': (middle, 0, ' '),
+        'newline in a block': (middle, 0, '\n'),
+        'digit at the top': (len('var total = '), 1, '5'),
+        'Int to Bool at the top': (len('var total = '), 1, 'true'),
+        'deleting a ";"': (text.index(';', middle), 1, ''),
+    }
+    print(f'{"edit":>24} {"ms":>8} {"speedup":>8}')
+    for name, (offset, deleted, inserted) in edits.items():
+        elapsed = measure(document, offset, deleted, inserted)
+        print(f'{name:>24} {elapsed * 1000:>8.2f} {full_time / elapsed:>7.0f}x')
+
+if __name__ == '__main__':
+    main()
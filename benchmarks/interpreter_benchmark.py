@@ -0,0 +1,131 @@
+import time
+from typing import Any, Callable
+import compiler.ast as ast
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import Value, compile_program, divide, remainder
+
+# Run with: poetry run python -m benchmarks.interpreter_benchmark
+
+programs = {
+    "sum": """
+        var i = 0; var sum = 0;
+        while i < 1000000 do { i = i + 1; sum = sum + i % 7 };
+        sum
+    """,
+    "primes": """
+        var n = 2; var count = 0;
+        while n < 20000 do {
+            var prime = true; var d = 2;
+            while prime and d * d <= n do { if n % d == 0 then prime = false; d = d + 1 };
+            if prime then count = count + 1;
+            n = n + 1
+        };
+        count
+    """,
+    "fibonacci": """
+        var round = 0; var a = 0;
+        while round < 20000 do {
+            a = 0; var b = 1; var i = 0;
+            while i < 40 do { var next = a + b; a = b; b = next; i = i + 1 };
+            round = round + 1
+        };
+        a
+    """,
+}
+
+class Scope:
+    def __init__(self, parent: 'Scope | None') -> None:
+        self.parent = parent
+        self.values: dict[str, Value] = {}
+
+    def find(self, name: str) -> 'Scope':
+        scope: Scope | None = self
+        while scope is not None:
+            if name in scope.values:
+                return scope
+            scope = scope.parent
+        raise NameError(name)
+
+def walk(node: ast.Expression, scope: Scope) -> Value:
+    """A straightforward tree-walking interpreter, to compare with."""
+    match node:
+        case ast.Literal():
+            return node.value
+        case ast.Identifier():
+            return scope.find(node.name).values[node.name]
+        case ast.UnaryOp():
+            right: Any = walk(node.right, scope)
+            return -right if node.op == '-' else not right
+        case ast.BinaryOp():
+            if node.op == '=':
+                assert isinstance(node.left, ast.Identifier)
+                value = walk(node.right, scope)
+                scope.find(node.left.name).values[node.left.name] = value
+                return value
+            left: Any = walk(node.left, scope)
+            if node.op == 'and':
+                return left and walk(node.right, scope)
+            if node.op == 'or':
+                return left or walk(node.right, scope)
+            right = walk(node.right, scope)
+            match node.op:
+                case '+': return left + right
+                case '-': return left - right
+                case '*': return left * right
+                case '/': return divide(left, right, node.position)
+                case '%': return remainder(left, right, node.position)
+                case '<': return left < right
+                case '<=': return left <= right
+                case '>': return left > right
+                case '>=': return left >= right
+                case '==': return left == right
+                case '!=': return left != right
+        case ast.While():
+            while walk(node.condition, scope):
+                walk(node.do, scope)
+            return None
+        case ast.If():
+            if walk(node.condition, scope):
+                return walk(node.then_branch, scope)
+            return None if node.else_branch is None else walk(node.else_branch, scope)
+        case ast.FunctionCall():
+            function: Any = walk(node.name, scope)
+            return function(*[walk(argument, scope) for argument in node.arguments])
+        case ast.VariableDeclaration():
+            scope.values[node.name.name] = walk(node.value, scope)
+            return None
+        case ast.Block():
+            inner = Scope(scope)
+            value = None
+            for statement in node.statements:
+                value = walk(statement, inner)
+            return value
+    raise Exception(f'Can not walk {node}')
+
+def best_time(run: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    print(f'{"program":>10} {"walk s":>7} {"compile s":>9} {"closures s":>10} {"speedup":>7}')
+    for name, source_code in programs.items():
+        root = parse(tokenize(source_code))
+        typecheck(root, SymbolTable())
+        builtins = Scope(None)
+        builtins.values |= {"print_int": print, "print_bool": print, "read_int": lambda: int(input())}
+        walk_time = best_time(lambda: walk(root, Scope(builtins)))
+        compile_time = best_time(lambda: compile_program(root))
+        code = compile_program(root)
+        assert code() == walk(root, Scope(builtins))
+        run_time = best_time(code)
+        print(f'{name:>10} {walk_time:>7.3f} {compile_time:>9.5f} {run_time:>10.3f} {walk_time / run_time:>6.1f}x')
+
+if __name__ == '__main__':
+    main()
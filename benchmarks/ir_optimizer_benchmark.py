@@ -0,0 +1,32 @@
+import time
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.ir_generator import generate_ir
+from compiler.ir_interpreter import execute_ir
+from compiler.ir_optimizer import optimize_ir, count_instructions
+from benchmarks.interpreter_benchmark import programs
+
+# Run with: poetry run python -m benchmarks.ir_optimizer_benchmark
+
+def main() -> None:
+    print(f'{"program":>10} {"level":>5} {"static":>6} {"executed":>9} {"optimize s":>10} {"run s":>6}')
+    for name, source_code in programs.items():
+        root = parse(tokenize(source_code))
+        typecheck(root, SymbolTable())
+        instructions = generate_ir(root)
+        expected = None
+        for opt_level in [0, 1, 2]:
+            start = time.perf_counter()
+            optimized, _ = optimize_ir(instructions, opt_level)
+            optimize_time = time.perf_counter() - start
+            start = time.perf_counter()
+            value, executed = execute_ir(optimized)
+            run_time = time.perf_counter() - start
+            assert expected is None or value == expected
+            expected = value
+            print(f'{name:>10} {opt_level:>5} {count_instructions(optimized):>6} {executed:>9} {optimize_time:>10.4f} {run_time:>6.2f}')
+
+if __name__ == '__main__':
+    main()
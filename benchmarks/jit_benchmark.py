@@ -0,0 +1,34 @@
+import io
+import tempfile
+import time
+from typing import Any
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import compile_program
+from compiler import jit
+from benchmarks.interpreter_benchmark import programs, best_time
+
+# Run with: poetry run python -m benchmarks.jit_benchmark
+
+def main() -> None:
+    print(f'{"program":>10} {"closures s":>10} {"jit cold s":>10} {"jit warm s":>10} {"speedup":>7}')
+    with tempfile.TemporaryDirectory() as directory:
+        jit.cache_directory = directory
+        for name, source_code in programs.items():
+            root = parse(tokenize(source_code))
+            typecheck(root, SymbolTable())
+            write: Any = io.StringIO().write
+            closure_time = best_time(compile_program(root, write = write))
+            expected = compile_program(root, write = write)()
+            # The first run compiles the loops with 'cc', the rest find them in the cache.
+            start = time.perf_counter()
+            assert compile_program(root, write = write, jit = True)() == expected
+            cold_time = time.perf_counter() - start
+            jit.loaded.clear()
+            warm_time = best_time(lambda: compile_program(root, write = write, jit = True)())
+            print(f'{name:>10} {closure_time:>10.3f} {cold_time:>10.3f} {warm_time:>10.4f} {closure_time / warm_time:>6.0f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import time
+import compiler.ast as ast
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import interpret
+from compiler.ast_optimizer import optimize
+from compiler.loop_optimizer import LoopOptions, optimize_loops
+from benchmarks.interpreter_benchmark import programs
+
+# Run with: poetry run python -m benchmarks.loop_optimizer_benchmark
+
+loop_programs = {
+    **programs,
+    "grid": """
+        var width = 300; var total = 0; var y = 0;
+        while y < 300 do {
+            var x = 0;
+            while x < width do { total = total + (y * width + x) % 7 + width * width % 5; x = x + 1 };
+            y = y + 1
+        };
+        total
+    """,
+    "table": """
+        var total = 0; var round = 0;
+        while round < 20000 do {
+            var k = 0;
+            while k < 10 do { total = total + k * 3 + round % 2; k = k + 1 };
+            round = round + 1
+        };
+        total
+    """,
+}
+
+configurations = {
+    "none": LoopOptions(False, False, False),
+    "licm": LoopOptions(True, False, False),
+    "strength": LoopOptions(False, True, False),
+    "unroll": LoopOptions(False, False, True),
+    "all": LoopOptions(),
+}
+
+def typechecked(source_code: str) -> ast.Expression:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    return optimize(root)
+
+def main() -> None:
+    print(f'{"program":>10}' + "".join(f' {name:>9}' for name in configurations) + f' {"speedup":>8}')
+    for name, source_code in loop_programs.items():
+        times = []
+        expected = None
+        for options in configurations.values():
+            root = optimize_loops(typechecked(source_code), options)
+            best = float('inf')
+            for _ in range(5):
+                start = time.perf_counter()
+                value = interpret(root, lambda: '', lambda text: None)
+                best = min(best, time.perf_counter() - start)
+            assert expected is None or value == expected
+            expected = value
+            times.append(best)
+        print(f'{name:>10}' + "".join(f' {each:>9.3f}' for each in times) + f' {times[0] / times[-1]:>7.2f}x')
+
+if __name__ == '__main__':
+    main()
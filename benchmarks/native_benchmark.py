@@ -0,0 +1,42 @@
+import io
+import os
+import subprocess
+import tempfile
+from typing import Any
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import compile_program
+from compiler.bytecode import compile_bytecode
+from compiler.vm import execute
+from compiler.transpiler import compile_python, run_code
+from compiler.asm_generator import generate_assembly, build_executable
+from benchmarks.interpreter_benchmark import programs, best_time
+
+# Run with: poetry run python -m benchmarks.native_benchmark
+
+def main() -> None:
+    print(f'{"program":>10} {"closures s":>10} {"vm s":>6} {"python s":>8} {"native -O0":>10} {"native -O2":>10} {"vs python":>9}')
+    with tempfile.TemporaryDirectory() as directory:
+        executable = os.path.join(directory, "program")
+        for name, source_code in programs.items():
+            root = parse(tokenize(source_code))
+            typecheck(root, SymbolTable())
+            write: Any = io.StringIO().write
+            closure_time = best_time(compile_program(root, write = write))
+            program = compile_bytecode(root)
+            vm_time = best_time(lambda: execute(program))
+            code = compile_python(root)
+            python_time = best_time(lambda: run_code(code, write = write))
+            expected = f'{compile_program(root)()}\n'
+            native_times = []
+            for opt_level in [0, 2]:
+                build_executable(generate_assembly(root, opt_level), executable)
+                # Starting the process is included, which takes about a millisecond.
+                native_times.append(best_time(lambda: subprocess.run([executable], capture_output = True, check = True)))
+                assert subprocess.run([executable], capture_output = True, text = True).stdout == expected
+            print(f'{name:>10} {closure_time:>10.3f} {vm_time:>6.3f} {python_time:>8.3f} {native_times[0]:>10.4f} {native_times[1]:>10.4f} {python_time / native_times[1]:>8.0f}x')
+
+if __name__ == '__main__':
+    main()
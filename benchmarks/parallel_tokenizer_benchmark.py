@@ -0,0 +1,39 @@
+import os
+import time
+from compiler.tokenizer import tokenize_stream, tokenize_parallel
+from benchmarks.programs import generate_source
+
+# Run with: poetry run python -m benchmarks.parallel_tokenizer_benchmark
+
+sizes = [64_000, 256_000, 1_000_000, 4_000_000, 16_000_000]
+
+def best_of(repeats: int, function) -> float: # type: ignore[no-untyped-def]
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({2, 4, cpus} - {1})
+    print(f'{cpus} CPUs')
+    print(f'{"size":>10} {"sequential":>11} ' + " ".join(f'{f"{w} workers":>10}' for w in worker_counts))
+    crossover: dict[int, int | None] = {w: None for w in worker_counts}
+    for size in sizes:
+        source_code = generate_source(size)
+        repeats = 3 if size < 4_000_000 else 1
+        sequential = best_of(repeats, lambda: tokenize_stream(source_code))
+        times = []
+        for workers in worker_counts:
+            elapsed = best_of(repeats, lambda: tokenize_parallel(source_code, workers, min_chunk_size=1))
+            times.append(elapsed)
+            if elapsed < sequential and crossover[workers] is None:
+                crossover[workers] = size
+        print(f'{size:>10} {sequential:>11.3f} ' + " ".join(f'{t:>10.3f}' for t in times))
+    for workers, crossover_size in crossover.items():
+        print(f'{workers} workers pay off from: {crossover_size if crossover_size is not None else "never (up to " + str(sizes[-1]) + ")"}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import time
+import compiler.ast as ast
+from compiler.tokenizer import tokenize_stream
+from compiler.parser import parse
+from benchmarks.programs import generate_source, generate_expressions
+
+# Run with: poetry run python -m benchmarks.parser_benchmark
+
+sizes = [100_000, 1_000_000]
+
+def count_nodes(root: ast.Expression) -> int:
+    count = 0
+    stack: list[object] = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, ast.Expression):
+            count += 1
+            stack.extend(getattr(node, name) for name in node.__dataclass_fields__ if name != "position")
+    return count
+
+def main() -> None:
+    print(f'{"corpus":>12} {"size":>10} {"nodes":>9} {"seconds":>8} {"ns/node":>8}')
+    for (corpus, generate), size in [(c, s) for c in [("statements", generate_source), ("expressions", generate_expressions)] for s in sizes]:
+        stream = tokenize_stream(generate(size))
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            tree = parse(stream)
+            best = min(best, time.perf_counter() - start)
+        nodes = count_nodes(tree)
+        print(f'{corpus:>12} {size:>10} {nodes:>9} {best:>8.3f} {best / nodes * 1e9:>8.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import random
+
+# Building blocks for generated benchmark programs. Every snippet is a valid
+# statement on its own, so any sequence of them typechecks.
+snippets = [
+    "var x{n} = {a} + {b} * ({c} - 1);",
+    "var y{n}: Bool = {a} < {b} and not ({c} == 0);",
+    "{{ var z = {a}; z = z % 7 + {b}; }}",
+    "if {a} >= {b} then {{ print_int({c}) }} else {{ print_int({a} / 3) }}",
+    "var w{n} = 0; while w{n} < {a} do {{ w{n} = w{n} + 1; }} // counting up",
+    "print_bool(true or false);  # comment",
+]
+
+def generate_source(size: int, seed: int = 0) -> str:
+    """Returns roughly 'size' characters of valid source code."""
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    n = 0
+    while length < size:
+        line = rng.choice(snippets).format(n=n, a=rng.randint(0, 999), b=rng.randint(0, 999), c=rng.randint(0, 999))
+        lines.append(line)
+        length += len(line) + 1
+        n += 1
+    return "\n".join(lines) + "\n"
+
+def generate_expressions(size: int, seed: int = 0) -> str:
+    """Returns roughly 'size' characters of long, well-typed arithmetic and logical expressions."""
+    rng = random.Random(seed)
+    
+    def int_expression() -> str:
+        terms = [str(rng.randint(1, 99)) if rng.random() < 0.7 else f"({rng.randint(0, 9)} + x)" for _ in range(rng.randint(3, 15))]
+        return terms[0] + "".join(f" {rng.choice(['+', '-', '*', '/', '%'])} {term}" for term in terms[1:])
+    
+    lines = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.5:
+            line = f"x = {int_expression()};"
+        else:
+            line = f"print_bool({int_expression()} < {int_expression()} and not ({int_expression()} == {int_expression()}) or false);"
+        lines.append(line)
+        length += len(line) + 1
+    return "var x = 1;\n" + "\n".join(lines) + "\n"
+
+def generate_repetitive(size: int, seed: int = 0, variety: int = 50) -> str:
+    """Returns roughly 'size' characters of statements built from only 'variety'
+    different expressions, like generated code that repeats itself."""
+    rng = random.Random(seed)
+    
+    def int_expression() -> str:
+        terms = [str(rng.randint(1, 9)) if rng.random() < 0.9 else "x" for _ in range(rng.randint(3, 12))]
+        return terms[0] + "".join(f" {rng.choice(['+', '-', '*', '%'])} {term}" for term in terms[1:])
+    
+    expressions = [int_expression() for _ in range(variety)]
+    lines = []
+    length = 0
+    while length < size:
+        a, b = rng.choice(expressions), rng.choice(expressions)
+        line = rng.choice([
+            f"x = {a};",
+            f"print_bool({a} < {b} or not ({b} == {a}));",
+            f"{{ var t = {a}; print_int(t * ({b})) }}",
+            f"if {a} > {b} then {{ print_int({a}) }} else {{ x = {b} }}",
+        ])
+        lines.append(line)
+        length += len(line) + 1
+    return "var x = 1;\n" + "\n".join(lines) + "\n"
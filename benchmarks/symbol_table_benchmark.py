@@ -0,0 +1,53 @@
+import time
+from typing import Any, Callable
+from compiler.symbol_table import Scopes, SymbolTable, FlatSymbolTable
+from compiler.types import Int
+
+# Run with: poetry run python -m benchmarks.symbol_table_benchmark
+
+depths = [1, 10, 100, 1_000, 10_000]
+
+def best_time(run: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def nested(make_table: Callable[[], Scopes], depth: int) -> Scopes:
+    """A table 'depth' scopes deep, with 'x' declared in the outermost one and 'y' in each."""
+    table = make_table()
+    table.insert("x", Int())
+    for _ in range(depth):
+        table.init_scope()
+        table.insert("y", Int())
+    return table
+
+def enter_and_exit(make_table: Callable[[], Scopes], depth: int) -> None:
+    table = make_table()
+    for _ in range(depth):
+        table.init_scope()
+        table.insert("y", Int())
+    for _ in range(depth):
+        table.exit_scope()
+
+def main() -> None:
+    tables: list[tuple[str, Callable[[], Scopes]]] = [("scoped", SymbolTable), ("flat", FlatSymbolTable)]
+    for name, make_table in tables:
+        construct = best_time(lambda: [make_table() for _ in range(10_000)]) / 10_000
+        print(f'{name:>7}: new table {construct * 1e6:.2f} us')
+    print()
+    print(f'{"depth":>6} {"table":>7} {"lookup outer ns":>15} {"lookup builtin ns":>17} {"scope in+out ns":>15}')
+    for depth in depths:
+        for name, make_table in tables:
+            table = nested(make_table, depth)
+            lookup = table.lookup
+            lookups = 1_000_000 // depth # the scoped table walks every scope
+            outer = best_time(lambda: [lookup("x") for _ in range(lookups)]) / lookups
+            builtin = best_time(lambda: [lookup("+") for _ in range(lookups)]) / lookups
+            scopes = best_time(lambda: enter_and_exit(make_table, depth)) / depth
+            print(f'{depth:>6} {name:>7} {outer * 1e9:>15.0f} {builtin * 1e9:>17.0f} {scopes * 1e9:>15.0f}')
+
+if __name__ == '__main__':
+    main()
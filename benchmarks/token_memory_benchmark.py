@@ -0,0 +1,30 @@
+import tracemalloc
+from typing import Callable
+from compiler.tokenizer import tokenize, tokenize_stream
+from compiler.parser import parse
+from benchmarks.programs import generate_source
+
+# Run with: poetry run python -m benchmarks.token_memory_benchmark
+
+sizes = [100_000, 1_000_000, 5_000_000]
+
+def peak_memory(function: Callable[[], object]) -> int:
+    tracemalloc.start()
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return peak
+
+def main() -> None:
+    print(f'{"source bytes":>12} {"list[Token]":>12} {"TokenStream":>12} {"ratio":>6} {"tokens+AST":>12} {"stream+AST":>12}')
+    for size in sizes:
+        source_code = generate_source(size)
+        as_list = peak_memory(lambda: tokenize(source_code))
+        as_stream = peak_memory(lambda: tokenize_stream(source_code))
+        parse_list = peak_memory(lambda: parse(tokenize(source_code)))
+        parse_stream = peak_memory(lambda: parse(tokenize_stream(source_code)))
+        print(f'{len(source_code):>12} {as_list:>12} {as_stream:>12} {as_list / as_stream:>6.1f} {parse_list:>12} {parse_stream:>12}')
+
+if __name__ == '__main__':
+    main()
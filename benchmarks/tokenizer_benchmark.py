@@ -0,0 +1,30 @@
+import time
+from compiler.tokenizer import tokenize, tokenize_stream, tokenize_bytes
+from benchmarks.programs import generate_source
+
+# Run with: poetry run python -m benchmarks.tokenizer_benchmark
+
+sizes = [10_000, 100_000, 1_000_000, 10_000_000]
+
+def main() -> None:
+    print(f'{"size":>12} {"tokens":>10} {"list s":>8} {"ns/char":>8} {"stream s":>9} {"ns/char":>8} {"bytes s":>8} {"ns/char":>8}')
+    for size in sizes:
+        source_code = generate_source(size)
+        start = time.perf_counter()
+        tokens = tokenize(source_code)
+        list_time = time.perf_counter() - start
+        del tokens
+        start = time.perf_counter()
+        stream = tokenize_stream(source_code)
+        stream_time = time.perf_counter() - start
+        del stream
+        source_bytes = source_code.encode()
+        start = time.perf_counter()
+        stream = tokenize_bytes(source_bytes)
+        bytes_time = time.perf_counter() - start
+        print(f'{len(source_code):>12} {len(stream):>10} {list_time:>8.3f} {list_time / len(source_code) * 1e9:>8.1f} '
+              f'{stream_time:>9.3f} {stream_time / len(source_code) * 1e9:>8.1f} '
+              f'{bytes_time:>8.3f} {bytes_time / len(source_code) * 1e9:>8.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import io
+from typing import Any
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import compile_program
+from compiler.bytecode import compile_bytecode
+from compiler.vm import execute
+from compiler.transpiler import compile_python, run_code, dump_code, load_code
+from benchmarks.interpreter_benchmark import programs, best_time
+
+# Run with: poetry run python -m benchmarks.transpiler_benchmark
+
+def main() -> None:
+    print(f'{"program":>10} {"compile s":>9} {"load s":>7} {"python s":>8} {"closures s":>10} {"vm s":>6} {"vs closures":>11}')
+    for name, source_code in programs.items():
+        root = parse(tokenize(source_code))
+        typecheck(root, SymbolTable())
+        write: Any = io.StringIO().write
+        compile_time = best_time(lambda: compile_python(root))
+        data = dump_code(compile_python(root))
+        load_time = best_time(lambda: load_code(data))
+        code = load_code(data)
+        assert run_code(code, write = write) == compile_program(root)()
+        python_time = best_time(lambda: run_code(code, write = write))
+        closure_time = best_time(compile_program(root))
+        program = compile_bytecode(root)
+        vm_time = best_time(lambda: execute(program))
+        print(f'{name:>10} {compile_time:>9.5f} {load_time:>7.5f} {python_time:>8.3f} {closure_time:>10.3f} {vm_time:>6.3f} {closure_time / python_time:>10.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import time
+from compiler.tokenizer import tokenize_stream
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from benchmarks.parser_benchmark import count_nodes
+from benchmarks.programs import generate_source, generate_expressions
+
+# Run with: poetry run python -m benchmarks.typecheck_benchmark
+
+size = 1_000_000
+depth = 100_000
+
+deep_programs = {
+    "nested blocks": "{" * depth + "1" + "}" * depth,
+    "nested ifs": "if true then " * depth + "1",
+    "long chain": "1" + " + 1" * depth,
+}
+
+def main() -> None:
+    print(f'{"program":>14} {"nodes":>9} {"parse s":>8} {"check s":>8} {"check ns/node":>14}')
+    programs = {"statements": generate_source(size), "expressions": generate_expressions(size)} | deep_programs
+    for name, source_code in programs.items():
+        stream = tokenize_stream(source_code)
+        start = time.perf_counter()
+        tree = parse(stream)
+        parse_time = time.perf_counter() - start
+        check_time = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            typecheck(tree, SymbolTable())
+            check_time = min(check_time, time.perf_counter() - start)
+        nodes = count_nodes(tree)
+        print(f'{name:>14} {nodes:>9} {parse_time:>8.3f} {check_time:>8.3f} {check_time / nodes * 1e9:>14.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import time
+from typing import Any, Callable
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import compile_program
+from compiler.bytecode import compile_bytecode
+from compiler.vm import execute
+from benchmarks.interpreter_benchmark import programs
+
+# Run with: poetry run python -m benchmarks.vm_benchmark
+
+def best_time(run: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    print(f'{"program":>10} {"instructions":>12} {"vm s":>6} {"M instr/s":>9} {"closures s":>10} {"vs closures":>11}')
+    for name, source_code in programs.items():
+        root = parse(tokenize(source_code))
+        typecheck(root, SymbolTable())
+        program = compile_bytecode(root)
+        value, executed = execute(program)
+        assert value == compile_program(root)()
+        vm_time = best_time(lambda: execute(program))
+        closure_time = best_time(compile_program(root))
+        print(f'{name:>10} {executed:>12} {vm_time:>6.3f} {executed / vm_time / 1e6:>9.1f} {closure_time:>10.3f} {closure_time / vm_time:>10.2f}x')
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,161 @@
-﻿import sys
-from compiler.tokenizer import tokenize
+﻿import mmap
+import os
+import sys
+import compiler.ast as ast
+from compiler.tokenizer import TokenStream, tokenize_stream, tokenize_bytes, tokenize_parallel
 from compiler.parser import parse
+from compiler.ast_format import dump_ast, load_ast, magic
 from compiler.type_checker import typecheck
+from compiler.ast_printer import format_typed_ast
+from compiler.ast_optimizer import optimize
+from compiler.loop_optimizer import LoopOptions, optimize_loops
+from compiler.interpreter import interpret, write_value
+from compiler.bytecode import compile_bytecode, disassemble
+from compiler import vm, transpiler
+from compiler.transpiler import transpile, compile_python, run_code, dump_code, load_code
+from compiler.ir import format_ir
+from compiler.ir_generator import generate_ir
+from compiler.ir_interpreter import run_ir
+from compiler.ir_optimizer import optimize_ir, format_report, max_opt_level
+from compiler.ast_cfg import build_ast_cfg, format_dot
+from compiler.asm_generator import generate_assembly, build_executable
 from compiler.symbol_table import SymbolTable
 
 # add more commands as needed
+# Regular files at least this large are tokenized straight from an mmap
+# instead of being read into a str first.
+mmap_threshold = 1 << 20
+
+# The flags that turn each loop optimization on or off, and their fields in 'LoopOptions'.
+loop_flag_names = {'licm': 'licm', 'strength-reduction': 'strength_reduction', 'unroll': 'unroll'}
+
 usage = f"""
 Usage: {sys.argv[0]} <command> [source_code_file]
     
+Command 'interpret':
+    Type checks and runs the program. Its value is printed at the end,
+    unless it is unit. 'read_int' reads lines from standard input.
+    With '--jit', loops that run long and only compute with integers and
+    booleans are compiled to machine code with 'cc', when it is there.
+
+Command 'run-vm':
+    Like 'interpret', but compiles the program to bytecode and runs it
+    on a stack machine.
+
+Command 'bytecode':
+    Prints the bytecode of the program, one instruction per line.
+    Jump targets are marked with '>>'.
+
+Command 'run-python':
+    Like 'interpret', but translates the program to Python and lets Python
+    compile and run it. Also runs code from 'dump-python'.
+
+Command 'python':
+    Prints the Python source that 'run-python' runs.
+
+Command 'dump-python':
+    Writes the program compiled to a Python code object to standard output,
+    to be given to 'run-python' later. Only the same version of Python can
+    run it.
+
+Command 'ir':
+    Prints the program lowered to three-address IR, one instruction per
+    line. Labels are not indented. When optimizing, the number of
+    instructions before and after each pass goes to standard error.
+
+Command 'cfg':
+    Prints the control flow graph of the typechecked program in the DOT
+    language of Graphviz. Each block lists the nodes it evaluates, in order,
+    with their line and column.
+
+Command 'run-ir':
+    Like 'interpret', but runs the IR of the program.
+
+Command 'asm':
+    Prints the program compiled to x86-64 assembly for the GNU assembler,
+    or writes it to the file given with '-o'. Integers are 64 bits wide
+    in compiled programs.
+
+Command 'compile':
+    Compiles the program to an executable with 'as' and 'cc', named by
+    '-o' or 'a.out'. Running it is like 'interpret'.
+
+Command 'batch':
+    Like 'interpret', but runs the program once for each line of the file
+    given with '--inputs', which has the same number of integers on every
+    line for 'read_int' to read. The lines run together on NumPy arrays.
+    Each line of output starts with the number of the input line it is
+    for, from 0. Needs NumPy, and a program that only has Int and Bool
+    variables and only calls the builtins.
+
 Command 'typecheck':
-    Runs the type checker on source code.
+    Runs the type checker on source code or on a binary AST.
+
+Command 'typed-ast':
+    Runs the type checker and prints the AST with the type of each node
+    and the overload chosen for each operator.
+
+Command 'dump-ast':
+    Writes the AST of source code to standard output in binary form,
+    to be given to other commands instead of the source code.
 
 Common arguments:
     source_code_file        Optional. Defaults to standard input if missing.
+    -j N, --jobs=N          Tokenize large inputs in N processes.
+    -o FILE, --output=FILE  Where 'asm' and 'compile' write their output.
+    --inputs=FILE           The input of 'batch'.
+    --jit                   Let 'interpret' compile hot loops.
+    -O N, --opt-level=N     Optimize at level N, from 0 (default) to {max_opt_level}. From
+                            level 1 on, the AST is simplified after type checking
+                            by every command that type checks the program,
+                            and the IR is optimized for 'ir', 'run-ir', 'asm'
+                            and 'compile'. Level 2 also optimizes loops, as
+                            the flags below do.
+    --[no-]licm             Move expressions that are the same in every round
+                            of a loop out of it.
+    --[no-]strength-reduction
+                            Replace multiplications by the counter of a loop
+                            with additions.
+    --[no-]unroll           Repeat the bodies of loops that count between
+                            constants, and check their conditions less often.
  """.strip() + "\n"
 
 
 def main() -> int:
     command: str | None = None
     input_file: str | None = None
-    for arg in sys.argv[1:]:
+    output_file: str | None = None
+    inputs_file: str | None = None
+    jit = False
+    jobs = 1
+    opt_level = 0
+    # The loop optimizations given on the command line, by the names of their flags.
+    loop_flags: dict[str, bool] = {}
+    args = iter(sys.argv[1:])
+    for arg in args:
         if arg in ['-h', '--help']:
             print(usage)
             return 0
+        elif arg in ['-j', '--jobs']:
+            jobs = int(next(args, '1'))
+        elif arg.startswith('--jobs='):
+            jobs = int(arg[len('--jobs='):])
+        elif arg in ['-o', '--output']:
+            output_file = next(args, None)
+        elif arg.startswith('--output='):
+            output_file = arg[len('--output='):]
+        elif arg == '--inputs':
+            inputs_file = next(args, None)
+        elif arg.startswith('--inputs='):
+            inputs_file = arg[len('--inputs='):]
+        elif arg == '--jit':
+            jit = True
+        elif arg in ['-O', '--opt-level']:
+            opt_level = int(next(args, '0'))
+        elif arg.startswith('--opt-level='):
+            opt_level = int(arg[len('--opt-level='):])
+        elif arg.startswith('--') and arg.removeprefix('--no-').removeprefix('--') in loop_flag_names:
+            loop_flags[arg.removeprefix('--no-').removeprefix('--')] = not arg.startswith('--no-')
         elif arg.startswith('-'):
             raise Exception(f"Unknown argument: {arg}")
         elif command is None:
@@ -32,21 +165,125 @@ def main() -> int:
         else:
             raise Exception("Multiple input files not supported")
 
+    stdin_data: bytes | None = None
+    
     def read_source_code() -> str:
         if input_file is not None:
             with open(input_file) as f:
                 return f.read()
+        elif stdin_data is not None:
+            return stdin_data.decode()
         else:
             return sys.stdin.read()
+        
+    def read_tokens() -> TokenStream:
+        if jobs > 1:
+            return tokenize_parallel(read_source_code(), jobs)
+        if input_file is not None and os.path.isfile(input_file) and os.path.getsize(input_file) >= mmap_threshold:
+            with open(input_file, 'rb') as f:
+                # The mapping stays valid after the file is closed.
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                return tokenize_bytes(mapped)
+            except SyntaxError:
+                # Only ASCII tokenizes as bytes. The str path accepts the
+                # same programs as for smaller files, or raises their error.
+                pass
+        return tokenize_stream(read_source_code())
+    
+    # The input, if it is binary data starting with 'expected'.
+    def read_binary(expected: bytes) -> bytes | None:
+        nonlocal stdin_data
+        if input_file is not None:
+            with open(input_file, 'rb') as f:
+                if f.read(len(expected)) == expected:
+                    return expected + f.read()
+            return None
+        if stdin_data is None:
+            stdin_data = sys.stdin.buffer.read()
+        return stdin_data if stdin_data.startswith(expected) else None
+
+    # Parses the input, or loads it if it is a binary AST from 'dump-ast'.
+    def read_ast() -> ast.Expression:
+        data = read_binary(magic)
+        if data is not None:
+            return load_ast(data)
+        return parse(read_tokens())
+
+    def read_typechecked_ast() -> ast.Expression:
+        root = read_ast()
+        typecheck(root, SymbolTable())
+        if opt_level > 0:
+            root = optimize(root)
+        options = LoopOptions(**{field: loop_flags.get(flag, opt_level >= 2) for flag, field in loop_flag_names.items()})
+        return optimize_loops(root, options)
 
     if command is None:
         print(f"Error: command argument missing\n\n{usage}", file=sys.stderr)
         return 1
 
-    if command == 'typecheck':
-        source_code = read_source_code()
-        typecheck(parse(tokenize(source_code)), SymbolTable())
+    if command == 'interpret':
+        interpret(read_typechecked_ast(), jit=jit)
+    elif command in ['run-vm', 'bytecode']:
+        program = compile_bytecode(read_typechecked_ast())
+        if command == 'run-vm':
+            vm.run(program)
+        else:
+            print(disassemble(program))
+    elif command == 'run-python':
+        data = read_binary(transpiler.magic)
+        run_code(load_code(data) if data is not None else compile_python(read_typechecked_ast()))
+    elif command == 'python':
+        print(transpile(read_typechecked_ast()), end='')
+    elif command == 'dump-python':
+        sys.stdout.buffer.write(dump_code(compile_python(read_typechecked_ast())))
+    elif command == 'ir':
+        instructions, report = optimize_ir(generate_ir(read_typechecked_ast()), opt_level)
+        if report:
+            print(format_report(report), file=sys.stderr)
+        print(format_ir(instructions))
+    elif command == 'cfg':
+        print(format_dot(build_ast_cfg(read_typechecked_ast())), end='')
+    elif command == 'run-ir':
+        instructions, _ = optimize_ir(generate_ir(read_typechecked_ast()), opt_level)
+        run_ir(instructions)
+    elif command == 'asm':
+        assembly = generate_assembly(read_typechecked_ast(), opt_level)
+        if output_file is None:
+            print(assembly, end='')
+        else:
+            with open(output_file, 'w') as f:
+                f.write(assembly)
+    elif command == 'compile':
+        build_executable(generate_assembly(read_typechecked_ast(), opt_level), output_file or 'a.out')
+    elif command == 'batch':
+        if inputs_file is None:
+            print("Error: 'batch' needs '--inputs'", file=sys.stderr)
+            return 1
+        try:
+            import numpy
+            from compiler.batch import run_batch
+        except ImportError:
+            print("Error: 'batch' needs NumPy", file=sys.stderr)
+            return 1
+        result = run_batch(read_typechecked_ast(), numpy.loadtxt(inputs_file, dtype=numpy.int64, ndmin=2))
+        failed = False
+        for row, (value, output, error) in enumerate(zip(result.values, result.outputs, result.errors)):
+            lines = output.splitlines()
+            write_value(value, lambda text: lines.append(text.rstrip('\n')))
+            for line in lines:
+                print(f'{row}: {line}')
+            if error is not None:
+                print(f'{row}: {error}', file=sys.stderr)
+                failed = True
+        return 1 if failed else 0
+    elif command == 'typecheck':
+        typecheck(read_ast(), SymbolTable())
         print("\nI approve ✓")
+    elif command == 'typed-ast':
+        print(format_typed_ast(read_typechecked_ast()))
+    elif command == 'dump-ast':
+        sys.stdout.buffer.write(dump_ast(read_ast()))
     else:
         print(f"Error: unknown command: {command}\n\n{usage}", file=sys.stderr)
         return 1
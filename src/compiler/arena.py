@@ -0,0 +1,400 @@
+from array import array
+from bisect import bisect_right
+import compiler.ast as ast
+from compiler.parser import START, parse_with
+from compiler.tokenizer import Token, TokenStream, Position
+from compiler.types import Type, Unit, Int, Bool, FunctionType
+from compiler.symbol_table import Scopes
+from compiler.type_checker import declarable_types
+
+# Node kinds, stored in Arena.kinds.
+LITERAL = 1
+IDENTIFIER = 2
+UNARY_OP = 3
+BINARY_OP = 4
+WHILE = 5
+IF = 6
+FUNCTION_CALL = 7
+VARIABLE_DECLARATION = 8
+BLOCK = 9
+
+class Arena:
+    """An AST stored in parallel arrays instead of one object per node.
+
+    Node n has kind kinds[n], is at offsets[n] and its children are
+    children[ends[n - 1]:ends[n]] (from 0 for the first node), in the order of
+    the fields of the matching ast class:
+
+        UnaryOp             right
+        BinaryOp            left, right
+        While               condition, do
+        If                  condition, then_branch[, else_branch]
+        FunctionCall        name, *arguments
+        VariableDeclaration name[, type_exp], value
+        Block               *statements
+
+    data[n] indexes a side table: 'literals' for literals, 'names' for identifiers
+    and 'operators' for unary and binary operators. Children always come before
+    their parent, so the root is the last node.
+
+    Offsets are offsets into the source code, found from 'line_starts' like in
+    TokenStream, or indices into 'position_table' if the positions did not come
+    from source code.
+    """
+
+    def __init__(self, position_table: list[Position] | None = None) -> None:
+        self.kinds = array('B')
+        self.offsets = array('I')
+        self.data = array('I')
+        self.ends = array('I')
+        self.children = array('I')
+        self.literals: list[int | bool | None] = []
+        self.names: list[str] = []
+        self.operators: list[str] = []
+        self.line_starts = array('I', [0])
+        self.position_table = position_table
+        # Side table indices of values already added, so that each is stored once.
+        # Literals are keyed by type too, as True == 1.
+        self.literal_indices: dict[tuple[type, int | bool | None], int] = {}
+        self.name_indices: dict[str, int] = {}
+        self.operator_indices: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    @property
+    def root(self) -> int:
+        return len(self.kinds) - 1
+
+    def add(self, kind: int, offset: int, data: int, children: list[int]) -> int:
+        """Adds a node whose children have already been added and returns its index."""
+        self.kinds.append(kind)
+        self.offsets.append(offset)
+        self.data.append(data)
+        self.children.extend(children)
+        self.ends.append(len(self.children))
+        return len(self.kinds) - 1
+
+    def literal_index(self, value: int | bool | None) -> int:
+        key = (type(value), value)
+        index = self.literal_indices.get(key)
+        if index is None:
+            index = self.literal_indices[key] = len(self.literals)
+            self.literals.append(value)
+        return index
+
+    def name_index(self, name: str) -> int:
+        index = self.name_indices.get(name)
+        if index is None:
+            index = self.name_indices[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def operator_index(self, op: str) -> int:
+        index = self.operator_indices.get(op)
+        if index is None:
+            index = self.operator_indices[op] = len(self.operators)
+            self.operators.append(op)
+        return index
+
+    def children_of(self, node: int) -> array:
+        return self.children[self.ends[node - 1] if node else 0:self.ends[node]]
+
+    def position(self, node: int) -> Position:
+        offset = self.offsets[node]
+        if self.position_table is not None:
+            return self.position_table[offset]
+        line = bisect_right(self.line_starts, offset)
+        return Position(line, offset - self.line_starts[line - 1] + 1)
+
+class ArenaBuilder:
+    """Makes the parser add its nodes to an Arena."""
+
+    def __init__(self, stream: TokenStream) -> None:
+        self.length = len(stream)
+        if stream.positions is None:
+            self.arena = Arena()
+            self.arena.line_starts = stream.line_starts
+            self.starts = stream.starts
+        else:
+            # Tokens that do not come from source code: offsets index their positions
+            # and the last position is the one of START.
+            self.arena = Arena(stream.positions + [Position(1, 1)])
+            self.starts = array('I', range(self.length))
+        self.add = self.arena.add
+
+    def offset(self, token: int) -> int:
+        if 0 <= token < self.length:
+            return self.starts[token]
+        if token == START or self.length == 0:
+            return 0 if self.arena.position_table is None else self.length
+        return self.starts[self.length - 1]
+
+    def literal(self, value: int | bool | None, token: int) -> int:
+        return self.add(LITERAL, self.offset(token), self.arena.literal_index(value), [])
+
+    def identifier(self, name: str, token: int) -> int:
+        return self.add(IDENTIFIER, self.offset(token), self.arena.name_index(name), [])
+
+    def unary_op(self, op: str, right: int, token: int) -> int:
+        return self.add(UNARY_OP, self.offset(token), self.arena.operator_index(op), [right])
+
+    def binary_op(self, left: int, op: str, right: int, token: int) -> int:
+        return self.add(BINARY_OP, self.offset(token), self.arena.operator_index(op), [left, right])
+
+    def while_expression(self, condition: int, do: int, token: int) -> int:
+        return self.add(WHILE, self.offset(token), 0, [condition, do])
+
+    def if_expression(self, condition: int, then_branch: int, else_branch: int | None, token: int) -> int:
+        branches = [condition, then_branch] if else_branch is None else [condition, then_branch, else_branch]
+        return self.add(IF, self.offset(token), 0, branches)
+
+    def function_call(self, name: int, arguments: list[int], token: int) -> int:
+        return self.add(FUNCTION_CALL, self.offset(token), 0, [name] + arguments)
+
+    def variable_declaration(self, name: int, type_exp: int | None, value: int, token: int) -> int:
+        parts = [name, value] if type_exp is None else [name, type_exp, value]
+        return self.add(VARIABLE_DECLARATION, self.offset(token), 0, parts)
+
+    def block(self, statements: list[int], token: int) -> int:
+        return self.add(BLOCK, self.offset(token), 0, statements)
+
+def parse_arena(tokens: TokenStream | list[Token]) -> Arena:
+    """Like 'parse', but into an Arena whose root is its last node."""
+    builder: ArenaBuilder | None = None
+    def make_builder(stream: TokenStream) -> ArenaBuilder:
+        nonlocal builder
+        builder = ArenaBuilder(stream)
+        return builder
+    parse_with(tokens, make_builder)
+    assert builder is not None
+    return builder.arena
+
+def from_tree(root: ast.Expression) -> Arena:
+    """Stores the tree under 'root' in an Arena, keeping its positions."""
+    arena = Arena([])
+    positions = arena.position_table
+    assert positions is not None
+    made: list[int] = [] # indices of the nodes made so far, in post-order
+    # Each node is on the stack twice: first to push its children, then
+    # (negated, as ~index into 'pending') to add it once they are done.
+    pending: list[ast.Expression] = []
+    stack: list[ast.Expression | int] = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, int):
+            node = pending[~item]
+            parts = ast.children(node)
+            children = made[len(made) - len(parts):]
+            del made[len(made) - len(parts):]
+            positions.append(node.position)
+            offset = len(positions) - 1
+            match node:
+                case ast.Literal():
+                    made.append(arena.add(LITERAL, offset, arena.literal_index(node.value), children))
+                case ast.Identifier():
+                    made.append(arena.add(IDENTIFIER, offset, arena.name_index(node.name), children))
+                case ast.UnaryOp():
+                    made.append(arena.add(UNARY_OP, offset, arena.operator_index(node.op), children))
+                case ast.BinaryOp():
+                    made.append(arena.add(BINARY_OP, offset, arena.operator_index(node.op), children))
+                case _:
+                    made.append(arena.add(kinds_by_class[type(node)], offset, 0, children))
+        else:
+            pending.append(item)
+            stack.append(~(len(pending) - 1))
+            stack.extend(reversed(ast.children(item)))
+    return arena
+
+kinds_by_class: dict[type, int] = {
+    ast.Literal: LITERAL, ast.Identifier: IDENTIFIER, ast.UnaryOp: UNARY_OP, ast.BinaryOp: BINARY_OP,
+    ast.While: WHILE, ast.If: IF, ast.FunctionCall: FUNCTION_CALL,
+    ast.VariableDeclaration: VARIABLE_DECLARATION, ast.Block: BLOCK,
+}
+
+def to_tree(arena: Arena, root: int | None = None) -> ast.Expression:
+    """Makes the dataclass tree under 'root', by default the root of the arena."""
+    root = arena.root if root is None else root
+    kinds, data, ends, children = arena.kinds, arena.data, arena.ends, arena.children
+    # Children come before their parents, so every node can be made from already made ones.
+    made: list[ast.Expression] = []
+    begin = 0
+    for node in range(root + 1):
+        end = ends[node]
+        parts = [made[child] for child in children[begin:end]]
+        begin = end
+        position = arena.position(node)
+        kind = kinds[node]
+        exp: ast.Expression
+        if kind == LITERAL:
+            exp = ast.Literal(value = arena.literals[data[node]], position = position)
+        elif kind == IDENTIFIER:
+            exp = ast.Identifier(name = arena.names[data[node]], position = position)
+        elif kind == UNARY_OP:
+            exp = ast.UnaryOp(op = arena.operators[data[node]], right = parts[0], position = position)
+        elif kind == BINARY_OP:
+            exp = ast.BinaryOp(left = parts[0], op = arena.operators[data[node]], right = parts[1], position = position)
+        elif kind == WHILE:
+            exp = ast.While(condition = parts[0], do = parts[1], position = position)
+        elif kind == IF:
+            exp = ast.If(condition = parts[0], then_branch = parts[1], else_branch = parts[2] if len(parts) > 2 else None, position = position)
+        elif kind == FUNCTION_CALL:
+            exp = ast.FunctionCall(name = parts[0], arguments = parts[1:], position = position)
+        elif kind == VARIABLE_DECLARATION:
+            name, type_exp = parts[0], parts[1] if len(parts) > 2 else None
+            assert isinstance(name, ast.Identifier) and (type_exp is None or isinstance(type_exp, ast.Identifier))
+            exp = ast.VariableDeclaration(name = name, type_exp = type_exp, value = parts[-1], position = position)
+        else:
+            exp = ast.Block(statements = parts, position = position)
+        made.append(exp)
+    return made[root]
+
+def typecheck_arena(arena: Arena, sym_table: Scopes, root: int | None = None) -> list[Type] | Type:
+    """Like 'typecheck', with the same errors, but over an Arena and without a Step per node.
+
+    Nodes that have children get a frame on an explicit stack, which records the
+    next child to check and where the types of its checked children begin in 'types'.
+    """
+    kinds, data, ends, children = arena.kinds, arena.data, arena.ends, arena.children
+    names, operators = arena.names, arena.operators
+    literal_types = [Unit() if value is None else Bool() if isinstance(value, bool) else Int() for value in arena.literals]
+    lookup = sym_table.lookup
+    position = arena.position
+
+    frames: list[int] = [] # node of each frame
+    cursors: list[int] = [] # index in 'children' of the next child to check
+    bases: list[int] = [] # index in 'types' of the type of the first checked child
+    types: list[list[Type] | Type] = []
+
+    # Checks made between children, where the tree checker makes them.
+    def check_child(node: int, number: int, child_type: list[Type] | Type) -> None:
+        kind = kinds[node]
+        if kind == FUNCTION_CALL:
+            name = children[ends[node - 1] if node else 0]
+            if number == 0:
+                if not isinstance(child_type, FunctionType):
+                    raise TypeError(f'{position(name)}: Expected a function instead of {child_type}')
+                arguments = ends[node] - (ends[node - 1] if node else 0) - 1
+                if arguments != len(child_type.param_types):
+                    raise TypeError(f'{position(name)}: Function expects {len(child_type.param_types)} arguments instead of {arguments}')
+            else:
+                fun_type = types[bases[-1]]
+                assert isinstance(fun_type, FunctionType)
+                if child_type is not fun_type.param_types[number - 1]:
+                    raise TypeError(f'{position(name)}: Function expects parameter {number} to have type {fun_type.param_types[number - 1]} instead of {child_type}')
+        elif number == 0 and child_type is not Bool():
+            if kind == IF:
+                raise TypeError(f'{position(node)}: If expression expects type of condition to be boolean instead of {child_type}')
+            if kind == WHILE:
+                raise TypeError(f'{position(node)}: While expression expects type of condition to be boolean instead of {child_type}')
+
+    # Checks made once all children are checked. Returns the type of 'node'.
+    def finish(node: int, child_types: list[list[Type] | Type]) -> list[Type] | Type:
+        kind = kinds[node]
+        begin = ends[node - 1] if node else 0
+        if kind == VARIABLE_DECLARATION:
+            assigned_type = child_types[0]
+            name, name_position = names[data[children[begin]]], position(children[begin])
+            if ends[node] - begin > 2:
+                var_type = children[begin + 1]
+                type_name = names[data[var_type]]
+                if type_name not in declarable_types:
+                    raise TypeError(f'{position(var_type)}: Unknown type "{type_name}"')
+                declared_type = declarable_types[type_name]
+                if assigned_type is not declared_type:
+                    raise TypeError(f'{name_position}: Variable "{name}" expects type {declared_type} instead of {assigned_type}')
+            if not sym_table.insert(name, assigned_type):
+                raise NameError(f'{name_position}: Variable "{name}" already declared in this scope')
+            return Unit()
+        elif kind == UNARY_OP:
+            op = operators[data[node]]
+            type_right = child_types[0]
+            op_types = sym_table.lookup(op)
+            if not op_types:
+                raise Exception("I don't know what I'm doing honestly")
+            for one in op_types:
+                if not isinstance(one, FunctionType) or len(one.param_types) != 1:
+                    continue
+                if type_right is not one.param_types[0]:
+                    raise TypeError(f'{position(node)}: Unary operator "{op}" expects right side to have type {one.param_types[0]} instead of {type_right}')
+                return one.return_type
+        elif kind == BINARY_OP:
+            op = operators[data[node]]
+            type_left, type_right = child_types
+            if op == '=':
+                if kinds[children[begin]] != IDENTIFIER:
+                    raise TypeError(f'{position(node)}: Left side of assignment must be a variable name')
+                elif type_left is not type_right:
+                    raise TypeError(f'{position(node)}: Assignment expects same type on both sides, instead left side was {type_left} and right side was {type_right}')
+                return type_right
+            elif op in ['==', '!=']:
+                if type_left is not type_right:
+                    raise TypeError(f'{position(node)}: Binary operator "{op}" expects same type on both sides, instead left side was {type_left} and right side was {type_right}')
+                return Bool()
+            op_types = sym_table.lookup(op)
+            if not op_types:
+                raise Exception("There is something fundamentally wrong with me")
+            for one in op_types:
+                if not isinstance(one, FunctionType) or len(one.param_types) != 2:
+                    continue
+                if type_left is not one.param_types[0]:
+                    raise TypeError(f'{position(node)}: Binary operator "{op}" expects left side to have type {one.param_types[0]} instead of {type_left}')
+                if type_right is not one.param_types[1]:
+                    raise TypeError(f'{position(node)}: Binary operator "{op}" expects right side to have type {one.param_types[1]} instead of {type_right}')
+                return one.return_type
+        elif kind == FUNCTION_CALL:
+            fun_type = child_types[0]
+            assert isinstance(fun_type, FunctionType)
+            return fun_type.return_type
+        elif kind == IF:
+            return child_types[1] if len(child_types) > 2 else Unit()
+        elif kind == WHILE:
+            return Unit()
+        elif kind == BLOCK:
+            sym_table.exit_scope()
+            return child_types[-1] if child_types else Unit()
+        raise Exception("Alright, I think it's time for me to pack up an go")
+
+    node = arena.root if root is None else root
+    while True:
+        # Check 'node', or give it a frame if it has children to check first.
+        kind = kinds[node]
+        checked = True
+        node_type: list[Type] | Type
+        if kind == LITERAL:
+            node_type = literal_types[data[node]]
+        elif kind == IDENTIFIER:
+            found = lookup(names[data[node]])
+            if not found:
+                raise NameError(f'{position(node)}: Variable "{names[data[node]]}" not found')
+            node_type = found if len(found) > 1 else found[0]
+        else:
+            if kind == BLOCK:
+                sym_table.init_scope()
+            frames.append(node)
+            # Only the value of a declaration is checked, not its name or type.
+            cursors.append(ends[node] - 1 if kind == VARIABLE_DECLARATION else ends[node - 1] if node else 0)
+            bases.append(len(types))
+            checked = False
+        # Hand the type of a checked node to the frame below, finishing the frames
+        # that have no children left, until some frame has a child left to check.
+        while True:
+            if checked:
+                if not frames:
+                    return node_type
+                parent = frames[-1]
+                if kinds[parent] in (FUNCTION_CALL, IF, WHILE):
+                    check_child(parent, len(types) - bases[-1], node_type)
+                types.append(node_type)
+            parent = frames[-1]
+            cursor = cursors[-1]
+            if cursor < ends[parent]:
+                cursors[-1] = cursor + 1
+                node = children[cursor]
+                break
+            frames.pop()
+            cursors.pop()
+            base = bases.pop()
+            node_type = finish(parent, types[base:])
+            del types[base:]
+            checked = True
@@ -0,0 +1,406 @@
+import os
+import subprocess
+import tempfile
+import compiler.ast as ast
+from compiler.types import Type, Int, Bool
+from compiler.ir import (
+    IRVar, Instruction, LoadIntConst, LoadBoolConst, Copy, Call, Jump, CondJump, Return,
+    binary_operators, unary_operators, builtin_function_names, unit, root_names, destination, sources,
+)
+from compiler.ir_generator import generate_ir
+from compiler.ir_optimizer import optimize_ir
+from compiler.cfg import build_cfg
+from compiler.register_allocator import live_intervals, linear_scan, write_position
+
+# Registers for variables. Calls may change the first ones, but not the
+# preserved ones. %rax, %rcx and %rdx are left for computing with.
+caller_saved_registers = ['%rsi', '%rdi', '%r8', '%r9', '%r10', '%r11']
+preserved_registers = ['%rbx', '%r12', '%r13', '%r14', '%r15']
+argument_registers = ['%rdi', '%rsi', '%rdx', '%rcx', '%r8', '%r9']
+
+arithmetic_instructions = {'+': 'addq', '-': 'subq', '*': 'imulq'}
+# The condition codes of comparisons, and the ones of their negations.
+condition_codes = {'<': 'l', '<=': 'le', '>': 'g', '>=': 'ge', '==': 'e', '!=': 'ne'}
+negated_condition_codes = {'<': 'ge', '<=': 'g', '>': 'le', '>=': 'l', '==': 'ne', '!=': 'e'}
+
+# The builtins, and a function for errors the program can not go on after.
+runtime = """
+    .section .rodata
+.Lint_format:
+    .string "%ld\\n"
+.Lread_format:
+    .string "%ld"
+.Ltrue:
+    .string "true"
+.Lfalse:
+    .string "false"
+.Lerror_format:
+    .string "%s\\n"
+.Lno_more_input:
+    .string "read_int: no more input"
+.Linvalid_input:
+    .string "read_int: invalid integer"
+
+    .text
+print_int:
+    subq $8, %rsp
+    movq %rdi, %rsi
+    leaq .Lint_format(%rip), %rdi
+    xorl %eax, %eax
+    call printf@PLT
+    xorl %eax, %eax
+    addq $8, %rsp
+    ret
+
+print_bool:
+    subq $8, %rsp
+    leaq .Ltrue(%rip), %rax
+    leaq .Lfalse(%rip), %rdx
+    testq %rdi, %rdi
+    cmoveq %rdx, %rax
+    movq %rax, %rdi
+    call puts@PLT
+    xorl %eax, %eax
+    addq $8, %rsp
+    ret
+
+read_int:
+    subq $24, %rsp
+    leaq 8(%rsp), %rsi
+    leaq .Lread_format(%rip), %rdi
+    xorl %eax, %eax
+    call scanf@PLT
+    cmpl $1, %eax
+    je 1f
+    leaq .Linvalid_input(%rip), %rdi
+    leaq .Lno_more_input(%rip), %rdx
+    cmpl $-1, %eax
+    cmoveq %rdx, %rdi
+    call runtime_error
+1:
+    movq 8(%rsp), %rax
+    addq $24, %rsp
+    ret
+
+# Prints the message at %rdi to standard error and exits with status 1.
+runtime_error:
+    andq $-16, %rsp
+    movq %rdi, %rdx
+    leaq .Lerror_format(%rip), %rsi
+    movq stderr@GOTPCREL(%rip), %rdi
+    movq (%rdi), %rdi
+    xorl %eax, %eax
+    call fprintf@PLT
+    movl $1, %edi
+    call exit@PLT
+"""
+
+def generate_assembly(root: ast.Expression, opt_level: int = 0) -> str:
+    """Compiles the typechecked tree under 'root' into x86-64 assembly in AT&T
+    syntax, for the GNU assembler. It defines 'main', so linking it with the
+    C library gives a program that prints what the interpreter prints.
+
+    Integers are 64 bits wide, and wrap around on overflow. Dividing by zero
+    prints the position of the division to standard error and exits with
+    status 1, and so does 'read_int' when its input ends or is not a number.
+    """
+    instructions, _ = optimize_ir(generate_ir(root), opt_level)
+    return generate_assembly_from_ir(instructions, root.type)
+
+def generate_assembly_from_ir(instructions: list[Instruction], result_type: list[Type] | Type | None) -> str:
+    """Like 'generate_assembly', for IR of a program whose value has the type
+    'result_type'. Variables get registers by linear scan."""
+    cfg = build_cfg(instructions)
+    writes: dict[IRVar, list[Instruction]] = {}
+    read_counts: dict[IRVar, int] = {}
+    calls = []
+    index = 0
+    for block in cfg.blocks.values():
+        for instruction in block.instructions:
+            for variable in sources(instruction):
+                read_counts[variable] = read_counts.get(variable, 0) + 1
+            written = destination(instruction)
+            if written is not None:
+                writes.setdefault(written, []).append(instruction)
+            if isinstance(instruction, Call) and not is_operator(instruction):
+                calls.append(write_position(index))
+            index += 1
+    # Builtins that the program assigns to are variables, on the stack from the
+    # start. The others are only called, or read as addresses.
+    written_builtins = sorted((variable for variable in writes if variable.name in builtin_function_names), key = str)
+    functions = {IRVar(name) for name in root_names} - {unit, *written_builtins}
+    # Variables only ever written with a constant small enough to be an operand
+    # are not given a place. Declarations come before every read, so a read
+    # always finds the constant.
+    immediates = {unit: 0}
+    for variable, written_by in writes.items():
+        if len(written_by) == 1 and isinstance(constant := written_by[0], (LoadIntConst, LoadBoolConst)) and fits_in_32_bits(int(constant.value)):
+            immediates[variable] = int(constant.value)
+    # Results nothing reads are not kept either.
+    unread = {variable for variable in writes if variable not in read_counts}
+    intervals = live_intervals(cfg, functions | immediates.keys() | unread)
+    allocation = linear_scan(intervals, caller_saved_registers + preserved_registers, preserved_registers, calls)
+    for builtin in written_builtins:
+        allocation.slots[builtin] = len(allocation.slots)
+    saved = [register for register in preserved_registers if register in allocation.used_registers()]
+    # The stack stays aligned to 16 bytes at calls.
+    frame_size = 8 * len(allocation.slots) + 8 * ((len(saved) + len(allocation.slots)) % 2)
+
+    lines: list[str] = []
+    error_lines: list[str] = []
+    block_labels = {label: f'.L{number}' for number, label in enumerate(cfg.blocks)}
+    errors = 0
+    next_label: str | None = None # of the block after the one being emitted
+
+    def emit(line: str) -> None:
+        lines.append(f'    {line}')
+
+    def location(variable: IRVar) -> str:
+        """The register or stack slot of a variable that has a place."""
+        register = allocation.registers.get(variable)
+        if register is not None:
+            return register
+        return f'{-8 * (len(saved) + allocation.slots[variable] + 1)}(%rbp)'
+
+    def is_register(place: str) -> bool:
+        return place.startswith('%')
+
+    def operand(variable: IRVar) -> str:
+        """'variable' as the source operand of an instruction. Functions are put
+        in %rcx first."""
+        if variable in immediates:
+            return f'${immediates[variable]}'
+        if variable in functions:
+            emit(f'leaq {variable.name}(%rip), %rcx')
+            return '%rcx'
+        return location(variable)
+
+    def load(variable: IRVar, place: str) -> None:
+        """Puts the value of 'variable' in 'place', a register unless 'variable'
+        is an immediate or in a register."""
+        if variable in functions:
+            emit(f'leaq {variable.name}(%rip), {place}')
+        elif immediates.get(variable) == 0 and is_register(place):
+            emit(f'xorl {register_32(place)}, {register_32(place)}')
+        elif operand(variable) != place:
+            emit(f'movq {operand(variable)}, {place}')
+
+    def store(register: str, variable: IRVar) -> None:
+        if variable not in immediates and variable not in unread and location(variable) != register:
+            emit(f'movq {register}, {location(variable)}')
+
+    def in_register(variable: IRVar) -> str:
+        """A register that holds the value of 'variable': its own, or %rax."""
+        if variable in allocation.registers:
+            return allocation.registers[variable]
+        load(variable, '%rax')
+        return '%rax'
+
+    def division_by_zero(instruction: Call) -> str:
+        """A label that reports dividing by zero at 'instruction'."""
+        nonlocal errors
+        errors += 1
+        label = f'.Ldivision_by_zero{errors}'
+        message = f'{instruction.position}: Division by zero'.replace('\\', '\\\\').replace('"', '\\"')
+        error_lines.extend([
+            f'{label}:',
+            f'    leaq {label}_message(%rip), %rdi',
+            '    call runtime_error',
+            '    .section .rodata',
+            f'{label}_message:',
+            f'    .string "{message}"',
+            '    .text',
+        ])
+        return label
+
+    def emit_operator(instruction: Call, fused_jump: CondJump | None) -> None:
+        op = instruction.fun.name
+        args = instruction.args
+        dest = instruction.dest
+        if dest in unread and op not in ['/', '%']:
+            return
+        if op in arithmetic_instructions:
+            place = location(dest)
+            if is_register(place) and place != operand(args[1]):
+                load(args[0], place)
+                emit(f'{arithmetic_instructions[op]} {operand(args[1])}, {place}')
+            else:
+                load(args[0], '%rax')
+                emit(f'{arithmetic_instructions[op]} {operand(args[1])}, %rax')
+                store('%rax', dest)
+        elif op in ['/', '%']:
+            divisor = immediates.get(args[1])
+            load(args[1], '%rcx')
+            if divisor is None or divisor == 0:
+                emit('testq %rcx, %rcx')
+                emit(f'jz {division_by_zero(instruction)}')
+            load(args[0], '%rax')
+            # Dividing the least integer by -1 would trap instead of wrapping around.
+            by_minus_one = 'negq %rax' if op == '/' else 'xorl %eax, %eax'
+            if divisor is None:
+                emit('cmpq $-1, %rcx')
+                emit('jne 1f')
+                emit(by_minus_one)
+                emit('jmp 2f')
+                lines.append('1:')
+            if divisor == -1:
+                emit(by_minus_one)
+            else:
+                emit('cqto')
+                emit('idivq %rcx')
+                if op == '%':
+                    emit('movq %rdx, %rax')
+            if divisor is None:
+                lines.append('2:')
+            store('%rax', dest)
+        elif op in condition_codes:
+            left = in_register(args[0])
+            emit(f'cmpq {operand(args[1])}, {left}')
+            if fused_jump is not None:
+                emit_branch(f'j{condition_codes[op]}', f'j{negated_condition_codes[op]}', fused_jump)
+                return
+            emit(f'set{condition_codes[op]} %al')
+            emit('movzbq %al, %rax')
+            store('%rax', dest)
+        else:
+            place = location(dest)
+            if not is_register(place):
+                place = '%rax'
+            load(args[0], place)
+            emit('negq ' + place if op == 'unary_-' else 'xorq $1, ' + place)
+            store(place, dest)
+
+    def emit_call(instruction: Call) -> None:
+        if instruction.fun in functions:
+            target = instruction.fun.name
+        else:
+            load(instruction.fun, '%rax')
+            target = '*%rax'
+        if len(instruction.args) == 1:
+            load(instruction.args[0], argument_registers[0])
+        else:
+            # Through the stack, as arguments may be in each other's registers.
+            for argument in instruction.args:
+                emit(f'pushq {operand(argument)}')
+            for register in reversed(argument_registers[:len(instruction.args)]):
+                emit(f'popq {register}')
+        emit(f'call {target}')
+        store('%rax', instruction.dest)
+
+    def emit_branch(jump_if: str, jump_unless: str, instruction: CondJump) -> None:
+        then_label = block_labels[instruction.then_label]
+        else_label = block_labels[instruction.else_label]
+        if next_label == instruction.else_label:
+            emit(f'{jump_if} {then_label}')
+        elif next_label == instruction.then_label:
+            emit(f'{jump_unless} {else_label}')
+        else:
+            emit(f'{jump_if} {then_label}')
+            emit(f'jmp {else_label}')
+
+    def emit_jump(label: str) -> None:
+        if label != next_label:
+            emit(f'jmp {block_labels[label]}')
+
+    lines.extend(['    .text', '    .globl main', '    .type main, @function', 'main:'])
+    emit('pushq %rbp')
+    emit('movq %rsp, %rbp')
+    for register in saved:
+        emit(f'pushq {register}')
+    if frame_size:
+        emit(f'subq ${frame_size}, %rsp')
+    for builtin in written_builtins:
+        emit(f'leaq {builtin.name}(%rip), %rax')
+        store('%rax', builtin)
+
+    order = list(cfg.blocks)
+    for number, label in enumerate(order):
+        block = cfg.blocks[label]
+        next_label = order[number + 1] if number + 1 < len(order) else None
+        lines.append(f'{block_labels[label]}:')
+        for position, instruction in enumerate(block.instructions):
+            following = block.instructions[position + 1] if position + 1 < len(block.instructions) else None
+            match instruction:
+                case LoadIntConst() | LoadBoolConst():
+                    if instruction.dest not in immediates and instruction.dest not in unread:
+                        # Only constants that do not fit in an operand need two instructions.
+                        value = wrap(int(instruction.value))
+                        if fits_in_32_bits(value):
+                            emit(f'movq ${value}, {location(instruction.dest)}')
+                        else:
+                            emit(f'movabsq ${value}, %rax')
+                            store('%rax', instruction.dest)
+                case Copy() if instruction.dest not in unread:
+                    place = location(instruction.dest)
+                    if is_register(place) or instruction.source in immediates:
+                        load(instruction.source, place)
+                    else:
+                        store(in_register(instruction.source), instruction.dest)
+                case Call() if is_operator(instruction):
+                    # A comparison read only by the jump after it sets the flags for it.
+                    fused = (
+                        following if isinstance(following, CondJump) and following.cond == instruction.dest
+                        and instruction.fun.name in condition_codes and read_counts.get(instruction.dest) == 1
+                        else None
+                    )
+                    emit_operator(instruction, fused)
+                    if fused is not None:
+                        break # the jump is emitted
+                case Copy():
+                    pass
+                case Call():
+                    emit_call(instruction)
+                case Jump():
+                    emit_jump(instruction.label)
+                case CondJump():
+                    if instruction.cond in immediates:
+                        emit_jump(instruction.then_label if immediates[instruction.cond] else instruction.else_label)
+                    elif is_register(location(instruction.cond)):
+                        emit(f'testq {location(instruction.cond)}, {location(instruction.cond)}')
+                        emit_branch('jne', 'je', instruction)
+                    else:
+                        emit(f'cmpq $0, {location(instruction.cond)}')
+                        emit_branch('jne', 'je', instruction)
+                case Return():
+                    if result_type is Int() or result_type is Bool():
+                        load(instruction.value, '%rdi')
+                        emit(f'call {"print_int" if result_type is Int() else "print_bool"}')
+                    emit('xorl %eax, %eax')
+                    emit(f'leaq {-8 * len(saved)}(%rbp), %rsp' if saved else 'movq %rbp, %rsp')
+                    for register in reversed(saved):
+                        emit(f'popq {register}')
+                    emit('popq %rbp')
+                    emit('ret')
+                case _:
+                    raise Exception(f'{instruction.position}: Can not compile {type(instruction).__name__}')
+    lines.extend(error_lines)
+    lines.append(runtime.strip('\n'))
+    lines.append('    .section .note.GNU-stack,"",@progbits')
+    return "\n".join(lines) + "\n"
+
+def is_operator(instruction: Call) -> bool:
+    return instruction.fun.name in binary_operators or instruction.fun.name in unary_operators
+
+def wrap(value: int) -> int:
+    """'value' as a 64-bit integer, wrapping around like arithmetic does."""
+    return (value + 2**63) % 2**64 - 2**63
+
+def fits_in_32_bits(value: int) -> bool:
+    """Whether an instruction can take 'value' as an operand."""
+    return -2**31 <= value < 2**31
+
+def register_32(register: str) -> str:
+    """The lower half of a 64-bit register, which zeroes the upper half when written."""
+    if register.startswith('%r') and register[2:].isdigit():
+        return register + 'd'
+    return '%e' + register[2:]
+
+def build_executable(assembly: str, output_file: str) -> None:
+    """Assembles 'assembly' with 'as' and links it into 'output_file' with 'cc'."""
+    with tempfile.TemporaryDirectory() as directory:
+        assembly_file = os.path.join(directory, 'program.s')
+        object_file = os.path.join(directory, 'program.o')
+        with open(assembly_file, 'w') as f:
+            f.write(assembly)
+        subprocess.run(['as', '-o', object_file, assembly_file], check = True)
+        subprocess.run(['cc', '-o', output_file, object_file], check = True)
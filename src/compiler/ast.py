@@ -1,54 +1,87 @@
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from compiler.tokenizer import Position
+from compiler.types import Type, FunctionType
 
-@dataclass
+@dataclass(slots=True)
 class Expression:
     """Base class for AST nodes representing expressions."""
-    position: Position
+    position: Position = field(default_factory=lambda: Position(1,1), kw_only=True)
+    type: list[Type] | Type | None = field(default=None, compare=False, kw_only=True) # set by the type checker
 
-@dataclass
+@dataclass(slots=True)
 class Literal(Expression):
     value: int | bool | None
     # (value=None is used when parsing the keyword `unit`)
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class Binding:
+    """Where a variable lives: slot 'slot' of the frame of the block 'depth' blocks deep.
+    Depth 0 is the global frame of builtins and variables declared outside any block."""
+    depth: int
+    slot: int
+
+@dataclass(slots=True)
 class Identifier(Expression):
     name: str
+    binding: Binding | None = field(default=None, compare=False, kw_only=True) # set by the resolver
     
-@dataclass
+@dataclass(slots=True)
 class UnaryOp(Expression):
     op: str
     right: Expression
+    overload: FunctionType | None = field(default=None, compare=False, kw_only=True) # set by the type checker
 
-@dataclass
+@dataclass(slots=True)
 class BinaryOp(Expression):
     left: Expression
     op: str
     right: Expression
+    overload: FunctionType | None = field(default=None, compare=False, kw_only=True) # set by the type checker
     
-@dataclass
+@dataclass(slots=True)
 class While(Expression):
     condition: Expression
     do: Expression
     
-@dataclass
+@dataclass(slots=True)
 class If(Expression):
     condition: Expression
     then_branch: Expression
     else_branch: Expression | None
     
-@dataclass
+@dataclass(slots=True)
 class FunctionCall(Expression):
     name: Expression
     arguments: list[Expression]
     
-@dataclass
+@dataclass(slots=True)
 class VariableDeclaration(Expression):
     name: Identifier
     type_exp: Identifier | None
     value: Expression
+    binding: Binding | None = field(default=None, compare=False, kw_only=True) # set by the resolver
     
-@dataclass
+@dataclass(slots=True)
 class Block(Expression):
-    statements: list[Expression] #Return value is defined by the last expression
\ No newline at end of file
+    statements: list[Expression] #Return value is defined by the last expression
+    frame_size: int = field(default=0, compare=False, kw_only=True) # set by the resolver
+
+def children(node: Expression) -> list[Expression]:
+    """The child expressions of 'node', in the order of its fields."""
+    match node:
+        case UnaryOp():
+            return [node.right]
+        case BinaryOp():
+            return [node.left, node.right]
+        case While():
+            return [node.condition, node.do]
+        case If():
+            return [node.condition, node.then_branch] if node.else_branch is None else [node.condition, node.then_branch, node.else_branch]
+        case FunctionCall():
+            return [node.name, *node.arguments]
+        case VariableDeclaration():
+            return [node.name, node.value] if node.type_exp is None else [node.name, node.type_exp, node.value]
+        case Block():
+            return node.statements
+    return []
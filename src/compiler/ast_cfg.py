@@ -0,0 +1,200 @@
+from dataclasses import dataclass, field
+import compiler.ast as ast
+from compiler.trampoline import Step, trampoline
+
+@dataclass
+class BasicBlock:
+    """AST nodes that run one after another, in the order they are evaluated:
+    children before their parents. Only the nodes that compute something are
+    here, 'Block', 'If' and 'While' are the edges between blocks."""
+    index: int
+    nodes: list[ast.Expression] = field(default_factory = list)
+    successors: list[int] = field(default_factory = list)
+    predecessors: list[int] = field(default_factory = list)
+
+@dataclass
+class ControlFlowGraph:
+    """The blocks of a typechecked program. The entry is the first block and
+    the exit the last one, which is empty.
+
+    Each declaration is a variable of its own, even if another one has the same
+    name, and the builtins are not variables. A definition is a declaration
+    or an assignment. The dictionaries are by the 'id' of the nodes, as nodes
+    compare by their fields: identifiers that read a variable, and definitions,
+    to the index of their variable, and definitions to their own index.
+    """
+    blocks: list[BasicBlock]
+    variables: list[ast.VariableDeclaration]
+    definitions: list[ast.Expression]
+    variable_of: dict[int, int]
+    definition_of: dict[int, int]
+
+    @property
+    def entry(self) -> int:
+        return 0
+
+    @property
+    def exit(self) -> int:
+        return len(self.blocks) - 1
+
+def build_ast_cfg(root: ast.Expression) -> ControlFlowGraph:
+    """Splits the typechecked tree under 'root' into basic blocks.
+
+    The condition of an 'if' or a 'while' ends its block, and 'and' and 'or'
+    end theirs before their right side, which may not run. The scopes are
+    the same as in 'typecheck'.
+    """
+    cfg = ControlFlowGraph([BasicBlock(0)], [], [], {}, {})
+    current = 0
+    scopes: list[dict[str, int]] = [{}] # the variables declared in each open block, by name
+
+    def new_block() -> int:
+        cfg.blocks.append(BasicBlock(len(cfg.blocks)))
+        return len(cfg.blocks) - 1
+
+    def edge(source: int, target: int) -> None:
+        cfg.blocks[source].successors.append(target)
+        cfg.blocks[target].predecessors.append(source)
+
+    def lookup(name: str) -> int | None:
+        for scope in reversed(scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def define(node: ast.Expression, variable: int | None) -> None:
+        if variable is not None:
+            cfg.variable_of[id(node)] = variable
+            cfg.definition_of[id(node)] = len(cfg.definitions)
+            cfg.definitions.append(node)
+
+    def visit(node: ast.Expression) -> Step[None] | None:
+        nonlocal current
+        match node:
+            case ast.Identifier():
+                variable = lookup(node.name)
+                if variable is not None:
+                    cfg.variable_of[id(node)] = variable
+            case ast.BinaryOp() if node.op == '=':
+                assert isinstance(node.left, ast.Identifier)
+                yield visit(node.right)
+                define(node, lookup(node.left.name))
+            case ast.BinaryOp() if node.op in ['and', 'or']:
+                yield visit(node.left)
+                decided = current
+                current = new_block()
+                edge(decided, current)
+                yield visit(node.right)
+                join = new_block()
+                edge(current, join)
+                edge(decided, join)
+                current = join
+            case ast.While():
+                header = new_block()
+                edge(current, header)
+                current = header
+                yield visit(node.condition)
+                decided = current
+                current = new_block()
+                edge(decided, current)
+                yield visit(node.do)
+                edge(current, header)
+                current = new_block()
+                edge(decided, current)
+                return None
+            case ast.If():
+                yield visit(node.condition)
+                decided = current
+                current = new_block()
+                edge(decided, current)
+                yield visit(node.then_branch)
+                ends = [current]
+                if node.else_branch is not None:
+                    current = new_block()
+                    edge(decided, current)
+                    yield visit(node.else_branch)
+                    ends.append(current)
+                else:
+                    ends.append(decided)
+                current = new_block()
+                for end in ends:
+                    edge(end, current)
+                return None
+            case ast.VariableDeclaration():
+                yield visit(node.value)
+                variable = len(cfg.variables)
+                cfg.variables.append(node)
+                scopes[-1][node.name.name] = variable
+                define(node, variable)
+            case ast.Block():
+                scopes.append({})
+                for statement in node.statements:
+                    yield visit(statement)
+                scopes.pop()
+                return None
+            case _:
+                for child in ast.children(node):
+                    yield visit(child)
+        cfg.blocks[current].nodes.append(node)
+        return None
+
+    trampoline(visit(root))
+    edge(current, new_block())
+    return cfg
+
+def reverse_postorder(cfg: ControlFlowGraph) -> list[int]:
+    """The blocks the entry reaches, each one before its successors except
+    along loops.
+
+    The successors are searched from the last, so that the body of a loop comes
+    right after its condition, and what follows the loop after the body.
+    """
+    order: list[int] = []
+    visited = bytearray(len(cfg.blocks))
+    visited[cfg.entry] = 1
+    stack = [(cfg.entry, reversed(cfg.blocks[cfg.entry].successors))]
+    while stack:
+        index, successors = stack[-1]
+        for successor in successors:
+            if not visited[successor]:
+                visited[successor] = 1
+                stack.append((successor, reversed(cfg.blocks[successor].successors)))
+                break
+        else:
+            stack.pop()
+            order.append(index)
+    order.reverse()
+    return order
+
+def describe(node: ast.Expression) -> str:
+    """A short text for 'node' in a block."""
+    match node:
+        case ast.Literal():
+            return 'unit' if node.value is None else str(node.value).lower()
+        case ast.Identifier():
+            return node.name
+        case ast.BinaryOp() if node.op == '=':
+            assert isinstance(node.left, ast.Identifier)
+            return f'{node.left.name} ='
+        case ast.UnaryOp() | ast.BinaryOp():
+            return node.op
+        case ast.FunctionCall():
+            return f'call {node.name.name}' if isinstance(node.name, ast.Identifier) else 'call'
+        case ast.VariableDeclaration():
+            return f'var {node.name.name}'
+    return type(node).__name__
+
+def format_dot(cfg: ControlFlowGraph) -> str:
+    """The graph in the DOT language of Graphviz, with the nodes of each block
+    on lines of their own, with their positions."""
+    lines = ['digraph cfg {', '    node [shape=box, fontname="monospace"];']
+    for block in cfg.blocks:
+        name = 'entry' if block.index == cfg.entry else 'exit' if block.index == cfg.exit else f'b{block.index}'
+        texts = [name] + [f'{node.position.line}:{node.position.column} {describe(node)}' for node in block.nodes]
+        label = ''.join(text.replace('\\', '\\\\').replace('"', '\\"') + '\\l' for text in texts)
+        lines.append(f'    b{block.index} [label="{label}"];')
+    for block in cfg.blocks:
+        for successor in block.successors:
+            lines.append(f'    b{block.index} -> b{successor};')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
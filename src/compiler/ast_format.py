@@ -0,0 +1,265 @@
+import gc
+import sys
+import compiler.ast as ast
+from compiler.tokenizer import Position
+
+# Binary AST format, version 1:
+#
+#   magic       b"\0AST"
+#   version     varint
+#   strings     varint count, then each string as varint byte length + UTF-8
+#   nodes       varint count, then the nodes in post-order (children first)
+#
+# Each node is its tag, its position as the change in line and column from
+# the previous node (zigzag varints) and then the tag's operand if it has one.
+# Loading pushes each node on a stack and pops its children from there.
+#
+# Varints are little-endian base 128: 7 bits per byte, high bit set on all but the last.
+# Zigzag maps signed to unsigned: 0, -1, 1, -2, ... to 0, 1, 2, 3, ...
+
+magic = b"\0AST"
+version = 1
+
+# Node tags. The operand is in parentheses.
+UNIT = 0
+TRUE = 1
+FALSE = 2
+INT = 3 # (zigzag value)
+IDENTIFIER = 4 # (string)
+UNARY_OP = 5 # (string)
+BINARY_OP = 6 # (string)
+WHILE = 7
+IF = 8
+IF_ELSE = 9
+FUNCTION_CALL = 10 # (number of arguments)
+VARIABLE_DECLARATION = 11
+TYPED_VARIABLE_DECLARATION = 12
+BLOCK = 13 # (number of statements)
+
+takes_operand = [tag in (INT, IDENTIFIER, UNARY_OP, BINARY_OP, FUNCTION_CALL, BLOCK) for tag in range(256)]
+
+def dump_ast(root: ast.Expression) -> bytes:
+    """Encodes the tree under 'root' in the binary AST format."""
+    strings: dict[str, int] = {}
+    body = bytearray()
+    add = body.append
+
+    def varint(value: int) -> None:
+        write_varint(body, value)
+
+    def string(text: str) -> int:
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+
+    # Parents before children, last child first: reversed, this is post-order.
+    order: list[ast.Expression] = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        match node:
+            case ast.UnaryOp():
+                stack.append(node.right)
+            case ast.BinaryOp():
+                stack += (node.left, node.right)
+            case ast.While():
+                stack += (node.condition, node.do)
+            case ast.If():
+                stack += (node.condition, node.then_branch)
+                if node.else_branch is not None:
+                    stack.append(node.else_branch)
+            case ast.FunctionCall():
+                stack.append(node.name)
+                stack += node.arguments
+            case ast.VariableDeclaration():
+                stack.append(node.name)
+                if node.type_exp is not None:
+                    stack.append(node.type_exp)
+                stack.append(node.value)
+            case ast.Block():
+                stack += node.statements
+
+    line, column = 1, 1
+    for node in reversed(order):
+        operand: int | None = None
+        match node:
+            case ast.Literal(value = None):
+                tag = UNIT
+            case ast.Literal(value = True):
+                tag = TRUE
+            case ast.Literal(value = False):
+                tag = FALSE
+            case ast.Literal(value = int(value)):
+                tag, operand = INT, zigzag(value)
+            case ast.Identifier():
+                tag, operand = IDENTIFIER, string(node.name)
+            case ast.UnaryOp():
+                tag, operand = UNARY_OP, string(node.op)
+            case ast.BinaryOp():
+                tag, operand = BINARY_OP, string(node.op)
+            case ast.While():
+                tag = WHILE
+            case ast.If():
+                tag = IF if node.else_branch is None else IF_ELSE
+            case ast.FunctionCall():
+                tag, operand = FUNCTION_CALL, len(node.arguments)
+            case ast.VariableDeclaration():
+                tag = VARIABLE_DECLARATION if node.type_exp is None else TYPED_VARIABLE_DECLARATION
+            case ast.Block():
+                tag, operand = BLOCK, len(node.statements)
+            case _:
+                raise TypeError(f'Cannot encode {type(node).__name__} nodes')
+        add(tag)
+        varint(zigzag(node.position.line - line))
+        varint(zigzag(node.position.column - column))
+        line, column = node.position.line, node.position.column
+        if operand is not None:
+            varint(operand)
+
+    header = bytearray(magic)
+    write_varint(header, version)
+    write_varint(header, len(strings))
+    for text in strings:
+        encoded = text.encode()
+        write_varint(header, len(encoded))
+        header += encoded
+    write_varint(header, len(order))
+    return bytes(header + body)
+
+def zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else (~value << 1) | 1
+
+def write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+def load_ast(data: bytes | bytearray | memoryview) -> ast.Expression:
+    """Decodes a tree that 'dump_ast' encoded.
+
+    Raises ValueError if 'data' is not in a format version this can read.
+    """
+    data = bytes(data)
+    if data[:len(magic)] != magic:
+        raise ValueError('Not a binary AST')
+    index = len(magic)
+
+    def varint() -> int:
+        nonlocal index
+        value = shift = 0
+        while True:
+            byte = data[index]
+            index += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    # Loading makes no reference cycles, so the cyclic garbage collector is paused
+    # instead of having it scan the growing tree over and over.
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        found_version = varint()
+        if found_version != version:
+            raise ValueError(f'Binary AST format version {found_version} is not supported, expected version {version}')
+        strings: list[str] = []
+        for _ in range(varint()):
+            length = varint()
+            if index + length > len(data):
+                raise IndexError
+            strings.append(sys.intern(data[index:index + length].decode()))
+            index += length
+
+        stack: list[ast.Expression] = []
+        push = stack.append
+        pop = stack.pop
+        new_position = Position.__new__
+        set_line = Position.line.__set__ # type: ignore[misc, attr-defined]
+        set_column = Position.column.__set__ # type: ignore[misc, attr-defined]
+        line, column = 1, 1
+        for _ in range(varint()):
+            # Most varints here are one byte, so that case is read inline.
+            tag = data[index]
+            change = data[index + 1]
+            index += 2
+            if change:
+                if change >= 0x80:
+                    index -= 1
+                    change = varint()
+                line += change >> 1 if not change & 1 else ~(change >> 1)
+            change = data[index]
+            index += 1
+            if change >= 0x80:
+                index -= 1
+                change = varint()
+            column += change >> 1 if not change & 1 else ~(change >> 1)
+            # Position is frozen, so its __init__ sets fields through object.__setattr__.
+            # Setting the slots directly halves the cost of the most common object here.
+            position = new_position(Position)
+            set_line(position, line)
+            set_column(position, column)
+
+            if takes_operand[tag]:
+                operand = data[index]
+                index += 1
+                if operand >= 0x80:
+                    index -= 1
+                    operand = varint()
+
+            if tag == IDENTIFIER:
+                node: ast.Expression = ast.Identifier(strings[operand], position = position)
+            elif tag == BINARY_OP:
+                right = pop()
+                node = ast.BinaryOp(pop(), strings[operand], right, position = position)
+            elif tag == INT:
+                node = ast.Literal(operand >> 1 if not operand & 1 else ~(operand >> 1), position = position)
+            elif tag == BLOCK:
+                if operand:
+                    statements = stack[-operand:]
+                    del stack[-operand:]
+                else:
+                    statements = []
+                node = ast.Block(statements, position = position)
+            elif tag <= FALSE:
+                node = ast.Literal(None if tag == UNIT else tag == TRUE, position = position)
+            elif tag == UNARY_OP:
+                node = ast.UnaryOp(strings[operand], pop(), position = position)
+            elif tag == WHILE:
+                do = pop()
+                node = ast.While(pop(), do, position = position)
+            elif tag == IF:
+                then_branch = pop()
+                node = ast.If(pop(), then_branch, None, position = position)
+            elif tag == IF_ELSE:
+                else_branch = pop()
+                then_branch = pop()
+                node = ast.If(pop(), then_branch, else_branch, position = position)
+            elif tag == FUNCTION_CALL:
+                if operand:
+                    arguments = stack[-operand:]
+                    del stack[-operand:]
+                else:
+                    arguments = []
+                node = ast.FunctionCall(pop(), arguments, position = position)
+            elif tag == VARIABLE_DECLARATION or tag == TYPED_VARIABLE_DECLARATION:
+                value = pop()
+                type_exp = pop() if tag == TYPED_VARIABLE_DECLARATION else None
+                name = pop()
+                if not isinstance(name, ast.Identifier) or not (type_exp is None or isinstance(type_exp, ast.Identifier)):
+                    raise ValueError('Invalid binary AST: variable declaration without a name')
+                node = ast.VariableDeclaration(name, type_exp, value, position = position)
+            else:
+                raise ValueError(f'Invalid binary AST: unknown node tag {tag}')
+            push(node)
+    except IndexError:
+        raise ValueError('Invalid binary AST: it ends in the middle of a node or a node is missing children') from None
+    finally:
+        if collecting:
+            gc.enable()
+    if len(stack) != 1 or index != len(data):
+        raise ValueError('Invalid binary AST: it is not one tree')
+    return stack[0]
@@ -0,0 +1,207 @@
+import compiler.ast as ast
+from compiler.types import Unit, Int, Bool
+from compiler.resolver import resolve
+from compiler.trampoline import Step, trampoline
+from compiler.interpreter import divide, remainder, operands
+
+# Operators that can be folded when both sides are literals.
+int_operators = {
+    '+': lambda left, right: left + right,
+    '-': lambda left, right: left - right,
+    '*': lambda left, right: left * right,
+    '<': lambda left, right: left < right,
+    '<=': lambda left, right: left <= right,
+    '>': lambda left, right: left > right,
+    '>=': lambda left, right: left >= right,
+}
+
+def optimize(root: ast.Expression) -> ast.Expression:
+    """Simplifies the typechecked tree under 'root', and returns the new root.
+
+    Operators on literals are folded, 'if' and 'while' on literal conditions
+    lose the branches that can not run, and so do 'and' and 'or'. Statements
+    without effects are removed from blocks, and so are declarations of
+    variables that are never used, if computing their value has no effects.
+    Blocks without declarations of their own are merged into the block they
+    are in, and a block of one statement becomes that statement.
+
+    Division and remainder by zero, and loops, count as effects, so a program
+    still fails and runs forever where it did. New nodes have their types.
+    """
+    resolve(root)
+    # How many identifiers refer to each variable, not counting declarations.
+    references: dict[ast.Binding, int] = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Identifier) and node.binding is not None:
+            references[node.binding] = references.get(node.binding, 0) + 1
+        stack += operands(node)
+
+    def discard(node: ast.Expression) -> None:
+        """Forgets the references in 'node', which is removed."""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast.Identifier) and node.binding is not None:
+                references[node.binding] -= 1
+            stack += operands(node)
+
+    def literal(value: int | bool | None, node: ast.Expression) -> tuple[ast.Expression, bool]:
+        result = ast.Literal(value, position = node.position)
+        result.type = Unit() if value is None else Bool() if type(value) is bool else Int()
+        return result, True
+
+    def is_unused_declaration(node: ast.Expression, pure: bool) -> bool:
+        return isinstance(node, ast.VariableDeclaration) and pure and node.binding is not None and references.get(node.binding, 0) == 0
+
+    # Each node becomes the simplified node and whether evaluating it has no effects.
+    def step(node: ast.Expression) -> Step[tuple[ast.Expression, bool]] | tuple[ast.Expression, bool]:
+        match node:
+            case ast.Literal() | ast.Identifier():
+                return node, True
+        return simplify(node)
+
+    def simplify(node: ast.Expression) -> Step[tuple[ast.Expression, bool]]:
+        match node:
+            case ast.UnaryOp():
+                right, pure = yield step(node.right)
+                if isinstance(right, ast.Literal):
+                    return literal(-right.value if node.op == '-' else not right.value, node) # type: ignore[operator]
+                if isinstance(right, ast.UnaryOp) and right.op == node.op:
+                    # '- - x' and 'not not x' are 'x'.
+                    return right.right, pure
+                node.right = right
+                return node, pure
+            case ast.BinaryOp() if node.op == '=':
+                node.right, _ = yield step(node.right)
+                return node, False
+            case ast.BinaryOp() if node.op in ['and', 'or']:
+                left, left_pure = yield step(node.left)
+                right, right_pure = yield step(node.right)
+                deciding = node.op == 'or' # the value of the left side that decides the result
+                if isinstance(left, ast.Literal):
+                    if left.value == deciding:
+                        discard(right)
+                        return left, True
+                    return right, right_pure
+                if isinstance(right, ast.Literal):
+                    if right.value != deciding:
+                        return left, left_pure
+                    if left_pure:
+                        discard(left)
+                        return right, True
+                node.left, node.right = left, right
+                return node, left_pure and right_pure
+            case ast.BinaryOp():
+                left, left_pure = yield step(node.left)
+                right, right_pure = yield step(node.right)
+                node.left, node.right = left, right
+                if isinstance(right, ast.Literal) and node.op in ['/', '%']:
+                    if right.value == 0:
+                        return node, False # fails when it runs
+                    if isinstance(left, ast.Literal):
+                        return literal((divide if node.op == '/' else remainder)(left.value, right.value, node.position), node) # type: ignore[arg-type]
+                    return node, left_pure
+                if node.op in ['/', '%']:
+                    return node, False
+                if isinstance(left, ast.Literal) and isinstance(right, ast.Literal):
+                    if node.op == '==':
+                        return literal(left.value == right.value, node)
+                    if node.op == '!=':
+                        return literal(left.value != right.value, node)
+                    return literal(int_operators[node.op](left.value, right.value), node)
+                return node, left_pure and right_pure
+            case ast.While():
+                condition, _ = yield step(node.condition)
+                if isinstance(condition, ast.Literal) and condition.value is False:
+                    discard(node.do)
+                    return literal(None, node)
+                node.condition = condition
+                node.do, _ = yield step(node.do)
+                return node, False # may not end
+            case ast.If():
+                condition, condition_pure = yield step(node.condition)
+                then_branch, then_pure = yield step(node.then_branch)
+                else_branch, else_pure = (yield step(node.else_branch)) if node.else_branch is not None else (None, True)
+                if isinstance(condition, ast.Literal):
+                    taken, other = (then_branch, else_branch) if condition.value else (else_branch, then_branch)
+                    taken_pure = then_pure if condition.value else else_pure
+                    if other is not None:
+                        discard(other)
+                    if taken is None:
+                        return literal(None, node)
+                    if node.else_branch is None and taken.type is not node.type:
+                        # Without 'else' the value is unit.
+                        unit, _ = literal(None, node)
+                        block = ast.Block([taken, unit], position = node.position)
+                        block.type = node.type
+                        return block, taken_pure
+                    return taken, taken_pure
+                node.condition, node.then_branch, node.else_branch = condition, then_branch, else_branch
+                return node, condition_pure and then_pure and else_pure
+            case ast.FunctionCall():
+                node.name, _ = yield step(node.name)
+                arguments = []
+                for argument in node.arguments:
+                    simplified, _ = yield step(argument)
+                    arguments.append(simplified)
+                node.arguments = arguments
+                return node, False
+            case ast.VariableDeclaration():
+                node.value, pure = yield step(node.value)
+                return node, pure
+            case ast.Block():
+                results = []
+                for statement in node.statements:
+                    results.append((yield step(statement)))
+                return simplify_block(node, results)
+        raise Exception(f'{node.position}: Can not optimize {type(node).__name__}')
+
+    def simplify_block(node: ast.Block, results: list[tuple[ast.Expression, bool]]) -> tuple[ast.Expression, bool]:
+        # From the last, so that a declaration used only by later unused ones goes too.
+        kept: list[ast.Expression] = []
+        all_pure = True
+        for index in reversed(range(len(results))):
+            statement, pure = results[index]
+            all_pure = all_pure and pure
+            last = index == len(results) - 1
+            if is_unused_declaration(statement, pure):
+                discard(statement)
+                if last:
+                    kept.append(literal(None, statement)[0])
+            elif pure and not last and not isinstance(statement, ast.VariableDeclaration):
+                discard(statement)
+            else:
+                kept.append(statement)
+        kept.reverse()
+        # Blocks that declare nothing are merged into this one.
+        statements: list[ast.Expression] = []
+        for index, statement in enumerate(kept):
+            if isinstance(statement, ast.Block) and not any(isinstance(each, ast.VariableDeclaration) for each in statement.statements):
+                inner = statement.statements
+                if index < len(kept) - 1:
+                    # The value of a block in the middle is not used.
+                    inner = [each for each in inner if not (isinstance(each, ast.Literal) and each.value is None)]
+                statements.extend(inner)
+            else:
+                statements.append(statement)
+        if not statements:
+            return literal(None, node)
+        if len(statements) == 1 and not isinstance(statements[0], ast.VariableDeclaration):
+            return statements[0], all_pure
+        node.statements = statements
+        return node, all_pure
+
+    optimized, _ = trampoline(step(root))
+    return optimized
+
+def count_nodes(root: ast.Expression) -> int:
+    """The number of nodes in the tree under 'root'."""
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack += ast.children(node)
+    return count
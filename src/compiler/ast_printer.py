@@ -0,0 +1,39 @@
+import compiler.ast as ast
+
+def describe(node: ast.Expression) -> str:
+    """One line about 'node' itself: its kind, what it holds, and what the type checker recorded on it."""
+    match node:
+        case ast.Literal():
+            text = f'Literal {"unit" if node.value is None else str(node.value).lower()}'
+        case ast.Identifier():
+            text = f'Identifier {node.name}'
+        case ast.UnaryOp() | ast.BinaryOp():
+            text = f'{type(node).__name__} {node.op}'
+            if node.overload is not None:
+                text += f' {node.overload}'
+        case ast.VariableDeclaration():
+            text = f'VariableDeclaration {node.name.name}'
+            if node.type_exp is not None:
+                text += f' declared {node.type_exp.name}'
+        case ast.If():
+            text = 'If' if node.else_branch is None else 'If-else'
+        case _:
+            text = type(node).__name__
+    return f'{text} : {"?" if node.type is None else node.type}'
+
+def format_typed_ast(root: ast.Expression) -> str:
+    """The tree under 'root' with one node per line, children indented under their parent.
+
+    Nodes the type checker has not reached show '?' as their type.
+    """
+    lines = []
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        lines.append(f'{"  " * depth}{describe(node)}')
+        # The name of a declaration is in its own line, its type annotation is not a child.
+        children = ast.children(node)
+        if isinstance(node, ast.VariableDeclaration):
+            children = [node.value]
+        stack.extend((child, depth + 1) for child in reversed(children))
+    return "\n".join(lines)
@@ -0,0 +1,325 @@
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable
+import numpy as np
+import compiler.ast as ast
+from compiler.types import Type, Int, Bool, Unit, FunctionType
+from compiler.resolver import resolve, builtin_slots
+from compiler.interpreter import Value, compile_program, nesting_depth
+from compiler.trampoline import Step, trampoline
+
+# The values of an expression in every lane: an array, a NumPy scalar that is
+# the same in every lane, or None for Unit.
+Vector = Any
+Mask = np.ndarray # of bool, the lanes that run the code
+Code = Callable[[Mask], Vector]
+
+least_int = -2**63
+greatest_int = 2**63 - 1
+
+@dataclass
+class BatchResult:
+    """What the program did with each row of input."""
+    values: list[Value] # None for Unit and for rows that failed
+    outputs: list[str] # what the print functions wrote
+    errors: list[str | None] # the message of the error that stopped the row
+
+def run_batch(root: ast.Expression, inputs: Any) -> BatchResult:
+    """Runs the typechecked tree under 'root' once for each row of the N×k
+    matrix 'inputs', as if each run read the numbers of its row with 'read_int'.
+
+    The rows run together, each in a lane of NumPy arrays of 64-bit integers.
+    Both branches of an 'if' run, with the lanes masked so that only those
+    that take a branch see its effects, and a 'while' runs as long as any lane
+    still loops. A lane stops at the first error it runs into, which is kept
+    for its row. The rare rows that do not fit in 64 bits, because an operation
+    would overflow, run again in the interpreter, so the results are the same
+    as when the rows run one at a time.
+
+    Raises an exception naming the first part of the program that can not run
+    this way: functions as values, and variables that are not Int or Bool.
+    """
+    inputs = np.asarray(inputs, dtype = np.int64)
+    if inputs.ndim != 2:
+        raise ValueError(f'Batch inputs must be a matrix, not of shape {inputs.shape}')
+    count, columns = inputs.shape
+    resolve(root)
+    lanes = np.arange(count)
+    alive = np.ones(count, dtype = bool) # the lanes that have not stopped
+    overflowed = np.zeros(count, dtype = bool)
+    cursor = np.zeros(count, dtype = np.int64) # the next column 'read_int' reads
+    failures = np.zeros(count, dtype = np.int64) # 1 + the index of the error message
+    messages: list[str] = []
+    printed: list[tuple[Mask, Vector, bool]] = [] # in order: lanes, values, whether Bool
+    variables: dict[ast.Binding, np.ndarray] = {}
+
+    def fail(failing: Mask, message: str) -> None:
+        """Stops the lanes in 'failing' with an error."""
+        if failing.any():
+            messages.append(message)
+            failures[failing] = len(messages)
+            alive[failing] = False
+
+    def overflow(failing: Mask) -> None:
+        """Stops the lanes in 'failing', to run them again in the interpreter."""
+        if failing.any():
+            overflowed[failing] = True
+            alive[failing] = False
+
+    def variable(binding: ast.Binding | None, type: Type | list[Type] | None) -> ast.Binding:
+        assert binding is not None, "the resolver binds every variable"
+        if binding not in variables:
+            variables[binding] = np.zeros(count, dtype = bool if type is Bool() else np.int64)
+        return binding
+
+    def vectorize(node: ast.Expression) -> Step[Code] | Code:
+        """The code that evaluates 'node' in the lanes of its mask."""
+        position = node.position
+        match node:
+            case ast.Literal():
+                if node.value is None:
+                    return lambda mask: None
+                if type(node.value) is bool:
+                    boolean = np.bool_(node.value)
+                    return lambda mask: boolean
+                if not least_int <= node.value <= greatest_int:
+                    raise Exception(f'{position}: Can not run in a batch: {node.value} does not fit in 64 bits')
+                integer = np.int64(node.value)
+                return lambda mask: integer
+            case ast.Identifier():
+                if node.type is not Int() and node.type is not Bool():
+                    raise Exception(f'{position}: Can not run in a batch: "{node.name}" is of type {node.type}')
+                binding = variable(node.binding, node.type)
+                return lambda mask: variables[binding]
+            case ast.UnaryOp():
+                right = yield vectorize(node.right)
+                if node.op == 'not':
+                    return lambda mask: ~right(mask)
+                def negate(mask: Mask) -> Vector:
+                    value = right(mask)
+                    overflow(mask & alive & (value == least_int))
+                    return -value
+                return negate
+            case ast.BinaryOp() if node.op == '=':
+                assert isinstance(node.left, ast.Identifier)
+                if node.left.type is not Int() and node.left.type is not Bool():
+                    raise Exception(f'{position}: Can not run in a batch: "{node.left.name}" is of type {node.left.type}')
+                binding = variable(node.left.binding, node.left.type)
+                value = yield vectorize(node.right)
+                def assign(mask: Mask) -> Vector:
+                    result = value(mask)
+                    variables[binding] = np.where(mask & alive, result, variables[binding])
+                    return result
+                return assign
+            case ast.BinaryOp():
+                left = yield vectorize(node.left)
+                right = yield vectorize(node.right)
+                return binary(node, left, right)
+            case ast.While():
+                condition = yield vectorize(node.condition)
+                body = yield vectorize(node.do)
+                def loop(mask: Mask) -> Vector:
+                    looping = mask & alive
+                    while True:
+                        looping = looping & condition(looping) & alive
+                        if not looping.any():
+                            return None
+                        body(looping)
+                return loop
+            case ast.If():
+                condition = yield vectorize(node.condition)
+                then_branch = yield vectorize(node.then_branch)
+                else_branch = (yield vectorize(node.else_branch)) if node.else_branch is not None else None
+                has_value = node.else_branch is not None and node.type is not Unit()
+                default = zero(node.type)
+                def branch(mask: Mask) -> Vector:
+                    taken = condition(mask) & mask & alive
+                    then_value = then_branch(taken) if taken.any() else default
+                    if else_branch is None:
+                        return None
+                    not_taken = mask & alive & ~taken
+                    else_value = else_branch(not_taken) if not_taken.any() else default
+                    return np.where(taken, then_value, else_value) if has_value else None
+                return branch
+            case ast.FunctionCall():
+                return (yield from call(node))
+            case ast.VariableDeclaration():
+                if node.value.type is not Int() and node.value.type is not Bool():
+                    raise Exception(f'{position}: Can not run in a batch: "{node.name.name}" is of type {node.value.type}')
+                binding = variable(node.binding, node.value.type)
+                value = yield vectorize(node.value)
+                initial = zero(node.value.type)
+                def declare(mask: Mask) -> Vector:
+                    result = value(mask)
+                    # Declarations in sibling blocks share bindings, maybe with
+                    # another type, so each one makes an array of its own.
+                    variables[binding] = np.where(mask & alive, result, initial)
+                    return None
+                return declare
+            case ast.Block():
+                statements: list[Code] = []
+                for statement in node.statements:
+                    statements.append((yield vectorize(statement)))
+                match statements:
+                    case []:
+                        return lambda mask: None
+                    case [only]:
+                        return only
+                *first, last = statements
+                def block(mask: Mask) -> Vector:
+                    for statement in first:
+                        statement(mask)
+                    return last(mask)
+                return block
+        raise Exception(f'{position}: Can not run {type(node).__name__} in a batch')
+
+    def binary(node: ast.BinaryOp, left: Code, right: Code) -> Code:
+        position = node.position
+        match node.op:
+            case 'and':
+                def conjunction(mask: Mask) -> Vector:
+                    first = left(mask)
+                    rest = mask & alive & first
+                    return first & right(rest) if rest.any() else first
+                return conjunction
+            case 'or':
+                def disjunction(mask: Mask) -> Vector:
+                    first = left(mask)
+                    rest = mask & alive & ~first
+                    return first | right(rest) if rest.any() else first
+                return disjunction
+            case '==' | '!=' if node.left.type is Unit():
+                equal = np.bool_(node.op == '==')
+                def compare_units(mask: Mask) -> Vector:
+                    left(mask)
+                    right(mask)
+                    return equal
+                return compare_units
+            case '+':
+                def add(mask: Mask) -> Vector:
+                    a, b = left(mask), right(mask)
+                    result = a + b
+                    overflow(mask & alive & (((a ^ result) & (b ^ result)) < 0))
+                    return result
+                return add
+            case '-':
+                def subtract(mask: Mask) -> Vector:
+                    a, b = left(mask), right(mask)
+                    result = a - b
+                    overflow(mask & alive & (((a ^ b) & (a ^ result)) < 0))
+                    return result
+                return subtract
+            case '*':
+                def multiply(mask: Mask) -> Vector:
+                    a, b = left(mask), right(mask)
+                    result = a * b
+                    # Without overflow, dividing the product gives the other factor back.
+                    wrong = (a != 0) & ((result // np.where(a == 0, 1, a) != b) | ((a == -1) & (b == least_int)))
+                    overflow(mask & alive & wrong)
+                    return result
+                return multiply
+            case '/' | '%':
+                message = f'{position}: Division by zero'
+                is_division = node.op == '/'
+
+                def truncate(a: Vector, divisor: Vector) -> Vector:
+                    # Rounded towards zero like in C, as 'divide' and 'remainder' do.
+                    # Flooring with a divisor that is the same in every lane is fast.
+                    quotient = a // divisor
+                    rest = a - quotient * divisor
+                    inexact = (rest != 0) & ((a < 0) != (divisor < 0))
+                    return quotient + inexact if is_division else np.where(inexact, rest - divisor, rest)
+
+                if isinstance(node.right, ast.Literal) and node.right.value not in [0, -1]:
+                    # Never divides by zero, and can not overflow.
+                    return lambda mask: truncate(left(mask), right(mask))
+
+                def divide(mask: Mask) -> Vector:
+                    a, b = left(mask), right(mask)
+                    running = mask & alive
+                    fail(running & (b == 0), message)
+                    if is_division:
+                        overflow(running & (a == least_int) & (b == -1))
+                    # Dividing by -1 is left to negation, as it may overflow.
+                    result = truncate(a, np.where((b == 0) | (b == -1), 1, b))
+                    return np.where(b == -1, -a if is_division else 0, result)
+                return divide
+        operator = comparisons[node.op]
+        return lambda mask: operator(left(mask), right(mask))
+
+    def call(node: ast.FunctionCall) -> Step[Code]:
+        name = node.name
+        binding = name.binding if isinstance(name, ast.Identifier) else None
+        builtin = next((builtin for builtin, slot in builtin_slots.items() if binding == ast.Binding(0, slot)), None)
+        if builtin is None or not isinstance(name, ast.Identifier):
+            raise Exception(f'{node.position}: Can not run in a batch: only the builtin functions can be called')
+        if builtin == 'read_int':
+            def read_int(mask: Mask) -> Vector:
+                reading = mask & alive
+                fail(reading & (cursor >= columns), 'read_int: no more input')
+                reading &= alive
+                if columns == 0:
+                    return np.int64(0)
+                value = inputs[lanes, np.minimum(cursor, columns - 1)]
+                cursor[reading] += 1
+                return value
+            return read_int
+        [argument] = node.arguments
+        value = yield vectorize(argument)
+        is_bool = builtin == 'print_bool'
+        def write(mask: Mask) -> Vector:
+            result = value(mask)
+            writing = mask & alive
+            if writing.any():
+                printed.append((writing, result, is_bool))
+            return None
+        return write
+
+    def zero(type: Type | list[Type] | None) -> Vector:
+        if type is Int():
+            return np.int64(0)
+        if type is Bool():
+            return np.bool_(False)
+        return None
+
+    if isinstance(root.type, FunctionType):
+        raise Exception(f'{root.position}: Can not run in a batch: the value of the program is a function')
+    code = trampoline(vectorize(root))
+
+    # The closures call each other as deep as the tree is, see 'interpret'.
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 2 * nesting_depth(root) + 100))
+    try:
+        with np.errstate(all = 'ignore'):
+            result = code(alive.copy())
+        finished = alive.copy()
+        values: list[Value] = [None] * count
+        if result is not None:
+            values = np.broadcast_to(result, (count,)).tolist()
+        outputs: list[list[str]] = [[] for _ in range(count)]
+        for writing, value, is_bool in printed:
+            writing = writing & ~overflowed
+            texts = np.broadcast_to(value, (count,))[writing].tolist()
+            for row, text in zip(np.flatnonzero(writing).tolist(), texts):
+                outputs[row].append(('true\n' if text else 'false\n') if is_bool else f'{text}\n')
+        errors: list[str | None] = [messages[failure - 1] if failure else None for failure in failures.tolist()]
+        for row in np.flatnonzero(~finished).tolist():
+            values[row] = None
+        for row in np.flatnonzero(overflowed).tolist():
+            values[row], outputs[row], errors[row] = run_row(root, inputs[row].tolist())
+    finally:
+        sys.setrecursionlimit(limit)
+    return BatchResult(values, [''.join(output) for output in outputs], errors)
+
+def run_row(root: ast.Expression, numbers: list[int]) -> tuple[Value, list[str], str | None]:
+    """Runs the program in the interpreter with 'numbers' as its input."""
+    lines = iter(f'{number}\n' for number in numbers)
+    output: list[str] = []
+    try:
+        return compile_program(root, lambda: next(lines, ''), output.append)(), output, None
+    except (ZeroDivisionError, EOFError) as error:
+        return None, output, str(error)
+
+comparisons: dict[str, Callable[[Vector, Vector], Vector]] = {
+    '==': np.equal, '!=': np.not_equal, '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+}
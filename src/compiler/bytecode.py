@@ -0,0 +1,286 @@
+from array import array
+from dataclasses import dataclass, field
+from typing import Any
+import compiler.ast as ast
+from compiler.tokenizer import Position
+from compiler.resolver import resolve, builtin_slots
+from compiler.trampoline import Step, trampoline
+
+# Opcodes. Every instruction is two ints in Bytecode.code: the opcode and its
+# operand, which is 0 when the opcode takes none.
+PUSH_INT = 1 # push the operand
+PUSH_CONST = 2 # push constants[operand]
+PUSH_UNIT = 3
+LOAD = 4 # push slots[operand]
+STORE = 5 # pop into slots[operand]
+POP = 6
+DUP = 7
+ADD = 8
+SUB = 9
+MUL = 10
+DIV = 11
+MOD = 12
+ADD_INT = 13 # add the operand to the top of the stack
+SUB_INT = 14
+NEG = 15
+NOT = 16
+LT = 17
+LE = 18
+GT = 19
+GE = 20
+EQ = 21
+NE = 22
+JUMP = 23 # continue at instruction operand
+JUMP_IF_TRUE = 24 # pop, jump if true
+JUMP_IF_FALSE = 25
+JUMP_IF_TRUE_OR_POP = 26 # jump if the top is true, pop it otherwise
+JUMP_IF_FALSE_OR_POP = 27
+JUMP_IF_LT = 28 # pop two and compare, jump if the comparison holds
+JUMP_IF_LE = 29
+JUMP_IF_GT = 30
+JUMP_IF_GE = 31
+JUMP_IF_EQ = 32
+JUMP_IF_NE = 33
+PRINT_INT = 34 # pop and print
+PRINT_BOOL = 35
+READ_INT = 36 # push an integer read from input
+CALL = 37 # pop operand arguments and a function, push what calling it returns
+RETURN = 38 # stop with the top of the stack as the value of the program
+
+opcode_names = {value: name for name, value in globals().items() if name.isupper() and type(value) is int}
+
+comparisons = {'<': LT, '<=': LE, '>': GT, '>=': GE, '==': EQ, '!=': NE}
+arithmetic = {'+': ADD, '-': SUB, '*': MUL, '/': DIV, '%': MOD}
+# The jump taken when a comparison holds, and when it does not.
+jumps_if = {LT: JUMP_IF_LT, LE: JUMP_IF_LE, GT: JUMP_IF_GT, GE: JUMP_IF_GE, EQ: JUMP_IF_EQ, NE: JUMP_IF_NE}
+jumps_unless = {LT: JUMP_IF_GE, LE: JUMP_IF_GT, GT: JUMP_IF_LE, GE: JUMP_IF_LT, EQ: JUMP_IF_NE, NE: JUMP_IF_EQ}
+jump_opcodes = {JUMP, JUMP_IF_TRUE, JUMP_IF_FALSE, JUMP_IF_TRUE_OR_POP, JUMP_IF_FALSE_OR_POP, *jumps_if.values()}
+
+# Operands that fit in the instruction itself.
+int_min = -(1 << 31)
+int_max = (1 << 31) - 1
+
+@dataclass
+class Bytecode:
+    """A compiled program.
+
+    The variables are in one list of slots. As there are no user defined
+    functions, a block never runs twice at a time, so each variable can have
+    a slot of its own. Slots start as None, except those in 'builtins', which
+    start as the builtin of that name. Instructions that can fail have their
+    position in 'positions', by instruction index.
+    """
+    code: array = field(default_factory = lambda: array('i'))
+    constants: list[Any] = field(default_factory = list)
+    names: list[str] = field(default_factory = list) # name of the variable in each slot
+    builtins: dict[int, str] = field(default_factory = dict)
+    positions: dict[int, Position] = field(default_factory = dict)
+
+    def __len__(self) -> int:
+        """The number of instructions."""
+        return len(self.code) // 2
+
+builtin_opcodes = {"print_int": PRINT_INT, "print_bool": PRINT_BOOL, "read_int": READ_INT}
+
+def compile_bytecode(root: ast.Expression) -> Bytecode:
+    """Compiles the typechecked tree under 'root'.
+
+    Every node is compiled either for its value, which it leaves on the stack,
+    or only for its effects. Conditions of 'if' and 'while' are compiled into
+    jumps, so that comparisons, 'and', 'or' and 'not' in them push nothing.
+    """
+    resolve(root)
+    program = Bytecode()
+    code = program.code
+    slots: dict[ast.Binding, int] = {}
+
+    def slot_of(binding: ast.Binding | None, name: str) -> int:
+        assert binding is not None, "the resolver binds every variable"
+        slot = slots.get(binding)
+        if slot is None:
+            slot = slots[binding] = len(program.names)
+            program.names.append(name)
+            if binding.depth == 0 and binding.slot < len(builtin_slots):
+                program.builtins[slot] = name
+        return slot
+
+    def emit(opcode: int, operand: int = 0) -> int:
+        code.append(opcode)
+        code.append(operand)
+        return len(code) // 2 - 1
+
+    def patch(instruction: int) -> None:
+        """Makes the jump at 'instruction' go to the next instruction emitted."""
+        code[2 * instruction + 1] = len(code) // 2
+
+    def emit_int(value: int) -> None:
+        if int_min <= value <= int_max:
+            emit(PUSH_INT, value)
+        else:
+            emit(PUSH_CONST, len(program.constants))
+            program.constants.append(value)
+
+    def emit_node(node: ast.Expression, value: bool) -> Step[None] | None:
+        """Emits 'node', leaving its value on the stack if 'value' is true."""
+        match node:
+            case ast.Literal():
+                if value:
+                    if node.value is None:
+                        emit(PUSH_UNIT)
+                    elif type(node.value) is bool:
+                        emit(PUSH_CONST, len(program.constants))
+                        program.constants.append(node.value)
+                    else:
+                        emit_int(node.value)
+                return None
+            case ast.Identifier():
+                if value:
+                    emit(LOAD, slot_of(node.binding, node.name))
+                return None
+        return emit_compound(node, value)
+
+    def emit_compound(node: ast.Expression, value: bool) -> Step[None]:
+        match node:
+            case ast.UnaryOp():
+                yield emit_node(node.right, True)
+                emit(NEG if node.op == '-' else NOT)
+            case ast.BinaryOp() if node.op == '=':
+                assert isinstance(node.left, ast.Identifier)
+                yield emit_node(node.right, True)
+                if value:
+                    emit(DUP)
+                emit(STORE, slot_of(node.left.binding, node.left.name))
+                return
+            case ast.BinaryOp() if node.op in ['and', 'or']:
+                yield emit_node(node.left, True)
+                jump = emit(JUMP_IF_FALSE_OR_POP if node.op == 'and' else JUMP_IF_TRUE_OR_POP)
+                yield emit_node(node.right, True)
+                patch(jump)
+            case ast.BinaryOp():
+                yield emit_node(node.left, True)
+                right = node.right
+                if node.op in ['+', '-'] and isinstance(right, ast.Literal) and type(right.value) is int and int_min <= right.value <= int_max:
+                    emit(ADD_INT if node.op == '+' else SUB_INT, right.value)
+                else:
+                    yield emit_node(right, True)
+                    opcode = arithmetic.get(node.op) or comparisons[node.op]
+                    if opcode in [DIV, MOD]:
+                        program.positions[len(code) // 2] = node.position
+                    emit(opcode)
+            case ast.While():
+                # The condition is at the bottom, so that each round takes one jump.
+                jump = emit(JUMP)
+                body = len(code) // 2
+                yield emit_node(node.do, False)
+                patch(jump)
+                yield emit_condition(node.condition, True, body)
+                if value:
+                    emit(PUSH_UNIT)
+                return
+            case ast.If():
+                to_else = yield emit_condition(node.condition, False, -1)
+                if node.else_branch is None:
+                    yield emit_node(node.then_branch, False)
+                    for jump in to_else:
+                        patch(jump)
+                    if value:
+                        emit(PUSH_UNIT)
+                    return
+                yield emit_node(node.then_branch, value)
+                to_end = emit(JUMP)
+                for jump in to_else:
+                    patch(jump)
+                yield emit_node(node.else_branch, value)
+                patch(to_end)
+                return
+            case ast.FunctionCall():
+                builtin: int | None = None
+                if isinstance(node.name, ast.Identifier) and node.name.binding is not None:
+                    binding = node.name.binding
+                    if binding.depth == 0 and binding.slot < len(builtin_slots):
+                        # Builtins can not be replaced, as no other function has the same type.
+                        builtin = builtin_opcodes.get(node.name.name)
+                if builtin is None:
+                    yield emit_node(node.name, True)
+                for argument in node.arguments:
+                    yield emit_node(argument, True)
+                if builtin is None:
+                    emit(CALL, len(node.arguments))
+                elif builtin != READ_INT:
+                    emit(builtin)
+                    if value:
+                        emit(PUSH_UNIT)
+                    return
+                else:
+                    emit(READ_INT)
+            case ast.VariableDeclaration():
+                yield emit_node(node.value, True)
+                emit(STORE, slot_of(node.binding, node.name.name))
+                if value:
+                    emit(PUSH_UNIT)
+                return
+            case ast.Block():
+                if not node.statements:
+                    if value:
+                        emit(PUSH_UNIT)
+                    return
+                for statement in node.statements[:-1]:
+                    yield emit_node(statement, False)
+                yield emit_node(node.statements[-1], value)
+                return
+            case _:
+                raise Exception(f'{node.position}: Can not compile {type(node).__name__}')
+        # The node left its value on the stack.
+        if not value:
+            emit(POP)
+
+    def emit_condition(node: ast.Expression, when: bool, target: int) -> Step[list[int]]:
+        """Emits a jump to 'target' that is taken if 'node' is 'when'.
+        Returns the jumps emitted, to be patched if the target is not known yet."""
+        match node:
+            case ast.UnaryOp() if node.op == 'not':
+                return (yield emit_condition(node.right, not when, target))
+            case ast.BinaryOp() if node.op in ['and', 'or']:
+                if (node.op == 'and') == when:
+                    # Both have to be 'when' to jump: if the left side is not, skip the right side.
+                    skips = yield emit_condition(node.left, not when, -1)
+                    jumps = yield emit_condition(node.right, when, target)
+                    for skip in skips:
+                        patch(skip)
+                    return jumps
+                # Either one being 'when' is enough.
+                jumps = yield emit_condition(node.left, when, target)
+                return jumps + (yield emit_condition(node.right, when, target))
+            case ast.BinaryOp() if node.op in comparisons:
+                yield emit_node(node.left, True)
+                yield emit_node(node.right, True)
+                opcode = comparisons[node.op]
+                return [emit((jumps_if if when else jumps_unless)[opcode], target)]
+            case ast.Literal() if type(node.value) is bool:
+                return [emit(JUMP, target)] if node.value == when else []
+        yield emit_node(node, True)
+        return [emit(JUMP_IF_TRUE if when else JUMP_IF_FALSE, target)]
+
+    trampoline(emit_node(root, True))
+    emit(RETURN)
+    return program
+
+def disassemble(program: Bytecode) -> str:
+    """One instruction per line, with jump targets marked and slots named."""
+    code = program.code
+    targets = {code[i + 1] for i in range(0, len(code), 2) if code[i] in jump_opcodes}
+    lines = []
+    for instruction in range(len(program)):
+        opcode, operand = code[2 * instruction], code[2 * instruction + 1]
+        name = opcode_names[opcode]
+        line = f'{">>" if instruction in targets else "":>2} {instruction:>5} {name:<20}'
+        if opcode in [LOAD, STORE]:
+            line += f' {operand} ({program.names[operand]})'
+        elif opcode == PUSH_CONST:
+            line += f' {operand} ({program.constants[operand]!r})'
+        elif opcode in jump_opcodes:
+            line += f' -> {operand}'
+        elif opcode in [PUSH_INT, ADD_INT, SUB_INT, CALL]:
+            line += f' {operand}'
+        lines.append(line.rstrip())
+    return "\n".join(lines)
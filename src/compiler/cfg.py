@@ -0,0 +1,205 @@
+import copy
+from dataclasses import dataclass, field
+from compiler.ir import IRVar, Instruction, Label, Jump, CondJump, Return, Phi, destination, sources
+
+@dataclass
+class BasicBlock:
+    """Instructions that run one after another. Only the last one jumps or
+    returns, and the label of the block is the only one jumped to."""
+    label: str
+    instructions: list[Instruction] = field(default_factory = list) # without the label
+    successors: list[str] = field(default_factory = list)
+    predecessors: list[str] = field(default_factory = list)
+
+    def phis(self) -> list[Phi]:
+        """The phis at the start of the block."""
+        found = []
+        for instruction in self.instructions:
+            if not isinstance(instruction, Phi):
+                break
+            found.append(instruction)
+        return found
+
+@dataclass
+class ControlFlowGraph:
+    entry: str
+    blocks: dict[str, BasicBlock] # in the order they are laid out in
+
+    def instruction_count(self) -> int:
+        """The number of instructions, labels not included."""
+        return sum(len(block.instructions) for block in self.blocks.values())
+
+entry_label = 'entry'
+
+def successor_labels(instruction: Instruction) -> list[str]:
+    match instruction:
+        case Jump():
+            return [instruction.label]
+        case CondJump():
+            return [instruction.then_label] if instruction.then_label == instruction.else_label else [instruction.then_label, instruction.else_label]
+    return []
+
+def build_cfg(instructions: list[Instruction]) -> ControlFlowGraph:
+    """Splits a copy of IR into basic blocks. A block that would fall through to
+    the next one gets a jump to it, and blocks that no label leads to are left
+    out, as they can not run. The first block is 'entry', which nothing jumps to."""
+    blocks: dict[str, BasicBlock] = {entry_label: BasicBlock(entry_label)}
+    block: BasicBlock | None = blocks[entry_label]
+    for instruction in instructions:
+        if isinstance(instruction, Label):
+            following = blocks[instruction.name] = BasicBlock(instruction.name)
+            if block is not None:
+                block.instructions.append(Jump(instruction.name, position = instruction.position))
+            block = following
+        elif block is not None:
+            block.instructions.append(copy.copy(instruction))
+            if isinstance(instruction, (Jump, CondJump, Return)):
+                block = None
+    if block is not None:
+        raise Exception('The IR does not end in a jump or a return')
+    for block in blocks.values():
+        block.successors = successor_labels(block.instructions[-1])
+        for successor in block.successors:
+            blocks[successor].predecessors.append(block.label)
+    return ControlFlowGraph(entry_label, blocks)
+
+def linearize(cfg: ControlFlowGraph) -> list[Instruction]:
+    """The blocks back in a list. Jumps to the block right after are left out,
+    and so are labels that nothing jumps to."""
+    targets = {label for block in cfg.blocks.values() for label in block.successors}
+    instructions: list[Instruction] = []
+    order = list(cfg.blocks)
+    for index, label in enumerate(order):
+        block = cfg.blocks[label]
+        if label in targets:
+            instructions.append(Label(label))
+        following = order[index + 1] if index + 1 < len(order) else None
+        last = block.instructions[-1]
+        instructions.extend(block.instructions[:-1])
+        if not (isinstance(last, Jump) and last.label == following):
+            instructions.append(last)
+    return instructions
+
+def reverse_postorder(cfg: ControlFlowGraph) -> list[str]:
+    """The blocks reachable from the entry, each one before its successors
+    except along loops."""
+    order: list[str] = []
+    visited = {cfg.entry}
+    stack = [(cfg.entry, iter(cfg.blocks[cfg.entry].successors))]
+    while stack:
+        label, successors = stack[-1]
+        for successor in successors:
+            if successor not in visited:
+                visited.add(successor)
+                stack.append((successor, iter(cfg.blocks[successor].successors)))
+                break
+        else:
+            stack.pop()
+            order.append(label)
+    order.reverse()
+    return order
+
+def remove_unreachable(cfg: ControlFlowGraph) -> None:
+    """Removes the blocks the entry does not lead to."""
+    reachable = set(reverse_postorder(cfg))
+    for label in [label for label in cfg.blocks if label not in reachable]:
+        del cfg.blocks[label]
+    for block in cfg.blocks.values():
+        block.predecessors = [label for label in block.predecessors if label in reachable]
+
+def immediate_dominators(cfg: ControlFlowGraph) -> dict[str, str]:
+    """The immediate dominator of each reachable block. The entry is its own.
+
+    This is the iterative algorithm of Cooper, Harvey and Kennedy: "A Simple,
+    Fast Dominance Algorithm".
+    """
+    order = reverse_postorder(cfg)
+    index = {label: number for number, label in enumerate(order)}
+    idom = {cfg.entry: cfg.entry}
+
+    def intersect(first: str, second: str) -> str:
+        while first != second:
+            while index[first] > index[second]:
+                first = idom[first]
+            while index[second] > index[first]:
+                second = idom[second]
+        return first
+
+    changed = True
+    while changed:
+        changed = False
+        for label in order[1:]:
+            new: str | None = None
+            for predecessor in cfg.blocks[label].predecessors:
+                if predecessor in idom:
+                    new = predecessor if new is None else intersect(predecessor, new)
+            assert new is not None, "a block after the entry in reverse postorder has a processed predecessor"
+            if idom.get(label) != new:
+                idom[label] = new
+                changed = True
+    return idom
+
+def dominator_tree(idom: dict[str, str]) -> dict[str, list[str]]:
+    """The blocks each block immediately dominates."""
+    children: dict[str, list[str]] = {label: [] for label in idom}
+    for label, parent in idom.items():
+        if label != parent:
+            children[parent].append(label)
+    return children
+
+def dominance_frontiers(cfg: ControlFlowGraph, idom: dict[str, str]) -> dict[str, set[str]]:
+    """The blocks where the dominance of each block ends: those it does not strictly
+    dominate but dominates a predecessor of."""
+    frontiers: dict[str, set[str]] = {label: set() for label in idom}
+    for label in idom:
+        predecessors = [predecessor for predecessor in cfg.blocks[label].predecessors if predecessor in idom]
+        if len(predecessors) < 2:
+            continue
+        for predecessor in predecessors:
+            runner = predecessor
+            while runner != idom[label]:
+                frontiers[runner].add(label)
+                runner = idom[runner]
+    return frontiers
+
+def liveness(cfg: ControlFlowGraph) -> tuple[dict[str, set[IRVar]], dict[str, set[IRVar]]]:
+    """The variables live at the start and at the end of each block. The
+    arguments of a phi are used at the end of the block they come from."""
+    uses: dict[str, set[IRVar]] = {}
+    definitions: dict[str, set[IRVar]] = {}
+    phi_uses: dict[str, set[IRVar]] = {label: set() for label in cfg.blocks}
+    for block in cfg.blocks.values():
+        used: set[IRVar] = set()
+        defined: set[IRVar] = set()
+        for instruction in block.instructions:
+            if isinstance(instruction, Phi):
+                for predecessor, source in instruction.sources:
+                    phi_uses[predecessor].add(source)
+            else:
+                used.update(source for source in sources(instruction) if source not in defined)
+            written = destination(instruction)
+            if written is not None:
+                defined.add(written)
+        uses[block.label] = used
+        definitions[block.label] = defined
+    live_in: dict[str, set[IRVar]] = {label: set() for label in cfg.blocks}
+    live_out: dict[str, set[IRVar]] = {label: set() for label in cfg.blocks}
+    # Backwards: a block is done after its successors, except around loops.
+    worklist = list(cfg.blocks)
+    pending = set(worklist)
+    while worklist:
+        label = worklist.pop()
+        pending.discard(label)
+        block = cfg.blocks[label]
+        out = set(phi_uses[label])
+        for successor in block.successors:
+            out |= live_in[successor]
+        live_out[label] = out
+        new_in = uses[label] | (out - definitions[label])
+        if new_in != live_in[label]:
+            live_in[label] = new_in
+            for predecessor in block.predecessors:
+                if predecessor not in pending:
+                    pending.add(predecessor)
+                    worklist.append(predecessor)
+    return live_in, live_out
@@ -0,0 +1,155 @@
+import heapq
+from dataclasses import dataclass
+from compiler.ast_cfg import ControlFlowGraph, reverse_postorder
+
+# Sets are Python integers with a bit for each member, so that union,
+# intersection and difference of whole sets are single operations. The
+# difference is '(a | b) ^ b', as Python handles 'a & ~b' as negative numbers
+# in two's complement, which takes several times longer.
+Bits = int
+
+@dataclass
+class Problem:
+    """A dataflow problem where each block changes the set flowing through it
+    by 'after = gen | (before & ~kill)'. Forward problems flow from the start
+    of a block to its end and from its predecessors, backward ones the other way.
+
+    The sets flowing into a block are joined by union when 'may' is set, and by
+    intersection otherwise. 'boundary' flows into the entry, or into the exit
+    when backward. When joining by intersection, the other blocks start from
+    'universe', the set of everything.
+    """
+    forward: bool
+    may: bool
+    gen: list[Bits]
+    kill: list[Bits]
+    boundary: Bits = 0
+    universe: Bits = 0
+
+def solve(cfg: ControlFlowGraph, problem: Problem) -> tuple[list[Bits], list[Bits]]:
+    """The sets at the start and at the end of each block that solve 'problem'
+    on 'cfg': the smallest ones when joining by union, the largest otherwise.
+
+    Blocks wait on a worklist, and the first one in reverse postorder, or in
+    postorder when backward, goes first, so that most blocks come after the
+    blocks flowing into them. A block goes back on the list when a set flowing
+    into it changes.
+    """
+    count = len(cfg.blocks)
+    if problem.forward:
+        sources = [block.predecessors for block in cfg.blocks]
+        targets = [block.successors for block in cfg.blocks]
+        start = cfg.entry
+    else:
+        sources = [block.successors for block in cfg.blocks]
+        targets = [block.predecessors for block in cfg.blocks]
+        start = cfg.exit
+    gen, kill, may, boundary = problem.gen, problem.kill, problem.may, problem.boundary
+    initial = 0 if may else problem.universe
+    before = [initial] * count # flowing in
+    after = [initial] * count # flowing out
+    order = reverse_postorder(cfg)
+    if not problem.forward:
+        order.reverse()
+    # Blocks the entry does not reach run too, after the others.
+    rank = [-1] * count
+    for position, index in enumerate(order):
+        rank[index] = position
+    order.extend(index for index in range(count) if rank[index] < 0)
+    for position, index in enumerate(order):
+        rank[index] = position
+    # By their place in the order, so that a loop is done again before
+    # what comes after it.
+    worklist = list(range(count))
+    waiting = bytearray(b'\x01') * count
+    while worklist:
+        index = order[heapq.heappop(worklist)]
+        waiting[index] = 0
+        inputs = sources[index]
+        if index == start:
+            value = boundary
+        elif not inputs:
+            value = initial
+        elif may:
+            value = 0
+            for source in inputs:
+                value |= after[source]
+        else:
+            value = after[inputs[0]]
+            for source in inputs:
+                value &= after[source]
+        before[index] = value
+        killed = kill[index]
+        value = gen[index] | ((value | killed) ^ killed)
+        if value != after[index]:
+            after[index] = value
+            for target in targets[index]:
+                if not waiting[target]:
+                    waiting[target] = 1
+                    heapq.heappush(worklist, rank[target])
+    if problem.forward:
+        return before, after
+    return after, before
+
+def members(bits: Bits) -> list[int]:
+    """The members of a set, from the smallest."""
+    found = []
+    while bits:
+        lowest = bits & -bits
+        found.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return found
+
+def liveness(cfg: ControlFlowGraph) -> tuple[list[Bits], list[Bits]]:
+    """The variables live at the start and at the end of each block: those
+    that some path from there reads before defining them again."""
+    gen = []
+    kill = []
+    for block in cfg.blocks:
+        used = defined = 0
+        for node in reversed(block.nodes):
+            variable = cfg.variable_of.get(id(node))
+            if variable is None:
+                continue
+            bit = 1 << variable
+            if id(node) in cfg.definition_of:
+                used &= ~bit
+                defined |= bit
+            else:
+                used |= bit
+        gen.append(used)
+        kill.append(defined)
+    return solve(cfg, Problem(forward = False, may = True, gen = gen, kill = kill))
+
+def reaching_definitions(cfg: ControlFlowGraph) -> tuple[list[Bits], list[Bits]]:
+    """The definitions that reach the start and the end of each block: those
+    after which some path gets there without defining their variable again."""
+    of_variable = [0] * len(cfg.variables)
+    for index, node in enumerate(cfg.definitions):
+        of_variable[cfg.variable_of[id(node)]] |= 1 << index
+    gen = []
+    kill = []
+    for block in cfg.blocks:
+        reaching = killed = 0
+        for node in block.nodes:
+            definition = cfg.definition_of.get(id(node))
+            if definition is not None:
+                others = of_variable[cfg.variable_of[id(node)]]
+                reaching = ((reaching | others) ^ others) | 1 << definition
+                killed |= others
+        gen.append(reaching)
+        kill.append(killed)
+    return solve(cfg, Problem(forward = True, may = True, gen = gen, kill = kill))
+
+def definite_assignment(cfg: ControlFlowGraph) -> tuple[list[Bits], list[Bits]]:
+    """The variables that every path from the entry to the start and to the
+    end of each block defines."""
+    gen = []
+    for block in cfg.blocks:
+        defined = 0
+        for node in block.nodes:
+            if id(node) in cfg.definition_of:
+                defined |= 1 << cfg.variable_of[id(node)]
+        gen.append(defined)
+    universe = (1 << len(cfg.variables)) - 1
+    return solve(cfg, Problem(forward = True, may = False, gen = gen, kill = [0] * len(gen), universe = universe))
@@ -0,0 +1,158 @@
+from copy import deepcopy
+from dataclasses import dataclass
+from typing import Any
+import compiler.ast as ast
+from compiler.tokenizer import Position
+from compiler.types import Type
+from compiler.symbol_table import Scopes
+from compiler.trampoline import Step, trampoline
+from compiler.type_checker import typecheck, typecheck_step, typecheck_compound
+
+@dataclass
+class InternedTree:
+    """A tree whose structurally identical subtrees are one shared node.
+
+    Shared nodes keep the position of their first occurrence. The position of
+    every occurrence is in 'positions', in post-order (children first, left to right),
+    so that 'expand' can make the original tree again.
+    
+    'reused' maps the id of each shared node that occurs more than once, and whose
+    type depends only on the types of the variables it uses from outside, to the
+    names of those variables. Nodes that declare a variable in the enclosing scope
+    are left out. Closed nodes, which use no variables, map to ().
+    """
+    root: ast.Expression
+    positions: list[Position]
+    reused: dict[int, tuple[str, ...]]
+    nodes: int # number of distinct nodes
+
+def with_children(node: ast.Expression, children: list[Any], position: Position) -> ast.Expression:
+    """A copy of 'node' with other children, in the order 'ast.children' gives them."""
+    match node:
+        case ast.Literal():
+            return ast.Literal(node.value, position = position)
+        case ast.Identifier():
+            return ast.Identifier(node.name, position = position)
+        case ast.UnaryOp():
+            return ast.UnaryOp(node.op, children[0], position = position)
+        case ast.BinaryOp():
+            return ast.BinaryOp(children[0], node.op, children[1], position = position)
+        case ast.While():
+            return ast.While(children[0], children[1], position = position)
+        case ast.If():
+            return ast.If(children[0], children[1], children[2] if len(children) > 2 else None, position = position)
+        case ast.FunctionCall():
+            return ast.FunctionCall(children[0], children[1:], position = position)
+        case ast.VariableDeclaration():
+            return ast.VariableDeclaration(children[0], children[1] if len(children) > 2 else None, children[-1], position = position)
+        case ast.Block():
+            return ast.Block(children, position = position)
+    raise TypeError(f'Unknown node {type(node).__name__}')
+
+def post_order(root: ast.Expression) -> list[ast.Expression]:
+    """Every occurrence of every node under 'root', children first."""
+    # Parents before children, last child first: reversed, this is post-order.
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack += ast.children(node)
+    order.reverse()
+    return order
+
+no_names: frozenset[str] = frozenset()
+
+def intern_tree(root: ast.Expression) -> InternedTree:
+    """Shares the structurally identical subtrees of the tree under 'root'."""
+    nodes = post_order(root)
+    table: dict[tuple, ast.Expression] = {} # structure -> shared node
+    shared: dict[int, ast.Expression] = {} # id of a node in the tree -> its shared node
+    # For each shared node: the variables it uses from outside, and whether it declares a variable in the enclosing scope.
+    free: dict[int, frozenset[str]] = {}
+    declares: dict[int, bool] = {}
+    occurrences: dict[int, int] = {} # id of a shared compound node -> number of occurrences
+    for node in nodes:
+        children = [shared[id(child)] for child in ast.children(node)]
+        child_ids = tuple(id(child) for child in children)
+        match node:
+            case ast.Literal():
+                key: tuple = (ast.Literal, type(node.value), node.value)
+            case ast.Identifier():
+                key = (ast.Identifier, node.name)
+            case ast.UnaryOp() | ast.BinaryOp():
+                key = (type(node), node.op, child_ids)
+            case _:
+                key = (type(node), child_ids)
+        found = table.get(key)
+        if found is None:
+            found = table[key] = with_children(node, children, node.position)
+            found_id = id(found)
+            match node:
+                case ast.Identifier():
+                    free[found_id] = frozenset([node.name])
+                    declares[found_id] = False
+                case ast.VariableDeclaration():
+                    free[found_id] = free[id(children[-1])]
+                    declares[found_id] = True
+                case ast.Block():
+                    names: set[str] = set()
+                    declared: set[str] = set()
+                    for statement in children:
+                        names |= free[id(statement)] - declared
+                        if isinstance(statement, ast.VariableDeclaration):
+                            declared.add(statement.name.name)
+                    free[found_id] = frozenset(names) if names else no_names
+                    declares[found_id] = False
+                case _:
+                    used = [free[id(child)] for child in children if free[id(child)]]
+                    free[found_id] = used[0].union(*used[1:]) if used else no_names
+                    declares[found_id] = any(declares[id(child)] for child in children)
+            if children and not declares[found_id]:
+                occurrences[found_id] = 0
+        if id(found) in occurrences:
+            occurrences[id(found)] += 1
+        shared[id(node)] = found
+    reused = {node: tuple(sorted(free[node])) for node, count in occurrences.items() if count > 1}
+    return InternedTree(shared[id(root)], [node.position for node in nodes], reused, len(table))
+
+def expand(tree: InternedTree) -> ast.Expression:
+    """Makes the original tree again, with every node at its own position."""
+    stack: list[ast.Expression] = []
+    for node, position in zip(post_order(tree.root), tree.positions):
+        count = len(ast.children(node))
+        children = stack[len(stack) - count:]
+        del stack[len(stack) - count:]
+        stack.append(with_children(node, children, position))
+    return stack[0]
+
+def typecheck_interned(tree: InternedTree, sym_table: Scopes) -> list[Type] | Type:
+    """Like 'typecheck' on the original tree, but checks each reused node only once
+    for each combination of types of the variables it uses. A shared node records
+    the type of whichever of its occurrences was checked last."""
+    snapshot = deepcopy(sym_table)
+    memo: dict[tuple, list[Type] | Type] = {}
+    reused = tree.reused
+    lookup = sym_table.lookup
+
+    def step(node: ast.Expression, sym_table: Scopes) -> Any:
+        names = reused.get(id(node))
+        if names is None:
+            if type(node) is ast.Literal or type(node) is ast.Identifier:
+                return typecheck_step(node, sym_table)
+            return typecheck_compound(node, sym_table, step)
+        key = (id(node), *[tuple(lookup(name) or ()) for name in names])
+        found = memo.get(key)
+        return found if found is not None else memoized(key, node, sym_table)
+
+    def memoized(key: tuple, node: ast.Expression, sym_table: Scopes) -> Step[list[Type] | Type]:
+        memo[key] = node_type = yield typecheck_compound(node, sym_table, step)
+        return node_type
+
+    try:
+        return trampoline(step(tree.root, sym_table))
+    except Exception:
+        pass
+    # Shared nodes have the position of their first occurrence, so the error is
+    # found again in the original tree to report it at the right position.
+    return typecheck(expand(tree), snapshot)
@@ -0,0 +1,514 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Any
+import compiler.ast as ast
+from compiler.tokenizer import Position, TokenStream, PUNCTUATION, tokenize_stream, tokenize_chunk
+from compiler.parser import START, TreeBuilder, parse_with
+from compiler.type_checker import typecheck, typecheck_step, typecheck_compound
+from compiler.symbol_table import Scopes, SymbolTable
+from compiler.trampoline import trampoline
+from compiler.types import Type, Unit
+
+@dataclass
+class StatementSpans:
+    """Where the statements of a block are in the source code, as offsets from
+    the '{' of the block, or from the start of the file for the top level:
+    the first character of each statement, the one after its last character,
+    and the '}' or the end of the file. 'blocks' has the blocks of each
+    statement that are not inside another of its blocks."""
+    starts: list[int]
+    ends: list[int]
+    end: int
+    blocks: list[list[ast.Block]]
+
+class IncrementalBuilder(TreeBuilder):
+    """A TreeBuilder that keeps the block it builds around several top-level statements."""
+
+    def __init__(self, stream: TokenStream) -> None:
+        super().__init__(stream)
+        self.top_level: ast.Block | None = None
+
+    def block(self, statements: list[ast.Expression], token: int) -> ast.Expression:
+        node = ast.Block(statements = statements, position = self.position(token))
+        if token == START:
+            self.top_level = node
+        return node
+
+def parse_keeping_top_level(stream: TokenStream) -> tuple[ast.Expression, ast.Block | None]:
+    """What 'parse' returns, and the block around the top-level statements, if it made one."""
+    builders: list[IncrementalBuilder] = []
+
+    def make_builder(stream: TokenStream) -> IncrementalBuilder:
+        builders.append(IncrementalBuilder(stream))
+        return builders[-1]
+
+    root = parse_with(stream, make_builder)
+    return root, builders[0].top_level
+
+class Document:
+    """Source code that stays tokenized, parsed and typechecked as it is edited.
+
+    'root' is the typechecked tree that 'parse' and 'typecheck' make from
+    'text', or None when they raise, and then 'error' is what they raise.
+
+    An edit only tokenizes the lines it is on, and parses again the statements
+    it touches in the innermost block around it. The other statements keep
+    their nodes. Those statements are typechecked in the scope they are in,
+    the statements after them only if they declare something else than before,
+    and the blocks around them only if the type of their block changes.
+
+    After a syntax error the tree stays as it was, and the next edit parses the
+    damage of both edits. After a type error in the new statements, the next
+    edit goes on as usual if it replaces them, and other type errors make it
+    typecheck everything.
+    """
+
+    def __init__(self, source_code: str) -> None:
+        self.text = source_code
+        self.root: ast.Expression | None = None
+        self.error: Exception | None = None
+        # The tree is of 'parsed_text', the last text that parsed. The edits
+        # since make up one damaged region: where it starts, where it ends in
+        # 'parsed_text' and where it ends in 'text'.
+        self.parsed_text = ''
+        self.line_starts: list[int] = [0]
+        self.top_statements: list[ast.Expression] = [] # at the top level
+        self.top_level: ast.Block | None = None # around the statements when there is not exactly one
+        self.top_spans: StatementSpans | None = None # None when there are no tokens
+        self.block_spans: dict[int, StatementSpans] = {} # by the 'id' of each block
+        self.typed = False
+        # The statements a type error stopped in, the only nodes with wrong types.
+        self.unchecked: list[ast.Expression] | None = None
+        self.damage: tuple[int, int, int] | None = None
+        self.rebuild()
+
+    def edit(self, offset: int, deleted: int, inserted: str) -> None:
+        """Replaces 'deleted' characters at 'offset' with 'inserted'."""
+        if offset < 0 or deleted < 0 or offset + deleted > len(self.text):
+            raise ValueError(f'Can not delete {deleted} characters at {offset} of {len(self.text)}')
+        self.text = self.text[:offset] + inserted + self.text[offset + deleted:]
+        end = offset + deleted
+        if self.damage is None:
+            self.damage = (offset, end, offset + len(inserted))
+        else:
+            start, old_end, new_end = self.damage
+            if end > new_end: # past the damage, where the text is as parsed but moved
+                old_end = end - (new_end - old_end)
+            self.damage = (min(start, offset), old_end, max(new_end, end) + len(inserted) - deleted)
+        if self.top_spans is None:
+            self.rebuild()
+        else:
+            self.update()
+
+    def tree(self) -> ast.Expression:
+        return self.top_level if self.top_level is not None else self.top_statements[0]
+
+    def statements_of(self, block: ast.Block | None) -> list[ast.Expression]:
+        return self.top_statements if block is None else block.statements
+
+    def fail(self, error: Exception) -> None:
+        self.root = None
+        self.error = error
+
+    def typecheck_all(self) -> None:
+        root = self.tree()
+        self.unchecked = None
+        try:
+            typecheck(root, SymbolTable())
+        except Exception as error:
+            self.typed = False
+            self.fail(error)
+            return
+        self.typed = True
+        self.root = root
+        self.error = None
+
+    def rebuild(self) -> None:
+        """Tokenizes, parses and typechecks all of 'text'."""
+        try:
+            stream = tokenize_stream(self.text)
+            root, top_level = parse_keeping_top_level(stream)
+        except SyntaxError as error:
+            self.fail(error)
+            return
+        self.parsed_text = self.text
+        self.line_starts = list(stream.line_starts)
+        self.damage = None
+        self.block_spans = {}
+        self.top_level = top_level
+        self.top_statements = top_level.statements if top_level is not None else [root]
+        if len(stream) == 0:
+            self.top_spans = None
+        else:
+            self.top_spans = self.index_statements(stream, self.top_statements, 0, len(stream) - 1, 0, len(self.text))
+        self.typecheck_all()
+
+    def index_statements(self, stream: TokenStream, statements: list[ast.Expression], first: int, last: int, origin: int, end: int) -> StatementSpans:
+        """The spans of 'statements', which are the tokens of 'stream' from 'first'
+        to 'last', from 'origin'. The spans of the blocks in them go to 'block_spans'."""
+        closes = match_braces(stream)
+        source_code = stream.source_code
+        top = StatementSpans([], [], end, [])
+        pending = [(statements, first, last, origin, top)]
+        while pending:
+            statements, first, last, origin, spans = pending.pop()
+            firsts = [first_token(stream, statement, first) for statement in statements]
+            for index, statement in enumerate(statements):
+                final = last
+                if index + 1 < len(statements):
+                    final = firsts[index + 1] - 1
+                    if stream.kinds[final] == PUNCTUATION and source_code[stream.starts[final]] == ';':
+                        final -= 1
+                spans.starts.append(stream.starts[firsts[index]] - origin)
+                spans.ends.append(stream.starts[final] + stream.lengths[final] - origin)
+                blocks = []
+                stack = [statement]
+                while stack:
+                    node = stack.pop()
+                    if isinstance(node, ast.Block):
+                        blocks.append(node)
+                        opening = token_at(stream, node.position)
+                        closing = closes[opening]
+                        inner = StatementSpans([], [], stream.starts[closing] - stream.starts[opening], [])
+                        self.block_spans[id(node)] = inner
+                        pending.append((node.statements, opening + 1, closing - 1, stream.starts[opening], inner))
+                    else:
+                        stack.extend(reversed(ast.children(node)))
+                spans.blocks.append(blocks)
+        return top
+
+    def update(self) -> None:
+        """Parses and typechecks the damaged region again, and what depends on it."""
+        assert self.top_spans is not None and self.damage is not None
+        start, old_end, new_end = self.damage
+        delta = new_end - old_end
+        text = self.text
+        old_line_starts = self.line_starts
+        line_starts = edit_line_starts(old_line_starts, text, start, old_end, new_end)
+
+        # Down to the innermost block whose braces are around the damage and
+        # where it is inside one statement, or touches several.
+        path: list[tuple[ast.Block | None, int, StatementSpans, int]] = []
+        block: ast.Block | None = None
+        spans = self.top_spans
+        origin = 0 # of the block in the parsed text
+        while True:
+            count = len(spans.starts)
+            # From the statement the damage starts in or after, as what follows
+            # it may change, to the one it ends in or before.
+            touching = bisect_left(spans.ends, start - origin)
+            lo = max(min(touching, bisect_right(spans.starts, start - origin) - 1), 0)
+            hi = min(max(touching, bisect_right(spans.starts, old_end - origin) - 1), count - 1)
+            if lo != hi:
+                break
+            for nested in spans.blocks[lo]:
+                nested_spans = self.block_spans[id(nested)]
+                opening = old_line_starts[nested.position.line - 1] + nested.position.column - 1
+                if opening < start and old_end <= opening + nested_spans.end:
+                    path.append((block, lo, spans, origin))
+                    block, spans, origin = nested, nested_spans, opening
+                    break
+            else:
+                break
+
+        # The statements from 'lo' to 'hi' parse on their own if a ';' is
+        # around them, or an end of their block. Otherwise a statement that
+        # ends with '}' may go on with them, as with 'else', '(' or '+'.
+        statements = self.statements_of(block)
+        count = len(statements)
+        closing = None if block is None else (PUNCTUATION, origin + spans.end + delta)
+        to_end = count == 0
+        try:
+            while True:
+                region_start = min(origin + spans.starts[lo], start) if count else origin + 1
+                region_end = origin + spans.end if to_end else max(origin + spans.ends[hi], old_end)
+                following = token_after(text, line_starts, region_end + delta)
+                semicolon = following is not None and following[0] == PUNCTUATION and text[following[1]] == ';'
+                if hi < count - 1 and not semicolon:
+                    hi += 1
+                    continue
+                if hi == count - 1 and following != closing:
+                    # The damage made a comment end or go on past the last statement.
+                    if to_end:
+                        self.rebuild()
+                        return
+                    to_end = True
+                    continue
+                if lo > 0:
+                    gap_kinds, gap_starts, _ = tokens_between(text, line_starts, origin + spans.ends[lo - 1], region_start)
+                    if not any(kind == PUNCTUATION and text[gap_start] == ';' for kind, gap_start in zip(gap_kinds, gap_starts)):
+                        lo -= 1
+                        continue
+                kinds, starts, lengths = tokens_between(text, line_starts, region_start, region_end + delta)
+                break
+        except SyntaxError:
+            self.rebuild()
+            return
+        # The parser stops at the same tokens on its own as inside the file
+        # unless the braces do not match, or the statements are all deleted
+        # and a ';' before them ends the block.
+        depth = 0
+        for kind, token_start in zip(kinds, starts):
+            if kind == PUNCTUATION and text[token_start] in '{}':
+                depth += 1 if text[token_start] == '{' else -1
+                if depth < 0:
+                    break
+        if depth != 0 or not kinds and not semicolon and (lo > 0 or block is None):
+            self.rebuild()
+            return
+
+        stream = TokenStream(text)
+        stream.line_starts = array('I', line_starts)
+        if block is not None:
+            append_token(stream, PUNCTUATION, origin, 1)
+        stream.kinds.extend(kinds)
+        stream.starts.extend(starts)
+        stream.lengths.extend(lengths)
+        if semicolon:
+            assert following is not None
+            append_token(stream, PUNCTUATION, following[1], 1)
+        if block is not None:
+            append_token(stream, PUNCTUATION, origin + spans.end + delta, 1)
+        try:
+            result, top_level = parse_keeping_top_level(stream)
+        except SyntaxError as error:
+            self.fail(error)
+            return
+        if block is not None:
+            assert isinstance(result, ast.Block) and top_level is None
+            new_statements = result.statements
+        else:
+            new_statements = top_level.statements if top_level is not None else [result]
+        if semicolon:
+            new_statements.pop() # the unit after the ';', which another statement follows instead
+        last = len(stream) - (2 if block is not None else 1) - (1 if semicolon else 0)
+        new_spans = self.index_statements(stream, new_statements, 1 if block is not None else 0, last, origin, 0)
+
+        old_statements = statements[lo:hi + 1]
+        old_declarations = declarations(old_statements)
+        old_types = [self.type_of(container) for container, _, _, _ in path] + [self.type_of(block)]
+        old_path_declarations = [declarations(self.statements_of(container)[index:index + 1]) for container, index, _, _ in path]
+        self.move_positions(path, block, spans, origin, hi + 1, region_end, region_end + delta, line_starts)
+
+        removed = [nested for blocks in spans.blocks[lo:hi + 1] for nested in blocks]
+        while removed:
+            removed.extend(nested for blocks in self.block_spans.pop(id(removed.pop())).blocks for nested in blocks)
+        statements[lo:hi + 1] = new_statements
+        after = lo + len(new_statements)
+        spans.starts[lo:hi + 1] = new_spans.starts
+        spans.ends[lo:hi + 1] = new_spans.ends
+        spans.blocks[lo:hi + 1] = new_spans.blocks
+        if delta:
+            spans.starts[after:] = [each + delta for each in spans.starts[after:]]
+            spans.ends[after:] = [each + delta for each in spans.ends[after:]]
+            spans.end += delta
+            for _, index, outer_spans, _ in path:
+                outer_spans.ends[index] += delta
+                outer_spans.starts[index + 1:] = [each + delta for each in outer_spans.starts[index + 1:]]
+                outer_spans.ends[index + 1:] = [each + delta for each in outer_spans.ends[index + 1:]]
+                outer_spans.end += delta
+        self.parsed_text = text
+        self.line_starts = line_starts
+        self.damage = None
+
+        # Typechecking depends on the top level being a block or not.
+        if block is None and (len(statements) == 1) != (self.top_level is None):
+            self.top_level = None if len(statements) == 1 else ast.Block(statements = statements, position = Position(1, 1))
+            self.typed = False
+        declared: list[list[tuple[str, Any]] | None] = [*old_path_declarations, old_declarations]
+        if self.unchecked is not None:
+            # What the statements after were typechecked with is not known.
+            replaced = {id(statement) for statement in old_statements}
+            if any(id(statement) not in replaced for statement in self.unchecked):
+                self.typed = False
+            declared[-1] = None
+            self.unchecked = None
+        if not self.typed:
+            self.typecheck_all()
+            return
+        levels = [(container, index) for container, index, _, _ in path] + [(block, lo)]
+        try:
+            self.typecheck_from(levels, len(new_statements), declared, old_types)
+        except Exception as error:
+            if self.unchecked is None:
+                self.typed = False
+            self.fail(error)
+            return
+        self.root = self.tree()
+        self.error = None
+
+    def type_of(self, block: ast.Block | None) -> list[Type] | Type | None:
+        return self.tree().type if block is None else block.type
+
+    def move_positions(self, path: list[tuple[ast.Block | None, int, StatementSpans, int]], block: ast.Block | None, spans: StatementSpans, origin: int, after: int, old_end: int, new_end: int, line_starts: list[int]) -> None:
+        """Moves the nodes after the damaged region, which ends at 'old_end' in the
+        parsed text and at 'new_end' in the new one, before the region is replaced."""
+        old_line_starts = self.line_starts
+        old_line = bisect_right(old_line_starts, old_end)
+        old_column = old_end - old_line_starts[old_line - 1] + 1
+        new_line = bisect_right(line_starts, new_end)
+        new_column = new_end - line_starts[new_line - 1] + 1
+        lines = new_line - old_line
+        # When no lines are added or removed, only what is on the last line of the region moves.
+        next_line_start = old_line_starts[old_line] if old_line < len(old_line_starts) else len(self.parsed_text) + 1
+
+        def move(node: ast.Expression, skip: ast.Expression | None = None) -> None:
+            stack = [node]
+            while stack:
+                node = stack.pop()
+                if node is skip:
+                    continue
+                position = node.position
+                if position.line == old_line:
+                    if position.column >= old_column:
+                        node.position = Position(new_line, position.column - old_column + new_column)
+                elif position.line > old_line and lines:
+                    node.position = Position(position.line + lines, position.column)
+                stack.extend(ast.children(node))
+
+        def move_statements(statements: list[ast.Expression], after: int, spans: StatementSpans, origin: int) -> None:
+            for index in range(after, len(statements)):
+                if not lines and origin + spans.starts[index] >= next_line_start:
+                    break
+                move(statements[index])
+
+        move_statements(self.statements_of(block), after, spans, origin)
+        child = block
+        for container, index, outer_spans, outer_origin in reversed(path):
+            statements = self.statements_of(container)
+            move(statements[index], child)
+            move_statements(statements, index + 1, outer_spans, outer_origin)
+            child = container
+
+    def typecheck_from(self, levels: list[tuple[ast.Block | None, int]], count: int, old_declarations: list[list[tuple[str, Any]] | None], old_types: list[list[Type] | Type | None]) -> None:
+        """Typechecks the 'count' new statements at the end of 'levels', and then
+        what may have changed with them. 'levels' are the blocks from the top
+        level down, each with the index of the statement that goes on down.
+        'old_declarations' and 'old_types' are what those statements declared
+        and the types of the blocks before, None when not known."""
+        table = SymbolTable()
+        for container, index in levels:
+            if container is not None or self.top_level is not None:
+                table.init_scope()
+            for statement in self.statements_of(container)[:index]:
+                if isinstance(statement, ast.VariableDeclaration):
+                    table.insert(statement.name.name, statement.value.type)
+        level = len(levels) - 1
+        container, index = levels[level]
+        statements = self.statements_of(container)
+        self.unchecked = statements[index:index + count]
+        for statement in self.unchecked:
+            typecheck(statement, table)
+        self.unchecked = None
+        changed = declarations(statements[index:index + count]) != old_declarations[level]
+        after = index + count
+        while True:
+            if changed:
+                for statement in statements[after:]:
+                    typecheck(statement, table)
+            new_type = statements[-1].type if statements else Unit()
+            if container is not None:
+                container.type = new_type
+            elif self.top_level is not None:
+                self.top_level.type = new_type
+            if level == 0 or new_type == old_types[level]:
+                return
+            # The block is the same but for its type, which its statement is typechecked again with.
+            assert container is not None
+            table.exit_scope()
+            level -= 1
+            child: ast.Expression = container
+            container, index = levels[level]
+            statements = self.statements_of(container)
+
+            def step(node: ast.Expression, table: Scopes, child: ast.Expression = child) -> Any:
+                if node is child:
+                    return child.type
+                if isinstance(node, (ast.Literal, ast.Identifier)):
+                    return typecheck_step(node, table)
+                return typecheck_compound(node, table, step)
+
+            trampoline(step(statements[index], table))
+            changed = declarations(statements[index:index + 1]) != old_declarations[level]
+            after = index + 1
+
+def declarations(statements: list[ast.Expression]) -> list[tuple[str, Any]]:
+    """The names and types that 'statements' declare in their block."""
+    return [(statement.name.name, statement.value.type) for statement in statements if isinstance(statement, ast.VariableDeclaration)]
+
+def append_token(stream: TokenStream, kind: int, start: int, length: int) -> None:
+    stream.kinds.append(kind)
+    stream.starts.append(start)
+    stream.lengths.append(length)
+
+def match_braces(stream: TokenStream) -> dict[int, int]:
+    """The index of the '}' that closes each '{' of 'stream', by the index of the '{'."""
+    source_code = stream.source_code
+    closes = {}
+    opened = []
+    for index, (kind, start) in enumerate(zip(stream.kinds, stream.starts)):
+        if kind == PUNCTUATION:
+            if source_code[start] == '{':
+                opened.append(index)
+            elif source_code[start] == '}':
+                closes[opened.pop()] = index
+    return closes
+
+def first_token(stream: TokenStream, node: ast.Expression, first: int) -> int:
+    """The index of the first token of 'node', counting the parentheses around
+    it, but none before 'first'."""
+    while True:
+        if isinstance(node, ast.BinaryOp):
+            node = node.left
+        elif isinstance(node, ast.FunctionCall):
+            node = node.name
+        else:
+            break
+    source_code = stream.source_code
+    index = token_at(stream, node.position)
+    while index > first and stream.kinds[index - 1] == PUNCTUATION and source_code[stream.starts[index - 1]] == '(':
+        index -= 1
+    return index
+
+def token_at(stream: TokenStream, position: Position) -> int:
+    return bisect_left(stream.starts, stream.line_starts[position.line - 1] + position.column - 1)
+
+def edit_line_starts(line_starts: list[int], text: str, start: int, old_end: int, new_end: int) -> list[int]:
+    """The line starts of 'text', given those of the text it was before the
+    characters from 'start' to 'old_end' became those from 'start' to 'new_end'."""
+    first_moved = bisect_right(line_starts, start)
+    if new_end == old_end and text.find('\n', start, new_end) < 0 and bisect_right(line_starts, old_end) == first_moved:
+        return line_starts
+    edited = line_starts[:first_moved]
+    line_break = text.find('\n', start, new_end)
+    while line_break >= 0:
+        edited.append(line_break + 1)
+        line_break = text.find('\n', line_break + 1, new_end)
+    delta = new_end - old_end
+    edited.extend([line_start + delta for line_start in line_starts[bisect_right(line_starts, old_end):]])
+    return edited
+
+def tokens_between(text: str, line_starts: list[int], start: int, end: int) -> tuple[array, array, array]:
+    """The kinds, starts and lengths of the tokens that start from 'start' to
+    before 'end', which are not inside tokens. Tokenizes the lines they are on."""
+    chunk_start = line_starts[bisect_right(line_starts, start) - 1]
+    line = bisect_right(line_starts, end)
+    chunk_end = line_starts[line] if line < len(line_starts) else len(text)
+    kinds, starts, lengths, _ = tokenize_chunk(text[chunk_start:chunk_end], chunk_start)
+    first = bisect_left(starts, start)
+    last = bisect_left(starts, end)
+    return kinds[first:last], starts[first:last], lengths[first:last]
+
+def token_after(text: str, line_starts: list[int], offset: int) -> tuple[int, int] | None:
+    """The kind and start of the first token from 'offset' on, which is not inside a token."""
+    line = bisect_right(line_starts, offset) - 1
+    while line < len(line_starts):
+        line_start = line_starts[line]
+        line_end = line_starts[line + 1] if line + 1 < len(line_starts) else len(text)
+        kinds, starts, _, _ = tokenize_chunk(text[line_start:line_end], line_start)
+        index = bisect_left(starts, offset)
+        if index < len(starts):
+            return kinds[index], starts[index]
+        line += 1
+    return None
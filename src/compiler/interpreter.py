@@ -0,0 +1,225 @@
+import sys
+from typing import Any, Callable
+import compiler.ast as ast
+from compiler.resolver import resolve, builtin_slots
+from compiler.jit import jit_loop
+
+Value = int | bool | None | Callable[..., Any] # None is Unit
+Code = Callable[[], Value] # a compiled expression, calling it evaluates the expression
+
+def divide(left: int, right: int, position: ast.Position) -> int:
+    """Integer division that rounds towards zero, like in C."""
+    if right == 0:
+        raise ZeroDivisionError(f'{position}: Division by zero')
+    quotient = left // right
+    if quotient < 0 and quotient * right != left:
+        quotient += 1
+    return quotient
+
+def remainder(left: int, right: int, position: ast.Position) -> int:
+    """The remainder of 'divide', which has the sign of 'left', like in C."""
+    if right == 0:
+        raise ZeroDivisionError(f'{position}: Division by zero')
+    result = left % right
+    if result and (left < 0) != (right < 0):
+        result -= right
+    return result
+
+def builtin_functions(read_line: Callable[[], str], write: Callable[[str], Any]) -> dict[str, Callable[..., Value]]:
+    """The builtins, reading lines with 'read_line' and writing them with 'write'."""
+    def print_int(value: int) -> None:
+        write(f'{value}\n')
+
+    def print_bool(value: bool) -> None:
+        write('true\n' if value else 'false\n')
+
+    def read_int() -> int:
+        line = read_line()
+        if not line:
+            raise EOFError('read_int: no more input')
+        return int(line)
+
+    return {"print_int": print_int, "print_bool": print_bool, "read_int": read_int}
+
+def write_value(value: Value, write: Callable[[str], Any]) -> None:
+    """Prints the value of a program at its end, unless it is unit or a function."""
+    if type(value) is bool:
+        write('true\n' if value else 'false\n')
+    elif type(value) is int:
+        write(f'{value}\n')
+
+def operands(node: ast.Expression) -> list[ast.Expression]:
+    """The children of 'node' that are compiled into code of their own."""
+    if isinstance(node, ast.VariableDeclaration):
+        return [node.value]
+    return ast.children(node)
+
+def compile_program(root: ast.Expression, read_line: Callable[[], str] = sys.stdin.readline, write: Callable[[str], Any] = sys.stdout.write, jit: bool = False) -> Code:
+    """Compiles the typechecked tree under 'root' into a closure that runs it.
+
+    Each node becomes a closure specialized for its kind and operator, which calls
+    the closures of its children. Variables are resolved first, and each one is read
+    and written straight from a slot of a list. As there are no user defined functions,
+    a block is never running twice at a time, so every block at the same depth can
+    share one list. 'read_int' reads a line with 'read_line', the print functions
+    write a line with 'write'. With 'jit', loops that get hot may run as machine
+    code, see 'jit_loop'.
+    """
+    frames: list[list[Value]] = [[None] * resolve(root)]
+
+    def frame_of(binding: ast.Binding | None) -> list[Value]:
+        assert binding is not None, "the resolver binds every variable"
+        while len(frames) <= binding.depth:
+            frames.append([])
+        frame = frames[binding.depth]
+        if len(frame) <= binding.slot:
+            frame.extend([None] * (binding.slot + 1 - len(frame)))
+        return frame
+
+    builtins = builtin_functions(read_line, write)
+    for name, function in builtins.items():
+        frames[0][builtin_slots[name]] = function
+    functions_by_slot = {builtin_slots[name]: function for name, function in builtins.items()}
+
+    # Children are compiled before their parents, each node pops the code of its children.
+    codes: list[Code] = []
+    stack: list[tuple[ast.Expression, bool]] = [(root, False)]
+    while stack:
+        node, ready = stack.pop()
+        if not ready:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(operands(node)))
+            continue
+        count = len(operands(node))
+        children = codes[len(codes) - count:]
+        del codes[len(codes) - count:]
+        codes.append(compile_node(node, children, frame_of, functions_by_slot, jit))
+    return codes[0]
+
+def compile_node(node: ast.Expression, children: list[Code], frame_of: Callable[[ast.Binding | None], list[Value]], builtins: dict[int, Callable[..., Value]], jit: bool = False) -> Code:
+    """The code for 'node', given the code of its 'operands'."""
+    position = node.position
+    match node:
+        case ast.Literal():
+            value = node.value
+            return lambda: value
+        case ast.Identifier():
+            frame, slot = frame_of(node.binding), node.binding.slot # type: ignore[union-attr]
+            return lambda: frame[slot]
+        case ast.UnaryOp():
+            [right] = children
+            match node.op:
+                case '-':
+                    return lambda: -right() # type: ignore[operator]
+                case 'not':
+                    return lambda: not right()
+        case ast.BinaryOp():
+            left, right = children
+            match node.op:
+                case '=':
+                    assert isinstance(node.left, ast.Identifier)
+                    frame, slot = frame_of(node.left.binding), node.left.binding.slot # type: ignore[union-attr]
+                    def assign() -> Value:
+                        frame[slot] = value = right()
+                        return value
+                    return assign
+                case 'and':
+                    return lambda: left() and right()
+                case 'or':
+                    return lambda: left() or right()
+                case '==':
+                    return lambda: left() == right()
+                case '!=':
+                    return lambda: left() != right()
+                case '+':
+                    return lambda: left() + right() # type: ignore[operator]
+                case '-':
+                    return lambda: left() - right() # type: ignore[operator]
+                case '*':
+                    return lambda: left() * right() # type: ignore[operator]
+                case '/':
+                    return lambda: divide(left(), right(), position) # type: ignore[arg-type]
+                case '%':
+                    return lambda: remainder(left(), right(), position) # type: ignore[arg-type]
+                case '<':
+                    return lambda: left() < right() # type: ignore[operator]
+                case '<=':
+                    return lambda: left() <= right() # type: ignore[operator]
+                case '>':
+                    return lambda: left() > right() # type: ignore[operator]
+                case '>=':
+                    return lambda: left() >= right() # type: ignore[operator]
+        case ast.While():
+            condition, body = children
+            if jit:
+                return jit_loop(node, condition, body, frame_of)
+            def loop() -> Value:
+                while condition():
+                    body()
+                return None
+            return loop
+        case ast.If():
+            if len(children) == 2:
+                condition, then_branch = children
+                def if_then() -> Value:
+                    if condition():
+                        then_branch()
+                    return None
+                return if_then
+            condition, then_branch, else_branch = children
+            return lambda: then_branch() if condition() else else_branch()
+        case ast.FunctionCall():
+            function, *arguments = children
+            binding = node.name.binding if isinstance(node.name, ast.Identifier) else None
+            if binding is not None and binding.depth == 0 and binding.slot in builtins:
+                # Builtins can not be replaced, as no other function has the same type.
+                builtin = builtins[binding.slot]
+                match arguments:
+                    case []:
+                        return builtin
+                    case [argument]:
+                        return lambda: builtin(argument())
+            return lambda: function()(*[argument() for argument in arguments]) # type: ignore[operator, misc]
+        case ast.VariableDeclaration():
+            [initializer] = children
+            frame, slot = frame_of(node.binding), node.binding.slot # type: ignore[union-attr]
+            def declare() -> Value:
+                frame[slot] = initializer()
+                return None
+            return declare
+        case ast.Block():
+            match children:
+                case []:
+                    return lambda: None
+                case [only]:
+                    return only
+            *first, last = children
+            def block() -> Value:
+                for statement in first:
+                    statement()
+                return last()
+            return block
+    raise Exception(f'{position}: Can not interpret {type(node).__name__} "{getattr(node, "op", "")}"')
+
+def nesting_depth(root: ast.Expression) -> int:
+    deepest = 0
+    stack = [(root, 1)]
+    while stack:
+        node, depth = stack.pop()
+        deepest = max(deepest, depth)
+        stack.extend((child, depth + 1) for child in ast.children(node))
+    return deepest
+
+def interpret(root: ast.Expression, read_line: Callable[[], str] = sys.stdin.readline, write: Callable[[str], Any] = sys.stdout.write, jit: bool = False) -> Value:
+    """Runs the typechecked tree under 'root' and prints its value, unless it is unit or a function."""
+    code = compile_program(root, read_line, write, jit)
+    # The closures call each other as deep as the tree is. Calls between Python
+    # functions do not use the C stack, so only the recursion limit is in the way.
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 2 * nesting_depth(root) + 100))
+    try:
+        value = code()
+    finally:
+        sys.setrecursionlimit(limit)
+    write_value(value, write)
+    return value
@@ -0,0 +1,153 @@
+from dataclasses import dataclass, field
+from typing import Callable
+from compiler.tokenizer import Position
+
+@dataclass(frozen=True, slots=True)
+class IRVar:
+    """A variable of the IR. Variables of the program keep their names, with
+    '.N' added to tell apart ones that share a name. Temporaries are '%N'."""
+    name: str
+
+    def __str__(self) -> str:
+        return self.name
+
+@dataclass(slots=True)
+class Instruction:
+    """Base class for IR instructions."""
+    position: Position = field(default_factory=lambda: Position(1,1), kw_only=True, compare=False)
+
+@dataclass(slots=True)
+class Label(Instruction):
+    """Marks a place to jump to."""
+    name: str
+
+    def __str__(self) -> str:
+        return f'{self.name}:'
+
+@dataclass(slots=True)
+class LoadIntConst(Instruction):
+    value: int
+    dest: IRVar
+
+    def __str__(self) -> str:
+        return f'{self.dest} = {self.value}'
+
+@dataclass(slots=True)
+class LoadBoolConst(Instruction):
+    value: bool
+    dest: IRVar
+
+    def __str__(self) -> str:
+        return f'{self.dest} = {"true" if self.value else "false"}'
+
+@dataclass(slots=True)
+class Copy(Instruction):
+    source: IRVar
+    dest: IRVar
+
+    def __str__(self) -> str:
+        return f'{self.dest} = {self.source}'
+
+@dataclass(slots=True)
+class Call(Instruction):
+    """Calls 'fun' with 'args' and puts what it returns in 'dest'. Operators are
+    called by their names, see 'binary_operators' and 'unary_operators'."""
+    fun: IRVar
+    args: list[IRVar]
+    dest: IRVar
+
+    def __str__(self) -> str:
+        if self.fun.name in binary_operators and len(self.args) == 2:
+            return f'{self.dest} = {self.args[0]} {self.fun.name} {self.args[1]}'
+        if self.fun.name in unary_operators:
+            return f'{self.dest} = {unary_operators[self.fun.name]}{self.args[0]}'
+        return f'{self.dest} = {self.fun}({", ".join(map(str, self.args))})'
+
+@dataclass(slots=True)
+class Jump(Instruction):
+    label: str
+
+    def __str__(self) -> str:
+        return f'goto {self.label}'
+
+@dataclass(slots=True)
+class CondJump(Instruction):
+    cond: IRVar
+    then_label: str
+    else_label: str
+
+    def __str__(self) -> str:
+        return f'if {self.cond} goto {self.then_label} else {self.else_label}'
+
+@dataclass(slots=True)
+class Return(Instruction):
+    """Ends the program, with 'value' as its value."""
+    value: IRVar
+
+    def __str__(self) -> str:
+        return f'return {self.value}'
+
+@dataclass(slots=True)
+class Phi(Instruction):
+    """Only in SSA form, at the start of a block: 'dest' gets the source paired
+    with the label of the block that control came from."""
+    sources: list[tuple[str, IRVar]]
+    dest: IRVar
+
+    def __str__(self) -> str:
+        return f'{self.dest} = phi({", ".join(f"{label}: {source}" for label, source in self.sources)})'
+
+# The names operators are called by, and how unary ones are written.
+binary_operators = {'+', '-', '*', '/', '%', '<', '<=', '>', '>=', '==', '!='}
+unary_operators = {'unary_-': '-', 'not': 'not '}
+builtin_function_names = {'print_int', 'print_bool', 'read_int'}
+# Holds the unit value, and is never assigned to.
+unit = IRVar('unit')
+# Variables that exist before the program starts.
+root_names = {*binary_operators, *unary_operators, *builtin_function_names, unit.name}
+
+def format_ir(instructions: list[Instruction]) -> str:
+    """One instruction per line. Labels are not indented, everything else is."""
+    return "\n".join(str(instruction) if isinstance(instruction, Label) else f'    {instruction}' for instruction in instructions)
+
+def destination(instruction: Instruction) -> IRVar | None:
+    """The variable 'instruction' writes, if any."""
+    match instruction:
+        case LoadIntConst() | LoadBoolConst() | Copy() | Call() | Phi():
+            return instruction.dest
+    return None
+
+def sources(instruction: Instruction) -> list[IRVar]:
+    """The variables 'instruction' reads."""
+    match instruction:
+        case Copy():
+            return [instruction.source]
+        case Call():
+            return [instruction.fun, *instruction.args]
+        case CondJump():
+            return [instruction.cond]
+        case Return():
+            return [instruction.value]
+        case Phi():
+            return [source for _, source in instruction.sources]
+    return []
+
+def replace_sources(instruction: Instruction, replace: Callable[[IRVar], IRVar]) -> None:
+    """Makes 'instruction' read 'replace(v)' instead of each variable 'v' it reads."""
+    match instruction:
+        case Copy():
+            instruction.source = replace(instruction.source)
+        case Call():
+            instruction.fun = replace(instruction.fun)
+            instruction.args = [replace(argument) for argument in instruction.args]
+        case CondJump():
+            instruction.cond = replace(instruction.cond)
+        case Return():
+            instruction.value = replace(instruction.value)
+        case Phi():
+            instruction.sources = [(label, replace(source)) for label, source in instruction.sources]
+
+def replace_destination(instruction: Instruction, dest: IRVar) -> None:
+    """Makes 'instruction' write 'dest' instead of the variable it writes."""
+    assert isinstance(instruction, (LoadIntConst, LoadBoolConst, Copy, Call, Phi))
+    instruction.dest = dest
@@ -0,0 +1,172 @@
+import compiler.ast as ast
+from compiler.resolver import resolve, builtin_slots
+from compiler.trampoline import Step, trampoline
+from compiler.ir import (
+    IRVar, Instruction, Label, LoadIntConst, LoadBoolConst, Copy, Call, Jump, CondJump, Return,
+    unit, root_names, destination,
+)
+
+def generate_ir(root: ast.Expression) -> list[Instruction]:
+    """Lowers the typechecked tree under 'root' into IR that ends with a 'Return'
+    of the value of the program.
+
+    Every expression puts its value in a variable: a temporary, or the variable
+    of the program it reads. 'and', 'or', 'if' and 'while' become jumps. Operands
+    are evaluated from left to right, also when a later one assigns to a variable
+    an earlier one read.
+    """
+    resolve(root)
+    instructions: list[Instruction] = []
+    variables: dict[ast.Binding, IRVar] = {}
+    name_counts: dict[str, int] = {name: 1 for name in root_names}
+    # How many instructions emitted so far write each variable.
+    writes: dict[IRVar, int] = {}
+    temporaries = 0
+    labels = 0
+
+    def variable_of(binding: ast.Binding | None, name: str) -> IRVar:
+        assert binding is not None, "the resolver binds every variable"
+        found = variables.get(binding)
+        if found is None:
+            if binding.depth == 0 and binding.slot < len(builtin_slots):
+                found = IRVar(name)
+            else:
+                count = name_counts.get(name, 0)
+                name_counts[name] = count + 1
+                found = IRVar(name if count == 0 else f'{name}.{count}')
+            variables[binding] = found
+        return found
+
+    def temporary() -> IRVar:
+        nonlocal temporaries
+        temporaries += 1
+        return IRVar(f'%{temporaries}')
+
+    def new_labels(*kinds: str) -> list[str]:
+        """Fresh labels that share a number, one for each of 'kinds'."""
+        nonlocal labels
+        labels += 1
+        return [f'{kind}.{labels}' for kind in kinds]
+
+    def emit(instruction: Instruction) -> None:
+        written = destination(instruction)
+        if written is not None:
+            writes[written] = writes.get(written, 0) + 1
+        instructions.append(instruction)
+
+    def emit_node(node: ast.Expression) -> Step[IRVar] | IRVar:
+        """Emits 'node' and returns the variable that holds its value."""
+        match node:
+            case ast.Literal():
+                if node.value is None:
+                    return unit
+                result = temporary()
+                if type(node.value) is bool:
+                    emit(LoadBoolConst(node.value, result, position = node.position))
+                else:
+                    emit(LoadIntConst(node.value, result, position = node.position))
+                return result
+            case ast.Identifier():
+                return variable_of(node.binding, node.name)
+        return emit_compound(node)
+
+    def operands(nodes: list[ast.Expression]) -> Step[list[IRVar]]:
+        """The variables of 'nodes', evaluated in order: if a later one assigns to
+        the variable of an earlier one, the earlier value is copied first."""
+        results: list[IRVar] = []
+        marks: list[int] = [] # where the instructions of each one end
+        counts: list[int] = []
+        for node in nodes:
+            result = yield emit_node(node)
+            results.append(result)
+            marks.append(len(instructions))
+            counts.append(writes.get(result, 0))
+        # From the last, so that inserting does not move the marks still to be used.
+        for index in reversed(range(len(nodes) - 1)):
+            result = results[index]
+            if writes.get(result, 0) != counts[index]:
+                saved = temporary()
+                instructions.insert(marks[index], Copy(result, saved, position = nodes[index].position))
+                results[index] = saved
+        return results
+
+    def emit_compound(node: ast.Expression) -> Step[IRVar]:
+        match node:
+            case ast.UnaryOp():
+                right = yield emit_node(node.right)
+                result = temporary()
+                emit(Call(IRVar('unary_-' if node.op == '-' else 'not'), [right], result, position = node.position))
+                return result
+            case ast.BinaryOp() if node.op == '=':
+                assert isinstance(node.left, ast.Identifier)
+                right = yield emit_node(node.right)
+                target = variable_of(node.left.binding, node.left.name)
+                emit(Copy(right, target, position = node.position))
+                return target
+            case ast.BinaryOp() if node.op in ['and', 'or']:
+                right_label, end_label = new_labels(f'{node.op}_right', f'{node.op}_end')
+                left = yield emit_node(node.left)
+                result = temporary()
+                emit(Copy(left, result, position = node.position))
+                if node.op == 'and':
+                    emit(CondJump(left, right_label, end_label, position = node.position))
+                else:
+                    emit(CondJump(left, end_label, right_label, position = node.position))
+                emit(Label(right_label, position = node.position))
+                right = yield emit_node(node.right)
+                emit(Copy(right, result, position = node.position))
+                emit(Label(end_label, position = node.position))
+                return result
+            case ast.BinaryOp():
+                [left, right] = yield operands([node.left, node.right])
+                result = temporary()
+                emit(Call(IRVar(node.op), [left, right], result, position = node.position))
+                return result
+            case ast.While():
+                start_label, body_label, end_label = new_labels('while_start', 'while_body', 'while_end')
+                emit(Label(start_label, position = node.position))
+                condition = yield emit_node(node.condition)
+                emit(CondJump(condition, body_label, end_label, position = node.position))
+                emit(Label(body_label, position = node.position))
+                yield emit_node(node.do)
+                emit(Jump(start_label, position = node.position))
+                emit(Label(end_label, position = node.position))
+                return unit
+            case ast.If():
+                then_label, else_label, end_label = new_labels('then', 'else', 'if_end')
+                condition = yield emit_node(node.condition)
+                if node.else_branch is None:
+                    emit(CondJump(condition, then_label, end_label, position = node.position))
+                    emit(Label(then_label, position = node.position))
+                    yield emit_node(node.then_branch)
+                    emit(Label(end_label, position = node.position))
+                    return unit
+                result = temporary()
+                emit(CondJump(condition, then_label, else_label, position = node.position))
+                emit(Label(then_label, position = node.position))
+                emit(Copy((yield emit_node(node.then_branch)), result, position = node.position))
+                emit(Jump(end_label, position = node.position))
+                emit(Label(else_label, position = node.position))
+                emit(Copy((yield emit_node(node.else_branch)), result, position = node.position))
+                emit(Label(end_label, position = node.position))
+                return result
+            case ast.FunctionCall():
+                [function, *arguments] = yield operands([node.name, *node.arguments])
+                result = temporary()
+                emit(Call(function, arguments, result, position = node.position))
+                return result
+            case ast.VariableDeclaration():
+                value = yield emit_node(node.value)
+                emit(Copy(value, variable_of(node.binding, node.name.name), position = node.position))
+                return unit
+            case ast.Block():
+                result = unit
+                for statement in node.statements:
+                    result = yield emit_node(statement)
+                return result
+            case _:
+                raise Exception(f'{node.position}: Can not generate IR for {type(node).__name__}')
+
+    value: IRVar = trampoline(emit_node(root))
+    emit(Return(value, position = root.position))
+    return instructions
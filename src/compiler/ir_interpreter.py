@@ -0,0 +1,58 @@
+import operator
+import sys
+from typing import Any, Callable
+from compiler.ir import IRVar, Instruction, Label, LoadIntConst, LoadBoolConst, Copy, Call, Jump, CondJump, Return, unit
+from compiler.interpreter import Value, builtin_functions, divide, remainder, write_value
+
+operators: dict[str, Callable[..., Value]] = {
+    '+': operator.add, '-': operator.sub, '*': operator.mul,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    '==': operator.eq, '!=': operator.ne,
+    'unary_-': operator.neg, 'not': operator.not_,
+}
+divisions = {'/': divide, '%': remainder}
+
+def execute_ir(instructions: list[Instruction], read_line: Callable[[], str] = sys.stdin.readline, write: Callable[[str], Any] = sys.stdout.write) -> tuple[Value, int]:
+    """Runs IR from 'generate_ir' one instruction at a time. Returns the value of
+    the program and the number of instructions executed, not counting labels."""
+    labels = {instruction.name: index for index, instruction in enumerate(instructions) if isinstance(instruction, Label)}
+    values: dict[IRVar, Value] = {unit: None}
+    for name, builtin in builtin_functions(read_line, write).items():
+        values[IRVar(name)] = builtin
+    for name, builtin in operators.items():
+        values[IRVar(name)] = builtin
+    executed = 0
+    pc = 0
+    while True:
+        instruction = instructions[pc]
+        pc += 1
+        match instruction:
+            case Label():
+                continue
+            case LoadIntConst() | LoadBoolConst():
+                values[instruction.dest] = instruction.value
+            case Copy():
+                values[instruction.dest] = values[instruction.source]
+            case Call():
+                arguments: list[Any] = [values[argument] for argument in instruction.args]
+                division = divisions.get(instruction.fun.name)
+                if division is not None:
+                    values[instruction.dest] = division(arguments[0], arguments[1], instruction.position)
+                else:
+                    function: Any = values[instruction.fun]
+                    values[instruction.dest] = function(*arguments)
+            case Jump():
+                pc = labels[instruction.label]
+            case CondJump():
+                pc = labels[instruction.then_label if values[instruction.cond] else instruction.else_label]
+            case Return():
+                return values[instruction.value], executed + 1
+            case _:
+                raise Exception(f'{instruction.position}: Can not execute {type(instruction).__name__}')
+        executed += 1
+
+def run_ir(instructions: list[Instruction], read_line: Callable[[], str] = sys.stdin.readline, write: Callable[[str], Any] = sys.stdout.write) -> Value:
+    """Runs IR and prints its value, like 'interpret'."""
+    value, _ = execute_ir(instructions, read_line, write)
+    write_value(value, write)
+    return value
@@ -0,0 +1,319 @@
+from dataclasses import dataclass
+from typing import Any, Callable
+from compiler.ir import (
+    IRVar, Instruction, Label, LoadIntConst, LoadBoolConst, Copy, Call, Jump, CondJump, Return, Phi,
+    destination, sources, replace_sources,
+)
+from compiler.cfg import ControlFlowGraph, build_cfg, linearize, remove_unreachable, successor_labels
+from compiler.ssa import to_ssa, from_ssa, coalesce_copies
+from compiler.ir_interpreter import operators, divisions
+
+@dataclass
+class PassReport:
+    """How many instructions there were before and after a pass, labels not included."""
+    name: str
+    before: int
+    after: int
+
+max_opt_level = 2
+
+def optimize_ir(instructions: list[Instruction], opt_level: int = max_opt_level) -> tuple[list[Instruction], list[PassReport]]:
+    """Optimizes IR from 'generate_ir' in SSA form. Returns the new IR, and a
+    report of each pass.
+
+    Level 0 changes nothing. Level 1 removes code whose results are not used and
+    coalesces the copies left when leaving SSA. Level 2 also propagates constants
+    and copies, folding the branches that constants decide.
+    """
+    if opt_level <= 0:
+        return instructions, []
+    cfg = build_cfg(instructions)
+    report = [PassReport("build cfg", count_instructions(instructions), cfg.instruction_count())]
+
+    def run(name: str, optimization: Callable[[ControlFlowGraph], None]) -> None:
+        before = cfg.instruction_count()
+        optimization(cfg)
+        report.append(PassReport(name, before, cfg.instruction_count()))
+
+    run("to ssa", to_ssa)
+    if opt_level >= 2:
+        run("constant propagation", propagate_constants)
+        run("copy propagation", propagate_copies)
+    run("dead code elimination", eliminate_dead_code)
+    run("from ssa", from_ssa)
+    run("copy coalescing", coalesce_copies)
+    run("jump threading", thread_jumps)
+    optimized = linearize(cfg)
+    report.append(PassReport("linearize", cfg.instruction_count(), count_instructions(optimized)))
+    return optimized, report
+
+def count_instructions(instructions: list[Instruction]) -> int:
+    return sum(not isinstance(instruction, Label) for instruction in instructions)
+
+def format_report(report: list[PassReport]) -> str:
+    return "\n".join(f'{each.name:<24} {each.before:>7} -> {each.after:>7}' for each in report)
+
+# Values in the lattice of constant propagation, besides constants:
+unknown = object() # not known yet, as nothing that runs has written it
+varying = object() # not a constant
+
+def is_constant(value: Any) -> bool:
+    return value is not unknown and value is not varying
+
+def same(first: Any, second: Any) -> bool:
+    return first is second or (is_constant(first) and is_constant(second) and type(first) is type(second) and first == second)
+
+def meet(first: Any, second: Any) -> Any:
+    """The highest value in the lattice below both: unknown is above every
+    constant, and every constant is above varying."""
+    if first is unknown:
+        return second
+    if second is unknown or same(first, second):
+        return first
+    return varying
+
+def fold(instruction: Call, arguments: list[Any]) -> Any:
+    """The value of an operator applied to constants, or 'varying'."""
+    name = instruction.fun.name
+    if name in divisions:
+        if arguments[1] == 0:
+            return varying # left to fail when it runs
+        return divisions[name](arguments[0], arguments[1], instruction.position)
+    return operators[name](*arguments)
+
+def is_operator(instruction: Instruction) -> bool:
+    return isinstance(instruction, Call) and (instruction.fun.name in operators or instruction.fun.name in divisions)
+
+def propagate_constants(cfg: ControlFlowGraph) -> None:
+    """Sparse conditional constant propagation (Wegman and Zadeck) on SSA form.
+
+    Finds the variables that are constant on every path that can run, assuming
+    a branch can run only if its condition can take it. Writes of constants
+    become loads of them, branches on them become jumps, and blocks that can
+    not run are removed.
+    """
+    values: dict[IRVar, Any] = {}
+    users: dict[IRVar, list[tuple[str, Instruction]]] = {}
+    written: set[IRVar] = set()
+    for block in cfg.blocks.values():
+        for instruction in block.instructions:
+            for source in sources(instruction):
+                users.setdefault(source, []).append((block.label, instruction))
+            target = destination(instruction)
+            if target is not None:
+                written.add(target)
+
+    def value_of(variable: IRVar) -> Any:
+        # Builtins and operators are not constants here.
+        return values.get(variable, unknown) if variable in written else varying
+
+    edges: set[tuple[str, str]] = set()
+    reached: set[str] = set()
+    edge_worklist: list[tuple[str, str]] = [('', cfg.entry)]
+    variable_worklist: list[IRVar] = []
+
+    def visit(label: str, instruction: Instruction) -> None:
+        new: Any
+        match instruction:
+            case Jump():
+                edge_worklist.append((label, instruction.label))
+                return
+            case CondJump():
+                condition = value_of(instruction.cond)
+                if condition is varying:
+                    edge_worklist.extend((label, target) for target in successor_labels(instruction))
+                elif condition is not unknown:
+                    edge_worklist.append((label, instruction.then_label if condition else instruction.else_label))
+                return
+            case LoadIntConst() | LoadBoolConst():
+                new = instruction.value
+            case Copy():
+                new = value_of(instruction.source)
+            case Phi():
+                new = unknown
+                for predecessor, source in instruction.sources:
+                    if (predecessor, label) in edges:
+                        new = meet(new, value_of(source))
+            case Call() if is_operator(instruction):
+                arguments = [value_of(argument) for argument in instruction.args]
+                if any(argument is varying for argument in arguments):
+                    new = varying
+                elif any(argument is unknown for argument in arguments):
+                    new = unknown
+                else:
+                    new = fold(instruction, arguments)
+            case _:
+                new = varying
+        target = destination(instruction)
+        if target is None:
+            return
+        old = values.get(target, unknown)
+        new = meet(old, new)
+        if not same(new, old):
+            values[target] = new
+            variable_worklist.append(target)
+
+    while edge_worklist or variable_worklist:
+        while edge_worklist:
+            edge = edge_worklist.pop()
+            if edge in edges:
+                continue
+            edges.add(edge)
+            label = edge[1]
+            block = cfg.blocks[label]
+            if label not in reached:
+                reached.add(label)
+                for instruction in block.instructions:
+                    visit(label, instruction)
+            else:
+                for phi in block.phis():
+                    visit(label, phi)
+        while variable_worklist and not edge_worklist:
+            for label, instruction in users.get(variable_worklist.pop(), []):
+                if label in reached:
+                    visit(label, instruction)
+
+    for label in list(cfg.blocks):
+        if label not in reached:
+            del cfg.blocks[label]
+    for block in cfg.blocks.values():
+        phis: list[Instruction] = []
+        rest: list[Instruction] = []
+        for instruction in block.instructions:
+            target = destination(instruction)
+            if target is not None and is_constant(values.get(target, varying)) and (not isinstance(instruction, Call) or is_operator(instruction)):
+                value = values[target]
+                load = LoadBoolConst if type(value) is bool else LoadIntConst
+                instruction = load(value, target, position = instruction.position)
+            elif isinstance(instruction, CondJump) and is_constant(value_of(instruction.cond)):
+                taken = instruction.then_label if value_of(instruction.cond) else instruction.else_label
+                instruction = Jump(taken, position = instruction.position)
+            # The phis that are left stay first.
+            (phis if isinstance(instruction, Phi) else rest).append(instruction)
+        block.instructions = phis + rest
+    relink(cfg)
+
+def relink(cfg: ControlFlowGraph) -> None:
+    """Updates the successors and predecessors of the blocks after their jumps
+    have changed, and removes the blocks that can no longer run."""
+    for block in cfg.blocks.values():
+        block.predecessors = []
+    for block in cfg.blocks.values():
+        block.successors = successor_labels(block.instructions[-1])
+        for successor in block.successors:
+            cfg.blocks[successor].predecessors.append(block.label)
+    remove_unreachable(cfg)
+    for block in cfg.blocks.values():
+        for phi in block.phis():
+            phi.sources = [(predecessor, source) for predecessor, source in phi.sources if predecessor in block.predecessors]
+
+def propagate_copies(cfg: ControlFlowGraph) -> None:
+    """Makes every read of a copy in SSA form read what it copied instead.
+    Phis whose sources are all the same variable, or the phi itself, are copies too. The copies are left for dead code
+    elimination."""
+    replacement: dict[IRVar, IRVar] = {}
+    for block in cfg.blocks.values():
+        for instruction in block.instructions:
+            if isinstance(instruction, Copy):
+                replacement[instruction.dest] = instruction.source
+            elif isinstance(instruction, Phi):
+                others = {source for _, source in instruction.sources if source != instruction.dest}
+                if len(others) == 1:
+                    replacement[instruction.dest] = others.pop()
+
+    # The definition of what replaces a variable dominates it, so this ends.
+    def replace(variable: IRVar) -> IRVar:
+        while variable in replacement:
+            variable = replacement[variable]
+        return variable
+
+    for block in cfg.blocks.values():
+        for instruction in block.instructions:
+            replace_sources(instruction, replace)
+
+def eliminate_dead_code(cfg: ControlFlowGraph) -> None:
+    """Removes the instructions of SSA form whose results are never used and
+    that have no effects. Calls of functions, and divisions that may be by zero,
+    always stay, and so does everything they use."""
+    constants: dict[IRVar, Any] = {}
+    definitions: dict[IRVar, Instruction] = {}
+    for block in cfg.blocks.values():
+        for instruction in block.instructions:
+            target = destination(instruction)
+            if target is not None:
+                definitions[target] = instruction
+            if isinstance(instruction, (LoadIntConst, LoadBoolConst)):
+                constants[instruction.dest] = instruction.value
+
+    def has_effects(instruction: Instruction) -> bool:
+        match instruction:
+            case Call() if instruction.fun.name in divisions:
+                return constants.get(instruction.args[1], 0) == 0
+            case Call():
+                return not is_operator(instruction)
+            case Jump() | CondJump() | Return():
+                return True
+        return False
+
+    live: set[int] = set()
+    worklist: list[Instruction] = []
+    for block in cfg.blocks.values():
+        for instruction in block.instructions:
+            if has_effects(instruction):
+                live.add(id(instruction))
+                worklist.append(instruction)
+    while worklist:
+        for source in sources(worklist.pop()):
+            definition = definitions.get(source)
+            if definition is not None and id(definition) not in live:
+                live.add(id(definition))
+                worklist.append(definition)
+    for block in cfg.blocks.values():
+        block.instructions = [instruction for instruction in block.instructions if id(instruction) in live]
+
+def thread_jumps(cfg: ControlFlowGraph) -> None:
+    """Makes jumps to blocks that only jump elsewhere go there directly, and
+    joins each block to the one before it if that is the only way to it."""
+    forward: dict[str, str] = {}
+    for block in cfg.blocks.values():
+        only = block.instructions[0]
+        if len(block.instructions) == 1 and isinstance(only, Jump) and only.label != block.label and block.label != cfg.entry:
+            forward[block.label] = only.label
+
+    def destination_of(label: str) -> str:
+        path = [label]
+        seen = {label}
+        while path[-1] in forward and forward[path[-1]] not in seen:
+            path.append(forward[path[-1]])
+            seen.add(path[-1])
+        # Later jumps to the same chain go straight to its end.
+        for each in path[:-1]:
+            forward[each] = path[-1]
+        return path[-1]
+
+    for block in cfg.blocks.values():
+        last = block.instructions[-1]
+        if isinstance(last, Jump):
+            last.label = destination_of(last.label)
+        elif isinstance(last, CondJump):
+            last.then_label = destination_of(last.then_label)
+            last.else_label = destination_of(last.else_label)
+            if last.then_label == last.else_label:
+                block.instructions[-1] = Jump(last.then_label, position = last.position)
+    relink(cfg)
+
+    for label in list(cfg.blocks):
+        if label not in cfg.blocks:
+            continue
+        block = cfg.blocks[label]
+        # Join the blocks that only this one leads to, as long as there are some.
+        while len(block.successors) == 1:
+            following = cfg.blocks[block.successors[0]]
+            if following.label == cfg.entry or following.predecessors != [block.label] or following is block:
+                break
+            block.instructions[-1:] = following.instructions
+            block.successors = following.successors
+            for successor in following.successors:
+                predecessors = cfg.blocks[successor].predecessors
+                predecessors[predecessors.index(following.label)] = block.label
+            del cfg.blocks[following.label]
@@ -0,0 +1,284 @@
+import ctypes
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Any, Callable
+import compiler.ast as ast
+from compiler.types import Int, Bool
+from compiler.trampoline import Step, trampoline
+
+# A loop is compiled after running this many rounds, counting every time it ran.
+hot_loop_rounds = 1000
+# The C compiler, and where the shared objects it builds are kept, named by the
+# hash of their source code. The cache is the user's own, as whatever is in it
+# gets loaded and run.
+c_compiler = 'cc'
+cache_directory = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'compiler-jit')
+
+Code = Callable[[], Any]
+FrameOf = Callable[[ast.Binding | None], list[Any]]
+
+# What the compiled loop returns: it ended, or it stopped at the start of a
+# round that the interpreter has to run, as integers do not fit in 64 bits in it
+# or it divides by zero.
+finished = 0
+bailed_out = 1
+
+least_int = -2**63
+greatest_int = 2**63 - 1
+
+# Shared objects loaded by this process, by the hash of their source code.
+loaded: dict[str, Any] = {}
+
+def jit_loop(node: ast.While, condition: Code, body: Code, frame_of: FrameOf) -> Code:
+    """The code for 'node', given the code of its condition and body, that counts
+    its rounds. When the loop gets hot, and it only computes with Int and Bool
+    variables, it is compiled to C and the rest of it runs as machine code.
+
+    The compiled loop writes its variables back to their frames at the start of
+    every round. If a round would overflow a 64-bit integer or divide by zero,
+    the loop stops before it, and the interpreter runs it from there, so it
+    computes the same values and raises the same errors. Without a C compiler,
+    or with a loop it can not compile, the loop just keeps running here.
+    """
+    rounds = 0
+    run: Code # what runs the loop next time
+
+    def interpreted() -> Any:
+        while condition():
+            body()
+        return None
+
+    def counting() -> Any:
+        nonlocal rounds, run
+        while condition():
+            body()
+            rounds += 1
+            if rounds >= hot_loop_rounds:
+                native = compile_loop(node, frame_of)
+                if native is None:
+                    run = interpreted
+                    return interpreted()
+                run = compiled(native)
+                return run()
+        return None
+
+    def compiled(native: Callable[[], bool]) -> Code:
+        def run_compiled() -> Any:
+            if not native():
+                interpreted()
+            return None
+        return run_compiled
+
+    run = counting
+    return lambda: run()
+
+def compile_loop(node: ast.While, frame_of: FrameOf) -> Callable[[], bool] | None:
+    """A function that runs 'node' compiled, from the values in the frames, and
+    tells if the loop ended. None if it can not be compiled."""
+    if shutil.which(c_compiler) is None:
+        return None
+    translated = translate_loop(node)
+    if translated is None:
+        return None
+    source_code, variables = translated
+    function = load_function(source_code)
+    if function is None:
+        return None
+    places = [(frame_of(binding), binding.slot, is_bool) for binding, is_bool in variables]
+    values = (ctypes.c_int64 * max(len(places), 1))()
+
+    def run() -> bool:
+        for index, (frame, slot, _) in enumerate(places):
+            value = frame[slot]
+            if not least_int <= value <= greatest_int:
+                return False
+            values[index] = value
+        status = function(values)
+        for index, (frame, slot, is_bool) in enumerate(places):
+            frame[slot] = bool(values[index]) if is_bool else values[index]
+        return status == finished
+    return run
+
+def load_function(source_code: str) -> Any:
+    """The function 'run_loop' of 'source_code' compiled into a shared object,
+    built unless it is in the cache. None if it does not compile."""
+    key = hashlib.sha256(source_code.encode()).hexdigest()
+    if key in loaded:
+        return loaded[key]
+    path = os.path.join(cache_directory, f'{key}.so')
+    try:
+        os.makedirs(cache_directory, mode = 0o700, exist_ok = True)
+        if not owned(cache_directory):
+            return None
+        if not os.path.exists(path):
+            with tempfile.TemporaryDirectory(dir = cache_directory) as directory:
+                source_file = os.path.join(directory, 'loop.c')
+                with open(source_file, 'w') as f:
+                    f.write(source_code)
+                built = os.path.join(directory, 'loop.so')
+                subprocess.run([c_compiler, '-O2', '-shared', '-fPIC', '-o', built, source_file], check = True, capture_output = True)
+                # Others running the same loop may be building it too.
+                os.replace(built, path)
+        if not owned(path):
+            return None
+        function = ctypes.CDLL(path).run_loop
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    function.argtypes = [ctypes.POINTER(ctypes.c_int64)]
+    function.restype = ctypes.c_int
+    loaded[key] = function
+    return function
+
+def owned(path: str) -> bool:
+    """Whether 'path' belongs to this user, and no one else may write to it."""
+    status = os.stat(path)
+    return hasattr(os, 'getuid') and status.st_uid == os.getuid() and not status.st_mode & 0o022
+
+def translate_loop(loop: ast.While) -> tuple[str, list[tuple[ast.Binding, bool]]] | None:
+    """C source code of a function that runs 'loop', and the variables from
+    outside it that it reads and writes, with whether they are Bool. None if
+    the loop calls functions or has variables that are not Int or Bool.
+
+    The variables are given in an array, in the same order.
+    """
+    declared: dict[ast.Binding, None] = {} # in the order they are found
+    used: dict[ast.Binding, bool] = {}
+    stack: list[ast.Expression] = [loop]
+    while stack:
+        node = stack.pop()
+        match node:
+            case ast.FunctionCall():
+                return None
+            case ast.Literal() if type(node.value) is int and not least_int <= node.value <= greatest_int:
+                return None
+            case ast.Identifier():
+                if node.binding is None or (node.type is not Int() and node.type is not Bool()):
+                    return None
+                used[node.binding] = node.type is Bool()
+            case ast.VariableDeclaration():
+                if node.binding is None or (node.value.type is not Int() and node.value.type is not Bool()):
+                    return None
+                declared[node.binding] = None
+                stack.append(node.value)
+                continue
+        stack.extend(ast.children(node))
+    variables = [(binding, is_bool) for binding, is_bool in used.items() if binding not in declared]
+    names: dict[ast.Binding, str] = {}
+    for binding, _ in variables:
+        names[binding] = f'v{len(names)}'
+    for binding in declared:
+        names[binding] = f'v{len(names)}'
+
+    lines: list[str] = []
+    temporaries = 0
+    indent = 1
+
+    def emit(line: str) -> None:
+        lines.append('    ' * indent + line)
+
+    def temporary(value: str | None = None) -> str:
+        nonlocal temporaries
+        temporaries += 1
+        name = f't{temporaries}'
+        emit(f'int64_t {name};' if value is None else f'int64_t {name} = {value};')
+        return name
+
+    def commit() -> None:
+        for index, (binding, _) in enumerate(variables):
+            emit(f'vars[{index}] = {names[binding]};')
+
+    def open_block(line: str) -> None:
+        nonlocal indent
+        emit(line + ' {')
+        indent += 1
+
+    def close_block() -> None:
+        nonlocal indent
+        indent -= 1
+        emit('}')
+
+    def translate(node: ast.Expression) -> Step[str] | str:
+        """Emits 'node' and returns a temporary with its value. Unit is 0."""
+        match node:
+            case ast.Literal():
+                return temporary(str(int(node.value or 0)))
+            case ast.Identifier():
+                return temporary(names[node.binding]) # type: ignore[index]
+            case ast.UnaryOp():
+                right = yield translate(node.right)
+                if node.op == 'not':
+                    return temporary(f'!{right}')
+                emit(f'if ({right} == INT64_MIN) goto bail;')
+                return temporary(f'-{right}')
+            case ast.BinaryOp() if node.op == '=':
+                assert isinstance(node.left, ast.Identifier)
+                right = yield translate(node.right)
+                emit(f'{names[node.left.binding]} = {right};') # type: ignore[index]
+                return right
+            case ast.BinaryOp() if node.op in ['and', 'or']:
+                result = temporary((yield translate(node.left)))
+                open_block(f'if ({result})' if node.op == 'and' else f'if (!{result})')
+                emit(f'{result} = {(yield translate(node.right))};')
+                close_block()
+                return result
+            case ast.BinaryOp():
+                left = yield translate(node.left)
+                right = yield translate(node.right)
+                if node.op in overflow_builtins:
+                    result = temporary()
+                    emit(f'if ({overflow_builtins[node.op]}({left}, {right}, &{result})) goto bail;')
+                    return result
+                if node.op in ['/', '%']:
+                    emit(f'if ({right} == 0 || ({left} == INT64_MIN && {right} == -1)) goto bail;')
+                return temporary(f'{left} {node.op} {right}')
+            case ast.While():
+                open_block('for (;;)')
+                condition = yield translate(node.condition)
+                emit(f'if (!{condition}) break;')
+                yield translate(node.do)
+                if node is loop:
+                    commit()
+                close_block()
+                return temporary('0')
+            case ast.If():
+                result = temporary('0')
+                open_block(f'if ({(yield translate(node.condition))})')
+                then_value = yield translate(node.then_branch)
+                if node.else_branch is not None:
+                    emit(f'{result} = {then_value};')
+                    close_block()
+                    open_block('else')
+                    emit(f'{result} = {(yield translate(node.else_branch))};')
+                close_block()
+                return result
+            case ast.VariableDeclaration():
+                emit(f'{names[node.binding]} = {(yield translate(node.value))};') # type: ignore[index]
+                return temporary('0')
+            case ast.Block():
+                last: str | None = None
+                for statement in node.statements:
+                    last = yield translate(statement)
+                return last if last is not None else temporary('0')
+        raise Exception(f'{node.position}: Can not compile {type(node).__name__} to C')
+
+    trampoline(translate(loop))
+    body = lines
+    lines = ['int run_loop(int64_t *vars) {']
+    for index, (binding, _) in enumerate(variables):
+        emit(f'int64_t {names[binding]} = vars[{index}];')
+    for binding in declared:
+        emit(f'int64_t {names[binding]} = 0;')
+    lines.extend(body)
+    # Assignments in the condition that ended the loop are written back too.
+    commit()
+    emit(f'return {finished};')
+    lines.append('bail:')
+    emit(f'return {bailed_out};')
+    lines.append('}')
+    return "#include <stdint.h>\n\n" + "\n".join(lines) + "\n", variables
+
+# The operators that can overflow, and the GCC builtins that check for it.
+overflow_builtins = {'+': '__builtin_add_overflow', '-': '__builtin_sub_overflow', '*': '__builtin_mul_overflow'}
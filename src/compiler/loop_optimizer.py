@@ -0,0 +1,508 @@
+import copy
+from dataclasses import dataclass
+from typing import Callable
+import compiler.ast as ast
+from compiler.types import Unit, Int, Bool
+from compiler.resolver import resolve
+from compiler.trampoline import Step, trampoline
+from compiler.interpreter import operands
+from compiler.ir_interpreter import operators
+from compiler.ast_optimizer import count_nodes
+
+# Every 'while' is a natural loop: its condition is the header, and the end
+# of its body jumps back to it. Loops nest like the tree does, so each pass
+# walks the tree with the loops around the current node on a stack.
+
+@dataclass
+class LoopOptions:
+    """Which loop optimizations 'optimize_loops' does."""
+    licm: bool = True # loop-invariant code motion
+    strength_reduction: bool = True
+    unroll: bool = True
+
+unroll_factor = 4
+max_unrolled_nodes = 256 # how large an unrolled body may get
+
+def optimize_loops(root: ast.Expression, options: LoopOptions = LoopOptions()) -> ast.Expression:
+    """Optimizes the loops in the typechecked tree under 'root', and returns the
+    new root. New variables get names that the program does not use."""
+    if options.licm:
+        root = hoist_invariants(root)
+    if options.strength_reduction:
+        root = reduce_strength(root)
+    if options.unroll:
+        root = unroll_loops(root)
+    return root
+
+def replace_operands(node: ast.Expression, new: list[ast.Expression]) -> None:
+    """Sets the operands of 'node', in the order 'operands' gives them."""
+    match node:
+        case ast.UnaryOp():
+            [node.right] = new
+        case ast.BinaryOp():
+            [node.left, node.right] = new
+        case ast.While():
+            [node.condition, node.do] = new
+        case ast.If():
+            node.condition, node.then_branch = new[0], new[1]
+            node.else_branch = new[2] if len(new) > 2 else None
+        case ast.FunctionCall():
+            node.name, node.arguments = new[0], new[1:]
+        case ast.VariableDeclaration():
+            [node.value] = new
+        case ast.Block():
+            node.statements = new
+
+def clone(node: ast.Expression) -> ast.Expression:
+    """A copy of the tree under 'node' that shares no nodes with it. Only small
+    trees are copied, so this recurses."""
+    result = copy.copy(node)
+    if isinstance(result, ast.VariableDeclaration):
+        result.name = copy.copy(result.name)
+    replace_operands(result, [clone(operand) for operand in operands(node)])
+    return result
+
+def name_generator(root: ast.Expression) -> Callable[[str], str]:
+    """A function that returns a new name starting with the prefix it is given
+    each time, unlike every name under 'root'."""
+    taken = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Identifier):
+            taken.add(node.name)
+        stack += ast.children(node)
+    counts: dict[str, int] = {}
+
+    def fresh(prefix: str) -> str:
+        while True:
+            counts[prefix] = counts.get(prefix, 0) + 1
+            name = f'{prefix}{counts[prefix]}'
+            if name not in taken:
+                taken.add(name)
+                return name
+
+    return fresh
+
+def typed(node: ast.Expression, type: Int | Bool | Unit) -> ast.Expression:
+    node.type = type
+    return node
+
+def variable(name: str, node: ast.Expression) -> ast.Identifier:
+    """A read of the variable 'name', with the type of 'node'."""
+    return ast.Identifier(name, position = node.position, type = node.type)
+
+def declaration(name: str, value: ast.Expression) -> ast.VariableDeclaration:
+    declared = ast.VariableDeclaration(variable(name, value), None, value, position = value.position)
+    declared.type = Unit()
+    return declared
+
+def assignment(name: str, value: ast.Expression) -> ast.BinaryOp:
+    return ast.BinaryOp(variable(name, value), '=', value, position = value.position, type = value.type)
+
+def preceded_by(loop: ast.While, statements: list[ast.Expression], wrappers: set[int]) -> ast.Expression:
+    """'loop' after 'statements', in a block of their own. The ids of such blocks
+    go in 'wrappers', for 'splice'."""
+    if not statements:
+        return loop
+    block = ast.Block([*statements, loop], position = loop.position, type = Unit())
+    wrappers.add(id(block))
+    return block
+
+def splice(statements: list[ast.Expression], wrappers: set[int]) -> list[ast.Expression]:
+    """'statements' with the blocks of 'preceded_by' in them replaced by their
+    statements. Their declarations are of new names, so they can go in any block."""
+    result: list[ast.Expression] = []
+    for statement in statements:
+        if id(statement) in wrappers:
+            result += statement.statements # type: ignore[attr-defined]
+        else:
+            result.append(statement)
+    return result
+
+def assigned_variables(root: ast.Expression) -> dict[int, set[ast.Binding]]:
+    """The variables assigned to in each loop under 'root', by the id of the loop,
+    also in the loops in it."""
+    assigned: dict[int, set[ast.Binding]] = {}
+    loops: list[ast.While] = []
+    stack: list[ast.Expression | None] = [root] # None closes the innermost loop
+    while stack:
+        node = stack.pop()
+        if node is None:
+            loops.pop()
+            continue
+        if isinstance(node, ast.While):
+            assigned[id(node)] = set()
+            loops.append(node)
+            stack.append(None)
+        elif isinstance(node, ast.BinaryOp) and node.op == '=' and isinstance(node.left, ast.Identifier) and node.left.binding is not None:
+            for loop in loops:
+                assigned[id(loop)].add(node.left.binding)
+        stack += operands(node)
+    return assigned
+
+class LoopNest:
+    """The loops around the node a walk is at, and what it takes for a variable
+    to keep its value in them. Variables declared inside a loop, or assigned to
+    in it, may change from one round of the loop to the next."""
+
+    def __init__(self, root: ast.Expression) -> None:
+        resolve(root)
+        self.assigned = assigned_variables(root)
+        self.loops: list[ast.While] = []
+        # How many loops are around the declaration of each variable seen so far.
+        # Blocks reuse bindings, but only after the variables that had them are gone.
+        self.declared_in: dict[ast.Binding, int] = {}
+
+    def declare(self, node: ast.VariableDeclaration) -> None:
+        if node.binding is not None:
+            self.declared_in[node.binding] = len(self.loops)
+
+    def level(self, binding: ast.Binding | None) -> int:
+        """How many of the loops around, from the outermost, the variable may
+        change in. It keeps its value in the rest."""
+        if binding is None:
+            return len(self.loops)
+        for index in reversed(range(len(self.loops))):
+            if binding in self.assigned[id(self.loops[index])]:
+                return max(index + 1, self.declared_in.get(binding, 0))
+        return self.declared_in.get(binding, 0)
+
+def can_hoist(node: ast.Expression) -> bool:
+    """Whether evaluating 'node' does nothing but compute a value, given that its
+    operands do the same, so it can run once before a loop instead of in it even
+    if the loop would not run it at all."""
+    match node:
+        case ast.UnaryOp():
+            return True
+        case ast.BinaryOp() if node.op in ['/', '%']:
+            return isinstance(node.right, ast.Literal) and node.right.value != 0
+        case ast.BinaryOp():
+            return node.op != '='
+    return False
+
+def hoist_invariants(root: ast.Expression) -> ast.Expression:
+    """Moves the expressions in loops whose value is the same every round out
+    of as many loops as possible, computing each one before the loop into a new
+    variable. The same expression appearing many times is computed once.
+
+    Only expressions that can not fail or have effects move, so the program
+    still does what it did even if the loop does not run.
+    """
+    nest = LoopNest(root)
+    fresh = name_generator(root)
+    # The declarations to put before each loop, and the variables already holding an expression.
+    hoisted: dict[int, list[ast.Expression]] = {}
+    wrappers: set[int] = set()
+    holders: dict[tuple[int, int], str] = {}
+    # Each expression that can move has a number, the same for the same expression.
+    numbers: dict[tuple[object, ...], int] = {}
+
+    def number(key: tuple[object, ...]) -> int:
+        return numbers.setdefault(key, len(numbers))
+
+    def hoist(node: ast.Expression, level: int, expression: int) -> ast.Expression:
+        loop = nest.loops[level]
+        name = holders.get((id(loop), expression))
+        if name is None:
+            name = holders[(id(loop), expression)] = fresh('invariant')
+            hoisted.setdefault(id(loop), []).append(declaration(name, node))
+        return variable(name, node)
+
+    # Each node becomes the new node, the level of 'LoopNest', and the number
+    # of its expression if it could move.
+    def step(node: ast.Expression) -> Step[tuple[ast.Expression, int, int | None]] | tuple[ast.Expression, int, int | None]:
+        match node:
+            case ast.Literal():
+                return node, 0, number(('literal', type(node.value), node.value))
+            case ast.Identifier():
+                return node, nest.level(node.binding), number(('variable', node.binding))
+        return walk(node)
+
+    def walk(node: ast.Expression) -> Step[tuple[ast.Expression, int, int | None]]:
+        if isinstance(node, ast.While):
+            nest.loops.append(node)
+        results = []
+        for operand in operands(node):
+            results.append((yield step(operand)))
+        depth = len(nest.loops)
+        level = max((each_level for _, each_level, _ in results), default = 0)
+        expression = None
+        if can_hoist(node) and all(each is not None for _, _, each in results):
+            expression = number((type(node), getattr(node, 'op'), *(each for _, _, each in results)))
+        movable = expression is not None and level < depth
+        new = []
+        for operand, operand_level, operand_expression in results:
+            # The largest expressions that can move, move: not the parts of one that moves as far.
+            leaf = isinstance(operand, (ast.Literal, ast.Identifier))
+            if not leaf and operand_expression is not None and operand_level < depth and not (movable and operand_level == level):
+                operand = hoist(operand, operand_level, operand_expression)
+            new.append(operand)
+        replace_operands(node, splice(new, wrappers) if isinstance(node, ast.Block) else new)
+        if isinstance(node, ast.VariableDeclaration):
+            nest.declare(node)
+        if isinstance(node, ast.While):
+            nest.loops.pop()
+            return preceded_by(node, hoisted.pop(id(node), []), wrappers), level, None
+        return node, level, expression
+
+    new_root, _, _ = trampoline(step(root))
+    return new_root
+
+def reduce_strength(root: ast.Expression) -> ast.Expression:
+    """Replaces multiplications of an induction variable by a value the same in
+    the loop, like 'i * 4', by a new variable that is kept equal to them by an
+    addition next to the one to the induction variable.
+
+    An induction variable of a loop is declared outside it, and assigned only
+    once in it, by a statement of its body like 'i = i + c' or 'i = i - c',
+    where 'c' is the same in every round.
+    """
+    nest = LoopNest(root)
+    fresh = name_generator(root)
+    # The assignment to each induction variable of each loop, and the step in it.
+    inductions: dict[int, dict[ast.Binding, tuple[ast.Expression, str, ast.Expression]]] = {}
+    # The variable kept equal to each product, by the loop, variable and factor.
+    products: dict[tuple[int, ast.Binding, object], str] = {}
+    # The declarations before each loop, and the updates after the assignments in it.
+    before: dict[int, list[ast.Expression]] = {}
+    after: dict[int, list[tuple[ast.Expression, ast.Expression]]] = {}
+    wrappers: set[int] = set()
+
+    def invariant(node: ast.Expression, index: int) -> bool:
+        """Whether 'node' has the same value in every round of the loop 'index'."""
+        if isinstance(node, ast.Literal):
+            return node.type is Int()
+        return isinstance(node, ast.Identifier) and nest.level(node.binding) <= index
+
+    def find_inductions(loop: ast.While) -> None:
+        found: dict[ast.Binding, tuple[ast.Expression, str, ast.Expression]] = {}
+        index = len(nest.loops) - 1
+        statements = loop.do.statements if isinstance(loop.do, ast.Block) else []
+        for statement in statements:
+            match statement:
+                case ast.BinaryOp(left = ast.Identifier(binding = binding), op = '=', right = ast.BinaryOp(op = '+' | '-' as op, left = left, right = right)):
+                    if binding is None or statement.type is not Int() or nest.declared_in.get(binding, 0) > index:
+                        continue
+                    if isinstance(left, ast.Identifier) and left.binding == binding and invariant(right, index):
+                        found[binding] = (statement, op, right)
+                    elif op == '+' and isinstance(right, ast.Identifier) and right.binding == binding and invariant(left, index):
+                        found[binding] = (statement, op, left)
+        # Assigned anywhere else in the loop, the variable is not one.
+        counts: dict[ast.Binding, int] = {}
+        stack: list[ast.Expression] = [loop]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast.BinaryOp) and node.op == '=' and isinstance(node.left, ast.Identifier) and node.left.binding in found:
+                counts[node.left.binding] = counts.get(node.left.binding, 0) + 1
+            stack += operands(node)
+        inductions[id(loop)] = {binding: each for binding, each in found.items() if counts[binding] == 1}
+
+    def factor_key(node: ast.Expression) -> object:
+        return node.value if isinstance(node, ast.Literal) else node.binding # type: ignore[attr-defined]
+
+    def reduce(node: ast.BinaryOp, induction: ast.Identifier, factor: ast.Expression) -> ast.Expression | None:
+        assert induction.binding is not None
+        # The loop to reduce in is the innermost one that assigns to the variable.
+        index = len(nest.loops) - 1
+        while index >= 0 and induction.binding not in nest.assigned[id(nest.loops[index])]:
+            index -= 1
+        if index < 0 or not invariant(factor, index):
+            return None
+        loop = nest.loops[index]
+        found = inductions[id(loop)].get(induction.binding)
+        if found is None:
+            return None
+        key = (id(loop), induction.binding, factor_key(factor))
+        name = products.get(key)
+        if name is None:
+            name = products[key] = fresh('reduced')
+            assignment_node, op, increment = found
+            initial = ast.BinaryOp(clone(induction), '*', clone(factor), position = node.position, type = Int(), overload = node.overload)
+            declarations = before.setdefault(id(loop), [])
+            declarations.append(declaration(name, initial))
+            if isinstance(increment, ast.Literal) and isinstance(factor, ast.Literal):
+                amount: ast.Expression = typed(ast.Literal(increment.value * factor.value, position = increment.position), Int()) # type: ignore[operator]
+            else:
+                # The step is the same in every round, so it is computed before the loop.
+                product = ast.BinaryOp(clone(increment), '*', clone(factor), position = increment.position, type = Int(), overload = node.overload)
+                step_name = fresh('step')
+                declarations.append(declaration(step_name, product))
+                amount = variable(step_name, product)
+            update = ast.BinaryOp(variable(name, node), op, amount, position = assignment_node.position, type = Int(), overload = assignment_node.right.overload) # type: ignore[attr-defined]
+            after.setdefault(id(loop), []).append((assignment_node, assignment(name, update)))
+        return variable(name, node)
+
+    def step(node: ast.Expression) -> Step[ast.Expression] | ast.Expression:
+        if isinstance(node, (ast.Literal, ast.Identifier)):
+            return node
+        return walk(node)
+
+    def walk(node: ast.Expression) -> Step[ast.Expression]:
+        if isinstance(node, ast.While):
+            nest.loops.append(node)
+            find_inductions(node)
+        new = []
+        for operand in operands(node):
+            new.append((yield step(operand)))
+        replace_operands(node, splice(new, wrappers) if isinstance(node, ast.Block) else new)
+        if isinstance(node, ast.VariableDeclaration):
+            nest.declare(node)
+        if isinstance(node, ast.BinaryOp) and node.op == '*' and nest.loops:
+            for induction, factor in [(node.left, node.right), (node.right, node.left)]:
+                if isinstance(induction, ast.Identifier) and induction.binding is not None:
+                    reduced = reduce(node, induction, factor)
+                    if reduced is not None:
+                        return reduced
+        if isinstance(node, ast.While):
+            nest.loops.pop()
+            updates = after.pop(id(node), [])
+            if updates:
+                assert isinstance(node.do, ast.Block)
+                statements: list[ast.Expression] = []
+                for statement in node.do.statements:
+                    statements.append(statement)
+                    statements += [update for assigned, update in updates if assigned is statement]
+                node.do.statements = statements
+            return preceded_by(node, before.pop(id(node), []), wrappers)
+        return node
+
+    return trampoline(step(root))
+
+flipped = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+def trip_count(op: str, start: int, limit: int, step: int) -> int | None:
+    """How many rounds a loop like 'var i = start; while i op limit do { ...; i = i + step }'
+    runs, or None if it never ends."""
+    if not operators[op](start, limit):
+        return 0
+    match op:
+        case '<' if step > 0:
+            return -((start - limit) // step)
+        case '<=' if step > 0:
+            return (limit - start) // step + 1
+        case '>' if step < 0:
+            return -((limit - start) // -step)
+        case '>=' if step < 0:
+            return (start - limit) // -step + 1
+    return None # stepping away from the limit
+
+def unroll_loops(root: ast.Expression) -> ast.Expression:
+    """Unrolls the loops that count a variable from one constant to another by a
+    constant step, so that they check their condition less often.
+
+    The variable must be set to the start right before the loop, apart from
+    declarations that do not assign to it, and the loop must assign to it only
+    in a statement of its body like 'i = i + 1'. If all the rounds together
+    are small enough, the loop becomes that many copies of its body. Otherwise,
+    if the body is small, it is repeated 'unroll_factor' times in the loop, and
+    the rounds left over run before the loop.
+    """
+    resolve(root)
+
+    def counter_of(loop: ast.While) -> tuple[ast.Identifier, str, int] | None:
+        """The variable, the comparison and the limit in the condition of 'loop'."""
+        match loop.condition:
+            case ast.BinaryOp(left = ast.Identifier() as counter, op = '<' | '<=' | '>' | '>=' as op, right = ast.Literal(value = int() as limit)) if limit is not True and limit is not False:
+                return counter, op, limit
+            case ast.BinaryOp(left = ast.Literal(value = int() as limit), op = '<' | '<=' | '>' | '>=' as op, right = ast.Identifier() as counter) if limit is not True and limit is not False:
+                return counter, flipped[op], limit
+        return None
+
+    def assigns(node: ast.Expression, binding: ast.Binding) -> int:
+        """How many times 'binding' is assigned to in the tree under 'node'."""
+        count = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast.BinaryOp) and node.op == '=' and isinstance(node.left, ast.Identifier) and node.left.binding == binding:
+                count += 1
+            stack += operands(node)
+        return count
+
+    def start_of(binding: ast.Binding, before: list[ast.Expression]) -> int | None:
+        """The value the statements 'before' a loop last set the variable to."""
+        for statement in reversed(before):
+            match statement:
+                case ast.VariableDeclaration(value = ast.Literal(value = int() as start)) if statement.binding == binding and type(start) is int:
+                    return start
+                case ast.BinaryOp(left = ast.Identifier(binding = target), op = '=', right = ast.Literal(value = int() as start)) if target == binding and type(start) is int:
+                    return start
+                case ast.VariableDeclaration() if assigns(statement.value, binding) == 0:
+                    continue
+            return None
+        return None
+
+    def step_of(loop: ast.While, binding: ast.Binding) -> int | None:
+        """How much the only assignment to the variable in 'loop' adds to it."""
+        statements = loop.do.statements if isinstance(loop.do, ast.Block) else [loop.do]
+        found = None
+        for statement in statements:
+            match statement:
+                case ast.BinaryOp(left = ast.Identifier(binding = target), op = '=', right = ast.BinaryOp(left = left, op = '+' | '-' as op, right = right)) if target == binding:
+                    match left, right:
+                        case ast.Identifier(binding = same), ast.Literal(value = int() as amount) if same == binding and type(amount) is int:
+                            found = amount if op == '+' else -amount
+                        case ast.Literal(value = int() as amount), ast.Identifier(binding = same) if op == '+' and same == binding and type(amount) is int:
+                            found = amount
+        if found is None or assigns(loop, binding) != 1:
+            return None
+        return found
+
+    def unroll(loop: ast.While, before: list[ast.Expression]) -> list[ast.Expression] | None:
+        """What replaces 'loop', which comes after the statements 'before' it in a block."""
+        found = counter_of(loop)
+        if found is None or found[0].binding is None:
+            return None
+        counter, op, limit = found
+        start = start_of(counter.binding, before) # type: ignore[arg-type]
+        if start is None:
+            return None
+        step = step_of(loop, counter.binding) # type: ignore[arg-type]
+        if step is None:
+            return None
+        trips = trip_count(op, start, limit, step)
+        if not trips:
+            return None
+        size = count_nodes(loop.do)
+        if trips * size <= max_unrolled_nodes:
+            return copies(loop.do, trips)
+        if size * unroll_factor > max_unrolled_nodes:
+            return None
+        body = ast.Block(copies(loop.do, unroll_factor), position = loop.do.position, type = loop.do.type)
+        rest = copies(loop.do, trips % unroll_factor)
+        loop.do = body
+        return [*rest, loop]
+
+    def copies(body: ast.Expression, count: int) -> list[ast.Expression]:
+        """Statements that run 'body' 'count' times. The statements of a body that
+        declares nothing go straight in the block they are put in."""
+        if isinstance(body, ast.Block) and not any(isinstance(each, ast.VariableDeclaration) for each in body.statements):
+            return [statement for _ in range(count) for statement in clone(body).statements] # type: ignore[attr-defined]
+        return [clone(body) for _ in range(count)]
+
+    def step(node: ast.Expression) -> Step[ast.Expression] | ast.Expression:
+        if isinstance(node, (ast.Literal, ast.Identifier)):
+            return node
+        return walk(node)
+
+    def walk(node: ast.Expression) -> Step[ast.Expression]:
+        # Loops in loops are unrolled first.
+        new = []
+        for operand in operands(node):
+            new.append((yield step(operand)))
+        replace_operands(node, new)
+        if isinstance(node, ast.Block):
+            statements: list[ast.Expression] = []
+            for index, statement in enumerate(node.statements):
+                unrolled = unroll(statement, statements) if isinstance(statement, ast.While) else None
+                if unrolled is None:
+                    statements.append(statement)
+                    continue
+                statements += unrolled
+                if index == len(node.statements) - 1 and not isinstance(unrolled[-1], ast.While):
+                    statements.append(typed(ast.Literal(None, position = statement.position), Unit()))
+            node.statements = statements
+        return node
+
+    return trampoline(step(root))
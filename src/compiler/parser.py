@@ -1,212 +1,330 @@
 
+from typing import Callable, Generic, Protocol, TypeVar
 import compiler.ast as ast
-from compiler.tokenizer import Token, Type, Position
+from compiler.trampoline import Step, trampoline
+from compiler.tokenizer import Token, TokenStream, Type, Position, PUNCTUATION, OPERATOR, INT_LITERAL, BOOL_LITERAL, KEYWORD, IDENTIFIER, END
 
-def parse(tokens: list[Token]) -> ast.Expression:
+N = TypeVar('N')
 
-    left_associative_binary_operators = [
-        ['*', '/', '%'],
-        ['+', '-'],
-        ['<', '<=', '>', '>='],
-        ['==', '!='],
-        ['and'],
-        ['or']
-    ]
-    lowest_precedence = len(left_associative_binary_operators)
+# Token index given as the position of nodes that do not start at a token,
+# i.e. the block around top-level expressions. It stands for line 1, column 1.
+START = -1
+
+class Builder(Protocol, Generic[N]):
+    """Makes the nodes the parser produces, one method per kind of node.
+    
+    Positions are given as token indices: the node is at the token with that index,
+    at the end of input if the index equals the number of tokens, or at START.
+    """
+    def literal(self, value: int | bool | None, token: int) -> N: ...
+    def identifier(self, name: str, token: int) -> N: ...
+    def unary_op(self, op: str, right: N, token: int) -> N: ...
+    def binary_op(self, left: N, op: str, right: N, token: int) -> N: ...
+    def while_expression(self, condition: N, do: N, token: int) -> N: ...
+    def if_expression(self, condition: N, then_branch: N, else_branch: N | None, token: int) -> N: ...
+    def function_call(self, name: N, arguments: list[N], token: int) -> N: ...
+    def variable_declaration(self, name: N, type_exp: N | None, value: N, token: int) -> N: ...
+    def block(self, statements: list[N], token: int) -> N: ...
+
+class TreeBuilder:
+    """Builds the tree of ast.Expression dataclasses."""
+    
+    def __init__(self, stream: TokenStream) -> None:
+        self.stream = stream
+        self.length = len(stream)
+    
+    def position(self, token: int) -> Position:
+        if 0 <= token < self.length:
+            return self.stream.position(token)
+        if token == START or self.length == 0:
+            return Position(1, 1)
+        return self.stream.position(self.length - 1)
+    
+    def literal(self, value: int | bool | None, token: int) -> ast.Expression:
+        return ast.Literal(value = value, position = self.position(token))
+    
+    def identifier(self, name: str, token: int) -> ast.Expression:
+        return ast.Identifier(name = name, position = self.position(token))
+    
+    def unary_op(self, op: str, right: ast.Expression, token: int) -> ast.Expression:
+        return ast.UnaryOp(op = op, right = right, position = self.position(token))
+    
+    def binary_op(self, left: ast.Expression, op: str, right: ast.Expression, token: int) -> ast.Expression:
+        return ast.BinaryOp(left = left, op = op, right = right, position = self.position(token))
+    
+    def while_expression(self, condition: ast.Expression, do: ast.Expression, token: int) -> ast.Expression:
+        return ast.While(condition = condition, do = do, position = self.position(token))
+    
+    def if_expression(self, condition: ast.Expression, then_branch: ast.Expression, else_branch: ast.Expression | None, token: int) -> ast.Expression:
+        return ast.If(condition = condition, then_branch = then_branch, else_branch = else_branch, position = self.position(token))
+    
+    def function_call(self, name: ast.Expression, arguments: list[ast.Expression], token: int) -> ast.Expression:
+        return ast.FunctionCall(name = name, arguments = arguments, position = self.position(token))
+    
+    def variable_declaration(self, name: ast.Expression, type_exp: ast.Expression | None, value: ast.Expression, token: int) -> ast.Expression:
+        assert isinstance(name, ast.Identifier) and (type_exp is None or isinstance(type_exp, ast.Identifier))
+        return ast.VariableDeclaration(name = name, type_exp = type_exp, value = value, position = self.position(token))
+    
+    def block(self, statements: list[ast.Expression], token: int) -> ast.Expression:
+        return ast.Block(statements = statements, position = self.position(token))
+
+def parse(tokens: TokenStream | list[Token]) -> ast.Expression:
+    return parse_with(tokens, TreeBuilder)
+
+def parse_with(tokens: TokenStream | list[Token], make_builder: Callable[[TokenStream], Builder[N]]) -> N:
+    """Parses 'tokens' into the nodes that 'make_builder(stream)' makes."""
+
+    # Binding powers of binary operators: the higher, the tighter the operator binds.
+    # All are left-associative except '=', which binds the weakest.
+    binding_powers = {
+        '=': 1,
+        'or': 2,
+        'and': 3,
+        '==': 4, '!=': 4,
+        '<': 5, '<=': 5, '>': 5, '>=': 5,
+        '+': 6, '-': 6,
+        '*': 7, '/': 7, '%': 7,
+    }
+    lowest_binding_power = 1
+    prefix_operators = ['-', 'not']
+    prefix_binding_power = 8 # tighter than any binary operator
+    leaf_kinds = (INT_LITERAL, BOOL_LITERAL, IDENTIFIER)
+    
+    stream = tokens if isinstance(tokens, TokenStream) else TokenStream.from_tokens(tokens)
+    build = make_builder(stream)
+    kinds = stream.kinds
+    content = stream.content
+    length = len(stream)
+    end_position = stream.position(length - 1) if length else Position(1, 1)
     
     index = 0
-    previous = None
+    previous: int | None = None # index of the last consumed token
     
-    def peek() -> Token:
-        if not index < len(tokens):
-            if tokens:
-                return Token(Type.END, "end of input", tokens[-1].position)
-            else:
-                return Token(Type.END, "end of input")
-        return tokens[index]
+    def peek_type() -> Type:
+        return stream.type(index) if index < length else Type.END
+    
+    def peek_content() -> str:
+        return content(index) if index < length else "end of input"
     
-    # 'consume(expected)' returns the token at 'pos'
-    # and moves 'pos' forward.
+    def peek_position() -> Position:
+        return stream.position(index) if index < length else end_position
+    
+    def peek_is(kind: int, text: str) -> bool:
+        return index < length and kinds[index] == kind and content(index) == text
+    
+    def previous_is_closing_brace() -> bool:
+        return previous is not None and previous < length and kinds[previous] == PUNCTUATION and content(previous) == "}"
+    
+    # 'consume(expected)' returns the index of the token at 'index'
+    # and moves 'index' forward.
     #
     # If the optional parameter 'expected' is given,
     # it checks that the token being consumed has that text.
     # If 'expected' is a list, then the token must have
     # one of the texts in the list.
-    def consume(expected: str | list[str] | None = None) -> Token:
+    def consume(expected: str | list[str] | None = None) -> int:
         nonlocal index, previous
-        token = peek()
-        if isinstance(expected, str) and token.content != expected:
-            raise SyntaxError(f'{token.position}: expected "{expected}" instead of "{token.content}"')
-        if isinstance(expected, list) and token.content not in expected:
-            comma_separated = ", ".join([f'"{e}"' for e in expected])
-            raise SyntaxError(f'{token.position}: expected one of: {comma_separated} instead of "{token.content}"')
+        if expected is not None:
+            text = peek_content()
+            if isinstance(expected, str) and text != expected:
+                raise SyntaxError(f'{peek_position()}: expected "{expected}" instead of "{text}"')
+            if isinstance(expected, list) and text not in expected:
+                comma_separated = ", ".join([f'"{e}"' for e in expected])
+                raise SyntaxError(f'{peek_position()}: expected one of: {comma_separated} instead of "{text}"')
+        consumed = index
         index += 1
-        previous = token
-        return token
-
-    def parse_int_literal() -> ast.Literal:
-        if not peek().type == Type.INT_LITERAL:
-            raise SyntaxError(f'{peek().position}: expected integer literal instead of "{peek().content}"')
+        previous = consumed
+        return consumed
+    
+    def parse_int_literal() -> N:
+        if not peek_type() == Type.INT_LITERAL:
+            raise SyntaxError(f'{peek_position()}: expected integer literal instead of "{peek_content()}"')
         token = consume()
-        return ast.Literal(value = int(token.content), position = token.position)
+        return build.literal(int(content(token)), token)
     
-    def parse_bool_literal() -> ast.Literal:
-        if not peek().type == Type.BOOL_LITERAL:
-            raise SyntaxError(f'{peek().position}: expected boolean literal instead of "{peek().content}"')
+    def parse_bool_literal() -> N:
+        if not peek_type() == Type.BOOL_LITERAL:
+            raise SyntaxError(f'{peek_position()}: expected boolean literal instead of "{peek_content()}"')
         token = consume(["true", "false"])
-        return ast.Literal(value = token.content == "true", position = token.position)
+        return build.literal(content(token) == "true", token)
     
-    def parse_identifier() -> ast.Identifier:
-        if not peek().type == Type.IDENTIFIER:
-            raise SyntaxError(f'{peek().position}: expected identifier instead of "{peek().content}"')
+    def parse_identifier() -> N:
+        if not peek_type() == Type.IDENTIFIER:
+            raise SyntaxError(f'{peek_position()}: expected identifier instead of "{peek_content()}"')
         token = consume()
-        return ast.Identifier(name = token.content, position = token.position)
-    
-    def parse_block() -> ast.Expression:
-        position = consume("{").position
-        statements = []
-        if peek().content != '}':
-            statements.append(parse_expression(True))
-            while peek().content != '}':
-                if previous and previous != Token(Type.PUNCTUATION, "}"):
+        return build.identifier(content(token), token)
+    
+    # Everything below that can nest is a Step: sub-expressions are parsed
+    # by yielding their Step, so that nesting depth is not limited by the call stack.
+    
+    def parse_block() -> Step[N]:
+        token = consume("{")
+        statements: list[N] = []
+        if peek_content() != '}':
+            statements.append((yield parse_expression(True)))
+            while peek_content() != '}':
+                if previous is not None and not previous_is_closing_brace():
                     consume(";")
-                    if peek().type == Type.PUNCTUATION and peek().content == '}':
-                        statements.append(ast.Literal(value = None, position = previous.position))
+                    if peek_is(PUNCTUATION, '}'):
+                        statements.append(build.literal(None, previous))
                         break
-                elif peek().type == Type.PUNCTUATION and peek().content == ';':
-                    position_ = consume(";").position
-                    if peek().type == Type.PUNCTUATION and peek().content == '}':
-                        statements.append(ast.Literal(value = None, position = position_))
+                elif peek_is(PUNCTUATION, ';'):
+                    semicolon = consume(";")
+                    if peek_is(PUNCTUATION, '}'):
+                        statements.append(build.literal(None, semicolon))
                         break
-                statements.append(parse_expression(True))
+                statements.append((yield parse_expression(True)))
         consume("}")
-        return ast.Block(statements = statements, position = position)
+        return build.block(statements, token)
     
-    def parse_parentheses() -> ast.Expression:
+    def parse_parentheses() -> Step[N]:
         consume("(")
-        exp = parse_expression(False)
+        exp = yield parse_expression(False)
         consume(")")
         return exp
     
-    def parse_function_call(name: ast.Expression) -> ast.Expression:
-        position = consume("(").position
-        arguments = []
-        if peek().content != ')':
-            arguments.append(parse_expression(False))
-            while peek().type == Type.PUNCTUATION and peek().content == ',':
+    def parse_function_call(name: N) -> Step[N]:
+        token = consume("(")
+        arguments: list[N] = []
+        if peek_content() != ')':
+            arguments.append((yield parse_expression(False)))
+            while peek_is(PUNCTUATION, ','):
                 consume(",")
-                arguments.append(parse_expression(False))
+                arguments.append((yield parse_expression(False)))
         consume(")")
-        return ast.FunctionCall(name = name, arguments = arguments, position = position)
-    
-    def parse_term() -> ast.Expression:
-        exp = None
-        if peek().type == Type.PUNCTUATION and peek().content == '{':
-            exp = parse_block()
-        elif peek().type == Type.PUNCTUATION and peek().content == '(':
-            exp = parse_parentheses()
-        elif peek().type == Type.INT_LITERAL:
+        return build.function_call(name, arguments, token)
+    
+    def parse_term() -> Step[N]:
+        kind = kinds[index] if index < length else END
+        if kind == PUNCTUATION and content(index) == '{':
+            exp = yield parse_block()
+        elif kind == PUNCTUATION and content(index) == '(':
+            exp = yield parse_parentheses()
+        elif kind == INT_LITERAL:
             exp = parse_int_literal() # do not allow in function calls?
-        elif peek().type == Type.BOOL_LITERAL:
+        elif kind == BOOL_LITERAL:
             exp = parse_bool_literal() # do not allow in function calls?
-        elif peek().type == Type.IDENTIFIER:
+        elif kind == IDENTIFIER:
             exp = parse_identifier()
         else:
-            raise SyntaxError(f'{peek().position}: expected expression instead of "{peek().content}"')
-        while peek().type == Type.PUNCTUATION and peek().content == '(':
-            exp = parse_function_call(exp)
+            raise SyntaxError(f'{peek_position()}: expected expression instead of "{peek_content()}"')
+        while peek_is(PUNCTUATION, '('):
+            exp = yield parse_function_call(exp)
         return exp
 
-    def parse_while_expression():
-        if peek().type == Type.KEYWORD and peek().content == "while":
-            position = consume("while").position
-            condition = parse_expression(False)
-            consume("do")
-            do = parse_expression(False)
-            return ast.While(condition = condition, do = do, position = position)
-        else:
-            return parse_term()
-    
-    def parse_if_expression() -> ast.Expression:
-        if peek().type == Type.KEYWORD and peek().content == "if":
-            position = consume("if").position
-            condition = parse_expression(False)
-            consume("then")
-            then_branch = parse_expression(False)
-            if peek().type == Type.KEYWORD and peek().content == "else":
-                consume("else")
-                return ast.If(condition = condition, then_branch = then_branch, else_branch = parse_expression(False), position = position)
-            else:
-                return ast.If(condition = condition, then_branch = then_branch, else_branch = None, position = position)
-        else:
-            return parse_while_expression()
+    def parse_while_expression() -> Step[N]:
+        token = consume("while")
+        condition = yield parse_expression(False)
+        consume("do")
+        do = yield parse_expression(False)
+        return build.while_expression(condition, do, token)
     
-    def parse_unary_expression() -> ast.Expression:
-        if peek().type == Type.OPERATOR and peek().content in ['-', 'not']:
-            token = consume()
-            op = token.content
-            return ast.UnaryOp(op = op, right = parse_unary_expression(), position = token.position)
+    def parse_if_expression() -> Step[N]:
+        token = consume("if")
+        condition = yield parse_expression(False)
+        consume("then")
+        then_branch = yield parse_expression(False)
+        if peek_is(KEYWORD, "else"):
+            consume("else")
+            return build.if_expression(condition, then_branch, (yield parse_expression(False)), token)
         else:
-            return parse_if_expression()
+            return build.if_expression(condition, then_branch, None, token)
     
-    def parse_binary_expression(precedence: int) -> ast.Expression:
-        if not precedence:
-            return parse_unary_expression()
-        exp = parse_binary_expression(precedence - 1)
-        while peek().type == Type.OPERATOR and peek().content in left_associative_binary_operators[precedence - 1]:
-            token = consume()
-            op = token.content
-            right = parse_binary_expression(precedence - 1)
-            exp = ast.BinaryOp(left = exp, op = op, right = right, position = token.position)
-        return exp
+    def parse_leaf(kind: int) -> N:
+        if kind == INT_LITERAL:
+            return parse_int_literal()
+        elif kind == BOOL_LITERAL:
+            return parse_bool_literal()
+        return parse_identifier()
+    
+    # Whether the token at 'index' is a literal or an identifier that makes up the whole
+    # operand, i.e. no call or operator binding tighter than 'min_power' follows.
+    # Such operands are parsed directly, without a Step.
+    def is_leaf_operand(min_power: int) -> bool:
+        if index >= length or kinds[index] not in leaf_kinds:
+            return False
+        following = index + 1
+        if following >= length:
+            return True
+        kind = kinds[following]
+        if kind == PUNCTUATION:
+            return content(following) != '('
+        if kind == OPERATOR:
+            return binding_powers.get(content(following), 0) < min_power
+        return True
     
-    def parse_assignment() -> ast.Expression: # combine to parse_binary_expression
-        exp = parse_binary_expression(lowest_precedence)
-        if peek().type == Type.OPERATOR and peek().content == '=':
-            token = consume("=")
-            op = token.content
-            right = parse_assignment()
-            exp = ast.BinaryOp(left = exp, op = op, right = right, position = token.position)
+    # Pratt parser: parses an expression whose binary operators all have
+    # a binding power of at least 'min_power'.
+    def parse_binary_expression(min_power: int) -> Step[N]:
+        nonlocal index, previous
+        kind = kinds[index] if index < length else END
+        if kind == OPERATOR and content(index) in prefix_operators:
+            token = consume()
+            if is_leaf_operand(prefix_binding_power):
+                right = parse_leaf(kinds[index])
+            else:
+                right = yield parse_binary_expression(prefix_binding_power)
+            exp = build.unary_op(content(token), right, token)
+        elif kind == KEYWORD and content(index) == "if":
+            exp = yield parse_if_expression()
+        elif kind == KEYWORD and content(index) == "while":
+            exp = yield parse_while_expression()
+        else:
+            exp = yield parse_term()
+        while index < length and kinds[index] == OPERATOR:
+            op = content(index)
+            power = binding_powers.get(op)
+            if power is None or power < min_power:
+                break
+            token = index
+            index += 1
+            previous = token
+            right_power = power if op == '=' else power + 1
+            if is_leaf_operand(right_power):
+                right = parse_leaf(kinds[index])
+            else:
+                right = yield parse_binary_expression(right_power)
+            exp = build.binary_op(exp, op, right, token)
         return exp
     
-    def parse_variable_declaration() -> ast.Expression:
-        position = consume("var").position
+    def parse_variable_declaration() -> Step[N]:
+        token = consume("var")
         name = parse_identifier()
-        type_exp = None
-        if peek().type == Type.PUNCTUATION and peek().content == ':':
+        type_exp: N | None = None
+        if peek_is(PUNCTUATION, ':'):
             consume(":")
             type_exp = parse_identifier() # allow FunctionType
         consume("=")
-        value = parse_expression(False)
-        return ast.VariableDeclaration(name = name, type_exp = type_exp, value = value, position = position)
+        value = yield parse_expression(False)
+        return build.variable_declaration(name, type_exp, value, token)
     
-    def parse_expression(top_level: bool) -> ast.Expression:
-        if peek().type == Type.KEYWORD and peek().content == "var":
+    def parse_expression(top_level: bool) -> Step[N]:
+        if peek_is(KEYWORD, "var"):
             if not top_level:
-                raise SyntaxError(f'{peek().position}: variable declaration is only allowed directly inside {{blocks}} and in top-level expressions')
+                raise SyntaxError(f'{peek_position()}: variable declaration is only allowed directly inside {{blocks}} and in top-level expressions')
             return parse_variable_declaration()
         else:
-            return parse_assignment()
+            return parse_binary_expression(lowest_binding_power)
     
-    def parse_top_level() -> ast.Expression:
-        if peek().type == Type.END:
-            return ast.Literal(value = None, position = peek().position) #how should empty token list be represented?
-        exp = parse_expression(True)
-        if peek().type == Type.END:
+    def parse_top_level() -> Step[N]:
+        if peek_type() == Type.END:
+            return build.literal(None, index) #how should empty token list be represented?
+        exp = yield parse_expression(True)
+        if peek_type() == Type.END:
             return exp
         statements = [exp]
-        while peek().type != Type.END:
-            if previous and not previous == Token(Type.PUNCTUATION, "}"):
+        while peek_type() != Type.END:
+            if previous is not None and not previous_is_closing_brace():
                 consume(";")
-                if peek().type == Type.END:
-                    statements.append(ast.Literal(value = None, position = previous.position))
+                if peek_type() == Type.END:
+                    statements.append(build.literal(None, previous))
                     break
-            elif peek().type == Type.PUNCTUATION and peek().content == ';':
-                position_ = consume(";").position
-                if peek().type == Type.END:
-                    statements.append(ast.Literal(value = None, position = position_))
+            elif peek_is(PUNCTUATION, ';'):
+                semicolon = consume(";")
+                if peek_type() == Type.END:
+                    statements.append(build.literal(None, semicolon))
                     break
-            statements.append(parse_expression(True))
-        return ast.Block(statements = statements, position = Position(1,1))
+            statements.append((yield parse_expression(True)))
+        return build.block(statements, START)
 
-    return parse_top_level()
\ No newline at end of file
+    return trampoline(parse_top_level())
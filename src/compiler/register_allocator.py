@@ -0,0 +1,130 @@
+from dataclasses import dataclass
+from compiler.ir import IRVar, destination, sources
+from compiler.cfg import ControlFlowGraph, liveness
+
+# The instructions of a CFG are numbered in the order its blocks are laid out
+# in. Instruction number i reads its operands at position 2 * i and writes its
+# result at position 2 * i + 1.
+
+def read_position(index: int) -> int:
+    return 2 * index
+
+def write_position(index: int) -> int:
+    return 2 * index + 1
+
+@dataclass
+class LiveInterval:
+    """The positions from the first write of a variable to its last read. Between
+    them the variable may be live, so it needs a place of its own."""
+    variable: IRVar
+    start: int
+    end: int
+
+def live_intervals(cfg: ControlFlowGraph, ignored: set[IRVar] = set()) -> list[LiveInterval]:
+    """The live interval of each variable of 'cfg' not in 'ignored', sorted by
+    their starts.
+
+    A variable live at the start or end of a block is live at its first or last
+    instruction, so an interval covers every loop that its variable is live
+    around, even where the loop is laid out before its first write.
+    """
+    live_in, live_out = liveness(cfg)
+    bounds: dict[IRVar, list[int]] = {}
+
+    def cover(variable: IRVar, position: int) -> None:
+        if variable in ignored:
+            return
+        found = bounds.get(variable)
+        if found is None:
+            bounds[variable] = [position, position]
+        elif position < found[0]:
+            found[0] = position
+        elif position > found[1]:
+            found[1] = position
+
+    index = 0
+    for block in cfg.blocks.values():
+        for variable in live_in[block.label]:
+            cover(variable, read_position(index))
+        for instruction in block.instructions:
+            for variable in sources(instruction):
+                cover(variable, read_position(index))
+            written = destination(instruction)
+            if written is not None:
+                cover(written, write_position(index))
+            index += 1
+        for variable in live_out[block.label]:
+            cover(variable, write_position(index - 1))
+    intervals = [LiveInterval(variable, start, end) for variable, (start, end) in bounds.items()]
+    intervals.sort(key = lambda interval: (interval.start, interval.end))
+    return intervals
+
+@dataclass
+class Allocation:
+    """Where each variable lives: a register, or a numbered stack slot."""
+    registers: dict[IRVar, str]
+    slots: dict[IRVar, int]
+
+    def used_registers(self) -> set[str]:
+        return set(self.registers.values())
+
+def linear_scan(intervals: list[LiveInterval], registers: list[str], preserved: list[str], calls: list[int]) -> Allocation:
+    """Linear scan register allocation (Poletto and Sarkar, "Linear Scan Register
+    Allocation").
+
+    The intervals are visited by their starts, keeping the ones that hold a
+    register in order of their ends. An interval gets a register that no
+    interval still live has, if there is one. If not, of it and the live
+    intervals that could give it their register, the one that ends last goes
+    to the stack for all its length.
+
+    The calls writing their results at the positions 'calls' may change every
+    register except those in 'preserved', so an interval live across one gets
+    only those. The intervals are sorted, like 'live_intervals' returns them.
+    An instruction reads its operands before it writes its result, so the
+    result may get the register of an operand read for the last time.
+    """
+    allocation = Allocation({}, {})
+    calls = sorted(calls)
+    active: list[LiveInterval] = [] # holding registers, by their ends
+    free = list(registers)
+
+    def crosses_call(interval: LiveInterval) -> bool:
+        # The first call after the start.
+        low, high = 0, len(calls)
+        while low < high:
+            middle = (low + high) // 2
+            if calls[middle] <= interval.start:
+                low = middle + 1
+            else:
+                high = middle
+        return low < len(calls) and calls[low] < interval.end
+
+    def spill(interval: LiveInterval) -> None:
+        allocation.slots[interval.variable] = len(allocation.slots)
+
+    for interval in intervals:
+        while active and active[0].end < interval.start:
+            free.append(allocation.registers[active.pop(0).variable])
+        allowed = preserved if crosses_call(interval) else registers
+        # Registers that calls do not change are kept for intervals across them.
+        choices = [register for register in free if register in allowed]
+        choices.sort(key = lambda register: register in preserved)
+        if choices:
+            register = choices[0]
+            free.remove(register)
+        else:
+            candidates = [other for other in active if allocation.registers[other.variable] in allowed]
+            victim = max(candidates, key = lambda other: other.end, default = None)
+            if victim is None or victim.end <= interval.end:
+                spill(interval)
+                continue
+            register = allocation.registers.pop(victim.variable)
+            active.remove(victim)
+            spill(victim)
+        allocation.registers[interval.variable] = register
+        index = len(active)
+        while index > 0 and active[index - 1].end > interval.end:
+            index -= 1
+        active.insert(index, interval)
+    return allocation
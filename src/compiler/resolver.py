@@ -0,0 +1,66 @@
+import compiler.ast as ast
+from compiler.symbol_table import prelude
+
+# The global frame starts with the builtins, in the order of the prelude.
+builtin_slots: dict[str, int] = {name: slot for slot, name in enumerate(prelude)}
+
+def resolve(root: ast.Expression) -> int:
+    """Binds every variable under 'root' to a slot in a frame.
+
+    Each block has a frame of its own, for the variables declared directly in it,
+    and its 'frame_size' is set to their number. Each 'VariableDeclaration' gets
+    the binding of its variable, and each 'Identifier' that is used as a variable
+    (also as the target of an assignment) gets the binding of the declaration it
+    refers to. The scopes are the same as in 'typecheck', and so are the errors.
+    Returns the size of the global frame: the builtins and the variables declared
+    outside any block.
+    """
+    bindings: dict[str, list[ast.Binding]] = {name: [ast.Binding(0, slot)] for name, slot in builtin_slots.items()}
+    scopes: list[list[str]] = [list(builtin_slots)] # names declared in each open frame
+    # Nodes to visit, and the declarations and blocks to finish after their children.
+    stack: list[ast.Expression | tuple[ast.Expression]] = [root]
+    while stack:
+        node = stack.pop()
+        if type(node) is tuple:
+            match node[0]:
+                case ast.VariableDeclaration() as declaration:
+                    scope = scopes[-1]
+                    found = bindings.get(declaration.name.name)
+                    if found and found[-1].depth == len(scopes) - 1:
+                        raise NameError(f'{declaration.name.position}: Variable "{declaration.name.name}" already declared in this scope')
+                    declaration.binding = declaration.name.binding = ast.Binding(len(scopes) - 1, len(scope))
+                    bindings.setdefault(declaration.name.name, []).append(declaration.binding)
+                    scope.append(declaration.name.name)
+                case ast.Block() as block:
+                    names = scopes.pop()
+                    block.frame_size = len(names)
+                    for name in names:
+                        bindings[name].pop()
+            continue
+        match node:
+            case ast.Identifier():
+                found = bindings.get(node.name)
+                if not found:
+                    raise NameError(f'{node.position}: Variable "{node.name}" not found')
+                node.binding = found[-1]
+            case ast.UnaryOp():
+                stack.append(node.right)
+            case ast.BinaryOp():
+                stack += [node.right, node.left]
+            case ast.While():
+                stack += [node.do, node.condition]
+            case ast.If():
+                if node.else_branch is not None:
+                    stack.append(node.else_branch)
+                stack += [node.then_branch, node.condition]
+            case ast.FunctionCall():
+                stack += reversed(node.arguments)
+                stack.append(node.name)
+            case ast.VariableDeclaration():
+                # The value is resolved before the variable is declared.
+                stack += [(node,), node.value]
+            case ast.Block():
+                scopes.append([])
+                stack.append((node,))
+                stack += reversed(node.statements)
+    return len(scopes[0])
@@ -0,0 +1,214 @@
+from compiler.ir import IRVar, Copy, Jump, CondJump, Phi, Instruction, root_names, destination, sources, replace_sources, replace_destination
+from compiler.cfg import (
+    BasicBlock, ControlFlowGraph, remove_unreachable, immediate_dominators, dominator_tree,
+    dominance_frontiers, liveness,
+)
+
+# In SSA form every variable is written by one instruction. The versions of
+# a variable 'x' are 'x@1', 'x@2' and so on. Variables that nothing writes,
+# like the builtins, keep their names.
+
+def version_of(variable: IRVar) -> str:
+    """The name of the variable 'variable' is a version of."""
+    return variable.name.split('@')[0]
+
+def to_ssa(cfg: ControlFlowGraph) -> None:
+    """Turns 'cfg' into SSA form, removing the blocks that can not run.
+
+    Phis go into the iterated dominance frontiers of the blocks that write each
+    variable, but only where the variable is live, so there are no phis of values
+    that are never used. Then every write gets a version of its own and every
+    read the version that reaches it, on a walk down the dominator tree.
+    """
+    remove_unreachable(cfg)
+    idom = immediate_dominators(cfg)
+    frontiers = dominance_frontiers(cfg, idom)
+    live_in, _ = liveness(cfg)
+
+    written_in: dict[IRVar, set[str]] = {}
+    for block in cfg.blocks.values():
+        for instruction in block.instructions:
+            written = destination(instruction)
+            if written is not None:
+                written_in.setdefault(written, set()).add(block.label)
+    for variable, labels in written_in.items():
+        has_phi: set[str] = set()
+        worklist = list(labels)
+        while worklist:
+            for label in frontiers[worklist.pop()]:
+                if label in has_phi or variable not in live_in[label]:
+                    continue
+                has_phi.add(label)
+                block = cfg.blocks[label]
+                block.instructions.insert(0, Phi([(predecessor, variable) for predecessor in block.predecessors], variable))
+                if label not in labels:
+                    worklist.append(label)
+
+    versions: dict[IRVar, int] = {}
+    current: dict[IRVar, list[IRVar]] = {} # the versions in scope, innermost last
+
+    def reaching(variable: IRVar) -> IRVar:
+        found = current.get(variable)
+        return found[-1] if found else variable
+
+    children = dominator_tree(idom)
+    # Blocks to rename, and the variables to go out of scope after the blocks they dominate.
+    stack: list[str | list[IRVar]] = [cfg.entry]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            for variable in item:
+                current[variable].pop()
+            continue
+        block = cfg.blocks[item]
+        written_here: list[IRVar] = []
+        for instruction in block.instructions:
+            if not isinstance(instruction, Phi):
+                replace_sources(instruction, reaching)
+            written = destination(instruction)
+            if written is not None:
+                versions[written] = versions.get(written, 0) + 1
+                version = IRVar(f'{written.name}@{versions[written]}')
+                replace_destination(instruction, version)
+                current.setdefault(written, []).append(version)
+                written_here.append(written)
+        for successor in block.successors:
+            for phi in cfg.blocks[successor].phis():
+                phi.sources = [(label, reaching(source) if label == block.label else source) for label, source in phi.sources]
+        stack.append(written_here)
+        stack.extend(reversed(children[block.label]))
+
+def split_critical_edges(cfg: ControlFlowGraph) -> None:
+    """Puts an empty block on each edge from a block with many successors to
+    a block with phis and many predecessors, so that copies for the phis can
+    go on the edge without running on the others."""
+    for block in list(cfg.blocks.values()):
+        if len(block.predecessors) < 2 or not block.phis():
+            continue
+        for index, label in enumerate(block.predecessors):
+            predecessor = cfg.blocks[label]
+            if len(predecessor.successors) < 2:
+                continue
+            middle = BasicBlock(f'{label}->{block.label}', [Jump(block.label)], [block.label], [label])
+            cfg.blocks[middle.label] = middle
+            last = predecessor.instructions[-1]
+            assert isinstance(last, CondJump)
+            if last.then_label == block.label:
+                last.then_label = middle.label
+            if last.else_label == block.label:
+                last.else_label = middle.label
+            predecessor.successors = [middle.label if successor == block.label else successor for successor in predecessor.successors]
+            block.predecessors[index] = middle.label
+            for phi in block.phis():
+                phi.sources = [(middle.label if source_label == label else source_label, source) for source_label, source in phi.sources]
+
+def sequential_copies(copies: list[tuple[IRVar, IRVar]], temporary: IRVar) -> list[Copy]:
+    """Copies that do what the (dest, source) pairs in 'copies' would do all at
+    once. A cycle, like swapping two variables, is broken by 'temporary'."""
+    pending = [(dest, source) for dest, source in copies if dest != source]
+    result: list[Copy] = []
+    while pending:
+        read = {source for _, source in pending}
+        ready = next((pair for pair in pending if pair[0] not in read), None)
+        if ready is not None:
+            pending.remove(ready)
+            result.append(Copy(ready[1], ready[0]))
+        else:
+            # Every destination is still to be read: save one and read the saved value.
+            saved = pending[0][0]
+            result.append(Copy(saved, temporary))
+            pending = [(dest, temporary if source == saved else source) for dest, source in pending]
+    return result
+
+def from_ssa(cfg: ControlFlowGraph) -> None:
+    """Replaces the phis by copies at the ends of the blocks before them."""
+    split_critical_edges(cfg)
+    swaps = 0
+    for block in cfg.blocks.values():
+        phis = block.phis()
+        if not phis:
+            continue
+        for label in block.predecessors:
+            predecessor = cfg.blocks[label]
+            copies = [(phi.dest, dict(phi.sources)[label]) for phi in phis]
+            swaps += 1
+            predecessor.instructions[-1:-1] = sequential_copies(copies, IRVar(f'%swap{swaps}'))
+        del block.instructions[:len(phis)]
+
+def coalesce_copies(cfg: ControlFlowGraph) -> None:
+    """Gives variables that a copy connects one name, where their values are
+    never both needed at once, and removes the copies that become useless.
+
+    Each variable then gets the name of the variable it was a version of,
+    unless another one already has it.
+    """
+    _, live_out = liveness(cfg)
+    interferes: dict[IRVar, set[IRVar]] = {}
+    for block in cfg.blocks.values():
+        live = set(live_out[block.label])
+        for instruction in reversed(block.instructions):
+            written = destination(instruction)
+            if written is not None:
+                neighbours = interferes.setdefault(written, set())
+                for variable in live:
+                    # A copy does not make its destination and source interfere.
+                    if variable != written and not (isinstance(instruction, Copy) and variable == instruction.source):
+                        neighbours.add(variable)
+                        interferes.setdefault(variable, set()).add(written)
+                live.discard(written)
+            live.update(sources(instruction))
+
+    # Union-find: each class of variables is named by its representative.
+    parent: dict[IRVar, IRVar] = {}
+
+    def find(variable: IRVar) -> IRVar:
+        while variable in parent:
+            variable = parent[variable]
+        return variable
+
+    for block in cfg.blocks.values():
+        for instruction in block.instructions:
+            if not isinstance(instruction, Copy):
+                continue
+            source, dest = find(instruction.source), find(instruction.dest)
+            if source == dest or source.name in root_names or dest.name in root_names:
+                continue
+            if dest in interferes.get(source, set()):
+                continue
+            parent[dest] = source
+            merged = interferes.setdefault(source, set())
+            for neighbour in interferes.pop(dest, set()):
+                interferes[neighbour].discard(dest)
+                interferes[neighbour].add(source)
+                merged.add(neighbour)
+
+    # A class is named after a variable of the program in it, rather than a temporary.
+    wanted: dict[IRVar, str] = {}
+    for variable in parent:
+        representative = find(variable)
+        if not version_of(variable).startswith('%'):
+            wanted.setdefault(representative, version_of(variable))
+    names: dict[IRVar, IRVar] = {}
+    taken = set(root_names)
+
+    def rename(variable: IRVar) -> IRVar:
+        if variable.name in root_names:
+            return variable
+        representative = find(variable)
+        name = names.get(representative)
+        if name is None:
+            base = wanted.get(representative, version_of(representative))
+            name = names[representative] = IRVar(base if base not in taken else representative.name)
+            taken.add(name.name)
+        return name
+
+    for block in cfg.blocks.values():
+        kept: list[Instruction] = []
+        for instruction in block.instructions:
+            replace_sources(instruction, rename)
+            written = destination(instruction)
+            if written is not None:
+                replace_destination(instruction, rename(written))
+            if not (isinstance(instruction, Copy) and instruction.source == instruction.dest):
+                kept.append(instruction)
+        block.instructions = kept
@@ -1,5 +1,34 @@
+from types import MappingProxyType
+from typing import Any, Mapping, Protocol
 from compiler.types import Type, Unit, Int, Bool, FunctionType
 
+def build_prelude() -> Mapping[str, list[Type]]:
+    """The operators and builtin functions every program starts with."""
+    table: dict[str, list[Type]] = {}
+    for each in ['+', '-', '*', '/', '%']:
+        table[each] = [FunctionType([Int(), Int()], Int())]
+    table['-'].append(FunctionType([Int()], Int())) # '-' as negation
+    for each in ['<', '<=', '>', '>=']:
+        table[each] = [FunctionType([Int(), Int()], Bool())]
+    table["and"] = [FunctionType([Bool(), Bool()], Bool())]
+    table["or"] = [FunctionType([Bool(), Bool()], Bool())]
+    table["not"] = [FunctionType([Bool()], Bool())]
+    table["print_int"] = [FunctionType([Int()], Unit())]
+    table["print_bool"] = [FunctionType([Bool()], Unit())]
+    table["read_int"] = [FunctionType([], Int())]
+    return MappingProxyType(table)
+
+# Built once and shared. Lookups return its lists, which must not be changed.
+prelude = build_prelude()
+
+class Scopes(Protocol):
+    """What typechecking needs of a symbol table. 'SymbolTable' and
+    'FlatSymbolTable' both have it, in different ways."""
+    def init_scope(self) -> None: ...
+    def exit_scope(self) -> None: ...
+    def insert(self, symbol: str, value: Any) -> bool: ...
+    def lookup(self, symbol: str) -> list[Type] | None: ...
+
 class SymbolTable:
     
     class Scope:
@@ -19,17 +48,7 @@ class SymbolTable:
 
     def __init__(self) -> None: # Add '==', '!=', 'print' and 'read'?
         self.current_scope = SymbolTable.Scope(None)
-        for each in ['+', '-', '*', '/', '%']:
-            self.insert(each, FunctionType([Int(), Int()], Int()))
-        self.current_scope.table['-'].append(FunctionType([Int()], Int())) # '-' as negation
-        for each in ['<', '<=', '>', '>=']:
-            self.insert(each, FunctionType([Int(), Int()], Bool()))
-        self.insert("and", FunctionType([Bool(), Bool()], Bool()))
-        self.insert("or", FunctionType([Bool(), Bool()], Bool()))
-        self.insert("not", FunctionType([Bool()], Bool()))
-        self.insert("print_int", FunctionType([Int()], Unit()))
-        self.insert("print_bool", FunctionType([Bool()], Unit()))
-        self.insert("read_int", FunctionType([], Int()))
+        self.current_scope.table = {symbol: list(types) for symbol, types in prelude.items()}
         
     def init_scope(self) -> None:
         self.current_scope = SymbolTable.Scope(self.current_scope)
@@ -48,4 +67,55 @@ class SymbolTable:
             if current_type:
                 return current_type
             scope = scope.parent
-        return None
\ No newline at end of file
+        return None
+
+class FlatSymbolTable:
+    """Like SymbolTable, but lookup, insert and exit_scope take constant time.
+    
+    Instead of a dict per scope, one dict maps each name to a stack of its
+    declarations, innermost last, with the depth of the scope of each. Every
+    scope logs the names declared in it, so that exiting it pops exactly those.
+    The prelude is shared by all tables and counts as declared at depth 0.
+    """
+    
+    def __init__(self) -> None:
+        self.depth = 0
+        self.declarations: dict[str, list[tuple[int, list[Type]]]] = {}
+        self.declared: list[str] = [] # names in the order they were declared, the undo log
+        self.scope_starts: list[int] = [] # where in 'declared' each scope above depth 0 starts
+    
+    def init_scope(self) -> None:
+        self.depth += 1
+        self.scope_starts.append(len(self.declared))
+    
+    def exit_scope(self) -> None:
+        if self.depth == 0:
+            return
+        self.depth -= 1
+        start = self.scope_starts.pop()
+        declarations = self.declarations
+        for symbol in self.declared[start:]:
+            stack = declarations[symbol]
+            stack.pop()
+            if not stack:
+                del declarations[symbol]
+        del self.declared[start:]
+    
+    def insert(self, symbol: str, value: Type) -> bool:
+        stack = self.declarations.get(symbol)
+        if stack is None:
+            if self.depth == 0 and symbol in prelude:
+                return False
+            self.declarations[symbol] = [(self.depth, [value])]
+        elif stack[-1][0] == self.depth:
+            return False
+        else:
+            stack.append((self.depth, [value]))
+        self.declared.append(symbol)
+        return True
+    
+    def lookup(self, symbol: str) -> list[Type] | None:
+        stack = self.declarations.get(symbol)
+        if stack is not None:
+            return stack[-1][1]
+        return prelude.get(symbol)
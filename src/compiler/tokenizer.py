@@ -1,18 +1,37 @@
 
+from collections.abc import Iterator
 from dataclasses import dataclass, field
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import mmap
+import os
 import re
+import sys
 from enum import Enum
 
-whitepace = re.compile(r'\s');
-punctuation = re.compile("[(){},;:]")
-operator = re.compile("[=!<>]=|[=<>%*/+-]|not|and|or")
-int_literal = re.compile("[0-9]+")
-bool_literal = re.compile("true|false")
-keyword = re.compile("if|then|else|while|do|var") #unit?
-identifier = re.compile("[a-zA-Z_][a-zA-Z0-9_]*")
-comment = re.compile(r'(//|#).*')
+# All token patterns combined into one alternation, tried in this order at every position.
+# 'invalid' has to come before 'int_literal' and 'comment' before 'operator' ('/').
+# A line break and the indentation after it are one 'newline' match.
+token_patterns = r"""
+    (?P<newline>\n[^\S\n]*)
+  | (?P<whitespace>[^\S\n]+)
+  | (?P<comment>(?://|\#).*)
+  | (?P<invalid>[0-9]+[a-zA-Z_]+)
+  | (?P<punctuation>[(){},;:])
+  | (?P<int_literal>[0-9]+)
+  | (?P<word>[a-zA-Z_][a-zA-Z0-9_]*)
+  | (?P<operator>[=!<>]=|[=<>%*/+-])
+""" #Integer literal and boolean literal/identifier/keyword have to be separated with whitespace
+token_pattern = re.compile(token_patterns, re.VERBOSE)
 
-invalid_tokens = re.compile("[0-9]+[a-zA-Z_]+") #Integer literal and boolean literal/identifier/keyword have to be separated with whitespace
+# The same for ASCII bytes. '\s' of str patterns also matches \x1c-\x1f,
+# and comments stop at non-ASCII bytes so that those are reported as errors.
+ascii_whitespace = r"\t\x0b\x0c\r\x1c-\x1f\x20"
+byte_token_pattern = re.compile(token_patterns
+    .replace(r"[^\S\n]", f"[{ascii_whitespace}]")
+    .replace(r"(?://|\#).*", r"(?://|\#)[\x00-\x09\x0b-\x7f]*")
+    .encode(), re.VERBOSE)
 
 class Type(Enum):
     PUNCTUATION = 1
@@ -23,7 +42,7 @@ class Type(Enum):
     IDENTIFIER = 6
     END = 7
 
-@dataclass(frozen = True)
+@dataclass(frozen = True, slots = True)
 class Position:
     line : int
     column : int
@@ -34,74 +53,219 @@ class Position:
     def __eq__(self, other: object) -> bool:
         return True
 
-@dataclass(frozen = True)
+@dataclass(frozen = True, slots = True)
 class Token:
     type: Type
     content : str
     position : Position = field(default_factory=lambda: Position(1,1))
 
+# Words that are not identifiers. Everything else matching 'word' is an identifier.
+reserved_words: dict[str, Type] = {
+    "not": Type.OPERATOR, "and": Type.OPERATOR, "or": Type.OPERATOR,
+    "true": Type.BOOL_LITERAL, "false": Type.BOOL_LITERAL,
+    "if": Type.KEYWORD, "then": Type.KEYWORD, "else": Type.KEYWORD, #unit?
+    "while": Type.KEYWORD, "do": Type.KEYWORD, "var": Type.KEYWORD,
+}
+
+group_types: dict[str, Type] = {
+    "punctuation": Type.PUNCTUATION,
+    "int_literal": Type.INT_LITERAL,
+    "operator": Type.OPERATOR,
+}
+
+types_by_kind: list[Type] = [Type.END] * (max(t.value for t in Type) + 1)
+for each in Type:
+    types_by_kind[each.value] = each
+
+# Type values as plain ints, for comparing against TokenStream.kinds without enum lookups.
+PUNCTUATION = Type.PUNCTUATION.value
+OPERATOR = Type.OPERATOR.value
+INT_LITERAL = Type.INT_LITERAL.value
+BOOL_LITERAL = Type.BOOL_LITERAL.value
+KEYWORD = Type.KEYWORD.value
+IDENTIFIER = Type.IDENTIFIER.value
+END = Type.END.value
+
+class TokenStream:
+    """Tokens stored column-wise in arrays instead of one Token object each.
+    
+    Token i is source_code[starts[i]:starts[i] + lengths[i]] and its type is Type(kinds[i]).
+    Content and positions are only created when asked for; positions are found
+    with a binary search from line_starts (the offset of the first character on each line).
+    """
+    
+    def __init__(self, source_code: 'str | Buffer') -> None:
+        self.source_code = source_code
+        self.kinds = array('B')
+        self.starts = array('I')
+        self.lengths = array('I')
+        self.line_starts = array('I', [0])
+        self.positions: list[Position] | None = None # only for streams made from Token lists
+    
+    @staticmethod
+    def from_tokens(tokens: list[Token]) -> 'TokenStream':
+        """Wraps a list of tokens that may not come from any source code, e.g. in tests."""
+        stream = TokenStream(" ".join(token.content for token in tokens))
+        offset = 0
+        for token in tokens:
+            stream.kinds.append(token.type.value)
+            stream.starts.append(offset)
+            stream.lengths.append(len(token.content))
+            offset += len(token.content) + 1
+        stream.positions = [token.position for token in tokens]
+        return stream
+    
+    def __len__(self) -> int:
+        return len(self.kinds)
+    
+    def __getitem__(self, index: int) -> Token:
+        return Token(self.type(index), self.content(index), self.position(index))
+    
+    def __iter__(self) -> Iterator[Token]:
+        return iter(self.tokens())
+    
+    def type(self, index: int) -> Type:
+        return types_by_kind[self.kinds[index]]
+    
+    def content(self, index: int) -> str:
+        start = self.starts[index]
+        content = self.source_code[start:start + self.lengths[index]]
+        if not isinstance(content, str):
+            content = str(content, "ascii")
+        if self.kinds[index] == IDENTIFIER:
+            return sys.intern(content)
+        return content
+    
+    def position(self, index: int) -> Position:
+        if self.positions is not None:
+            return self.positions[index]
+        return self.position_at(self.starts[index])
+    
+    def position_at(self, offset: int) -> Position:
+        line = bisect_right(self.line_starts, offset)
+        return Position(line, offset - self.line_starts[line - 1] + 1)
+    
+    def tokens(self) -> list[Token]:
+        """The tokens as Token objects, in the form 'tokenize' returns them."""
+        if self.positions is not None:
+            return [self[i] for i in range(len(self))]
+        tokens = []
+        source_code = self.source_code
+        line_starts = self.line_starts
+        line = 1
+        line_start = 0
+        next_line_start = line_starts[1] if len(line_starts) > 1 else sys.maxsize
+        for kind, start, length in zip(self.kinds, self.starts, self.lengths):
+            while start >= next_line_start:
+                line += 1
+                line_start = next_line_start
+                next_line_start = line_starts[line] if line < len(line_starts) else sys.maxsize
+            content = source_code[start:start + length]
+            if not isinstance(content, str):
+                content = str(content, "ascii")
+            if kind == IDENTIFIER:
+                content = sys.intern(content)
+            tokens.append(Token(types_by_kind[kind], content, Position(line, start - line_start + 1)))
+        return tokens
+
+# Anything 'tokenize_bytes' accepts: bytes, bytearray, memoryview or mmap.
+Buffer = bytes | bytearray | memoryview | mmap.mmap
+
+word_kinds: dict[str, int] = {word: type.value for word, type in reserved_words.items()}
+byte_word_kinds: dict[bytes, int] = {word.encode(): kind for word, kind in word_kinds.items()}
+group_kinds: dict[str, int] = {group: type.value for group, type in group_types.items()}
+
+def scan(stream: TokenStream, pattern: re.Pattern, word_kinds: dict) -> None:
+    """Fills 'stream' with the tokens of 'stream.source_code', using 'pattern' to find them."""
+    source_code = stream.source_code
+    add_kind = stream.kinds.append
+    add_start = stream.starts.append
+    add_length = stream.lengths.append
+    add_line_start = stream.line_starts.append
+    index = 0
+    
+    for match in pattern.finditer(source_code):
+        start = match.start()
+        if start != index: # finditer skipped something that matches no pattern
+            break
+        kind = match.lastgroup
+        index = match.end()
+        if kind == "newline": # how to handle tabs?
+            add_line_start(start + 1)
+        elif kind == "word":
+            add_kind(word_kinds.get(match.group(), IDENTIFIER))
+            add_start(start)
+            add_length(index - start)
+        elif kind == "invalid":
+            invalid = match.group()
+            if not isinstance(invalid, str):
+                invalid = str(invalid, "ascii")
+            raise SyntaxError(f'Invalid identifier "{invalid}" at: {stream.position_at(start)}')
+        elif kind != "whitespace" and kind != "comment":
+            add_kind(group_kinds[kind]) # type: ignore[index]
+            add_start(start)
+            add_length(index - start)
+    if index != len(source_code):
+        if not isinstance(source_code, str) and source_code[index] >= 0x80:
+            raise SyntaxError(f'Non-ASCII character at: {stream.position_at(index)}')
+        raise SyntaxError(f'Invalid character sequence at: {stream.position_at(index)}')
+
+def tokenize_stream(source_code: str) -> TokenStream:
+    stream = TokenStream(source_code)
+    scan(stream, token_pattern, word_kinds)
+    return stream
+
+def tokenize_bytes(source_code: Buffer) -> TokenStream:
+    """Tokenizes ASCII source code without decoding or copying it.
+    
+    Works on an mmap or memoryview as well, which then has to stay open as long as the stream is used.
+    """
+    stream = TokenStream(source_code)
+    scan(stream, byte_token_pattern, byte_word_kinds)
+    return stream
+
 def tokenize(source_code: str) -> list[Token]:
-    tokens = []
-    location = {"line": 1, "column": 1}
-    match = None
-    
-    def add_token(type: Type) -> None:
-        if not match:
-            return
-        nonlocal source_code
-        token = match.group();
-        tokens.append(Token(type, token, Position(location["line"], location["column"])))
-        source_code = source_code[match.end():]
-        location["column"] += match.end()
-
-    while source_code:
-        match = whitepace.match(source_code)
-        if match:
-            source_code = source_code[match.end():]
-            if match.group() == '\n': # how to handle tabs?
-                location["line"] += 1
-                location["column"] = 1
-            else:
-                location["column"] += match.end()
-            continue
-        match = comment.match(source_code)
-        if match:
-            source_code = source_code[match.end():]
-            location["column"] += match.end()
-            continue
-        match = invalid_tokens.match(source_code)
-        if match:
-            raise SyntaxError(f'Invalid identifier "{match.group()}" at: line {location["line"]}, column {location["column"]}')
-        match = punctuation.match(source_code)
-        if match:
-            add_token(Type.PUNCTUATION)
-            continue
-        match = int_literal.match(source_code)
-        if match:
-            add_token(Type.INT_LITERAL)
-            continue
-        match = identifier.match(source_code)
-        if match:
-            alt = operator.fullmatch(match.group())
-            if alt:
-                match = alt
-                add_token(Type.OPERATOR)
-                continue
-            alt = bool_literal.fullmatch(match.group())
-            if alt:
-                match = alt
-                add_token(Type.BOOL_LITERAL)
-                continue
-            alt = keyword.fullmatch(match.group())
-            if alt:
-                match = alt
-                add_token(Type.KEYWORD)
-                continue
-            add_token(Type.IDENTIFIER)
-            continue
-        match = operator.match(source_code)
-        if match:
-            add_token(Type.OPERATOR)
-            continue
-        raise SyntaxError(f'Invalid character sequence at: line {location["line"]}, column {location["column"]}')
-    return tokens
\ No newline at end of file
+    return tokenize_stream(source_code).tokens()
+
+def tokenize_chunk(chunk: str, offset: int) -> tuple[array, array, array, array]:
+    """Tokenizes source code that starts at 'offset' of a larger file and returns the arrays of its stream."""
+    stream = tokenize_stream(chunk)
+    if offset:
+        stream.starts = array('I', [start + offset for start in stream.starts])
+        stream.line_starts = array('I', [line_start + offset for line_start in stream.line_starts])
+    return stream.kinds, stream.starts, stream.lengths, stream.line_starts
+
+def tokenize_parallel(source_code: str, workers: int | None = None, min_chunk_size: int = 1 << 18) -> TokenStream:
+    """Tokenizes in 'workers' processes and returns the same tokens as 'tokenize_stream'.
+    
+    No token spans a line break, so the source is split into chunks of at least
+    'min_chunk_size' characters that end at a line break, and the chunks are
+    tokenized independently. Sources too small for two chunks are tokenized here.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_count = min(workers, len(source_code) // max(min_chunk_size, 1))
+    if chunk_count < 2:
+        return tokenize_stream(source_code)
+    
+    offsets = [0]
+    for i in range(1, chunk_count):
+        split = source_code.find("\n", max(len(source_code) * i // chunk_count, offsets[-1])) + 1
+        if split <= 0:
+            break
+        offsets.append(split)
+    ends = offsets[1:] + [len(source_code)]
+    
+    stream = TokenStream(source_code)
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(offsets))) as executor:
+            chunks = [source_code[start:end] for start, end in zip(offsets, ends)]
+            for kinds, starts, lengths, line_starts in executor.map(tokenize_chunk, chunks, offsets):
+                stream.kinds.extend(kinds)
+                stream.starts.extend(starts)
+                stream.lengths.extend(lengths)
+                # A chunk starts a line that is already recorded (0 or the previous chunk's last line break).
+                stream.line_starts.extend(line_starts[1:])
+    except SyntaxError:
+        # Report the first error with its position in the whole source.
+        return tokenize_stream(source_code)
+    return stream
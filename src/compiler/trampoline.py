@@ -0,0 +1,43 @@
+from types import GeneratorType
+from typing import Any, Generator, TypeVar, overload
+
+T = TypeVar('T')
+
+# A computation that would otherwise call itself recursively. Instead of calling,
+# it yields the Step whose result it needs and is sent that result back.
+# Yielding anything other than a generator sends it straight back, which lets
+# cheap cases skip creating a Step.
+Step = Generator[Any, Any, T]
+
+@overload
+def trampoline(step: Step[T]) -> T: ...
+@overload
+def trampoline(step: T) -> T: ...
+def trampoline(step: Step[T] | T) -> T:
+    """Runs 'step' and all the steps it yields on an explicit stack.
+    
+    This way nesting depth is limited by memory instead of the Python recursion limit.
+    """
+    if type(step) is not GeneratorType:
+        return step # type: ignore[return-value]
+    stack: list[Step[Any]] = [step] # type: ignore[list-item]
+    push = stack.append
+    pop = stack.pop
+    send = step.send # type: ignore[union-attr]
+    value: Any = None
+    while True:
+        try:
+            inner = send(value)
+        except StopIteration as done:
+            pop()
+            if not stack:
+                return done.value
+            send = stack[-1].send
+            value = done.value
+        else:
+            if type(inner) is GeneratorType:
+                push(inner)
+                send = inner.send
+                value = None
+            else:
+                value = inner
@@ -0,0 +1,301 @@
+import importlib.util
+import marshal
+import sys
+from types import CodeType
+from typing import Any, Callable
+import compiler.ast as ast
+from compiler.resolver import resolve, builtin_slots
+from compiler.trampoline import Step, trampoline
+from compiler.interpreter import Value, builtin_functions, divide, remainder, write_value
+
+# A program becomes the Python function below. Variables become its local
+# variables, named after the variable and numbered so that shadowing,
+# Python keywords and the names here can not clash.
+#
+#   def program(__print_int, __print_bool, __read_int, __divide, __remainder):
+#       ...
+#       return <value of the program>
+#
+# Blocks, while loops and the like become statements, and their values go into
+# temporaries (__t0, __t1, ...). Everything else stays an expression.
+
+function_name = "program"
+parameters = ["__print_int", "__print_bool", "__read_int", "__divide", "__remainder"]
+
+# CPython can not parse expressions nested much deeper than 200 parentheses,
+# more than 100 levels of indentation or more than 20 loops inside each other.
+max_expression_depth = 50
+max_indentation = 90
+max_loops = 20
+
+# Marshalled code starts with this and the bytecode version of the Python that made it.
+magic = b"\0PYC"
+
+binary_operators = {'+', '-', '*', '<', '<=', '>', '>=', '==', '!='}
+
+def transpile(root: ast.Expression) -> str:
+    """The Python source of a function that runs the typechecked tree under 'root'
+    and returns its value.
+
+    Raises ValueError if the program is nested too deeply for Python to compile.
+    """
+    resolve(root)
+    lines: list[str] = []
+    prologue: list[str] = [] # builtins used as values
+    names: dict[ast.Binding, str] = {}
+    temporaries = 0
+    indent = 1
+    loops = 0
+
+    def name_of(binding: ast.Binding | None, name: str) -> str:
+        assert binding is not None, "the resolver binds every variable"
+        found = names.get(binding)
+        if found is None:
+            found = names[binding] = f'{name}_{len(names)}'
+            if binding.depth == 0 and binding.slot < len(builtin_slots):
+                prologue.append(f'    {found} = __{name}')
+        return found
+
+    def line(text: str) -> None:
+        lines.append("    " * indent + text)
+
+    def deeper(node: ast.Expression) -> None:
+        nonlocal indent
+        indent += 1
+        if indent > max_indentation:
+            raise ValueError(f'{node.position}: Nested too deeply to compile to Python')
+
+    def take_lines(mark: int) -> list[str]:
+        """Removes and returns the lines emitted from 'mark' on."""
+        taken = lines[mark:]
+        del lines[mark:]
+        return taken
+
+    def temporary() -> str:
+        nonlocal temporaries
+        temporaries += 1
+        return f'__t{temporaries - 1}'
+
+    # Each expression is its source code and how deeply it is nested.
+    def nest(text: str, depth: int) -> tuple[str, int]:
+        """An expression made of others, of which the deepest is 'depth' deep."""
+        if depth < max_expression_depth:
+            return text, depth + 1
+        name = temporary()
+        line(f'{name} = {text}')
+        return name, 0
+
+    def is_constant(text: str) -> bool:
+        return text in ["None", "True", "False"] or text.lstrip("-").isdigit()
+
+    def statement(expression: tuple[str, int] | None) -> None:
+        """Evaluates 'expression' for its effects only."""
+        if expression is not None and not is_constant(expression[0]) and not expression[0].isidentifier():
+            line(expression[0])
+
+    def emit(node: ast.Expression, value: bool) -> Step[tuple[str, int] | None] | tuple[str, int] | None:
+        """Emits the statements 'node' needs, and returns the expression for its value.
+        Returns None if 'value' is false and nothing is left to evaluate."""
+        match node:
+            case ast.Literal():
+                return (repr(node.value), 0) if value else None
+            case ast.Identifier():
+                return (name_of(node.binding, node.name), 0) if value else None
+        return emit_compound(node, value)
+
+    def emit_value(node: ast.Expression) -> Step[tuple[str, int]]:
+        expression = yield emit(node, True)
+        assert expression is not None
+        return expression
+
+    def operands(nodes: list[ast.Expression]) -> Step[list[tuple[str, int]]]:
+        """The expressions of 'nodes', made to be evaluated in order: if statements
+        were emitted for a later one, the earlier ones are evaluated into temporaries
+        before those statements."""
+        expressions: list[tuple[str, int]] = []
+        marks: list[int] = [] # where the statements for each one start
+        for node in nodes:
+            marks.append(len(lines))
+            expressions.append((yield emit_value(node)))
+        # From the last, so that inserting lines does not move the marks still to be used.
+        for index in reversed(range(len(nodes) - 1)):
+            text, _ = expressions[index]
+            if marks[index + 1] < len(lines) and not is_constant(text):
+                name = temporary()
+                lines.insert(marks[index + 1], "    " * indent + f'{name} = {text}')
+                expressions[index] = (name, 0)
+        return expressions
+
+    def emit_compound(node: ast.Expression, value: bool) -> Step[tuple[str, int] | None]:
+        nonlocal indent, loops
+        match node:
+            case ast.UnaryOp():
+                right, depth = yield emit_value(node.right)
+                result = nest(f'(-{right})' if node.op == '-' else f'(not {right})', depth)
+            case ast.BinaryOp() if node.op == '=':
+                assert isinstance(node.left, ast.Identifier)
+                right, depth = yield emit_value(node.right)
+                name = name_of(node.left.binding, node.left.name)
+                if not value:
+                    line(f'{name} = {right}')
+                    return None
+                result = nest(f'({name} := {right})', depth)
+            case ast.BinaryOp() if node.op in ['and', 'or']:
+                left, left_depth = yield emit_value(node.left)
+                deeper(node)
+                mark = len(lines)
+                right, right_depth = yield emit_value(node.right)
+                statements = take_lines(mark)
+                indent -= 1
+                if not statements:
+                    result = nest(f'({left} {node.op} {right})', max(left_depth, right_depth))
+                else:
+                    # The statements of the right side run only if the left side does not decide.
+                    name = temporary()
+                    line(f'{name} = {left}')
+                    line(f'if {"" if node.op == "and" else "not "}{name}:')
+                    lines.extend(statements)
+                    lines.append("    " * (indent + 1) + f'{name} = {right}')
+                    result = (name, 0)
+            case ast.BinaryOp():
+                [(left, left_depth), (right, right_depth)] = yield operands([node.left, node.right])
+                depth = max(left_depth, right_depth)
+                if node.op in ['/', '%']:
+                    function = '__divide' if node.op == '/' else '__remainder'
+                    result = nest(f'{function}({left}, {right}, {str(node.position)!r})', depth)
+                else:
+                    assert node.op in binary_operators
+                    result = nest(f'({left} {node.op} {right})', depth)
+            case ast.While():
+                loops += 1
+                if loops > max_loops:
+                    raise ValueError(f'{node.position}: Nested too deeply to compile to Python')
+                deeper(node)
+                mark = len(lines)
+                condition, _ = yield emit_value(node.condition)
+                condition_statements = take_lines(mark)
+                statement((yield emit(node.do, False)))
+                body = take_lines(mark)
+                indent -= 1
+                loops -= 1
+                if condition_statements:
+                    line('while True:')
+                    lines.extend(condition_statements)
+                    lines.append("    " * (indent + 1) + f'if not {condition}: break')
+                else:
+                    line(f'while {condition}:')
+                lines.extend(body or ["    " * (indent + 1) + 'pass'])
+                result = ('None', 0)
+            case ast.If():
+                condition, condition_depth = yield emit_value(node.condition)
+                has_value = value and node.else_branch is not None
+                deeper(node)
+                mark = len(lines)
+                then_value = yield emit(node.then_branch, has_value)
+                then_statements = take_lines(mark)
+                if node.else_branch is not None:
+                    else_value = yield emit(node.else_branch, has_value)
+                    else_statements = take_lines(mark)
+                indent -= 1
+                if has_value and not then_statements and not else_statements:
+                    assert then_value is not None and else_value is not None
+                    depth = max(condition_depth, then_value[1], else_value[1])
+                    result = nest(f'({then_value[0]} if {condition} else {else_value[0]})', depth)
+                else:
+                    target = temporary() if has_value else None
+                    line(f'if {condition}:')
+                    indent += 1
+                    lines.extend(then_statements)
+                    if target is not None:
+                        assert then_value is not None
+                        line(f'{target} = {then_value[0]}')
+                    else:
+                        statement(then_value)
+                    if lines[-1].endswith(':'):
+                        line('pass')
+                    if node.else_branch is not None:
+                        indent -= 1
+                        line('else:')
+                        indent += 1
+                        lines.extend(else_statements)
+                        if target is not None:
+                            assert else_value is not None
+                            line(f'{target} = {else_value[0]}')
+                        else:
+                            statement(else_value)
+                        if lines[-1].endswith(':'):
+                            line('pass')
+                    indent -= 1
+                    result = (target or 'None', 0)
+            case ast.FunctionCall():
+                builtin = None
+                if isinstance(node.name, ast.Identifier) and node.name.binding is not None:
+                    binding = node.name.binding
+                    if binding.depth == 0 and binding.slot < len(builtin_slots):
+                        # Builtins can not be replaced, as no other function has the same type.
+                        builtin = f'__{node.name.name}'
+                if builtin is not None:
+                    arguments = yield operands(node.arguments)
+                    function = builtin
+                else:
+                    [(function, _), *arguments] = yield operands([node.name, *node.arguments])
+                depth = max([depth for _, depth in arguments], default = 0)
+                result = nest(f'{function}({", ".join(text for text, _ in arguments)})', depth)
+            case ast.VariableDeclaration():
+                initial, _ = yield emit_value(node.value)
+                line(f'{name_of(node.binding, node.name.name)} = {initial}')
+                result = ('None', 0)
+            case ast.Block():
+                for statement_node in node.statements[:-1]:
+                    statement((yield emit(statement_node, False)))
+                if not node.statements:
+                    result = ('None', 0)
+                else:
+                    last = yield emit(node.statements[-1], value)
+                    if not value:
+                        statement(last)
+                        return None
+                    assert last is not None
+                    result = last
+            case _:
+                raise Exception(f'{node.position}: Can not transpile {type(node).__name__}')
+        if not value:
+            statement(result)
+            return None
+        return result
+
+    text, _ = trampoline(emit(root, True)) or ('None', 0)
+    line(f'return {text}')
+    return "\n".join([f'def {function_name}({", ".join(parameters)}):', *prologue, *lines]) + "\n"
+
+def compile_python(root: ast.Expression) -> CodeType:
+    """Compiles the typechecked tree under 'root' into a code object that defines
+    the function 'transpile' gives."""
+    return compile(transpile(root), "<program>", "exec")
+
+def run_code(code: CodeType, read_line: Callable[[], str] = sys.stdin.readline, write: Callable[[str], Any] = sys.stdout.write) -> Value:
+    """Runs code from 'compile_python' and prints its value, like 'interpret'."""
+    namespace: dict[str, Any] = {}
+    exec(code, namespace)
+    builtins = builtin_functions(read_line, write)
+    value = namespace[function_name](builtins["print_int"], builtins["print_bool"], builtins["read_int"], divide, remainder)
+    write_value(value, write)
+    return value
+
+def dump_code(code: CodeType) -> bytes:
+    """The code object in a form 'load_code' reads, to be cached."""
+    return magic + importlib.util.MAGIC_NUMBER + marshal.dumps(code)
+
+def load_code(data: bytes) -> CodeType:
+    """Reads what 'dump_code' wrote, with the same version of Python.
+
+    Raises ValueError for other data, or code that another version of Python made.
+    """
+    if data[:len(magic)] != magic:
+        raise ValueError('Not compiled Python code')
+    if data[len(magic):len(magic) + len(importlib.util.MAGIC_NUMBER)] != importlib.util.MAGIC_NUMBER:
+        raise ValueError(f'Compiled Python code is for another version of Python than {sys.version.split()[0]}')
+    code = marshal.loads(data[len(magic) + len(importlib.util.MAGIC_NUMBER):])
+    if not isinstance(code, CodeType):
+        raise ValueError('Not compiled Python code')
+    return code
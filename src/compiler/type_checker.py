@@ -1,61 +1,83 @@
+from typing import Any, Callable
 import compiler.ast as ast 
 from compiler.types import Type, Unit, Int, Bool, FunctionType
-from compiler.symbol_table import SymbolTable
+from compiler.symbol_table import Scopes
+from compiler.trampoline import Step, trampoline
 
-declarable_types: list[str] = ["Unit", "Int", "Bool"] # allow FunctionType
+declarable_types: dict[str, Type] = {"Unit": Unit(), "Int": Int(), "Bool": Bool()} # allow FunctionType
 
-def typecheck(node: ast.Expression, sym_table: SymbolTable) -> list[Type] | Type:
+# Also records the type of every node on it, and the chosen overload on operators.
+def typecheck(node: ast.Expression, sym_table: Scopes) -> list[Type] | Type:
+	return trampoline(typecheck_step(node, sym_table))
+
+# Sub-expressions are checked by yielding what this returns, so that
+# nesting depth is not limited by the call stack. Literals and
+# identifiers are checked right away, everything else returns a Step.
+def typecheck_step(node: ast.Expression, sym_table: Scopes) -> Step[list[Type] | Type] | list[Type] | Type:
 	match node:
 		case ast.Literal():
 			if node.value is None:
-				return Unit()
+				node.type = Unit()
 			elif isinstance(node.value, bool):
-				return Bool()
+				node.type = Bool()
 			elif isinstance(node.value, int):
-				return Int()
-			raise Exception("Can you do that again, and let's hope for a different result")
+				node.type = Int()
+			else:
+				raise Exception("Can you do that again, and let's hope for a different result")
+			return node.type
 		case ast.Identifier():
 			types = sym_table.lookup(node.name)
 			if not types:
 				raise NameError(f'{node.position}: Variable "{node.name}" not found')
-			return types if len(types) > 1 else types[0]
+			node.type = types if len(types) > 1 else types[0]
+			return node.type
+	return typecheck_compound(node, sym_table)
+
+# 'step' is what sub-expressions are checked with, so that callers can wrap it.
+def typecheck_compound(node: ast.Expression, sym_table: Scopes, step: Callable[[ast.Expression, Scopes], Any] = typecheck_step) -> Step[list[Type] | Type]:
+	match node:
 		case ast.VariableDeclaration():
 			var_type = node.type_exp
-			assigned_type = typecheck(node.value, sym_table)
+			assigned_type = (yield step(node.value, sym_table))
 			if var_type is not None:
 				if var_type.name not in declarable_types:
 					raise TypeError(f'{var_type.position}: Unknown type "{var_type.name}"')
-				var_type = eval(var_type.name)()
-				if assigned_type != var_type:
-					raise TypeError(f'{node.name.position}: Variable "{node.name.name}" expects type {var_type} instead of {assigned_type}')
+				declared_type = declarable_types[var_type.name]
+				if assigned_type is not declared_type:
+					raise TypeError(f'{node.name.position}: Variable "{node.name.name}" expects type {declared_type} instead of {assigned_type}')
 			if not sym_table.insert(node.name.name, assigned_type):
 				raise NameError(f'{node.name.position}: Variable "{node.name.name}" already declared in this scope')
-			return Unit()
+			node.type = Unit()
+			return node.type
 		case ast.UnaryOp(): # combine with BinaryOp general case?
-			type_right = typecheck(node.right, sym_table)
+			type_right = (yield step(node.right, sym_table))
 			op_types = sym_table.lookup(node.op)
 			if not op_types:
 				raise Exception("I don't know what I'm doing honestly")
 			for one in op_types: # make this work with multiple types?
 				if not isinstance(one, FunctionType) or len(one.param_types) != 1:
 					continue
-				if type_right != one.param_types[0]:
+				if type_right is not one.param_types[0]:
 					raise TypeError(f'{node.position}: Unary operator "{node.op}" expects right side to have type {one.param_types[0]} instead of {type_right}')
-				return one.return_type	
+				node.overload = one
+				node.type = one.return_type
+				return node.type
 		case ast.BinaryOp():
-			type_left = typecheck(node.left, sym_table)
-			type_right = typecheck(node.right, sym_table)
+			type_left = (yield step(node.left, sym_table))
+			type_right = (yield step(node.right, sym_table))
 			if node.op == '=':
 				if not isinstance(node.left, ast.Identifier):
 					raise TypeError(f'{node.position}: Left side of assignment must be a variable name')
-				elif type_left != type_right:
+				elif type_left is not type_right:
 					raise TypeError(f'{node.position}: Assignment expects same type on both sides, instead left side was {type_left} and right side was {type_right}')
 				# no need to do the assignment as the type can't change
-				return type_right
+				node.type = type_right
+				return node.type
 			elif node.op in ['==', '!=']:
-				if type_left != type_right: 
+				if type_left is not type_right: 
 					raise TypeError(f'{node.position}: Binary operator "{node.op}" expects same type on both sides, instead left side was {type_left} and right side was {type_right}')
-				return Bool()
+				node.type = Bool()
+				return node.type
 			else: # combine with UnaryOp?
 				op_types = sym_table.lookup(node.op)
 				if not op_types:
@@ -63,43 +85,50 @@ def typecheck(node: ast.Expression, sym_table: SymbolTable) -> list[Type] | Type
 				for one in op_types: # make this work with multiple types?
 					if not isinstance(one, FunctionType) or len(one.param_types) != 2:
 						continue
-					if type_left != one.param_types[0]:
+					if type_left is not one.param_types[0]:
 						raise TypeError(f'{node.position}: Binary operator "{node.op}" expects left side to have type {one.param_types[0]} instead of {type_left}')
-					if type_right != one.param_types[1]:
+					if type_right is not one.param_types[1]:
 						raise TypeError(f'{node.position}: Binary operator "{node.op}" expects right side to have type {one.param_types[1]} instead of {type_right}')
-					return one.return_type
+					node.overload = one
+					node.type = one.return_type
+					return node.type
 		case ast.FunctionCall():
-			fun_type = typecheck(node.name, sym_table)
+			fun_type = (yield step(node.name, sym_table))
 			if not isinstance(fun_type, FunctionType):
 				raise TypeError(f'{node.name.position}: Expected a function instead of {fun_type}')
 			if len(node.arguments) != len(fun_type.param_types):
 				raise TypeError(f'{node.name.position}: Function expects {len(fun_type.param_types)} arguments instead of {len(node.arguments)}')
 			for one in range(len(node.arguments)):
-				arg_type = typecheck(node.arguments[one], sym_table)
-				if arg_type != fun_type.param_types[one]:
+				arg_type = (yield step(node.arguments[one], sym_table))
+				if arg_type is not fun_type.param_types[one]:
 					raise TypeError(f'{node.name.position}: Function expects parameter {one + 1} to have type {fun_type.param_types[one]} instead of {arg_type}')
-			return fun_type.return_type
+			node.type = fun_type.return_type
+			return node.type
 		case ast.If():
-			cond_type = typecheck(node.condition, sym_table)
-			if cond_type != Bool():
+			cond_type = (yield step(node.condition, sym_table))
+			if cond_type is not Bool():
 				raise TypeError(f'{node.position}: If expression expects type of condition to be boolean instead of {cond_type}')
-			then_type = typecheck(node.then_branch, sym_table)
+			then_type = (yield step(node.then_branch, sym_table))
 			if node.else_branch:
-				else_type = typecheck(node.else_branch, sym_table)
-				return then_type if cond_type else else_type
+				else_type = (yield step(node.else_branch, sym_table))
+				node.type = then_type if cond_type else else_type
+				return node.type
 			else:
-				return Unit()
+				node.type = Unit()
+				return node.type
 		case ast.While():
-			cond_type = typecheck(node.condition, sym_table)
-			if cond_type != Bool():
+			cond_type = (yield step(node.condition, sym_table))
+			if cond_type is not Bool():
 				raise TypeError(f'{node.position}: While expression expects type of condition to be boolean instead of {cond_type}')
-			typecheck(node.do, sym_table)
-			return Unit()
+			yield step(node.do, sym_table)
+			node.type = Unit()
+			return node.type
 		case ast.Block():
 			sym_table.init_scope()
 			return_type = Unit()
 			for statement in node.statements:
-				return_type = typecheck(statement, sym_table)
+				return_type = (yield step(statement, sym_table))
 			sym_table.exit_scope()
-			return return_type
+			node.type = return_type
+			return node.type
 	raise Exception("Alright, I think it's time for me to pack up an go")
\ No newline at end of file
@@ -1,28 +1,55 @@
-from dataclasses import dataclass
-
-@dataclass
 class Type:
-    """Base class for AST node types."""
+    """Base class for AST node types.
     
-@dataclass
-class Unit(Type):
-    def __repr__(self) -> str:
-        return Unit.__name__
+    Types are interned: structurally equal types are the same object,
+    so they can be compared with 'is' (and '==', which is the same here).
+    """
+    __slots__ = ()
+
+class PrimitiveType(Type):
+    """A type without parameters. Each has exactly one instance, e.g. Int() is Int()."""
+    __slots__ = ()
+    instances: dict[type, 'PrimitiveType'] = {}
     
-@dataclass
-class Int(Type):
-    def __repr__(self) -> str:
-        return Int.__name__
+    def __new__(cls) -> 'PrimitiveType':
+        instance = PrimitiveType.instances.get(cls)
+        if instance is None:
+            instance = PrimitiveType.instances[cls] = super().__new__(cls)
+        return instance
+    
+    def __reduce__(self) -> tuple[type, tuple[()]]:
+        return (type(self), ())
     
-@dataclass
-class Bool(Type):
     def __repr__(self) -> str:
-        return Bool.__name__
+        return type(self).__name__
+    
+class Unit(PrimitiveType):
+    __slots__ = ()
+    
+class Int(PrimitiveType):
+    __slots__ = ()
+    
+class Bool(PrimitiveType):
+    __slots__ = ()
     
-@dataclass
 class FunctionType(Type):
-    param_types: list[Type]
+    """Hash-consed: FunctionType([Int()], Bool()) is FunctionType([Int()], Bool())."""
+    __slots__ = ('param_types', 'return_type', '__weakref__')
+    instances: dict[tuple[tuple[Type, ...], Type], 'FunctionType'] = {}
+    param_types: tuple[Type, ...]
     return_type: Type
     
+    def __new__(cls, param_types: list[Type] | tuple[Type, ...], return_type: Type) -> 'FunctionType':
+        key = (tuple(param_types), return_type)
+        instance = FunctionType.instances.get(key)
+        if instance is None:
+            instance = super().__new__(cls)
+            instance.param_types, instance.return_type = key
+            FunctionType.instances[key] = instance
+        return instance
+    
+    def __reduce__(self) -> tuple[type, tuple[tuple[Type, ...], Type]]:
+        return (FunctionType, (self.param_types, self.return_type))
+    
     def __repr__(self) -> str:
-        return f'({", ".join(map(str, self.param_types))}) => {self.return_type}'
\ No newline at end of file
+        return f'({", ".join(map(str, self.param_types))}) => {self.return_type}'
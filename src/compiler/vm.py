@@ -0,0 +1,169 @@
+import sys
+from typing import Any, Callable
+from compiler.bytecode import (
+    Bytecode, PUSH_INT, PUSH_CONST, PUSH_UNIT, LOAD, STORE, POP, DUP,
+    ADD, SUB, MUL, DIV, MOD, ADD_INT, SUB_INT, NEG, NOT, LT, LE, GT, GE, EQ, NE,
+    JUMP, JUMP_IF_TRUE, JUMP_IF_FALSE, JUMP_IF_TRUE_OR_POP, JUMP_IF_FALSE_OR_POP,
+    JUMP_IF_LT, JUMP_IF_LE, JUMP_IF_GT, JUMP_IF_GE, JUMP_IF_EQ, JUMP_IF_NE,
+    PRINT_INT, PRINT_BOOL, READ_INT, CALL, RETURN,
+)
+from compiler.interpreter import Value, builtin_functions, write_value
+
+def execute(program: Bytecode, read_line: Callable[[], str] = sys.stdin.readline, write: Callable[[str], Any] = sys.stdout.write) -> tuple[Value, int]:
+    """Runs 'program'. Returns its value and the number of instructions executed.
+
+    The instructions are counted only where a jump is taken: everything from
+    the previous jump target up to the jump ran once.
+    """
+    builtins = builtin_functions(read_line, write)
+    print_int, print_bool, read_int = builtins["print_int"], builtins["print_bool"], builtins["read_int"]
+    slots: list[Any] = [None] * len(program.names)
+    for slot, name in program.builtins.items():
+        slots[slot] = builtins[name]
+    # Indexing an array makes a new int each time, a list has them already.
+    code = program.code.tolist()
+    constants = program.constants
+    stack: list[Any] = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0 # index into 'code', twice the instruction index
+    start = 0 # where the instructions not counted yet start
+    executed = 0
+    # The most common instructions first.
+    while True:
+        opcode = code[pc]
+        operand = code[pc + 1]
+        pc += 2
+        if opcode == LOAD:
+            push(slots[operand])
+        elif opcode == STORE:
+            slots[operand] = pop()
+        elif opcode == PUSH_INT:
+            push(operand)
+        elif opcode == ADD_INT:
+            stack[-1] += operand
+        elif opcode == JUMP_IF_LT:
+            right = pop()
+            if pop() < right:
+                executed += (pc - start) >> 1
+                pc = start = operand << 1
+        elif opcode == JUMP_IF_GE:
+            right = pop()
+            if pop() >= right:
+                executed += (pc - start) >> 1
+                pc = start = operand << 1
+        elif opcode == JUMP_IF_LE:
+            right = pop()
+            if pop() <= right:
+                executed += (pc - start) >> 1
+                pc = start = operand << 1
+        elif opcode == JUMP_IF_GT:
+            right = pop()
+            if pop() > right:
+                executed += (pc - start) >> 1
+                pc = start = operand << 1
+        elif opcode == JUMP_IF_EQ:
+            right = pop()
+            if pop() == right:
+                executed += (pc - start) >> 1
+                pc = start = operand << 1
+        elif opcode == JUMP_IF_NE:
+            right = pop()
+            if pop() != right:
+                executed += (pc - start) >> 1
+                pc = start = operand << 1
+        elif opcode == JUMP_IF_FALSE:
+            if not pop():
+                executed += (pc - start) >> 1
+                pc = start = operand << 1
+        elif opcode == JUMP_IF_TRUE:
+            if pop():
+                executed += (pc - start) >> 1
+                pc = start = operand << 1
+        elif opcode == JUMP:
+            executed += (pc - start) >> 1
+            pc = start = operand << 1
+        elif opcode == ADD:
+            right = pop()
+            stack[-1] += right
+        elif opcode == SUB:
+            right = pop()
+            stack[-1] -= right
+        elif opcode == MUL:
+            right = pop()
+            stack[-1] *= right
+        elif opcode == SUB_INT:
+            stack[-1] -= operand
+        elif opcode == DIV or opcode == MOD:
+            right = pop()
+            left = pop()
+            if right == 0:
+                raise ZeroDivisionError(f'{program.positions[(pc >> 1) - 1]}: Division by zero')
+            # Rounded towards zero, like in C.
+            quotient = left // right
+            if quotient < 0 and quotient * right != left:
+                quotient += 1
+            push(quotient if opcode == DIV else left - quotient * right)
+        elif opcode == LT:
+            right = pop()
+            stack[-1] = stack[-1] < right
+        elif opcode == LE:
+            right = pop()
+            stack[-1] = stack[-1] <= right
+        elif opcode == GT:
+            right = pop()
+            stack[-1] = stack[-1] > right
+        elif opcode == GE:
+            right = pop()
+            stack[-1] = stack[-1] >= right
+        elif opcode == EQ:
+            right = pop()
+            stack[-1] = stack[-1] == right
+        elif opcode == NE:
+            right = pop()
+            stack[-1] = stack[-1] != right
+        elif opcode == NEG:
+            stack[-1] = -stack[-1]
+        elif opcode == NOT:
+            stack[-1] = not stack[-1]
+        elif opcode == JUMP_IF_FALSE_OR_POP:
+            if stack[-1]:
+                pop()
+            else:
+                executed += (pc - start) >> 1
+                pc = start = operand << 1
+        elif opcode == JUMP_IF_TRUE_OR_POP:
+            if stack[-1]:
+                executed += (pc - start) >> 1
+                pc = start = operand << 1
+            else:
+                pop()
+        elif opcode == PUSH_CONST:
+            push(constants[operand])
+        elif opcode == PUSH_UNIT:
+            push(None)
+        elif opcode == POP:
+            pop()
+        elif opcode == DUP:
+            push(stack[-1])
+        elif opcode == PRINT_INT:
+            print_int(pop())
+        elif opcode == PRINT_BOOL:
+            print_bool(pop())
+        elif opcode == READ_INT:
+            push(read_int())
+        elif opcode == CALL:
+            arguments = stack[len(stack) - operand:]
+            del stack[len(stack) - operand:]
+            stack[-1] = stack[-1](*arguments)
+        elif opcode == RETURN:
+            executed += (pc - start) >> 1
+            return pop(), executed
+        else:
+            raise Exception(f'Unknown opcode {opcode} at instruction {(pc >> 1) - 1}')
+
+def run(program: Bytecode, read_line: Callable[[], str] = sys.stdin.readline, write: Callable[[str], Any] = sys.stdout.write) -> Value:
+    """Runs 'program' and prints its value, like 'interpret'."""
+    value, _ = execute(program, read_line, write)
+    write_value(value, write)
+    return value
@@ -0,0 +1,89 @@
+import pytest
+import compiler.ast as ast
+from compiler.tokenizer import Token, Type, tokenize, tokenize_stream
+from compiler.parser import parse
+from compiler.arena import Arena, parse_arena, from_tree, to_tree, typecheck_arena, BLOCK, VARIABLE_DECLARATION
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.types import Bool
+
+valid_programs = [
+    "",
+    "1",
+    "{}",
+    "{1;}",
+    "{print_int}(1)",
+    "var x = print_int; x(1)",
+    "{var print_bool = 1; print_int(1 + print_bool)}",
+    "var x: Int = 1; x = 2; x = 3",
+    "var x: Bool = true; x = not x",
+    "var x = 1; {var x = {}}",
+    "var x: Bool = 1 < -0",
+    "1 * 1 != 2 / 2",
+    "read_int()",
+    "if 1 < 2 then { 3 } else 4; if true then 1",
+    "var i = 0;\nwhile i < 10 do {\n  i = i + 1;\n  print_int(i % 3);\n}\n",
+]
+
+invalid_programs = [
+    "{false}()",
+    "(1)(1, 1+3)",
+    "print_int == print_bool",
+    "var x = 1; var y: Bool = x = 2",
+    "var x = 1; var y = x + true",
+    "{var x = 1} var y = x",
+    "var x = 1; var x = 2",
+    "var x: Unit = 1;",
+    "var x: Float = 1;",
+    "print_bool(1)",
+    "print_int(1, 2)",
+    "1 = 2",
+    "if 1 then 2",
+    "while 1 do 2",
+    "1 and 2",
+    "not 1",
+    "1 < true",
+    "- true",
+]
+
+def test_arena_converts_to_the_parsed_tree() -> None:
+    for source_code in valid_programs + invalid_programs:
+        tree = parse(tokenize_stream(source_code))
+        # repr also compares positions, which == does not
+        assert repr(to_tree(parse_arena(tokenize_stream(source_code)))) == repr(tree)
+        assert repr(to_tree(parse_arena(tokenize(source_code)))) == repr(tree)
+        assert repr(to_tree(from_tree(tree))) == repr(tree)
+
+def test_arena_keeps_token_positions() -> None:
+    tokens = [Token(Type.IDENTIFIER, "a", ast.Position(3, 4)), Token(Type.OPERATOR, "+", ast.Position(5, 6)), Token(Type.INT_LITERAL, "1", ast.Position(7, 8))]
+    arena = parse_arena(tokens)
+    assert to_tree(arena) == ast.BinaryOp(ast.Identifier("a"), "+", ast.Literal(1))
+    assert [str(arena.position(node)) for node in range(len(arena))] == ["line 3, column 4", "line 7, column 8", "line 5, column 6"]
+
+def test_arena_stores_nodes_in_arrays() -> None:
+    arena = parse_arena(tokenize("var x = 1; x = x + 1; true"))
+    assert isinstance(arena, Arena)
+    assert len(arena) == 10
+    assert arena.kinds[arena.root] == BLOCK
+    assert [arena.kinds[child] for child in arena.children_of(arena.root)][0] == VARIABLE_DECLARATION
+    assert arena.names == ["x"]
+    assert arena.literals == [1, True]
+    assert arena.operators == ["+", "="]
+
+def test_arena_typechecks_like_tree() -> None:
+    for source_code in valid_programs:
+        assert typecheck_arena(parse_arena(tokenize(source_code)), SymbolTable()) is typecheck(parse(tokenize(source_code)), SymbolTable())
+    for source_code in invalid_programs:
+        with pytest.raises(Exception) as expected:
+            typecheck(parse(tokenize(source_code)), SymbolTable())
+        with pytest.raises(expected.type) as raised:
+            typecheck_arena(parse_arena(tokenize(source_code)), SymbolTable())
+        assert str(raised.value) == str(expected.value)
+
+def test_deeply_nested_arena_typechecks() -> None:
+    depth = 100_000
+    arena = parse_arena(tokenize_stream("{ var x = true; " * depth + "x" + "}" * depth))
+    assert typecheck_arena(arena, SymbolTable()) is Bool()
+    assert from_tree(to_tree(arena)).kinds == arena.kinds
+    with pytest.raises(TypeError):
+        typecheck_arena(parse_arena(tokenize_stream("while " * depth + "1" + " do 1" * depth)), SymbolTable())
@@ -0,0 +1,111 @@
+import io
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+import pytest
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.asm_generator import generate_assembly, build_executable
+from compiler.ir_optimizer import max_opt_level
+from compiler.interpreter import interpret
+from tests.programs import generate_program
+
+pytestmark = pytest.mark.skipif(shutil.which("as") is None or shutil.which("cc") is None, reason = "needs 'as' and 'cc'")
+
+def assembly_of(source_code: str, opt_level: int = 0) -> str:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    return generate_assembly(root, opt_level)
+
+def run_native(source_code: str, input: str = "", opt_level: int = 0) -> tuple[str, str, int]:
+    """The output, error output and exit status of the compiled program."""
+    with tempfile.TemporaryDirectory() as directory:
+        executable = os.path.join(directory, "program")
+        build_executable(assembly_of(source_code, opt_level), executable)
+        result = subprocess.run([executable], input = input, capture_output = True, text = True)
+        return result.stdout, result.stderr, result.returncode
+
+def test_prints_the_value_of_the_program() -> None:
+    assert run_native("var x = 3; print_int(x * 2); x + 4") == ("6\n7\n", "", 0)
+    assert run_native("print_bool(1 < 2); 2 == 3") == ("true\nfalse\n", "", 0)
+    assert run_native("var x = 3; x = 4") == ("4\n", "", 0)
+    assert run_native("{ var x = 3; }") == ("", "", 0)
+
+def test_reads_input() -> None:
+    source_code = "var n = read_int(); var total = 0; while n > 0 do { total = total + read_int(); n = n - 1 }; total"
+    for opt_level in range(max_opt_level + 1):
+        assert run_native(source_code, "3\n10\n-4\n7\n", opt_level) == ("13\n", "", 0)
+
+def test_errors_exit_after_the_output_so_far() -> None:
+    assert run_native("print_int(1); var x = 0; print_int(5 / x)") == ("1\n", "line 1, column 38: Division by zero\n", 1)
+    assert run_native("print_int(1); 5 % 0", "", max_opt_level) == ("1\n", "line 1, column 17: Division by zero\n", 1)
+    assert run_native("print_int(read_int()); read_int()", "5\n") == ("5\n", "read_int: no more input\n", 1)
+    assert run_native("read_int()", "five\n") == ("", "read_int: invalid integer\n", 1)
+
+def test_integers_have_64_bits() -> None:
+    least = -2**63
+    source_code = f"""
+        var big = 9223372036854775807;
+        print_int(big + 1);
+        var least = {least};
+        print_int(least / -1);
+        print_int(least % -1);
+        var d = read_int();
+        print_int(least / d);
+        print_int(10000000000 * 3);
+        -7 / 2
+    """
+    output = f"{least}\n{least}\n0\n{least}\n30000000000\n-3\n"
+    for opt_level in range(max_opt_level + 1):
+        assert run_native(source_code, "-1\n", opt_level) == (output, "", 0)
+
+def test_functions_are_values() -> None:
+    source_code = "var f = print_int; f(read_int() * 2); var g = read_int; print_bool(g == read_int); print_int = print_int; print_int(g())"
+    for opt_level in range(max_opt_level + 1):
+        assert run_native(source_code, "21\n5\n", opt_level) == ("42\ntrue\n5\n", "", 0)
+
+def test_variables_live_in_registers() -> None:
+    text = assembly_of("var i = 0; var sum = 0; while i < 1000 do { i = i + 1; sum = sum + i % 7 }; sum", max_opt_level)
+    assert not re.search(r"movq .*\(%rbp\)", text)
+    # The comparison jumps out of the loop by itself.
+    assert "setl" not in text and "jge" in text
+
+def test_variables_that_do_not_fit_in_registers_go_on_the_stack() -> None:
+    count = 20
+    source_code = "".join(f"var x{n} = read_int(); " for n in range(count)) + " + ".join(f"x{n} * {n}" for n in range(count))
+    assert re.search(r"movq .*\(%rbp\)", assembly_of(source_code))
+    output, _, _ = run_native(source_code, "".join(f"{n}\n" for n in range(count)))
+    assert output == f"{sum(n * n for n in range(count))}\n"
+
+def test_command_line() -> None:
+    environment = {**os.environ, "PYTHONPATH": str(Path(__file__).parent.parent / "src")}
+    with tempfile.TemporaryDirectory() as directory:
+        source_file = os.path.join(directory, "program.txt")
+        Path(source_file).write_text("var x = read_int(); while x > 0 do { print_int(x); x = x - 1 }")
+        executable = os.path.join(directory, "program")
+        subprocess.run([sys.executable, "-m", "compiler", "compile", "-O", "2", source_file, "-o", executable], env = environment, check = True)
+        assert subprocess.run([executable], input = "2\n", capture_output = True, text = True).stdout == "2\n1\n"
+        assembly_file = os.path.join(directory, "program.s")
+        subprocess.run([sys.executable, "-m", "compiler", "asm", source_file, "--output=" + assembly_file], env = environment, check = True)
+        assert "main:" in Path(assembly_file).read_text()
+
+@pytest.mark.parametrize("seed", range(15))
+def test_compiled_programs_do_what_interpreted_ones_do(seed: int) -> None:
+    source_code = generate_program(random.Random(seed))
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    output = io.StringIO()
+    try:
+        interpret(root, io.StringIO("5\n").readline, output.write)
+        expected = (output.getvalue(), "", 0)
+    except ZeroDivisionError as error:
+        expected = (output.getvalue(), f"{error}\n", 1)
+    for opt_level in range(max_opt_level + 1):
+        assert run_native(source_code, "5\n", opt_level) == expected, (opt_level, source_code)
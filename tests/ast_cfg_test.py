@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+import compiler.ast as ast
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.ast_cfg import ControlFlowGraph, build_ast_cfg, describe, format_dot
+
+def cfg_of(source_code: str) -> ControlFlowGraph:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    return build_ast_cfg(root)
+
+def texts(cfg: ControlFlowGraph) -> list[list[str]]:
+    return [[describe(node) for node in block.nodes] for block in cfg.blocks]
+
+def test_if_else() -> None:
+    cfg = cfg_of("var x = read_int(); if x > 0 then x = 1 else x = 2; x")
+    assert texts(cfg) == [["read_int", "call read_int", "var x", "x", "0", ">"], ["1", "x ="], ["2", "x ="], ["x"], []]
+    assert [block.successors for block in cfg.blocks] == [[1, 2], [3], [3], [4], []]
+    assert cfg.blocks[3].predecessors == [1, 2]
+    assert cfg.exit == 4
+
+def test_loops_go_back_to_their_condition() -> None:
+    cfg = cfg_of("var i = 0; while i < 10 do i = i + 1; i")
+    assert texts(cfg) == [["0", "var i"], ["i", "10", "<"], ["i", "1", "+", "i ="], ["i"], []]
+    assert cfg.blocks[1].successors == [2, 3]
+    assert cfg.blocks[1].predecessors == [0, 2]
+
+def test_the_right_side_of_and_and_or_may_not_run() -> None:
+    cfg = cfg_of("var a = true; var b = a or false; b")
+    assert texts(cfg) == [["true", "var a", "a"], ["false"], ["or", "var b", "b"], []]
+    assert [block.successors for block in cfg.blocks] == [[1, 2], [2], [3], []]
+
+def test_every_declaration_is_a_variable_of_its_own() -> None:
+    cfg = cfg_of("var x = 1; { var x = x + 1; x = 3 }; x = 4; { var x = 5 }")
+    assert [declaration.value for declaration in cfg.variables] == [ast.Literal(1), ast.BinaryOp(ast.Identifier("x"), "+", ast.Literal(1)), ast.Literal(5)]
+    reads = [cfg.variable_of[id(node)] for node in cfg.blocks[0].nodes if isinstance(node, ast.Identifier)]
+    assert reads == [0]
+    assert [cfg.variable_of[id(definition)] for definition in cfg.definitions] == [0, 1, 1, 0, 2]
+    # The builtins are not variables.
+    assert all(id(node) not in cfg.variable_of for node in cfg_of("print_int(1)").blocks[0].nodes)
+
+def test_deep_nesting() -> None:
+    depth = 2_000
+    cfg = cfg_of("var x = read_int(); " + "while x > 0 do { x = x - 1; " * depth + "x = 0" + "}" * depth)
+    assert len(cfg.blocks) == 3 * depth + 2
+
+def test_dot() -> None:
+    dot = format_dot(cfg_of('var b = true; if b then print_bool(b)'))
+    assert dot.startswith("digraph cfg {\n")
+    assert 'b0 [label="entry\\l1:9 true\\l1:1 var b\\l1:18 b\\l"];' in dot
+    assert "    b0 -> b1;\n    b0 -> b2;\n    b1 -> b2;\n    b2 -> b3;\n}\n" in dot
+
+def test_command_line() -> None:
+    environment = {**os.environ, "PYTHONPATH": str(Path(__file__).parent.parent / "src")}
+    result = subprocess.run([sys.executable, "-m", "compiler", "cfg"], input = "var x = 1; while x < 3 do x = x + 1", env = environment, capture_output = True, text = True, check = True)
+    assert result.stdout == format_dot(cfg_of("var x = 1; while x < 3 do x = x + 1"))
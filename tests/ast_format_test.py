@@ -0,0 +1,67 @@
+import importlib.util
+import inspect
+import pickle
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable
+import pytest
+import compiler.ast as ast
+from compiler.tokenizer import tokenize, tokenize_stream
+from compiler.parser import parse
+from compiler.ast_format import dump_ast, load_ast, magic
+
+def load_test_module(name: str) -> ModuleType:
+    spec = importlib.util.spec_from_file_location(f"ast_format_{name}", Path(__file__).parent / f"{name}.py")
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# Every test that calls 'parse', run again with each parsed tree dumped and loaded back.
+parser_test_modules = [load_test_module(name) for name in ["parser_test", "parse_block_test", "integration_test"]]
+parser_tests = [
+    pytest.param(module, test, id = f"{module.__name__.removeprefix('ast_format_')}.{name}")
+    for module in parser_test_modules
+    for name, test in inspect.getmembers(module, inspect.isfunction)
+    if name.startswith("test_") and "parse(" in inspect.getsource(test)
+]
+
+def round_trip(tokens: Any) -> ast.Expression:
+    parsed = parse(tokens)
+    data = dump_ast(parsed)
+    loaded = load_ast(data)
+    assert dump_ast(loaded) == data # also compares positions, which == does not
+    return loaded
+
+@pytest.mark.parametrize("module, test", parser_tests)
+def test_parser_test_passes_with_loaded_trees(module: ModuleType, test: Callable[[], None], monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(module, "parse", round_trip)
+    test()
+
+def test_loaded_tree_has_same_positions() -> None:
+    source_code = "var x: Int = 100000;\n{\n  while x > 0 do x = x - 1;\n  if not true then print_int(-x) else f()\n}"
+    parsed = parse(tokenize(source_code))
+    assert repr(load_ast(dump_ast(parsed))) == repr(parsed)
+    assert repr(load_ast(dump_ast(ast.Literal(-5, position = ast.Position(7, 3))))) == repr(ast.Literal(-5, position = ast.Position(7, 3)))
+
+def test_binary_ast_is_much_smaller_than_pickle() -> None:
+    parsed = parse(tokenize("var x = 1;\n" + "x = x + 12345 * (x - 6);\n" * 100))
+    data = dump_ast(parsed)
+    assert data.startswith(magic)
+    assert len(data) * 5 < len(pickle.dumps(parsed))
+
+def test_load_rejects_other_data() -> None:
+    data = dump_ast(parse(tokenize("f(1, 2) + 3")))
+    with pytest.raises(ValueError, match = "Not a binary AST"):
+        load_ast(b"f(1, 2) + 3")
+    with pytest.raises(ValueError, match = "version 2 is not supported"):
+        load_ast(magic + b"\x02" + data[len(magic) + 1:])
+    with pytest.raises(ValueError, match = "Invalid binary AST"):
+        load_ast(data[:-1])
+    with pytest.raises(ValueError, match = "Invalid binary AST"):
+        load_ast(data + b"\x00")
+
+def test_deeply_nested_tree_round_trips() -> None:
+    depth = 100_000
+    data = dump_ast(parse(tokenize_stream("{" * depth + "1" + "}" * depth)))
+    assert dump_ast(load_ast(data)) == data
@@ -0,0 +1,109 @@
+import io
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.ast_printer import format_typed_ast
+from compiler.interpreter import interpret, Value
+from compiler.ast_optimizer import optimize, count_nodes
+import pytest
+
+def optimized(source_code: str) -> str:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    return format_typed_ast(optimize(root))
+
+def run(source_code: str, input: str = "") -> tuple[Value, str]:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    output = io.StringIO()
+    value = interpret(optimize(root), io.StringIO(input).readline, output.write)
+    return value, output.getvalue()
+
+def test_operators_on_literals_are_folded() -> None:
+    assert optimized("1 + 2 * 3") == "Literal 7 : Int"
+    assert optimized("-7 / 2 == -3 and 7 % -2 == 1") == "Literal true : Bool"
+    assert optimized("not (1 < 2) or 3 >= 4") == "Literal false : Bool"
+
+def test_double_negations_are_removed() -> None:
+    assert optimized("var x = read_int(); - - x") == "\n".join([
+        "Block : Int",
+        "  VariableDeclaration x : Unit",
+        "    FunctionCall : Int",
+        "      Identifier read_int : () => Int",
+        "  Identifier x : Int",
+    ])
+    assert optimized("var b = read_int() > 0; not not b").endswith("\n  Identifier b : Bool")
+
+def test_branches_that_can_not_run_are_removed() -> None:
+    assert optimized("if 1 < 2 then print_int(1) else print_int(2)") == "\n".join([
+        "FunctionCall : Unit",
+        "  Identifier print_int : (Int) => Unit",
+        "  Literal 1 : Int",
+    ])
+    assert optimized("if false then print_int(1)") == "Literal unit : Unit"
+    assert optimized("while 1 > 2 do print_int(1)") == "Literal unit : Unit"
+    # The left side has no effects, so it is not needed.
+    assert optimized("var x = read_int(); x > 0 or true").endswith("\n  Literal true : Bool")
+    assert optimized("print_int(1) == print_int(2) or true").startswith("BinaryOp or ")
+
+def test_if_without_else_stays_unit() -> None:
+    assert run("if true then { read_int() }", "5\n") == (None, "")
+    assert optimized("if true then { read_int() }") == "\n".join([
+        "Block : Unit",
+        "  FunctionCall : Int",
+        "    Identifier read_int : () => Int",
+        "  Literal unit : Unit",
+    ])
+
+def test_unused_declarations_are_removed() -> None:
+    assert optimized("var a = 1; var b = a * 2; var c = b + a; print_int(3)") == "\n".join([
+        "FunctionCall : Unit",
+        "  Identifier print_int : (Int) => Unit",
+        "  Literal 3 : Int",
+    ])
+
+def test_declarations_with_effects_are_kept() -> None:
+    assert optimized("var a = read_int(); var b = 1 / 0; 2") == "\n".join([
+        "Block : Int",
+        "  VariableDeclaration a : Unit",
+        "    FunctionCall : Int",
+        "      Identifier read_int : () => Int",
+        "  VariableDeclaration b : Unit",
+        "    BinaryOp / (Int, Int) => Int : Int",
+        "      Literal 1 : Int",
+        "      Literal 0 : Int",
+        "  Literal 2 : Int",
+    ])
+
+def test_division_by_zero_still_fails_where_it_did() -> None:
+    with pytest.raises(ZeroDivisionError, match = r"^line 1, column 14: Division by zero$"):
+        run("1 + 2; 3 * 4 / (5 - 5); 6")
+
+def test_loops_that_do_not_end_are_kept() -> None:
+    assert "While" in optimized("var i = 0; while true do { i = i + 1 }; 3")
+
+def test_blocks_without_declarations_are_merged() -> None:
+    lines = optimized("print_int(1); { print_int(2); { print_int(3) } }; 4").splitlines()
+    assert [line for line in lines if not line.startswith("    ")] == [
+        "Block : Int",
+        "  FunctionCall : Unit",
+        "  FunctionCall : Unit",
+        "  FunctionCall : Unit",
+        "  Literal 4 : Int",
+    ]
+    source_code = "var x = read_int(); { var x = 2; print_int(x) }; x"
+    assert optimized(source_code).count("Block") == 2
+    assert run(source_code, "5\n") == (5, "2\n5\n")
+
+def test_nodes_are_fewer() -> None:
+    root = parse(tokenize("var a = 2; var b = a * 3; { 1 + 2; print_int(a); }; if 2 > 3 then a else 4"))
+    typecheck(root, SymbolTable())
+    before = count_nodes(root)
+    assert (before, count_nodes(optimize(root))) == (23, 8)
+
+def test_deep_programs() -> None:
+    depth = 2000
+    source_code = "var x = read_int(); " + "{ var y = x; " * depth + "print_int(1 + 1)" + "}" * depth
+    assert run(source_code, "1\n") == (None, "2\n")
+    assert optimized("(" * depth + "1" + " + 1)" * depth) == f"Literal {depth + 1} : Int"
@@ -0,0 +1,117 @@
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+import pytest
+import compiler.ast as ast
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import Value
+from tests.programs import generate_program
+
+np = pytest.importorskip("numpy")
+from compiler.batch import BatchResult, run_batch, run_row
+
+def typechecked(source_code: str) -> ast.Expression:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    return root
+
+def rows_of(result: BatchResult) -> list[tuple[Value, str, str | None]]:
+    return list(zip(result.values, result.outputs, result.errors))
+
+def test_rows_run_like_separate_programs() -> None:
+    source_code = """
+        var n = read_int(); var sum = 0;
+        while n > 0 do {
+            sum = sum + n;
+            if n % 2 == 0 then print_int(n);
+            n = n - 1
+        };
+        print_bool(sum > 5);
+        if sum > 5 then sum else -sum
+    """
+    assert rows_of(run_batch(typechecked(source_code), [[1], [4], [0], [-5]])) == [
+        (-1, "false\n", None),
+        (10, "4\n2\ntrue\n", None),
+        (0, "false\n", None),
+        (0, "false\n", None),
+    ]
+
+def test_each_row_reads_its_own_numbers() -> None:
+    source_code = "var total = 0; var n = read_int(); while n > 0 do { total = total + read_int(); n = n - 1 }; total"
+    inputs = np.array([[0, 7, 7, 7], [2, 10, 20, 7], [3, -1, -2, -3]])
+    assert run_batch(typechecked(source_code), inputs).values == [0, 30, -6]
+    assert rows_of(run_batch(typechecked("print_int(read_int()); read_int()"), [[5], [6]])) == [
+        (None, "5\n", "read_int: no more input"),
+        (None, "6\n", "read_int: no more input"),
+    ]
+
+def test_sibling_blocks_declare_variables_of_other_types() -> None:
+    # The declarations in the two blocks get the same binding.
+    source_code = "{ var a = read_int(); print_int(a) }; { var b = true; print_bool(not b); b }; { var c = read_int() > 5; c }"
+    assert rows_of(run_batch(typechecked(source_code), [[5, 9], [6, 1]])) == [
+        (True, "5\nfalse\n", None),
+        (False, "6\nfalse\n", None),
+    ]
+
+def test_a_row_stops_at_its_first_error() -> None:
+    source_code = "var d = read_int(); print_int(10 / d); print_int(7 % (d - 1)); d"
+    assert rows_of(run_batch(typechecked(source_code), [[2], [0], [1], [-3]])) == [
+        (2, "5\n0\n", None),
+        (None, "", "line 1, column 34: Division by zero"),
+        (None, "10\n", "line 1, column 52: Division by zero"),
+        (-3, "-3\n3\n", None),
+    ]
+
+def test_division_rounds_towards_zero() -> None:
+    source_code = "var a = read_int(); var b = read_int(); print_int(a / b); a % b"
+    inputs = [[7, 2], [-7, 2], [7, -2], [-7, -2], [-2**63, -1], [-2**63, 1]]
+    assert rows_of(run_batch(typechecked(source_code), inputs)) == [
+        (1, "3\n", None), (-1, "-3\n", None), (1, "-3\n", None), (-1, "3\n", None),
+        (0, f"{2**63}\n", None), (0, f"{-2**63}\n", None),
+    ]
+
+def test_rows_that_overflow_run_in_the_interpreter() -> None:
+    source_code = "var x = read_int(); var i = 0; while i < 3 do { x = x * x; i = i + 1 }; print_int(-x); x + 1"
+    assert rows_of(run_batch(typechecked(source_code), [[3], [2**10], [-2]])) == [
+        (3**8 + 1, f"{-3**8}\n", None),
+        (2**80 + 1, f"{-2**80}\n", None),
+        (2**8 + 1, f"{-2**8}\n", None),
+    ]
+
+def test_programs_that_can_not_run_in_a_batch() -> None:
+    for source_code, message in [
+        ("var f = print_int; f(read_int())", r'^line 1, column 1: Can not run in a batch: "f" is of type \(Int\) => Unit$'),
+        ("var u = print_int(1); 0", r'^line 1, column 1: Can not run in a batch: "u" is of type Unit$'),
+        ("read_int() + 99999999999999999999", r"does not fit in 64 bits$"),
+    ]:
+        with pytest.raises(Exception, match = message):
+            run_batch(typechecked(source_code), [[1]])
+    with pytest.raises(ValueError):
+        run_batch(typechecked("1"), [1, 2])
+
+def test_command_line() -> None:
+    environment = {**os.environ, "PYTHONPATH": str(Path(__file__).parent.parent / "src")}
+    with tempfile.TemporaryDirectory() as directory:
+        source_file = os.path.join(directory, "program.txt")
+        Path(source_file).write_text("var n = read_int(); while n > 0 do { print_int(n); n = n - 2 }; 12 / n")
+        inputs_file = os.path.join(directory, "inputs.txt")
+        Path(inputs_file).write_text("3\n-1\n4\n")
+        result = subprocess.run([sys.executable, "-m", "compiler", "batch", source_file, "--inputs", inputs_file], env = environment, capture_output = True, text = True)
+        assert result.stdout == "0: 3\n0: 1\n0: -12\n1: -12\n2: 4\n2: 2\n"
+        assert result.stderr == "2: line 1, column 68: Division by zero\n"
+        assert result.returncode == 1
+
+@pytest.mark.parametrize("seed", range(20))
+def test_batches_run_like_the_interpreter(seed: int) -> None:
+    root = typechecked(generate_program(random.Random(seed)))
+    inputs = [[number] for number in range(-6, 7)] + [[10**9]]
+    result = run_batch(root, inputs)
+    for row, numbers in enumerate(inputs):
+        value, output, error = run_row(root, numbers)
+        assert (result.values[row], result.outputs[row], result.errors[row]) == (value, "".join(output), error), numbers
@@ -0,0 +1,69 @@
+import io
+import pytest
+from compiler.tokenizer import tokenize, tokenize_stream
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.bytecode import Bytecode, compile_bytecode, disassemble, opcode_names
+from compiler.interpreter import Value
+from compiler.vm import execute
+
+def compile_source(source_code: str) -> Bytecode:
+    root = parse(tokenize_stream(source_code))
+    typecheck(root, SymbolTable())
+    return compile_bytecode(root)
+
+def run(source_code: str, input: str = "") -> tuple[Value, str]:
+    output = io.StringIO()
+    value, _ = execute(compile_source(source_code), io.StringIO(input).readline, output.write)
+    return value, output.getvalue()
+
+def opcodes(program: Bytecode) -> list[str]:
+    return [opcode_names[opcode] for opcode in program.code[::2]]
+
+def test_loop_condition_is_one_jump() -> None:
+    program = compile_source("var i = 0;\nwhile i < 3 do i = i + 1;\ni")
+    assert disassemble(program) == "\n".join([
+        "       0 PUSH_INT             0",
+        "       1 STORE                0 (i)",
+        "       2 JUMP                 -> 6",
+        ">>     3 LOAD                 0 (i)",
+        "       4 ADD_INT              1",
+        "       5 STORE                0 (i)",
+        ">>     6 LOAD                 0 (i)",
+        "       7 PUSH_INT             3",
+        "       8 JUMP_IF_LT           -> 3",
+        "       9 LOAD                 0 (i)",
+        "      10 RETURN",
+    ])
+    # 3 before the loop, 3 for each of 3 rounds, 3 for each of 4 checks and 2 after it
+    assert execute(program) == (3, 26)
+
+def test_conditions_compile_into_jumps() -> None:
+    program = compile_source("var a = 1; if not (a < 2 and a > 0) or a == 5 then print_int(a)")
+    assert "NOT" not in opcodes(program) and "LT" not in opcodes(program)
+    assert opcodes(program).count("PRINT_INT") == 1
+    assert run("var a = 1; if not (a < 2 and a > 0) or a == 5 then print_int(a)") == (None, "")
+    assert run("var a = 5; if not (a < 2 and a > 0) or a == 5 then print_int(a)") == (None, "5\n")
+    assert run("var a = 1; var b = a < 2 and not (a > 0); b or true") == (True, "")
+
+def test_values_are_only_pushed_when_used() -> None:
+    assert "POP" not in opcodes(compile_source("var x = 1; x = 2; { x }; 3; x"))
+    assert opcodes(compile_source("var x = 1; var y = x = 2; y")).count("DUP") == 1
+
+def test_large_constants_and_function_values() -> None:
+    assert run("var x = 10000000000; x * x") == (10 ** 20, "")
+    assert run("var f = print_bool; f(1 < 2); { var print_int = print_bool; print_int(false) }") == (None, "true\nfalse\n")
+    assert run("read_int() - read_int()", "5\n8\n") == (-3, "")
+
+def test_runtime_errors() -> None:
+    with pytest.raises(ZeroDivisionError, match = "line 2, column 8: Division by zero"):
+        run("var z = 0;\n1 + (2 % z)")
+    with pytest.raises(EOFError):
+        run("read_int()")
+
+def test_deeply_nested_program_compiles() -> None:
+    depth = 100_000
+    assert run("1" + " + 1" * depth) == (depth + 1, "")
+    assert run("if true then " * depth + "print_int(1)") == (None, "1\n")
+    assert run("{ var x = 1; " * depth + "x" + "}" * depth) == (1, "")
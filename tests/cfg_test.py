@@ -0,0 +1,47 @@
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.ir import IRVar, format_ir, root_names
+from compiler.ir_generator import generate_ir
+from compiler.cfg import ControlFlowGraph, build_cfg, linearize, immediate_dominators, dominance_frontiers, liveness
+
+def cfg_of(source_code: str) -> ControlFlowGraph:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    return build_cfg(generate_ir(root))
+
+def test_blocks_end_in_jumps() -> None:
+    cfg = cfg_of("var x = read_int(); if x > 0 then x = 1 else x = 2; x")
+    assert list(cfg.blocks) == ["entry", "then.1", "else.1", "if_end.1"]
+    assert cfg.blocks["entry"].successors == ["then.1", "else.1"]
+    assert cfg.blocks["if_end.1"].predecessors == ["then.1", "else.1"]
+    # The fall through from 'else' became a jump, which linearizing removes again.
+    assert format_ir(linearize(cfg)) == format_ir(generate_ir(parse(tokenize("var x = read_int(); if x > 0 then x = 1 else x = 2; x"))))
+
+def test_dominators_of_a_loop() -> None:
+    cfg = cfg_of("var i = 0; while i < 10 do { if i % 2 == 0 then print_int(i); i = i + 1 }; i")
+    idom = immediate_dominators(cfg)
+    assert idom["while_start.1"] == "entry"
+    assert idom["while_body.1"] == "while_start.1"
+    assert idom["if_end.2"] == "while_body.1"
+    assert idom["while_end.1"] == "while_start.1"
+    frontiers = dominance_frontiers(cfg, idom)
+    assert frontiers["then.2"] == {"if_end.2"}
+    assert frontiers["if_end.2"] == {"while_start.1"}
+    assert frontiers["while_start.1"] == {"while_start.1"}
+
+def test_liveness() -> None:
+    cfg = cfg_of("var i = 0; var unused = 5; while i < 10 do i = i + 1; print_int(i)")
+    live_in, live_out = liveness(cfg)
+    assert IRVar("i") in live_in["while_start.1"] and IRVar("i") in live_out["while_body.1"]
+    assert IRVar("unused") not in live_out["entry"]
+    assert live_out["while_end.1"] == set()
+
+def test_deep_nesting() -> None:
+    depth = 2_000
+    cfg = cfg_of("var x = read_int(); " + "while x > 0 do { x = x - 1; " * depth + "x = 0" + "}" * depth)
+    idom = immediate_dominators(cfg)
+    assert len(idom) == len(cfg.blocks)
+    # Only the builtins and operators, which nothing writes.
+    assert {variable.name for variable in liveness(cfg)[0]["entry"]} <= root_names
@@ -0,0 +1,70 @@
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.ast_cfg import ControlFlowGraph, build_ast_cfg, describe
+from compiler.dataflow import Problem, solve, members, liveness, reaching_definitions, definite_assignment
+
+def cfg_of(source_code: str) -> ControlFlowGraph:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    return build_ast_cfg(root)
+
+def names(cfg: ControlFlowGraph, bits: int) -> set[str]:
+    return {cfg.variables[variable].name.name for variable in members(bits)}
+
+def test_members() -> None:
+    assert members(0) == []
+    assert members(0b101001) == [0, 3, 5]
+    assert members(1 << 1000 | 2) == [1, 1000]
+
+def test_liveness() -> None:
+    cfg = cfg_of("var i = 0; var unused = 5; var s = 0; while i < 10 do { s = s + i; i = i + 1 }; print_int(s)")
+    live_in, live_out = liveness(cfg)
+    # Blocks: the declarations, the condition, the body, after the loop and the exit.
+    assert names(cfg, live_out[0]) == {"i", "s"}
+    assert names(cfg, live_in[1]) == names(cfg, live_out[2]) == {"i", "s"}
+    assert names(cfg, live_in[3]) == {"s"}
+    assert live_out[3] == live_in[4] == 0
+    # Defined before it is read in the same block.
+    cfg = cfg_of("var x = 1; x = 2; { x = x + 1 }; x")
+    assert liveness(cfg)[0][0] == 0
+
+def test_reaching_definitions() -> None:
+    cfg = cfg_of("var x = read_int(); if x > 0 then x = 1; var y = x; while y > 0 do y = y - 1; y")
+    reaching_in, reaching_out = reaching_definitions(cfg)
+    texts = {definition: describe(cfg.definitions[definition]) + " " + str(cfg.definitions[definition].position.column) for definition in range(len(cfg.definitions))}
+    # 'var x' and 'x = 1' both reach the block after the 'if'.
+    assert [texts[definition] for definition in members(reaching_in[2])] == ["var x 1", "x = 37"]
+    # Both definitions of 'y' reach the condition of the loop, only the second one the body.
+    assert [texts[definition] for definition in members(reaching_in[3])] == ["var x 1", "x = 37", "var y 42", "y = 70"]
+    assert [texts[definition] for definition in members(reaching_out[4])] == ["var x 1", "x = 37", "y = 70"]
+
+def test_definite_assignment() -> None:
+    cfg = cfg_of("var x = 0; var y = 0; { var z = 1; if x > 0 then { y = 1; z = 2 } else z = 3; x }; while x < 3 do { var w = 1; x = x + w }; 0")
+    assigned_in, assigned_out = definite_assignment(cfg)
+    assert assigned_in[0] == 0
+    # 'z' is assigned in both branches, 'w' only when the loop runs.
+    after_if = cfg.blocks[1].successors[0]
+    assert names(cfg, assigned_in[after_if]) == {"x", "y", "z"}
+    assert names(cfg, assigned_in[cfg.exit]) == {"x", "y", "z"}
+    assert names(cfg, assigned_out[cfg.exit - 2]) == {"x", "y", "z", "w"}
+
+def test_a_problem_of_my_own() -> None:
+    # The blocks that some path from the entry goes through, each block a bit of its own.
+    cfg = cfg_of("var x = 1; while x < 10 do { if x % 2 == 0 then x = x + 3 else x = x + 1 }; x")
+    count = len(cfg.blocks)
+    _, after = solve(cfg, Problem(forward = True, may = True, gen = [1 << index for index in range(count)], kill = [0] * count))
+    assert members(after[cfg.exit]) == list(range(count))
+    # And the blocks that every path goes through: the dominators.
+    _, after = solve(cfg, Problem(forward = True, may = False, gen = [1 << index for index in range(count)], kill = [0] * count, universe = (1 << count) - 1))
+    assert members(after[cfg.exit]) == [0, 1, cfg.exit - 1, cfg.exit]
+
+def test_long_chains() -> None:
+    count = 5_000
+    cfg = cfg_of("var x = read_int(); " + "".join(f"if x > {n} then x = x - 1; " for n in range(count)) + "x")
+    live_in, _ = liveness(cfg)
+    assert all(names(cfg, live) == {"x"} for live in live_in[1:-2])
+    reaching_in, _ = reaching_definitions(cfg)
+    # Each assignment reaches the end through the ifs after it not taken.
+    assert len(members(reaching_in[cfg.exit])) == count + 1
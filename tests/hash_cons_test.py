@@ -0,0 +1,58 @@
+import pytest
+import compiler.ast as ast
+from compiler.tokenizer import tokenize, tokenize_stream
+from compiler.parser import parse
+from compiler.hash_cons import intern_tree, expand, typecheck_interned
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.types import Int, Bool
+
+def test_identical_subtrees_are_shared() -> None:
+    interned = intern_tree(parse(tokenize("(1 + 2) * (1 + 2) - x * (1 + 2)")))
+    root = interned.root
+    assert isinstance(root, ast.BinaryOp) and isinstance(root.left, ast.BinaryOp) and isinstance(root.right, ast.BinaryOp)
+    assert root.left.left is root.left.right is root.right.right
+    assert len(interned.positions) == 13
+    assert interned.nodes == 7
+    assert interned.reused[id(root.left.left)] == ()
+
+def test_subtrees_that_differ_are_not_shared() -> None:
+    root = intern_tree(parse(tokenize("f(true, 1, 1 + 1, 1 + 1, unit_like)"))).root
+    assert isinstance(root, ast.FunctionCall)
+    assert root.arguments[0] is not root.arguments[1] # True == 1, but they differ
+    assert root.arguments[1] is root.arguments[2].left # type: ignore[attr-defined]
+    assert root.arguments[2] is root.arguments[3]
+
+def test_expand_restores_positions() -> None:
+    for source_code in ["", "x", "var x = 1;\n{ x = x + 1;\n  x = x + 1 }\nif x > 1 then x + 1 else x + 1", "while true do { var a: Int = f(1, 1) }"]:
+        parsed = parse(tokenize(source_code))
+        # repr also compares positions, which == does not
+        assert repr(expand(intern_tree(parsed))) == repr(parsed)
+
+def test_interned_tree_typechecks_like_original() -> None:
+    for source_code in [
+        "var x = 1; x + 1; {var x = true; x or x}; x + 1",
+        "1 + 2 * 3 < 1 + 2 * 3",
+        "var f = print_int; f(1 + 2); {var f = print_bool; f(1 < 2)}; f(1 + 2)",
+        "{ var y = 1; y } + { var y = 1; y }",
+    ]:
+        assert typecheck_interned(intern_tree(parse(tokenize(source_code))), SymbolTable()) is typecheck(parse(tokenize(source_code)), SymbolTable())
+    for source_code in [
+        "var x = 1; x + 1; {var x = true; x + 1}",
+        "var x = 1;\n{ var x = 2 };\n{ var x = 2; var x = 2 }",
+        "1 + 2;\nprint_int(1 + 2);\nprint_bool(1 + 2)",
+        "{ var y = 1; y } + { var y = true; y }",
+    ]:
+        with pytest.raises(Exception) as expected:
+            typecheck(parse(tokenize(source_code)), SymbolTable())
+        with pytest.raises(expected.type) as raised:
+            typecheck_interned(intern_tree(parse(tokenize(source_code))), SymbolTable())
+        assert str(raised.value) == str(expected.value)
+
+def test_deeply_nested_tree_is_interned() -> None:
+    depth = 100_000
+    interned = intern_tree(parse(tokenize_stream("{ var x = true; " * depth + "x" + "}" * depth)))
+    assert typecheck_interned(interned, SymbolTable()) is Bool()
+    interned = intern_tree(parse(tokenize_stream("1" + " + 1" * depth)))
+    assert interned.nodes == depth + 1
+    assert typecheck_interned(interned, SymbolTable()) is Int()
@@ -0,0 +1,138 @@
+import random
+import pytest
+import compiler.ast as ast
+from compiler.tokenizer import tokenize_stream
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.incremental import Document
+from compiler.types import Int, Bool
+from tests.programs import generate_program
+
+def rebuilt(text: str) -> tuple[str | None, str | None]:
+    """The tree, and the error, of parsing and typechecking 'text' from scratch."""
+    try:
+        root = parse(tokenize_stream(text))
+        typecheck(root, SymbolTable())
+        # Positions are equal to all positions, so the trees compare by 'repr'.
+        return repr(root), None
+    except Exception as error:
+        return None, f'{type(error).__name__}: {error}'
+
+def check(document: Document) -> None:
+    error = None if document.error is None else f'{type(document.error).__name__}: {document.error}'
+    assert (repr(document.root) if document.root is not None else None, error) == rebuilt(document.text), document.text
+
+def test_edit_keeps_other_statements() -> None:
+    document = Document("var x = 1;\n{ var y = x; print_int(y) };\nwhile x < 3 do { x = x + 1 };\nx")
+    assert isinstance(document.root, ast.Block) and document.root.type is Int()
+    first, block, loop, last = document.root.statements
+    document.edit(document.text.index('y)'), 1, 'x')
+    check(document)
+    assert isinstance(document.root, ast.Block)
+    assert document.root.statements[0] is first
+    assert document.root.statements[1] is block
+    assert document.root.statements[2] is loop
+    assert document.root.statements[3] is last
+    # The declaration stays an Int, so what comes after is not typechecked again.
+    document.edit(document.text.index('1'), 1, '7')
+    check(document)
+    assert isinstance(document.root, ast.Block) and document.root.statements[1] is block
+
+def test_type_changes_propagate() -> None:
+    document = Document("var a = 1;\nvar b = { var c = a; c };\nb")
+    assert document.root is not None and document.root.type is Int()
+    document.edit(document.text.index('1'), 1, 'true')
+    check(document)
+    assert document.root is not None and document.root.type is Bool()
+    document.edit(document.text.index('c }'), 1, '1')
+    check(document)
+    assert document.root.type is Int()
+    document.edit(document.text.index('1 }'), 1, 'x')
+    check(document)
+    assert document.root is None and 'x' in str(document.error)
+
+def test_syntax_error_and_fix() -> None:
+    document = Document("var x = 1;\nvar y = x + 2;\ny")
+    document.edit(document.text.index('+'), 1, '')
+    check(document)
+    assert isinstance(document.error, SyntaxError)
+    # The damage of both edits is parsed again.
+    document.edit(document.text.index('= 1'), 0, '=')
+    check(document)
+    document.edit(document.text.index('== 1'), 1, '')
+    document.edit(document.text.index('x  2') + 2, 0, '*')
+    check(document)
+    assert document.error is None
+
+def test_newlines_move_positions() -> None:
+    document = Document("{ var a = 1 };\nvar b = 2;\nprint_int(b)")
+    document.edit(0, 0, "\n\n")
+    check(document)
+    document.edit(document.text.index('var b'), 0, "\n  ")
+    check(document)
+    document.edit(document.text.index('= 2'), 1, '=\n')
+    check(document)
+
+def test_context_of_statements() -> None:
+    # After '}' without ';', 'else', '(' and operators go on with the statement before.
+    for text, inserted in [("if true then { 1 } e", "lse 2"), ("{ 1 } x", "+ 2"), ("var x = 1; { x } a", "; 3")]:
+        document = Document(text)
+        for character in inserted:
+            document.edit(len(document.text) - 1, 1, document.text[-1] + character)
+            check(document)
+
+def test_typing_and_deleting() -> None:
+    for text in ["var x = 1;\n{ var y = x; print_int(y) }\nwhile x < 3 do { x = x + 1 };\nx",
+                 "if true then { 1 } else { 2 }",
+                 "({ 1 }) + 2",
+                 "var x = {\n var y = 2;\n y\n};\n{ x }\n# end\n"]:
+        document = Document("")
+        for offset, character in enumerate(text):
+            document.edit(offset, 0, character)
+            check(document)
+        document = Document(text)
+        while document.text:
+            document.edit(len(document.text) - 1, 1, '')
+            check(document)
+
+def test_single_characters_everywhere() -> None:
+    text = "var x = {\n var y = 2;\n y\n};\n{ x }\nwhile x > 0 do x = x - 1 # end\n"
+    for piece in ['\n', ' ', ';', '}', '{', '#', 'a', '(']:
+        for offset in range(len(text) + 1):
+            document = Document(text)
+            document.edit(offset, 0, piece)
+            check(document)
+            document.edit(offset, 1, '')
+            check(document)
+
+def test_random_edits() -> None:
+    for seed in range(20):
+        rng = random.Random(seed)
+        document = Document(generate_program(rng).replace('; ', ';\n    '))
+        undo: list[tuple[int, str, str]] = []
+        for _ in range(40):
+            text = document.text
+            if document.error is not None and undo and rng.random() < 0.6:
+                offset, inserted, removed = undo.pop()
+                document.edit(offset, len(inserted), removed)
+            else:
+                offset = rng.randint(0, len(text))
+                choice = rng.random()
+                if choice < 0.3:
+                    deleted, inserted = min(rng.randint(1, 3), len(text) - offset), ''
+                elif choice < 0.5:
+                    deleted, inserted = 0, rng.choice([' ', '\n', '# note\n'])
+                else:
+                    deleted, inserted = 0, rng.choice(['{', '}', ';', '(', ')', 'x', '=', '1', ' { var q = 1; q };'])
+                undo.append((offset, inserted, text[offset:offset + deleted]))
+                document.edit(offset, deleted, inserted)
+            check(document)
+
+def test_bad_edits() -> None:
+    document = Document("1 + 2")
+    with pytest.raises(ValueError):
+        document.edit(4, 2, '')
+    with pytest.raises(ValueError):
+        document.edit(-1, 0, 'x')
+    assert document.text == "1 + 2"
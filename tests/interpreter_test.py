@@ -0,0 +1,47 @@
+import io
+import pytest
+from compiler.tokenizer import tokenize, tokenize_stream
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import Value, interpret, divide, remainder
+import compiler.ast as ast
+
+def run(source_code: str, input: str = "") -> tuple[Value, str]:
+    root = parse(tokenize_stream(source_code))
+    typecheck(root, SymbolTable())
+    output = io.StringIO()
+    value = interpret(root, io.StringIO(input).readline, output.write)
+    return value, output.getvalue()
+
+def test_division_rounds_towards_zero() -> None:
+    position = ast.Position(1, 1)
+    for left in range(-7, 8):
+        for right in [-3, -2, -1, 1, 2, 3]:
+            quotient, rest = divide(left, right, position), remainder(left, right, position)
+            assert quotient == int(left / right)
+            assert quotient * right + rest == left
+            assert rest == 0 or (rest < 0) == (left < 0)
+
+def test_runtime_errors() -> None:
+    with pytest.raises(ZeroDivisionError, match = "line 2, column 13: Division by zero"):
+        run("var x = 0;\nprint_int(1 / x)")
+    with pytest.raises(ZeroDivisionError, match = "Division by zero"):
+        run("1 % 0")
+    with pytest.raises(EOFError):
+        run("read_int() + read_int()", "1\n")
+
+def test_value_is_printed_unless_unit_or_function() -> None:
+    assert run("var x = 3; x * 2") == (6, "6\n")
+    assert run("1 < 2") == (True, "true\n")
+    assert run("print_int(1)") == (None, "1\n")
+    assert run("print_int")[1] == ""
+
+def test_sibling_blocks_share_frame_slots() -> None:
+    assert run("{ var a = 1; print_int(a) }; { var b = 2; { var a = b + 1; print_int(a) }; print_int(b) }")[1] == "1\n3\n2\n"
+
+def test_deeply_nested_programs_run() -> None:
+    depth = 100_000
+    assert run("1" + " + 1" * depth) == (depth + 1, f"{depth + 1}\n")
+    assert run("if true then " * depth + "print_int(1)") == (None, "1\n")
+    assert run("{ var x = 1; " * depth + "x" + "}" * depth)[0] == 1
@@ -0,0 +1,72 @@
+import io
+from compiler.tokenizer import tokenize, tokenize_stream
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import Value
+from compiler.ir import Instruction, Call, CondJump, format_ir
+from compiler.ir_generator import generate_ir
+from compiler.ir_interpreter import execute_ir
+from compiler.ir_optimizer import PassReport, optimize_ir
+import pytest
+
+def optimize(source_code: str, opt_level: int = 2) -> tuple[list[Instruction], list[PassReport]]:
+    root = parse(tokenize_stream(source_code))
+    typecheck(root, SymbolTable())
+    return optimize_ir(generate_ir(root), opt_level)
+
+def run(source_code: str, input: str = "", opt_level: int = 2) -> tuple[Value, str, int]:
+    output = io.StringIO()
+    instructions, _ = optimize(source_code, opt_level)
+    value, executed = execute_ir(instructions, io.StringIO(input).readline, output.write)
+    return value, output.getvalue(), executed
+
+def calls(instructions: list[Instruction]) -> list[str]:
+    return [instruction.fun.name for instruction in instructions if isinstance(instruction, Call)]
+
+def test_constants_are_propagated_through_branches() -> None:
+    instructions, _ = optimize("var k = 3; var x = 0; if k * 2 > 5 then x = k + 1 else x = read_int(); print_int(x * 10)")
+    assert format_ir(instructions) == "\n".join([
+        "    %12 = 40",
+        "    %13 = print_int(%12)",
+        "    return %13",
+    ])
+
+def test_constants_in_loops() -> None:
+    source_code = "var k = 3; var s = 0; var i = 0; while i < 4 do { i = i + 1; s = s + k * 2; k = 3 }; s"
+    instructions, _ = optimize(source_code)
+    assert "*" not in calls(instructions)
+    assert run(source_code)[:2] == (24, "")
+    assert run(source_code)[2] < run(source_code, opt_level = 0)[2]
+
+def test_effects_are_kept() -> None:
+    instructions, _ = optimize("var x = read_int(); var y = x * 2; var z = 1 / 0; print_bool(true); 1")
+    assert calls(instructions) == ["read_int", "/", "print_bool"]
+    with pytest.raises(ZeroDivisionError, match = "line 1, column 46: Division by zero"):
+        run("var x = read_int(); var y = x * 2; var z = 1 / 0; print_bool(true); 1", "5")
+    instructions, _ = optimize("var x = read_int(); var y = x / 2; var z = x % read_int(); 1")
+    assert calls(instructions) == ["read_int", "read_int", "%"]
+
+def test_swapping_in_a_loop() -> None:
+    source_code = "var a = 1; var b = 2; var n = read_int(); while n > 0 do { var t = a; a = b; b = t; n = n - 1 }; a * 10 + b"
+    for opt_level in [0, 1, 2]:
+        assert run(source_code, "3", opt_level)[:2] == (21, "")
+        assert run(source_code, "4", opt_level)[:2] == (12, "")
+
+def test_level_one_keeps_branches() -> None:
+    instructions, report = optimize("var x = 1; if x > 0 then print_int(x); x", 1)
+    assert any(isinstance(instruction, CondJump) for instruction in instructions)
+    assert [each.name for each in report] == ["build cfg", "to ssa", "dead code elimination", "from ssa", "copy coalescing", "jump threading", "linearize"]
+    assert optimize("var x = 1; x", 0) == (generate_ir(parse(tokenize("var x = 1; x"))), [])
+
+def test_report_counts_instructions() -> None:
+    instructions, report = optimize("var i = 0; while i < 10 do i = i + 1; i")
+    assert report[0].before == 10
+    for previous, each in zip(report, report[1:]):
+        assert previous.after == each.before
+    assert report[-1].after == len(format_ir(instructions).splitlines()) - 3 # three labels
+
+def test_deeply_nested_program() -> None:
+    depth = 2_000
+    source_code = "var x = read_int(); " + "if x > 0 then { x = x - 1; " * depth + "print_int(x)" + "}" * depth
+    assert run(source_code, "3") == run(source_code, "3", opt_level = 0)[:2] + (run(source_code, "3")[2],)
@@ -0,0 +1,83 @@
+import io
+import pytest
+from compiler.tokenizer import tokenize, tokenize_stream
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import Value, compile_program
+from compiler.ir import Instruction, Call, CondJump, format_ir
+from compiler.ir_generator import generate_ir
+from compiler.ir_interpreter import execute_ir
+
+def generate(source_code: str) -> list[Instruction]:
+    root = parse(tokenize_stream(source_code))
+    typecheck(root, SymbolTable())
+    return generate_ir(root)
+
+def run(source_code: str, input: str = "") -> tuple[Value, str]:
+    output = io.StringIO()
+    value, _ = execute_ir(generate(source_code), io.StringIO(input).readline, output.write)
+    return value, output.getvalue()
+
+def interpreted(source_code: str, input: str = "") -> tuple[Value, str]:
+    root = parse(tokenize_stream(source_code))
+    typecheck(root, SymbolTable())
+    output = io.StringIO()
+    value = compile_program(root, io.StringIO(input).readline, output.write)()
+    return value, output.getvalue()
+
+def test_loop_is_lowered_to_jumps() -> None:
+    instructions = generate("var i = 0;\nwhile i < 3 do i = i + 1;\ni")
+    assert format_ir(instructions) == "\n".join([
+        "    %1 = 0",
+        "    i = %1",
+        "while_start.1:",
+        "    %2 = 3",
+        "    %3 = i < %2",
+        "    if %3 goto while_body.1 else while_end.1",
+        "while_body.1:",
+        "    %4 = 1",
+        "    %5 = i + %4",
+        "    i = %5",
+        "    goto while_start.1",
+        "while_end.1:",
+        "    return i",
+    ])
+    # 2 before the loop, 3 for each of 4 checks, 4 for each of 3 rounds and the return
+    assert execute_ir(instructions) == (3, 27)
+
+def test_and_and_or_are_lowered_to_jumps() -> None:
+    instructions = generate("var a = read_int(); a > 0 and a < 10 or a == 100")
+    assert not any(isinstance(instruction, Call) and instruction.fun.name in ['and', 'or'] for instruction in instructions)
+    assert sum(isinstance(instruction, CondJump) for instruction in instructions) == 2
+    for input, expected in [("5", True), ("10", False), ("100", True), ("-1", False)]:
+        assert run("var a = read_int(); a > 0 and a < 10 or a == 100", input) == (expected, "")
+    assert run("var x = 0; false and { x = 1; true }; true or { x = 2; true }; x") == (0, "")
+
+def test_shadowed_variables_are_told_apart() -> None:
+    assert "x.1 = " in format_ir(generate("var x = 1; { var x = 2; x }; x"))
+    assert run("var x = 1; { var x = 2; x = x * 10 }; x") == (1, "")
+    assert run("var print_int = print_bool; print_int(true); var unit = 3; unit") == (3, "true\n")
+
+def test_operands_are_evaluated_in_order() -> None:
+    for source_code in [
+        "var x = 1; x + { x = 5; x }",
+        "var x = 2; (x = 3) * x + { x = 4; x } * (x = 5)",
+        "var x = 1; print_int(x * { x = x + 1; x } - { x = x * 10; x }); x",
+        "var f = print_int; var x = 1; f({ f = print_int; x })",
+        "var x = 1; var y = x; x < { x = 0; x } and { x = 7; true } or x == y",
+        "var i = 0; var s = 0; while { i = i + 1; i <= 5 } do s = s + { var j = i; j * j }; s",
+    ]:
+        assert run(source_code) == interpreted(source_code), source_code
+
+def test_runtime_errors() -> None:
+    with pytest.raises(ZeroDivisionError, match = "line 2, column 3: Division by zero"):
+        run("var zero = 0;\n1 % zero")
+    with pytest.raises(EOFError):
+        run("read_int()")
+
+def test_deeply_nested_program() -> None:
+    depth = 100_000
+    assert run("1" + " + 1" * depth) == (depth + 1, "")
+    assert run("if true then " * depth + "print_int(1)") == (None, "1\n")
+    assert run("{ var x = 1; " * depth + "x" + "}" * depth) == (1, "")
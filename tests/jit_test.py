@@ -0,0 +1,152 @@
+import io
+import random
+import shutil
+from pathlib import Path
+from typing import Any
+import pytest
+import compiler.ast as ast
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.resolver import resolve
+from compiler.interpreter import interpret, Value
+from compiler import jit
+from tests.programs import generate_program
+
+needs_cc = pytest.mark.skipif(shutil.which("cc") is None, reason = "needs 'cc'")
+
+@pytest.fixture(autouse = True)
+def jit_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A cache of its own for each test, and loops that get hot fast."""
+    monkeypatch.setattr(jit, "cache_directory", str(tmp_path))
+    monkeypatch.setattr(jit, "loaded", {})
+    monkeypatch.setattr(jit, "hot_loop_rounds", 10)
+    return tmp_path
+
+def typechecked(source_code: str) -> ast.Expression:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    return root
+
+def run(source_code: str, input: str = "", use_jit: bool = True) -> tuple[Value, str]:
+    output = io.StringIO()
+    value = interpret(typechecked(source_code), io.StringIO(input).readline, output.write, jit = use_jit)
+    return value, output.getvalue()
+
+def compiled_files(directory: Path) -> list[str]:
+    return sorted(path.name for path in directory.glob("*.so"))
+
+@needs_cc
+def test_hot_loops_give_the_same_results(jit_cache: Path) -> None:
+    source_code = """
+        var i = 0; var s = 0; var done = false;
+        while i < 3000 and not done do {
+            var k = i * 2;
+            s = s + k / 3 - k % 5;
+            if s > 1000000 then done = true;
+            i = i + 1
+        };
+        print_int(i); print_bool(done); s
+    """
+    assert run(source_code) == run(source_code, use_jit = False) == (1001093, "1737\ntrue\n1001093\n")
+    assert len(compiled_files(jit_cache)) == 1
+
+@needs_cc
+def test_bool_variables_stay_bool() -> None:
+    assert run("var b = false; var i = 0; while i < 51 do { b = not b; i = i + 1 }; b") == (True, "true\n")
+
+@needs_cc
+def test_integers_too_large_for_machine_code_go_back_to_the_interpreter(jit_cache: Path) -> None:
+    source_code = "var x = 1; var i = 0; while i < 200 do { x = x * 2; i = i + 1 }; x"
+    assert run(source_code) == (2**200, f"{2**200}\n")
+    # The loop was compiled, and runs again here from the round that overflowed.
+    assert len(compiled_files(jit_cache)) == 1
+    # A loop does not start as machine code with values it can not hold.
+    source_code = "var x = 2 * 9223372036854775807; var i = 0; while i < 100 do { x = x - 1; i = i + 1 }; x"
+    assert run(source_code) == (2 * (2**63 - 1) - 100, f"{2 * (2**63 - 1) - 100}\n")
+
+@needs_cc
+def test_division_by_zero_raises_the_same_error() -> None:
+    source_code = "var d = 50; var q = 0; while true do { q = q + 100 / d; d = d - 1 }"
+    with pytest.raises(ZeroDivisionError, match = r"^line 1, column 52: Division by zero$"):
+        run(source_code)
+
+@needs_cc
+def test_loops_that_call_functions_are_not_compiled(jit_cache: Path) -> None:
+    source_code = """
+        var i = 0;
+        while i < 20 do {
+            var j = 0; var s = 0;
+            while j < 20 do { s = s + j; j = j + 1 };
+            print_int(s + i);
+            i = i + 1
+        }
+    """
+    assert run(source_code) == run(source_code, use_jit = False)
+    # Only the inner loop.
+    assert len(compiled_files(jit_cache)) == 1
+
+@needs_cc
+def test_compiled_loops_are_cached_by_their_source(jit_cache: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    source_code = "var i = 0; while i < 100 do i = i + 1; i"
+    run(source_code)
+    [name] = compiled_files(jit_cache)
+    monkeypatch.setattr(jit, "loaded", {})
+
+    def fail(*args: Any, **kwargs: Any) -> None:
+        raise AssertionError("compiled again")
+    monkeypatch.setattr(jit.subprocess, "run", fail)
+    # Another loop with the same shape has the same source code.
+    assert run("var k = 5; while k < 100 do k = k + 1; k") == (100, "100\n")
+    assert list(jit.loaded) == [name.removesuffix(".so")]
+
+@needs_cc
+def test_only_the_users_own_files_are_loaded(jit_cache: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    source_code = "var i = 0; while i < 100 do i = i + 1; i"
+    run(source_code)
+    [name] = compiled_files(jit_cache)
+    monkeypatch.setattr(jit, "loaded", {})
+
+    def fail(*args: Any, **kwargs: Any) -> None:
+        raise AssertionError("loaded")
+    monkeypatch.setattr(jit.ctypes, "CDLL", fail)
+    # Others could have changed the file, or put it there.
+    (jit_cache / name).chmod(0o666)
+    assert run(source_code) == (100, "100\n")
+    (jit_cache / name).chmod(0o700)
+    jit_cache.chmod(0o777)
+    assert run(source_code) == (100, "100\n")
+    assert jit.loaded == {}
+
+def test_without_a_compiler_loops_stay_interpreted(jit_cache: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(jit, "c_compiler", "no-such-compiler")
+    source_code = "var i = 0; var s = 0; while i < 1000 do { s = s + i * i; i = i + 1 }; s"
+    assert run(source_code) == run(source_code, use_jit = False)
+    assert compiled_files(jit_cache) == []
+
+def test_translation() -> None:
+    root = typechecked("var n = 10; var f = print_int; var i = 0; while i < n do { var k = i; i = k + 1 }; while i > 0 do f(i)")
+    resolve(root)
+    assert isinstance(root, ast.Block)
+    first, second = [node for node in root.statements if isinstance(node, ast.While)]
+    translated = jit.translate_loop(first)
+    assert translated is not None
+    source_code, variables = translated
+    # 'i' and 'n' come from outside, 'k' is local to the compiled function.
+    assert [is_bool for _, is_bool in variables] == [False, False]
+    assert "int64_t v2 = 0;" in source_code and "__builtin_add_overflow" in source_code
+    assert jit.translate_loop(second) is None
+
+@needs_cc
+@pytest.mark.parametrize("seed", range(20))
+def test_programs_run_the_same_with_the_jit(seed: int, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(jit, "hot_loop_rounds", 1)
+    source_code = generate_program(random.Random(seed))
+    results: list[tuple[Value, str] | str] = []
+    for use_jit in [False, True]:
+        try:
+            results.append(run(source_code, "5\n", use_jit))
+        except ZeroDivisionError as error:
+            results.append(str(error))
+    assert results[0] == results[1]
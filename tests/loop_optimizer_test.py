@@ -0,0 +1,185 @@
+import io
+import itertools
+import os
+import random
+import subprocess
+import sys
+from pathlib import Path
+import compiler.ast as ast
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.ast_printer import format_typed_ast
+from compiler.interpreter import interpret, Value
+from compiler.ast_optimizer import optimize
+from compiler.loop_optimizer import LoopOptions, optimize_loops, trip_count
+from tests.programs import generate_program
+import pytest
+
+only_licm = LoopOptions(licm = True, strength_reduction = False, unroll = False)
+only_strength_reduction = LoopOptions(licm = False, strength_reduction = True, unroll = False)
+only_unroll = LoopOptions(licm = False, strength_reduction = False, unroll = True)
+
+def typechecked(source_code: str) -> ast.Expression:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    return root
+
+def optimized(source_code: str, options: LoopOptions = LoopOptions()) -> str:
+    return format_typed_ast(optimize_loops(typechecked(source_code), options))
+
+def run(root: ast.Expression, input: str = "") -> tuple[Value, str]:
+    output = io.StringIO()
+    value = interpret(root, io.StringIO(input).readline, output.write)
+    return value, output.getvalue()
+
+def statements(text: str) -> list[str]:
+    """The lines of a typed AST of a block that are its statements."""
+    return [line.strip() for line in text.splitlines() if line.startswith("  ") and not line.startswith("   ")]
+
+def test_invariant_expressions_move_before_the_loop() -> None:
+    text = optimized("var n = read_int(); var i = 0; while i < n * 2 do { print_int(n * 2 + i); i = i + 1 }", only_licm)
+    assert statements(text) == [
+        "VariableDeclaration n : Unit",
+        "VariableDeclaration i : Unit",
+        "VariableDeclaration invariant1 : Unit",
+        "While : Unit",
+    ]
+    # The same expression is computed once.
+    assert text.count("BinaryOp *") == 1
+
+def test_invariant_expressions_move_out_of_as_many_loops_as_they_can() -> None:
+    source_code = """
+        var n = read_int(); var i = 0;
+        while i < 3 do {
+            var j = 0;
+            while j < 3 do { print_int(n * n + i * 10 + j); j = j + 1 };
+            i = i + 1
+        }
+    """
+    text = optimized(source_code, only_licm)
+    lines = text.splitlines()
+    # 'n * n' moves out of both loops, 'n * n + i * 10' only out of the inner one.
+    assert lines.index("  VariableDeclaration invariant1 : Unit") < lines.index("  While : Unit")
+    assert "\n".join([
+        "      VariableDeclaration invariant2 : Unit",
+        "        BinaryOp + (Int, Int) => Int : Int",
+        "          Identifier invariant1 : Int",
+        "          BinaryOp * (Int, Int) => Int : Int",
+        "            Identifier i : Int",
+        "            Literal 10 : Int",
+    ]) in text
+    assert run(optimize_loops(typechecked(source_code), only_licm), "2\n") == run(typechecked(source_code), "2\n")
+
+def test_expressions_that_may_fail_or_change_stay() -> None:
+    for source_code in [
+        "var n = read_int(); var i = 0; while i < 3 do { print_int(10 / n); i = i + 1 }",
+        "var n = read_int(); var i = 0; while i < 3 do { print_int(n * 2); n = n + 1; i = i + 1 }",
+        "var i = 0; while i < 3 do { var k = i; print_int(k * 2); i = i + 1 }",
+        "var i = 0; while i < 3 do { print_int(read_int() * 2); i = i + 1 }",
+    ]:
+        assert "invariant" not in optimized(source_code, only_licm)
+    # A loop that does not run still does not divide by zero.
+    source_code = "var n = 0; var i = 0; while i > 0 do { print_int(i / n + 6 / 3); i = i - 1 }; 5"
+    assert "invariant" in optimized(source_code, only_licm)
+    assert run(optimize_loops(typechecked(source_code), only_licm)) == (5, "5\n")
+
+def test_multiplications_by_induction_variables_become_additions() -> None:
+    source_code = "var s = 0; var i = 0; while i < 5 do { i = i + 2; s = s + i * 3 }; s"
+    text = optimized(source_code, only_strength_reduction)
+    assert text.count("BinaryOp *") == 1
+    assert statements(text)[2] == "VariableDeclaration reduced1 : Unit"
+    assert "BinaryOp = : Int\n        Identifier reduced1 : Int\n        BinaryOp + (Int, Int) => Int : Int\n          Identifier reduced1 : Int\n          Literal 6 : Int" in text
+    assert run(optimize_loops(typechecked(source_code), only_strength_reduction)) == (36, "36\n")
+
+def test_strength_reduction_with_a_variable_step() -> None:
+    source_code = "var k = read_int(); var d = read_int(); var s = 0; var i = 10; while i > 0 do { s = s + k * i; i = i - d }; s"
+    text = optimized(source_code, only_strength_reduction)
+    assert "VariableDeclaration step1 : Unit" in text
+    root = optimize_loops(typechecked(source_code), only_strength_reduction)
+    assert run(root, "3\n4\n") == run(typechecked(source_code), "3\n4\n") == (54, "54\n")
+
+def test_variables_assigned_twice_are_not_induction_variables() -> None:
+    for source_code in [
+        "var i = 0; while i < 5 do { i = i + 1; print_int(i * 3); if i == 2 then i = i + 1 }",
+        "var i = 0; while i < 5 do { i = i * 2 + 1; print_int(i * 3) }",
+        "var i = 0; var c = 1; while i < 5 do { i = i + c; c = 2; print_int(i * 3) }",
+    ]:
+        assert "reduced" not in optimized(source_code, only_strength_reduction)
+
+def test_small_loops_are_unrolled_completely() -> None:
+    source_code = "var s = 0; var i = 1; while i <= 3 do { s = s * 10 + i; i = i + 1 }; s"
+    text = optimized(source_code, only_unroll)
+    # The body declares nothing, so its statements need no block.
+    assert statements(text) == ["VariableDeclaration s : Unit", "VariableDeclaration i : Unit", *["BinaryOp = : Int"] * 6, "Identifier s : Int"]
+    assert run(optimize_loops(typechecked(source_code), only_unroll)) == (123, "123\n")
+    # Declarations in the body keep the copies in blocks of their own.
+    text = optimized("var i = 0; while i < 2 do { var j = i * 2; print_int(j); i = i + 1 }", only_unroll)
+    assert statements(text) == ["VariableDeclaration i : Unit", "Block : Int", "Block : Int", "Literal unit : Unit"]
+
+def test_larger_loops_are_unrolled_by_a_factor() -> None:
+    source_code = "var s = 0; var i = 0; while i < 1002 do { s = s + i % 7; i = i + 1 }; s"
+    root = optimize_loops(typechecked(source_code), only_unroll)
+    text = format_typed_ast(root)
+    # Two rounds before the loop, and four in each round of it.
+    assert statements(text)[2:] == [*["BinaryOp = : Int"] * 4, "While : Unit", "Identifier s : Int"]
+    assert text.count("BinaryOp %") == 6
+    assert run(root) == run(typechecked(source_code))
+
+def test_loops_without_a_known_count_are_not_unrolled() -> None:
+    for source_code in [
+        "var n = read_int(); var i = 0; while i < n do { i = i + 1 }",
+        "var i = read_int(); while i < 10 do { i = i + 1 }",
+        "var i = 0; print_int(i); while i < 10 do { i = i + 1; if i == 3 then i = 5 }",
+        "var i = 0; { i = 5 }; while i < 10 do { i = i + 1 }",
+        "var i = 0; while i < 10 do { i = i - 1; print_int(i); i = i + 2 }",
+        "var i = 0; while i < 3 do { var j = 0; while j < 3 do { j = j + 1 }; i = i + j }",
+    ]:
+        assert "While" in optimized(source_code, only_unroll)
+    # Stepping away from the limit, the loop would not end.
+    assert "While" in optimized("var i = 0; while i < 10 do { i = i - 1; print_int(i) }", only_unroll)
+
+def test_trip_count() -> None:
+    assert trip_count('<', 0, 10, 3) == 4
+    assert trip_count('<=', 0, 9, 3) == 4
+    assert trip_count('>', 10, 0, -3) == 4
+    assert trip_count('>=', 9, 0, -3) == 4
+    assert trip_count('<', 5, 5, 1) == 0
+    assert trip_count('<', 0, 5, -1) is None
+    assert trip_count('>', 5, 0, 0) is None
+
+def test_unrolled_loops_keep_their_positions_for_errors() -> None:
+    source_code = "var i = 0; while i < 3 do { print_int(6 / (2 - i)); i = i + 1 }"
+    with pytest.raises(ZeroDivisionError, match = r"^line 1, column 41: Division by zero$"):
+        run(optimize_loops(typechecked(source_code)))
+
+def test_deep_programs() -> None:
+    depth = 2000
+    source_code = "var n = read_int(); var i = 0; " + "{ " * depth + "while i < 10 do { print_int(n * n + " + "(" * depth + "i" + " + 1)" * depth + "); i = i + 1 }" + " }" * depth
+    assert run(optimize_loops(typechecked(source_code)), "3\n")[1].split() == [str(9 + i + depth) for i in range(10)]
+
+@pytest.mark.parametrize("seed", range(40))
+def test_optimized_programs_do_what_unoptimized_ones_do(seed: int) -> None:
+    source_code = generate_program(random.Random(seed))
+    try:
+        expected: tuple[Value, str] | str = run(typechecked(source_code), "5\n")
+    except ZeroDivisionError as error:
+        expected = str(error)
+    for flags in itertools.product([False, True], repeat = 3):
+        for simplify in [False, True]:
+            root = typechecked(source_code)
+            root = optimize_loops(optimize(root) if simplify else root, LoopOptions(*flags))
+            try:
+                actual: tuple[Value, str] | str = run(root, "5\n")
+            except ZeroDivisionError as error:
+                actual = str(error)
+            assert actual == expected, (flags, simplify, source_code)
+
+def test_command_line_files_named_like_flags(tmp_path: Path) -> None:
+    environment = {**os.environ, "PYTHONPATH": str(Path(__file__).parent.parent / "src")}
+    for name in ["licm", "unroll", "strength-reduction"]:
+        (tmp_path / name).write_text("var i = 0; while i < 3 do { print_int(i * 2); i = i + 1 }")
+        for flags in [[], ["--unroll", "--no-licm"]]:
+            result = subprocess.run([sys.executable, "-m", "compiler", "interpret", name, *flags], cwd = tmp_path, env = environment, input = "", capture_output = True, text = True, timeout = 60, check = True)
+            assert result.stdout == "0\n2\n4\n"
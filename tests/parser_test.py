@@ -1,6 +1,6 @@
 import pytest
 import compiler.ast as ast
-from compiler.tokenizer import Token, Type, tokenize
+from compiler.tokenizer import Token, Type, tokenize, tokenize_stream
 from compiler.parser import parse
 
 def test_int_literal_is_parsed() -> None:
@@ -226,4 +226,20 @@ def test_parse_raises_error_for_unexpected_token() -> None:
         parse([Token(Type.IDENTIFIER, "f"), Token(Type.PUNCTUATION, "("), Token(Type.PUNCTUATION, "("), Token(Type.INT_LITERAL, "1"), Token(Type.PUNCTUATION, ","), Token(Type.INT_LITERAL, "2"), Token(Type.PUNCTUATION, ","), Token(Type.INT_LITERAL, "3"), Token(Type.PUNCTUATION, ")"), Token(Type.PUNCTUATION, ")")])
 
 def test_parse_accepts_empty_token_list() -> None:
-    parse([])
\ No newline at end of file
+    parse([])
+
+def test_deeply_nested_input_is_parsed() -> None:
+    depth = 100_000
+    parsed = parse(tokenize_stream("{" * depth + "(" * depth + "1" + ")" * depth + "}" * depth))
+    for _ in range(depth):
+        assert isinstance(parsed, ast.Block)
+        parsed = parsed.statements[0]
+    assert parsed == ast.Literal(1)
+    parsed = parse(tokenize_stream("a = " * depth + "- " * depth + "1"))
+    for _ in range(depth):
+        assert isinstance(parsed, ast.BinaryOp) and parsed.op == "="
+        parsed = parsed.right
+    for _ in range(depth):
+        assert isinstance(parsed, ast.UnaryOp)
+        parsed = parsed.right
+    assert parsed == ast.Literal(1)
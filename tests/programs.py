@@ -0,0 +1,43 @@
+import random
+
+# Random programs that the tests run in many ways and compare.
+
+def generate_program(rng: random.Random) -> str:
+    """A random program of loops that end, in many shapes."""
+    counters = 0
+
+    def term(names: list[str]) -> str:
+        return rng.choice(names) if names and rng.random() < 0.7 else str(rng.randint(-3, 9))
+
+    def expression(names: list[str], depth: int) -> str:
+        choice = rng.random()
+        if depth == 0 or choice < 0.3:
+            return term(names)
+        if choice < 0.6:
+            return f'({expression(names, depth - 1)} {rng.choice("+-*")} {expression(names, depth - 1)})'
+        if choice < 0.7:
+            return f'({expression(names, depth - 1)} {rng.choice("/%")} {rng.choice(["3", "-2", term(names)])})'
+        if choice < 0.8:
+            return f'(if {expression(names, depth - 1)} < {term(names)} then {expression(names, depth - 1)} else {term(names)})'
+        return f'({term(names)} * {term(names)})'
+
+    def statement(names: list[str], variables: list[str], depth: int) -> str:
+        nonlocal counters
+        choice = rng.random()
+        if depth > 0 and choice < 0.35:
+            counters += 1
+            counter = f'i{counters}'
+            start = rng.randint(-3, 5)
+            op, step = rng.choice([('<', 1), ('<=', 2), ('>', -1), ('>=', -3)])
+            limit = start + rng.randint(-2, 12) * (1 if step > 0 else -1)
+            body = [statement(names + [counter], variables, depth - 1) for _ in range(rng.randint(1, 3))]
+            body.insert(rng.randint(0, len(body)), f'{counter} = {counter} + {step}')
+            return f'{{ var {counter} = {start}; while {counter} {op} {limit} do {{ {"; ".join(body)} }} }}'
+        if choice < 0.55 and variables:
+            return f'{rng.choice(variables)} = {expression(names, 2)}'
+        if choice < 0.7:
+            return f'if {expression(names, 1)} > {term(names)} then {{ {statement(names, variables, depth - 1)} }}'
+        return f'print_int({expression(names, 2)})'
+
+    names = ['a', 'b']
+    return "var a = read_int(); var b = 3;\n" + ";\n".join(statement(names, list(names), 3) for _ in range(3)) + ";\n" + expression(names, 2)
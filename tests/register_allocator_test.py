@@ -0,0 +1,60 @@
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.ir import IRVar, root_names
+from compiler.ir_generator import generate_ir
+from compiler.cfg import ControlFlowGraph, build_cfg
+from compiler.register_allocator import LiveInterval, live_intervals, linear_scan
+
+builtins = {IRVar(name) for name in root_names}
+
+def cfg_of(source_code: str) -> ControlFlowGraph:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    return build_cfg(generate_ir(root))
+
+def interval(name: str, start: int, end: int) -> LiveInterval:
+    return LiveInterval(IRVar(name), start, end)
+
+def test_intervals_cover_the_loops_their_variables_are_live_around() -> None:
+    cfg = cfg_of("var i = 0; var unused = 5; while i < 10 do i = i + 1; print_int(i)")
+    intervals = {each.variable.name: each for each in live_intervals(cfg, builtins)}
+    # Written by the second instruction, which copies the constant.
+    assert intervals["i"].start == 3
+    # Live until the jump back at the end of the loop body, laid out after the condition.
+    body_end = 2 * sum(len(cfg.blocks[label].instructions) for label in ["entry", "while_start.1", "while_body.1"]) - 1
+    assert intervals["i"].end >= body_end
+    assert intervals["unused"].end == intervals["unused"].start
+    assert [each.start for each in live_intervals(cfg, builtins)] == sorted(each.start for each in intervals.values())
+
+def test_registers_are_reused_after_intervals_end() -> None:
+    allocation = linear_scan([interval("a", 1, 4), interval("b", 3, 6), interval("c", 5, 8)], ["r1", "r2"], [], [])
+    assert allocation.registers == {IRVar("a"): "r1", IRVar("b"): "r2", IRVar("c"): "r1"}
+    assert allocation.slots == {}
+
+def test_results_may_take_the_register_of_an_operand_read_last() -> None:
+    # 'a' is read at 4, where the same instruction writes 'b' at 5.
+    allocation = linear_scan([interval("a", 1, 4), interval("b", 5, 8)], ["r1"], [], [])
+    assert allocation.registers == {IRVar("a"): "r1", IRVar("b"): "r1"}
+    # A result nothing reads still gets a register of its own, so a variable
+    # read by the same instruction keeps its value.
+    allocation = linear_scan([interval("a", 0, 9), interval("b", 1, 1)], ["r1", "r2"], [], [])
+    assert allocation.registers == {IRVar("a"): "r1", IRVar("b"): "r2"}
+
+def test_the_interval_that_ends_last_is_spilled() -> None:
+    intervals = [interval("long", 1, 100), interval("a", 3, 10), interval("b", 5, 12)]
+    allocation = linear_scan(intervals, ["r1", "r2"], [], [])
+    assert allocation.registers == {IRVar("a"): "r2", IRVar("b"): "r1"}
+    assert allocation.slots == {IRVar("long"): 0}
+    allocation = linear_scan([interval("a", 1, 10), interval("b", 3, 12), interval("long", 5, 100)], ["r1", "r2"], [], [])
+    assert allocation.slots == {IRVar("long"): 0}
+
+def test_intervals_across_calls_get_preserved_registers() -> None:
+    intervals = [interval("across", 1, 10), interval("argument", 3, 6), interval("result", 7, 9)]
+    allocation = linear_scan(intervals, ["scratch", "saved"], ["saved"], [7])
+    assert allocation.registers == {IRVar("across"): "saved", IRVar("argument"): "scratch", IRVar("result"): "scratch"}
+    # With no preserved register left, an interval across a call is spilled.
+    allocation = linear_scan([interval("first", 1, 10), interval("second", 2, 10)], ["scratch", "saved"], ["saved"], [7])
+    assert allocation.registers == {IRVar("first"): "saved"}
+    assert allocation.slots == {IRVar("second"): 0}
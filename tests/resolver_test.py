@@ -0,0 +1,64 @@
+import pytest
+import compiler.ast as ast
+from compiler.tokenizer import tokenize, tokenize_stream
+from compiler.parser import parse
+from compiler.resolver import resolve, builtin_slots
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+
+def test_declarations_get_depth_and_slot() -> None:
+    root = parse(tokenize("var x = 1; { var y = x; var x = y; { x = y } }; x"))
+    assert resolve(root) == len(builtin_slots)
+    assert isinstance(root, ast.Block) and root.frame_size == 1
+    outer_x, inner, use = root.statements
+    assert isinstance(outer_x, ast.VariableDeclaration) and outer_x.binding == ast.Binding(1, 0)
+    assert isinstance(use, ast.Identifier) and use.binding is outer_x.binding
+    assert isinstance(inner, ast.Block) and inner.frame_size == 2
+    y, inner_x, innermost = inner.statements
+    assert isinstance(y, ast.VariableDeclaration) and y.binding == ast.Binding(2, 0)
+    assert isinstance(y.value, ast.Identifier) and y.value.binding is outer_x.binding
+    assert isinstance(inner_x, ast.VariableDeclaration) and inner_x.binding == ast.Binding(2, 1)
+    assert isinstance(innermost, ast.Block) and innermost.frame_size == 0
+    assignment = innermost.statements[0]
+    assert isinstance(assignment, ast.BinaryOp)
+    assert isinstance(assignment.left, ast.Identifier) and assignment.left.binding is inner_x.binding
+    assert isinstance(assignment.right, ast.Identifier) and assignment.right.binding is y.binding
+
+def test_builtins_and_top_level_declarations_are_in_global_frame() -> None:
+    root = parse(tokenize("var x: Int = read_int()"))
+    assert resolve(root) == len(builtin_slots) + 1
+    assert isinstance(root, ast.VariableDeclaration) and root.binding == ast.Binding(0, len(builtin_slots))
+    assert isinstance(root.value, ast.FunctionCall) and isinstance(root.value.name, ast.Identifier)
+    assert root.value.name.binding == ast.Binding(0, builtin_slots["read_int"])
+    assert root.type_exp is not None and root.type_exp.binding is None # a type, not a variable
+
+def test_builtins_can_be_shadowed_in_blocks() -> None:
+    root = parse(tokenize("var print_int = 1; print_int"))
+    resolve(root)
+    assert isinstance(root, ast.Block) and isinstance(root.statements[1], ast.Identifier)
+    assert root.statements[1].binding == ast.Binding(1, 0)
+
+def test_resolver_reports_errors_like_typecheck() -> None:
+    for source_code in [
+        "x",
+        "var x = x",
+        "{ var x = 1 }; x",
+        "var x = 1;\n{ var y = 2;\n  var x = 3;\n  var y = 4 }",
+        "var print_int = 1",
+        "f(1, g)",
+        "while true do { var z = 1 }; z = 2",
+    ]:
+        with pytest.raises(NameError) as expected:
+            typecheck(parse(tokenize(source_code)), SymbolTable())
+        with pytest.raises(NameError) as raised:
+            resolve(parse(tokenize(source_code)))
+        assert str(raised.value) == str(expected.value)
+
+def test_resolver_handles_deep_nesting() -> None:
+    depth = 100_000
+    root = parse(tokenize_stream("{ var x = true; " * depth + "x" + "}" * depth))
+    resolve(root)
+    while isinstance(root, ast.Block):
+        assert root.frame_size == 1
+        root = root.statements[-1]
+    assert isinstance(root, ast.Identifier) and root.binding == ast.Binding(depth, 0)
@@ -0,0 +1,43 @@
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.ir import IRVar, Copy, Phi, destination
+from compiler.ir_generator import generate_ir
+from compiler.cfg import ControlFlowGraph, build_cfg
+from compiler.ssa import to_ssa, from_ssa, coalesce_copies, sequential_copies
+
+def ssa_of(source_code: str) -> ControlFlowGraph:
+    root = parse(tokenize(source_code))
+    typecheck(root, SymbolTable())
+    cfg = build_cfg(generate_ir(root))
+    to_ssa(cfg)
+    return cfg
+
+def test_every_variable_is_written_once() -> None:
+    cfg = ssa_of("var i = 0; var s = 0; while i < 10 do { i = i + 1; if i > 5 then s = s + i }; s")
+    written = [destination(instruction) for block in cfg.blocks.values() for instruction in block.instructions]
+    written_names = [variable for variable in written if variable is not None]
+    assert len(written_names) == len(set(written_names))
+    assert {str(phi.dest).split("@")[0] for phi in cfg.blocks["while_start.1"].phis()} == {"i", "s"}
+    assert [str(phi.dest).split("@")[0] for phi in cfg.blocks["if_end.2"].phis()] == ["s"]
+
+def test_phis_only_where_live() -> None:
+    # 't' is written in the loop but not live at its start, so it needs no phi there.
+    cfg = ssa_of("var i = 0; while i < 3 do { var t = i * 2; i = i + t + 1 }; i")
+    assert [str(phi.dest).split("@")[0] for phi in cfg.blocks["while_start.1"].phis()] == ["i"]
+
+def test_parallel_copies_are_sequentialized() -> None:
+    a, b, c, t = IRVar("a"), IRVar("b"), IRVar("c"), IRVar("t")
+    assert sequential_copies([(a, b), (b, a)], t) == [Copy(a, t), Copy(b, a), Copy(t, b)]
+    assert sequential_copies([(a, b), (b, c)], t) == [Copy(b, a), Copy(c, b)]
+    assert sequential_copies([(a, a)], t) == []
+
+def test_leaving_ssa_coalesces_versions() -> None:
+    cfg = ssa_of("var i = 0; while i < 10 do i = i + 1; i")
+    from_ssa(cfg)
+    assert not any(isinstance(instruction, Phi) for block in cfg.blocks.values() for instruction in block.instructions)
+    coalesce_copies(cfg)
+    names = {str(destination(instruction)) for block in cfg.blocks.values() for instruction in block.instructions} - {"None"}
+    assert "i" in names and not any("@" in name for name in names)
+    assert not any(isinstance(instruction, Copy) and instruction.source.name.startswith("i") for block in cfg.blocks.values() for instruction in block.instructions)
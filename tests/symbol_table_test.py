@@ -0,0 +1,77 @@
+import re
+import pytest
+from typing import Callable
+from compiler.tokenizer import tokenize, tokenize_stream
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import Scopes, SymbolTable, FlatSymbolTable, prelude
+from compiler.types import Int, Bool, Unit, FunctionType
+
+tables = [SymbolTable, FlatSymbolTable]
+
+@pytest.mark.parametrize("make_table", tables)
+def test_builtins_are_found(make_table: Callable[[], Scopes]) -> None:
+    table = make_table()
+    assert table.lookup("print_int") == [FunctionType([Int()], Unit())]
+    assert table.lookup("-") == [FunctionType([Int(), Int()], Int()), FunctionType([Int()], Int())]
+    assert table.lookup("x") is None
+
+@pytest.mark.parametrize("make_table", tables)
+def test_inner_declarations_shadow_outer_ones(make_table: Callable[[], Scopes]) -> None:
+    table = make_table()
+    table.init_scope()
+    assert table.insert("x", Int())
+    assert table.insert("print_int", Bool())
+    table.init_scope()
+    assert table.lookup("x") == [Int()]
+    assert table.insert("x", Bool())
+    assert table.lookup("x") == [Bool()]
+    assert table.lookup("print_int") == [Bool()]
+    table.exit_scope()
+    assert table.lookup("x") == [Int()]
+    table.exit_scope()
+    assert table.lookup("x") is None
+    assert table.lookup("print_int") == [FunctionType([Int()], Unit())]
+
+@pytest.mark.parametrize("make_table", tables)
+def test_name_can_be_declared_once_per_scope(make_table: Callable[[], Scopes]) -> None:
+    table = make_table()
+    assert not table.insert("print_int", Int()) # the builtins are in the outermost scope
+    assert table.insert("x", Int())
+    assert not table.insert("x", Int())
+    table.init_scope()
+    assert table.insert("x", Bool())
+    assert not table.insert("x", Bool())
+    table.exit_scope()
+    table.exit_scope() # exiting the outermost scope does nothing
+    assert not table.insert("x", Int())
+    assert table.lookup("x") == [Int()]
+
+def test_prelude_is_shared() -> None:
+    assert FlatSymbolTable().lookup("+") is FlatSymbolTable().lookup("+") is prelude["+"]
+    with pytest.raises(TypeError):
+        prelude["+"] = [] # type: ignore[index]
+    table = SymbolTable()
+    table.current_scope.table["-"].pop()
+    assert len(prelude["-"]) == 2
+
+def test_flat_table_typechecks_like_scoped_table() -> None:
+    for source_code in [
+        "var x = 1; { var x = true; { var x = 2; x } ; x } and true",
+        "var print_int = 1; print_int",
+        "{ var x = 1 }; var x = true; x",
+        "var x = 1; var x = 2",
+        "{ var x = 1 }; x",
+        "{ var y = 1; { var y = 2 }; var y = 3 }",
+    ]:
+        try:
+            expected = typecheck(parse(tokenize(source_code)), SymbolTable())
+        except Exception as error:
+            with pytest.raises(type(error), match = re.escape(str(error))):
+                typecheck(parse(tokenize(source_code)), FlatSymbolTable())
+        else:
+            assert typecheck(parse(tokenize(source_code)), FlatSymbolTable()) is expected
+
+def test_flat_table_handles_deep_scopes() -> None:
+    depth = 10_000
+    assert typecheck(parse(tokenize_stream("{ var x = true; " * depth + "x" + "}" * depth)), FlatSymbolTable()) is Bool()
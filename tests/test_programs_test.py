@@ -0,0 +1,123 @@
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+import pytest
+from compiler.tokenizer import tokenize
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import interpret
+from compiler.bytecode import compile_bytecode
+from compiler import vm
+from compiler.transpiler import compile_python, run_code, dump_code, load_code
+from compiler.ir_generator import generate_ir
+from compiler.ir_interpreter import run_ir
+from compiler.ir_optimizer import optimize_ir
+from compiler.ast_optimizer import optimize
+from compiler.loop_optimizer import optimize_loops
+from compiler.asm_generator import generate_assembly, build_executable
+
+# Every program in test_programs/, run in every way there is to run one.
+test_programs_dir = Path(__file__).parent.parent / "test_programs"
+
+@dataclass
+class Program:
+    source_code: str
+    input: str
+    expected_output: str
+
+def load_test_programs() -> dict[str, Program]:
+    """Each file holds test cases separated by '---' lines. In a test case, lines
+    starting with 'input' are given to read_int, and lines starting with 'prints'
+    are the output expected. The other lines are the program."""
+    programs = {}
+    for path in sorted(test_programs_dir.glob("*.txt")):
+        for number, text in enumerate(path.read_text().split("\n---\n"), 1):
+            source_lines, input_lines, output_lines = [], [], []
+            for line in text.splitlines():
+                if line.startswith("input "):
+                    input_lines.append(line.removeprefix("input ") + "\n")
+                elif line.startswith("prints "):
+                    output_lines.append(line.removeprefix("prints ") + "\n")
+                else:
+                    source_lines.append(line)
+            programs[f"{path.stem}-{number}"] = Program("\n".join(source_lines), "".join(input_lines), "".join(output_lines))
+    return programs
+
+test_programs = load_test_programs()
+
+def run_interpreter(program: Program) -> str:
+    root = parse(tokenize(program.source_code))
+    typecheck(root, SymbolTable())
+    output = io.StringIO()
+    interpret(root, io.StringIO(program.input).readline, output.write)
+    return output.getvalue()
+
+def run_vm(program: Program) -> str:
+    root = parse(tokenize(program.source_code))
+    typecheck(root, SymbolTable())
+    output = io.StringIO()
+    vm.run(compile_bytecode(root), io.StringIO(program.input).readline, output.write)
+    return output.getvalue()
+
+def run_python(program: Program) -> str:
+    root = parse(tokenize(program.source_code))
+    typecheck(root, SymbolTable())
+    output = io.StringIO()
+    # Through marshal, as if it was cached.
+    run_code(load_code(dump_code(compile_python(root))), io.StringIO(program.input).readline, output.write)
+    return output.getvalue()
+
+def run_ir_interpreter(program: Program) -> str:
+    root = parse(tokenize(program.source_code))
+    typecheck(root, SymbolTable())
+    output = io.StringIO()
+    run_ir(generate_ir(root), io.StringIO(program.input).readline, output.write)
+    return output.getvalue()
+
+def run_optimized_ast(program: Program) -> str:
+    root = parse(tokenize(program.source_code))
+    typecheck(root, SymbolTable())
+    output = io.StringIO()
+    interpret(optimize(root), io.StringIO(program.input).readline, output.write)
+    return output.getvalue()
+
+def run_optimized_loops(program: Program) -> str:
+    root = parse(tokenize(program.source_code))
+    typecheck(root, SymbolTable())
+    output = io.StringIO()
+    interpret(optimize_loops(optimize(root)), io.StringIO(program.input).readline, output.write)
+    return output.getvalue()
+
+def run_optimized_ir(opt_level: int) -> Callable[[Program], str]:
+    def run(program: Program) -> str:
+        root = parse(tokenize(program.source_code))
+        typecheck(root, SymbolTable())
+        output = io.StringIO()
+        instructions, _ = optimize_ir(generate_ir(root), opt_level)
+        run_ir(instructions, io.StringIO(program.input).readline, output.write)
+        return output.getvalue()
+    run.__name__ = f'run_ir_at_opt_level_{opt_level}'
+    return run
+
+def run_native(program: Program) -> str:
+    if shutil.which("as") is None or shutil.which("cc") is None:
+        pytest.skip("needs 'as' and 'cc'")
+    root = parse(tokenize(program.source_code))
+    typecheck(root, SymbolTable())
+    with tempfile.TemporaryDirectory() as directory:
+        executable = os.path.join(directory, "program")
+        build_executable(generate_assembly(root, 2), executable)
+        return subprocess.run([executable], input = program.input, capture_output = True, text = True, check = True).stdout
+
+runners: list[Callable[[Program], str]] = [run_interpreter, run_vm, run_python, run_ir_interpreter, run_optimized_ast, run_optimized_loops, run_optimized_ir(1), run_optimized_ir(2), run_native]
+
+@pytest.mark.parametrize("run", runners, ids = lambda run: run.__name__.removeprefix("run_"))
+@pytest.mark.parametrize("program", list(test_programs.values()), ids = list(test_programs))
+def test_program_prints_expected_output(program: Program, run: Callable[[Program], str]) -> None:
+    assert run(program) == program.expected_output
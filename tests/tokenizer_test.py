@@ -1,5 +1,11 @@
+import mmap
+import os
+import subprocess
+import sys
 import pytest
-from compiler.tokenizer import tokenize, Token, Type
+from pathlib import Path
+from compiler.tokenizer import tokenize, tokenize_stream, tokenize_bytes, tokenize_parallel, Token, Type
+from compiler.__main__ import mmap_threshold
 
 def test_tokenize_outputs_a_list() -> None:
     assert type(tokenize("")) == list
@@ -87,4 +93,71 @@ def test_tokenize_raises_error_for_invalid_tokens() -> None:
     with pytest.raises(SyntaxError):
         tokenize("23 else 6A")
     with pytest.raises(SyntaxError):
-        tokenize("23 else 6_")
\ No newline at end of file
+        tokenize("23 else 6_")
+
+def test_positions_are_tracked_across_lines() -> None:
+    tokens = tokenize("a\n  b # c\n\n\t d  // e\nf")
+    assert [(t.content, t.position.line, t.position.column) for t in tokens] == [("a", 1, 1), ("b", 2, 3), ("d", 4, 3), ("f", 5, 1)]
+    
+def test_error_reports_position() -> None:
+    with pytest.raises(SyntaxError, match="line 2, column 3"):
+        tokenize("a\nb &")
+    with pytest.raises(SyntaxError, match='Invalid identifier "6a" at: line 3, column 1'):
+        tokenize("\n\n6a")
+        
+def test_token_stream_matches_token_list() -> None:
+    source_code = "var x = 1;\nwhile x < 10 do {\n  x = x + 1 // step\n}"
+    stream = tokenize_stream(source_code)
+    tokens = tokenize(source_code)
+    assert len(stream) == len(tokens)
+    for i, token in enumerate(tokens):
+        assert stream.type(i) == token.type
+        assert stream.content(i) == token.content
+        assert str(stream.position(i)) == str(token.position)
+    assert [str(t.position) for t in stream] == [str(t.position) for t in tokens]
+    
+def test_token_stream_interns_identifiers() -> None:
+    stream = tokenize_stream("".join(["abc", "def"]) + " " + "abc" + "def")
+    assert stream.content(0) is stream.content(1)
+    
+def test_bytes_are_tokenized_like_str() -> None:
+    source_code = "var x = 1;\nwhile x < 10 do {\n\t x = x + 1 // step\n}\x1c# done"
+    expected = [(t.type, t.content, str(t.position)) for t in tokenize(source_code)]
+    inputs: list[bytes | memoryview] = [source_code.encode(), memoryview(source_code.encode())]
+    for data in inputs:
+        assert [(t.type, t.content, str(t.position)) for t in tokenize_bytes(data)] == expected
+        
+def test_mmap_is_tokenized_like_str(tmp_path: Path) -> None:
+    source_code = "if a then {b; c}\n  else 3 // x"
+    path = tmp_path / "source.txt"
+    path.write_bytes(source_code.encode())
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        assert [str(t) for t in tokenize_bytes(mapped)] == [str(t) for t in tokenize(source_code)]
+        
+def test_large_files_accept_what_small_files_accept(tmp_path: Path) -> None:
+    environment = {**os.environ, "PYTHONPATH": str(Path(__file__).parent.parent / "src")}
+    for size in [0, mmap_threshold]:
+        path = tmp_path / f"source{size}.txt"
+        path.write_text("# café\n" + " " * size + "print_int(1)", encoding = "utf-8")
+        result = subprocess.run([sys.executable, "-m", "compiler", "interpret", str(path)], env = environment, capture_output = True, text = True, timeout = 120)
+        assert (result.stdout, result.returncode) == ("1\n", 0), result.stderr
+
+def test_bytes_tokenizer_rejects_non_ascii() -> None:
+    with pytest.raises(SyntaxError, match="Non-ASCII character at: line 2, column 4"):
+        tokenize_bytes("a\nb c\xa0".encode())
+    with pytest.raises(SyntaxError, match="Non-ASCII character at: line 1, column 6"):
+        tokenize_bytes("x // ä".encode())
+    with pytest.raises(SyntaxError, match='Invalid identifier "6a" at: line 1, column 3'):
+        tokenize_bytes(b"1 6a")
+        
+def test_parallel_tokenization_matches_sequential() -> None:
+    source_code = "".join(f"var x{i} = {i} * 2; // {i}\n  {{ x{i} = x{i} + 1 }}\n\n" for i in range(200))
+    expected = [(t.type, t.content, str(t.position)) for t in tokenize(source_code)]
+    for workers in [2, 3]:
+        stream = tokenize_parallel(source_code, workers, min_chunk_size=100)
+        assert [(t.type, t.content, str(t.position)) for t in stream] == expected
+        
+def test_parallel_tokenization_reports_first_error() -> None:
+    source_code = "a\n" * 100 + "b & c\n" + "d\n" * 100 + "7e\n"
+    with pytest.raises(SyntaxError, match="Invalid character sequence at: line 101, column 3"):
+        tokenize_parallel(source_code, 3, min_chunk_size=10)
@@ -0,0 +1,81 @@
+import io
+import marshal
+import pytest
+from compiler.tokenizer import tokenize, tokenize_stream
+from compiler.parser import parse
+from compiler.type_checker import typecheck
+from compiler.symbol_table import SymbolTable
+from compiler.interpreter import Value, interpret
+from compiler.transpiler import transpile, compile_python, run_code, dump_code, load_code, magic
+
+def run(source_code: str, input: str = "") -> tuple[Value, str]:
+    root = parse(tokenize_stream(source_code))
+    typecheck(root, SymbolTable())
+    output = io.StringIO()
+    value = run_code(compile_python(root), io.StringIO(input).readline, output.write)
+    return value, output.getvalue()
+
+def interpreted(source_code: str, input: str = "") -> tuple[Value, str]:
+    root = parse(tokenize_stream(source_code))
+    typecheck(root, SymbolTable())
+    output = io.StringIO()
+    value = interpret(root, io.StringIO(input).readline, output.write)
+    return value, output.getvalue()
+
+def test_simple_loop_is_plain_python() -> None:
+    root = parse(tokenize("var n = read_int();\nwhile n > 0 do n = n - 1;\nn"))
+    typecheck(root, SymbolTable())
+    assert transpile(root) == "\n".join([
+        "def program(__print_int, __print_bool, __read_int, __divide, __remainder):",
+        "    n_0 = __read_int()",
+        "    while (n_0 > 0):",
+        "        n_0 = (n_0 - 1)",
+        "    return n_0",
+    ]) + "\n"
+
+def test_operands_are_evaluated_in_order() -> None:
+    for source_code in [
+        "var x = 1; x + { x = 5; x }",
+        "var x = 1; var f = print_int; f(x + { x = 5; x }); { f = print_int; 1 }; x",
+        "var x = 1; print_int(x * { x = x + 1; x } - { x = x * 10; x }); x",
+        "var x = 2; (x = 3) * x + { x = 4; x } * (x = 5)",
+        "var x = 1; x < { x = 0; x } and { x = 7; true } or x == 7",
+        "var x = 1; if x > 0 then { x = 2; x } else x + 1",
+        "var print_int = print_bool; print_int(true); { var print_int = 3; print_int }",
+        "var i = 0; var s = 0; while { i = i + 1; i <= 5 } do s = s + { var j = i; j * j }; s",
+    ]:
+        assert run(source_code) == interpreted(source_code), source_code
+
+def test_python_names_can_be_variables() -> None:
+    assert run("var def = 1; var __t0 = 2; var program = def + __t0; { var def = 10; program * def }") == (30, "30\n")
+
+def test_code_is_cached_with_marshal() -> None:
+    root = parse(tokenize("print_int(read_int() * 2); 1 < 2"))
+    typecheck(root, SymbolTable())
+    data = dump_code(compile_python(root))
+    assert data.startswith(magic)
+    output = io.StringIO()
+    assert run_code(load_code(data), io.StringIO("21\n").readline, output.write) is True
+    assert output.getvalue() == "42\ntrue\n"
+    with pytest.raises(ValueError, match = "Not compiled Python code"):
+        load_code(b"print_int(1)")
+    with pytest.raises(ValueError, match = "another version of Python"):
+        load_code(magic + b"\0\0\r\n" + marshal.dumps(compile("", "", "exec")))
+
+def test_runtime_errors() -> None:
+    with pytest.raises(ZeroDivisionError, match = "line 2, column 3: Division by zero"):
+        run("var zero = 0;\n1 / zero")
+    with pytest.raises(EOFError):
+        run("read_int()")
+
+def test_deep_expressions_are_split() -> None:
+    depth = 10_000
+    assert run("1" + " + 1" * depth) == (depth + 1, f"{depth + 1}\n")
+    assert run("{ var x = 1; " * depth + "x" + "}" * depth)[0] == 1
+    assert run("var x = 0; " + "x = " * depth + "1; x") == (1, "1\n")
+
+def test_too_deep_statements_are_rejected() -> None:
+    with pytest.raises(ValueError, match = "Nested too deeply"):
+        run("while false do " * 21 + "1")
+    with pytest.raises(ValueError, match = "Nested too deeply"):
+        run("if read_int() > 0 then { print_int(1); " * 100 + "1" + "}" * 100)
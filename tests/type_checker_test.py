@@ -1,8 +1,12 @@
+import pickle
 import pytest
-from compiler.tokenizer import tokenize
+import compiler.ast as ast
+from compiler.tokenizer import tokenize, tokenize_stream
 from compiler.parser import parse
 from compiler.type_checker import typecheck
+from compiler.ast_printer import format_typed_ast
 from compiler.symbol_table import SymbolTable
+from compiler.types import Int, Bool, Unit, FunctionType
 
 def test_typecheck_raises_error_for_bad_input() -> None:
     with pytest.raises(Exception):
@@ -65,4 +69,60 @@ def test_valid_program_typechecks() -> None:
     typecheck(parse(tokenize("var x: Int = 2 - -1")), SymbolTable())
     typecheck(parse(tokenize("var x: Int = {300}")), SymbolTable())
     typecheck(parse(tokenize("1 * 1 != 2 / 2")), SymbolTable())
-    typecheck(parse(tokenize("read_int()")), SymbolTable())
\ No newline at end of file
+    typecheck(parse(tokenize("read_int()")), SymbolTable())
+
+def test_deeply_nested_program_typechecks() -> None:
+    depth = 100_000
+    assert typecheck(parse(tokenize_stream("{ var x = true; " * depth + "x" + "}" * depth)), SymbolTable()) == Bool()
+    with pytest.raises(TypeError):
+        typecheck(parse(tokenize_stream("while " * depth + "1" + " do 1" * depth)), SymbolTable())
+    
+def test_types_are_interned() -> None:
+    assert Int() is Int() and Bool() is Bool() and Unit() is Unit()
+    assert Int() is not Bool()
+    assert FunctionType([Int(), Int()], Bool()) is FunctionType((Int(), Int()), Bool())
+    assert FunctionType([Int()], Bool()) is not FunctionType([Bool()], Int())
+    assert pickle.loads(pickle.dumps(FunctionType([Int()], Unit()))) is FunctionType([Int()], Unit())
+    assert typecheck(parse(tokenize("var f = print_int; f")), SymbolTable()) is FunctionType([Int()], Unit())
+
+def test_typecheck_records_types_on_nodes() -> None:
+    root = parse(tokenize("var x = 1; { x = -x - 1 }; x < 2; print_int"))
+    assert root.type is None
+    assert typecheck(root, SymbolTable()) is FunctionType([Int()], Unit())
+    assert isinstance(root, ast.Block) and root.type is FunctionType([Int()], Unit())
+    declaration, block, comparison, name = root.statements
+    assert isinstance(declaration, ast.VariableDeclaration)
+    assert declaration.type is Unit() and declaration.value.type is Int() and declaration.name.type is None
+    assert isinstance(block, ast.Block) and block.type is Int()
+    assignment = block.statements[0]
+    assert isinstance(assignment, ast.BinaryOp) and assignment.type is Int() and assignment.overload is None
+    subtraction = assignment.right
+    assert isinstance(subtraction, ast.BinaryOp) and subtraction.overload is FunctionType([Int(), Int()], Int())
+    negation = subtraction.left
+    assert isinstance(negation, ast.UnaryOp) and negation.overload is FunctionType([Int()], Int())
+    assert negation.right.type is Int()
+    assert isinstance(comparison, ast.BinaryOp) and comparison.type is Bool()
+    assert comparison.overload is FunctionType([Int(), Int()], Bool())
+    assert name.type is FunctionType([Int()], Unit())
+
+def test_typed_ast_is_formatted() -> None:
+    root = parse(tokenize("var x: Int = -1;\nif x > 0 then print_int(x) else { x = 2 }"))
+    typecheck(root, SymbolTable())
+    assert format_typed_ast(root) == "\n".join([
+        "Block : Unit",
+        "  VariableDeclaration x declared Int : Unit",
+        "    UnaryOp - (Int) => Int : Int",
+        "      Literal 1 : Int",
+        "  If-else : Unit",
+        "    BinaryOp > (Int, Int) => Bool : Bool",
+        "      Identifier x : Int",
+        "      Literal 0 : Int",
+        "    FunctionCall : Unit",
+        "      Identifier print_int : (Int) => Unit",
+        "      Identifier x : Int",
+        "    Block : Int",
+        "      BinaryOp = : Int",
+        "        Identifier x : Int",
+        "        Literal 2 : Int",
+    ])
+    assert format_typed_ast(parse(tokenize("true"))) == "Literal true : ?"